@@ -1,21 +1,31 @@
-from vnstock import Vnstock
-from datetime import datetime, timedelta
-import pandas as pd
-import time
-from vnstock.explorer.misc import *
+import argparse
+
+import instrument
+from cache import HistoryCache
+from scheduler import fetch_date_range
+from storage import DataStore
+from trading_calendar import TradingCalendar
+
+# Per-date rows of resumable backfills, partitioned by requested date
+BACKFILL_DATASET = 'backfill/gold_prices'
 
 source = 'VCI' # 'VCI' hoặc 'TCBS'
 symbol='VN30F1M'
-# Create Vnstock object and fetch stock data
 
-stock = Vnstock().stock(symbol=symbol, source=source)
-df = stock.quote.history(start='2020-01-01', end='2024-12-31')
-# Đặt cột 'time' làm cột index
-df.set_index('time', inplace=True)
-#print(df.head())
+def get_futures_history(symbol=symbol, source=source, start='2020-01-01', end='2024-12-31'):
+    """
+    Fetch daily history for a symbol (VN30F1M by default) indexed by time.
+
+    Served from the local history cache; only bars not stored yet are downloaded.
+    """
+    df = HistoryCache(source=source).history(symbol, start=start, end=end)
+    # Đặt cột 'time' làm cột index
+    return df.set_index('time')
 
 # Function to fetch gold prices for a date range
-def get_gold_prices_for_date_range(start_date_str, end_date_str, interval_days=7, delay_seconds=2):
+def get_gold_prices_for_date_range(start_date_str, end_date_str, interval_days=7, delay_seconds=2,
+                        max_workers=4, store=None, resume=True, calendar=None,
+                        trading_days_only=True):
     """
     Fetch gold prices for a range of dates with rate limiting.
     
@@ -27,8 +37,23 @@ def get_gold_prices_for_date_range(start_date_str, end_date_str, interval_days=7
         End date in 'YYYY-MM-DD' format
     interval_days : int
         Number of days between each data point (to avoid excessive API calls)
-    delay_seconds : int
-        Number of seconds to wait between API calls to respect rate limits
+    delay_seconds : float
+        Average number of seconds between API calls to respect rate limits;
+        0 disables rate limiting
+    max_workers : int
+        Number of API calls in flight at once, within the rate limit (default: 4)
+    store : storage.DataStore, optional
+        Store for resumable backfills: each date's rows are saved under
+        BACKFILL_DATASET as they arrive and dates already stored are skipped
+        (default: None, nothing is saved)
+    resume : bool
+        Skip dates completed by an earlier run when a store is given (default: True)
+    calendar : trading_calendar.TradingCalendar, optional
+        Calendar used to skip non-trading days (default: built from the history
+        cache and the holiday list)
+    trading_days_only : bool
+        Only request trading days; weekends and market holidays return empty
+        frames (default: True)
         
     Returns:
     --------
@@ -38,63 +63,39 @@ def get_gold_prices_for_date_range(start_date_str, end_date_str, interval_days=7
     Notes:
     ------
     This function returns a DataFrame named 'gold_prices' which can be used
-    with other modules in the vnstock project that expect this variable name.
+    with other modules in the vnstock project that expect this variable name;
+    providers.gold_prices loads it lazily on first access.
     The DataFrame contains columns including 'name', 'buy_price', 'sell_price', and 'date'.
     """
-    # Convert string dates to datetime objects
-    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-    
-    # Initialize an empty list to store DataFrames
-    all_prices = []
-    
-    # Calculate total number of API calls
-    total_days = (end_date - start_date).days
-    total_calls = (total_days // interval_days) + 1
-    
-    print(f"Will make approximately {total_calls} API calls with {delay_seconds} second delay between calls")
-    print(f"Estimated completion time: {total_calls * delay_seconds} seconds")
-    
-    # Loop through the date range with the specified interval
-    current_date = start_date
-    call_count = 0
-    
-    while current_date <= end_date:
-        # Convert current date to string format
-        date_str = current_date.strftime("%Y-%m-%d")
-        
-        try:
-            # Fetch gold prices for the current date
-            call_count += 1
-            print(f"[{call_count}/{total_calls}] Fetching gold prices for {date_str}...")
-            prices = sjc_gold_price(date=date_str)
-            
-            # Check if we got valid data
-            if not prices.empty:
-                # Append to the list
-                all_prices.append(prices)
-                print(f"  Retrieved {len(prices)} records")
-            else:
-                print(f"  No data available for {date_str}")
-            
-        except Exception as e:
-            print(f"  Error fetching data for {date_str}: {e}")
-        
-        # Move to the next date
-        current_date += timedelta(days=interval_days)
-        
-        # Add delay to respect rate limits (if not the last request)
-        if current_date <= end_date:
-            print(f"  Waiting {delay_seconds} seconds to respect API rate limits...")
-            time.sleep(delay_seconds)
-    
-    # Combine all DataFrames
-    if all_prices:
-        gold_prices = pd.concat(all_prices, ignore_index=True)
-        return gold_prices
-    else:
+    from vnstock.explorer.misc import sjc_gold_price
+
+    sjc_gold_price = instrument.timed('misc.sjc_gold_price')(sjc_gold_price)
+
+    if trading_days_only and calendar is None:
+        calendar = TradingCalendar.from_history_cache(HistoryCache())
+
+    # Calls are spaced delay_seconds apart on average by a token bucket,
+    # with up to max_workers requests in flight
+    gold_prices, failures = fetch_date_range(
+        lambda date_str: sjc_gold_price(date=date_str),
+        start_date_str,
+        end_date_str,
+        interval_days=interval_days,
+        rate=1.0 / delay_seconds if delay_seconds else None,
+        max_workers=max_workers,
+        store=store,
+        dataset=BACKFILL_DATASET if store is not None else None,
+        resume=resume,
+        calendar=calendar if trading_days_only else None,
+        label='gold price',
+    )
+
+    if not failures.empty:
+        print(f"\nDates that could not be fetched (retried on the next resumed run): {failures['date'].tolist()}")
+
+    if gold_prices.empty:
         print("No data was fetched for the specified date range.")
-        return pd.DataFrame()
+    return gold_prices
 
 def calculate_price_spread(df):
     """
@@ -122,28 +123,54 @@ def calculate_price_spread(df):
         print("Error: DataFrame must contain 'buy_price' and 'sell_price' columns")
         return df
 
-# Define the date range
-start_date = "2025-01-01"
-end_date = "2025-03-27"  # Today's date
+def save_gold_prices(gold_prices, store=None):
+    """Save gold prices to the data store."""
+    store = store or DataStore()
+    store.write('gold_prices', gold_prices, categories=['name'])
+    print(f"\nGold prices saved to {store.root}/gold_prices")
 
-# Fetch gold prices for the date range with a 14-day interval and 3-second delay between requests
-# Increased interval and delay to be more conservative with API usage
-gold_prices = get_gold_prices_for_date_range(start_date, end_date, interval_days=14, delay_seconds=3)
+def save_gold_prices_to_csv(gold_prices, output_file="gold_prices.csv"):
+    """Explicitly export gold prices to a CSV file."""
+    DataStore().export_csv(gold_prices, output_file)
+    print(f"\nGold prices saved to {output_file}")
 
-# Display the results
-if not gold_prices.empty:
-    # Calculate price spread
-    gold_prices = calculate_price_spread(gold_prices)
-    
-    print(f"\nFetched {len(gold_prices)} gold price records from {start_date} to {end_date}")
-    print("\nFirst few records:")
-    print(gold_prices.head())
-    
-    print("\nLast few records:")
-    print(gold_prices.tail())
-    
-    # Save to CSV
-    def save_gold_prices_to_csv():
-        output_file = "gold_prices.csv"
-        gold_prices.to_csv(output_file, index=False)
-        print(f"\nGold prices saved to {output_file}")
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch SJC gold prices for a date range.")
+    parser.add_argument('--start', default="2025-01-01", help="Start date (YYYY-MM-DD)")
+    parser.add_argument('--end', default="2025-03-27", help="End date (YYYY-MM-DD)")
+    # 14-day interval and 3-second delay to be conservative with API usage
+    parser.add_argument('--interval-days', type=int, default=14, help="Days between data points")
+    parser.add_argument('--delay', type=float, default=3, help="Seconds between API calls")
+    parser.add_argument('--workers', type=int, default=4, help="API calls in flight at once")
+    parser.add_argument('--all-days', action='store_true',
+                        help="Also request weekends and market holidays")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"Store each date under {BACKFILL_DATASET} and skip dates already fetched")
+    parser.add_argument('--save', action='store_true', help="Save the results to the data store")
+    args = parser.parse_args(argv)
+
+    # Fetch gold prices for the date range
+    gold_prices = get_gold_prices_for_date_range(args.start, args.end, interval_days=args.interval_days,
+                                                 delay_seconds=args.delay, max_workers=args.workers,
+                                                 store=DataStore() if args.resume else None,
+                                                 trading_days_only=not args.all_days)
+
+    # Display the results
+    if not gold_prices.empty:
+        # Calculate price spread
+        gold_prices = calculate_price_spread(gold_prices)
+
+        print(f"\nFetched {len(gold_prices)} gold price records from {args.start} to {args.end}")
+        print("\nFirst few records:")
+        print(gold_prices.head())
+
+        print("\nLast few records:")
+        print(gold_prices.tail())
+
+        if args.save:
+            save_gold_prices(gold_prices)
+
+    return gold_prices
+
+if __name__ == "__main__":
+    main()
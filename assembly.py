@@ -0,0 +1,177 @@
+"""
+Wide Frame Assembly Module
+
+This module aligns per-symbol historical data onto a shared time index in a
+single pass and builds the wide OHLCV frame and the close-only frame that
+test.py exports, replacing the chain of pairwise outer merges.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+
+def align_histories(all_historical_data):
+    """
+    Align per-symbol historical data onto one sorted time index.
+
+    Parameters:
+    -----------
+    all_historical_data : dict
+        Mapping of symbol to a DataFrame with a 'time' column
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Frame indexed by time with (symbol, field) MultiIndex columns, or an
+        empty DataFrame if there is no data
+    """
+    frames = []
+    keys = []
+    for symbol, data in all_historical_data.items():
+        if data is None or data.empty:
+            continue
+        frames.append(data.drop_duplicates('time', keep='last').set_index('time'))
+        keys.append(symbol)
+
+    if not frames:
+        return pd.DataFrame()
+
+    # One outer join over all symbols instead of one merge per symbol
+    aligned = pd.concat(frames, axis=1, keys=keys, join='outer', sort=True)
+    aligned.index.name = 'time'
+    return aligned
+
+
+@instrument.timed()
+def build_wide_frames(all_historical_data):
+    """
+    Build the combined OHLCV frame and the combined close price frame.
+
+    Both frames come from the same aligned data, so the per-symbol frames are
+    only read once.
+
+    Parameters:
+    -----------
+    all_historical_data : dict
+        Mapping of symbol to a DataFrame with a 'time' column
+
+    Returns:
+    --------
+    tuple of (pandas.DataFrame, pandas.DataFrame)
+        combined_data with a 'time' column followed by '{symbol}_{field}' columns,
+        and combined_prices with a 'time' column followed by '{symbol}_close'
+        columns, both sorted by time
+    """
+    aligned = align_histories(all_historical_data)
+    if aligned.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    combined_data = aligned.copy()
+    combined_data.columns = [f'{symbol}_{field}' for symbol, field in aligned.columns]
+    combined_data = combined_data.reset_index()
+
+    close_columns = [col for col in aligned.columns if col[1] == 'close']
+    combined_prices = aligned[close_columns].copy()
+    combined_prices.columns = [f'{symbol}_close' for symbol, _ in close_columns]
+    combined_prices = combined_prices.reset_index()
+
+    return combined_data, combined_prices
+
+
+def merge_chain(all_historical_data):
+    """
+    Build the same two frames with the original pairwise outer merges.
+
+    Kept as the baseline for benchmark().
+    """
+    combined_data = pd.DataFrame()
+    for symbol, data in all_historical_data.items():
+        temp_df = data.rename(columns={col: f'{symbol}_{col}' for col in data.columns if col != 'time'})
+        if combined_data.empty:
+            combined_data = temp_df
+        else:
+            combined_data = pd.merge(combined_data, temp_df, on='time', how='outer')
+    combined_data = combined_data.sort_values('time')
+
+    combined_prices = pd.DataFrame()
+    for symbol, data in all_historical_data.items():
+        temp_df = data[['time', 'close']].rename(columns={'close': f'{symbol}_close'})
+        if combined_prices.empty:
+            combined_prices = temp_df
+        else:
+            combined_prices = pd.merge(combined_prices, temp_df, on='time', how='outer')
+    combined_prices = combined_prices.sort_values('time')
+
+    return combined_data, combined_prices
+
+
+def synthetic_histories(num_symbols, start='2020-01-01', end='2024-12-31', seed=42):
+    """
+    Generate daily OHLCV frames with staggered listing dates for benchmarking.
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.bdate_range(start, end)
+    histories = {}
+    for i in range(num_symbols):
+        # Later symbols list later so the time indexes do not all match
+        offset = int(rng.integers(0, len(times) // 4))
+        t = times[offset:]
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, len(t))))
+        histories[f'S{i:04d}'] = pd.DataFrame({
+            'time': t,
+            'open': close * (1 + rng.normal(0, 0.005, len(t))),
+            'high': close * 1.02,
+            'low': close * 0.98,
+            'close': close,
+            'volume': rng.integers(1_000, 1_000_000, len(t)),
+        })
+    return histories
+
+
+def benchmark(sizes=(10, 100, 1000), start='2020-01-01', end='2024-12-31'):
+    """
+    Time the pairwise merge chain against build_wide_frames.
+
+    Parameters:
+    -----------
+    sizes : tuple of int
+        Numbers of synthetic symbols to test (default: (10, 100, 1000))
+    start, end : str
+        Date range of the synthetic daily bars
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per size with merge and single-pass timings and the speedup
+    """
+    rows = []
+    for size in sizes:
+        histories = synthetic_histories(size, start, end)
+
+        t0 = time.perf_counter()
+        old_data, old_prices = merge_chain(histories)
+        merge_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        new_data, new_prices = build_wide_frames(histories)
+        single_pass_seconds = time.perf_counter() - t0
+
+        pd.testing.assert_frame_equal(old_data.reset_index(drop=True), new_data, check_dtype=False)
+        pd.testing.assert_frame_equal(old_prices.reset_index(drop=True), new_prices, check_dtype=False)
+
+        rows.append({
+            'symbols': size,
+            'merge_seconds': merge_seconds,
+            'single_pass_seconds': single_pass_seconds,
+            'speedup': merge_seconds / single_pass_seconds,
+        })
+        print(f"{size} symbols: merge {merge_seconds:.3f}s, single pass {single_pass_seconds:.3f}s")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print(benchmark())
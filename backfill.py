@@ -0,0 +1,408 @@
+"""
+Universe Backfill Module
+
+This module backfills historical bars for a whole universe of symbols
+resolved from vnstock's listing endpoints (all symbols, one exchange or an
+index group such as VN30):
+
+- the symbols still to fetch are split into shards, one per worker process;
+  each worker fetches its shard with fetcher.fetch_histories (several
+  requests in flight), and every request of every worker draws from one
+  ratelimit.SharedRateLimiter;
+- workers write each chunk of symbols to a DataStore dataset partitioned by
+  symbol, then report the symbols as completed;
+- the parent process records completed symbols in a progress file, so an
+  interrupted backfill resumes without refetching them, and shows progress
+  with rich.progress.
+
+    python backfill.py --universe HOSE --start 2015-01-01 --end 2025-03-27 --rate 20
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+import instrument
+from fetcher import FAILURE_COLUMNS, fetch_histories, vnstock_quote
+from ratelimit import SharedRateLimiter, set_source_limiter
+from storage import DataStore
+
+# Exchange names accepted by resolve_universe -> values used by the listing
+EXCHANGES = {'HOSE': {'HOSE', 'HSX'}, 'HNX': {'HNX'}, 'UPCOM': {'UPCOM'}}
+
+# Symbols fetched and written together by a worker; completion is recorded
+# per chunk
+DEFAULT_CHUNK_SIZE = 25
+
+# Seconds between two writes of the progress file
+PROGRESS_SAVE_INTERVAL = 1.0
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def _vnstock_listing(source):
+    from vnstock import Listing
+    return instrument.traced(Listing(source=source), 'listing', source=source)
+
+
+def _symbol_column(frame):
+    return 'symbol' if 'symbol' in frame.columns else 'ticker'
+
+
+def resolve_universe(universe='all', source='VCI', listing_factory=None):
+    """
+    Resolve a universe name to its symbols through vnstock's listing.
+
+    Parameters:
+    -----------
+    universe : str or list of str
+        'all' (Listing.all_symbols), an exchange among EXCHANGES
+        (Listing.symbols_by_exchange, stocks only), an index group such as
+        'VN30' or 'HNX30' (Listing.symbols_by_group), or a list of symbols
+        returned as is (default: 'all')
+    source : str
+        Data source of the listing (default: 'VCI')
+    listing_factory : callable, optional
+        Function (source) -> object with vnstock Listing's methods. Defaults
+        to vnstock's Listing.
+
+    Returns:
+    --------
+    list of str
+        Sorted, unique symbols
+    """
+    if not isinstance(universe, str):
+        return sorted(set(universe))
+    listing = (listing_factory or _vnstock_listing)(source)
+    name = universe.upper()
+    if name == 'ALL':
+        frame = listing.all_symbols()
+        symbols = frame[_symbol_column(frame)]
+    elif name in EXCHANGES:
+        frame = listing.symbols_by_exchange()
+        exchange = 'exchange' if 'exchange' in frame.columns else 'comGroupCode'
+        frame = frame[frame[exchange].astype(str).str.upper().isin(EXCHANGES[name])]
+        if 'type' in frame.columns:
+            frame = frame[frame['type'].astype(str).str.upper() == 'STOCK']
+        symbols = frame[_symbol_column(frame)]
+    else:
+        symbols = listing.symbols_by_group(group=name)
+        if isinstance(symbols, pd.DataFrame):
+            symbols = symbols[_symbol_column(symbols)]
+    return sorted(set(pd.Series(symbols).astype(str)))
+
+
+def _progress_path(store, dataset):
+    return os.path.join(store.root, f'{dataset}.progress.json')
+
+
+def load_progress(store, dataset, start, end, interval):
+    """
+    Return the symbols recorded as completed for a dataset and date range.
+
+    Progress recorded for another range or interval is ignored.
+    """
+    path = _progress_path(store, dataset)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        progress = json.load(f)
+    if (progress.get('start'), progress.get('end'), progress.get('interval')) != (start, end, interval):
+        return set()
+    return set(progress['completed'])
+
+
+def _save_progress(store, dataset, start, end, interval, completed):
+    path = _progress_path(store, dataset)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'start': start, 'end': end, 'interval': interval, 'completed': sorted(completed)}, f)
+    os.replace(tmp_path, path)
+
+
+def shard(symbols, count):
+    """Split symbols into `count` interleaved shards of near-equal size."""
+    return [shard for shard in (symbols[i::count] for i in range(count)) if shard]
+
+
+def _exit_with_parent(parent):
+    # Pool workers outlive a parent that is killed; exit once it is gone
+    while os.getppid() == parent:
+        time.sleep(1.0)
+    os._exit(1)
+
+
+def _init_worker(limiter, source, events):
+    if limiter is not None:
+        set_source_limiter(source, limiter)
+    _worker['events'] = events
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+
+
+def _backfill_shard(symbols, start, end, interval, source, root, dataset, threads, rate_limit,
+                    retries, backoff, chunk_size, quote_factory):
+    """Fetch and store one shard in chunks, reporting each chunk to the parent."""
+    store = DataStore(root)
+    events = _worker['events']
+    for i in range(0, len(symbols), chunk_size):
+        chunk = symbols[i:i + chunk_size]
+        data, failures = fetch_histories(chunk, start, end, interval=interval, source=source, max_workers=threads,
+                                         rate_limit=rate_limit, retries=retries, backoff=backoff,
+                                         quote_factory=quote_factory, verbose=False)
+        rows = 0
+        if data:
+            frame = pd.concat([bars.assign(symbol=symbol) for symbol, bars in data.items()], ignore_index=True)
+            store.write(dataset, frame, partition_cols=['symbol'])
+            rows = len(frame)
+        # Reported only after the write, so the progress file never claims
+        # symbols that are not stored
+        events.put((list(data), failures.to_dict('records'), rows))
+    return len(symbols)
+
+
+def backfill(universe='all', start='2015-01-01', end=None, interval='1D', source='VCI', processes=None,
+             threads=8, rate_limit=None, retries=3, backoff=0.5, chunk_size=DEFAULT_CHUNK_SIZE, store=None,
+             dataset=None, resume=True, quote_factory=None, listing_factory=None, verbose=True):
+    """
+    Backfill historical bars for a universe with several worker processes.
+
+    Parameters:
+    -----------
+    universe : str or list of str
+        Universe passed to resolve_universe (default: 'all')
+    start : str
+        Start date in 'YYYY-MM-DD' format (default: '2015-01-01')
+    end : str, optional
+        End date in 'YYYY-MM-DD' format (default: today)
+    interval : str
+        Bar interval passed to Quote.history (default: '1D')
+    source : str
+        Data source (default: 'VCI')
+    processes : int, optional
+        Worker processes (default: CPU count, at most 4)
+    threads : int
+        Requests in flight per process (default: 8)
+    rate_limit : float, optional
+        Calls per second to the source, across all processes. None disables
+        rate limiting (default: None)
+    retries : int
+        Maximum attempts per symbol (default: 3)
+    backoff : float
+        Base of the exponential backoff between attempts, in seconds (default: 0.5)
+    chunk_size : int
+        Symbols written and recorded together (default: DEFAULT_CHUNK_SIZE)
+    store : storage.DataStore, optional
+        Store receiving the bars (default: DataStore())
+    dataset : str, optional
+        Dataset name, partitioned by symbol (default: 'history_{interval}')
+    resume : bool
+        Skip symbols recorded as completed by an earlier run of the same
+        dataset, range and interval (default: True)
+    quote_factory : callable, optional
+        Picklable function (symbol, source) -> object with a ``history``
+        method (default: vnstock's Quote)
+    listing_factory : callable, optional
+        Passed to resolve_universe
+    verbose : bool
+        Show progress with rich.progress (default: True)
+
+    Returns:
+    --------
+    tuple of (dict, pandas.DataFrame)
+        Summary (symbols, skipped, completed, failed, rows, seconds, and
+        estimated_seconds, the duration at the rate limit) and a failure
+        report (columns: FAILURE_COLUMNS)
+    """
+    end = end or pd.Timestamp.now().strftime('%Y-%m-%d')
+    store = store or DataStore()
+    dataset = dataset or f'history_{interval}'
+    processes = processes or min(4, os.cpu_count() or 1)
+    quote_factory = quote_factory or vnstock_quote
+
+    symbols = resolve_universe(universe, source, listing_factory)
+    completed = load_progress(store, dataset, start, end, interval) if resume else set()
+    remaining = [symbol for symbol in symbols if symbol not in completed]
+    shards = shard(remaining, processes)
+    # One request per symbol: the rate limit bounds how fast the run can go
+    estimated = len(remaining) / rate_limit if rate_limit else None
+    if verbose:
+        message = f"Backfilling {len(remaining)} of {len(symbols)} symbols ({len(symbols) - len(remaining)} done) " \
+                  f"with {len(shards)} processes x {threads} requests"
+        if estimated is not None:
+            message += f"; at least {estimated:.0f}s at {rate_limit:g} calls/s"
+        print(message)
+
+    context = multiprocessing.get_context('spawn')
+    limiter = SharedRateLimiter(rate_limit, context=context) if rate_limit else None
+    events = context.Queue()
+    failures = []
+    rows = 0
+    done = 0
+    t0 = time.perf_counter()
+
+    progress = None
+    if verbose:
+        from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn, \
+            TimeRemainingColumn
+        progress = Progress(TextColumn("[bold]{task.description}"), BarColumn(), MofNCompleteColumn(),
+                            TimeElapsedColumn(), TimeRemainingColumn())
+        progress.start()
+        task = progress.add_task(f"{dataset} {start}..{end}", total=len(remaining))
+
+    def handle(event):
+        nonlocal rows, done
+        fetched, failed, event_rows = event
+        completed.update(fetched)
+        failures.extend(failed)
+        rows += event_rows
+        done += len(fetched) + len(failed)
+        if progress is not None:
+            progress.update(task, advance=len(fetched) + len(failed),
+                            description=f"{dataset} {start}..{end} ({len(failures)} failed)")
+
+    try:
+        if shards:
+            with ProcessPoolExecutor(max_workers=len(shards), mp_context=context, initializer=_init_worker,
+                                     initargs=(limiter, source, events)) as executor:
+                futures = [executor.submit(_backfill_shard, part, start, end, interval, source, store.root, dataset,
+                                           threads, rate_limit, retries, backoff, chunk_size, quote_factory)
+                           for part in shards]
+                saved = time.monotonic()
+                pending = set(futures)
+                while pending:
+                    try:
+                        handle(events.get(timeout=0.2))
+                    except queue.Empty:
+                        pass
+                    if time.monotonic() - saved >= PROGRESS_SAVE_INTERVAL:
+                        _save_progress(store, dataset, start, end, interval, completed)
+                        saved = time.monotonic()
+                    finished, pending = wait(pending, timeout=0, return_when=FIRST_EXCEPTION)
+                    for future in finished:
+                        future.result()
+            # Events sent just before the workers finished
+            while done < len(remaining):
+                try:
+                    handle(events.get(timeout=1.0))
+                except queue.Empty:
+                    break
+    finally:
+        _save_progress(store, dataset, start, end, interval, completed)
+        if progress is not None:
+            progress.stop()
+
+    seconds = time.perf_counter() - t0
+    summary = {
+        'symbols': len(symbols),
+        'skipped': len(symbols) - len(remaining),
+        'completed': done - len(failures),
+        'failed': len(failures),
+        'rows': rows,
+        'seconds': seconds,
+        'estimated_seconds': estimated,
+    }
+    if verbose:
+        rate = summary['completed'] / seconds if seconds else 0.0
+        print(f"Backfilled {summary['completed']} symbols ({rows:,} bars) in {seconds:.1f}s "
+              f"({rate:.1f} symbols/s), {summary['failed']} failed")
+    return summary, pd.DataFrame(failures, columns=FAILURE_COLUMNS)
+
+
+def benchmark(num_symbols=600, latency=0.05, rate_limit=25, processes=2, threads=4,
+              root=os.path.join('.cache', 'backfill_bench')):
+    """
+    Backfill a fake market (fake_vnstock) twice: a run interrupted part-way,
+    then a resumed run that must fetch only the remaining symbols.
+
+    Returns:
+    --------
+    dict
+        Summaries of the interrupted and resumed runs, and the stored symbols
+    """
+    import shutil
+    import subprocess
+    import sys
+
+    import fake_vnstock
+
+    # Absolute, so the interrupted child interpreter writes to the same place
+    root = os.path.abspath(root)
+    shutil.rmtree(root, ignore_errors=True)
+    store = DataStore(root)
+    options = dict(start='2020-01-01', end='2024-12-31', processes=processes, threads=threads,
+                   rate_limit=rate_limit, store=store, quote_factory=fake_vnstock.QuoteFactory(
+                       num_symbols=num_symbols, latency=latency))
+
+    # Interrupted run: a child interpreter killed with its workers once a
+    # third of the symbols are recorded
+    child = subprocess.Popen([sys.executable, '-c', (
+        "import backfill, fake_vnstock\n"
+        "from storage import DataStore\n"
+        f"with fake_vnstock.installed(num_symbols={num_symbols}):\n"
+        f"    backfill.backfill(start='2020-01-01', end='2024-12-31', processes={processes}, threads={threads},\n"
+        f"                      rate_limit={rate_limit}, store=DataStore({root!r}), verbose=False,\n"
+        f"                      quote_factory=fake_vnstock.QuoteFactory(num_symbols={num_symbols},\n"
+        f"                                                              latency={latency}))\n"
+    )], cwd=os.path.dirname(os.path.abspath(__file__)))
+    while child.poll() is None and \
+            len(load_progress(store, 'history_1D', '2020-01-01', '2024-12-31', '1D')) < num_symbols // 3:
+        time.sleep(0.2)
+    # Its workers notice the parent is gone and exit
+    child.kill()
+    child.wait()
+    interrupted = len(load_progress(store, 'history_1D', '2020-01-01', '2024-12-31', '1D'))
+
+    with fake_vnstock.installed(num_symbols=num_symbols):
+        resumed, failures = backfill(verbose=True, **options)
+    stored = store.partitions('history_1D')
+    return {
+        'symbols': num_symbols,
+        'completed_before_interrupt': interrupted,
+        'resumed': resumed,
+        'stored_symbols': len(stored),
+        'failures': len(failures),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill historical bars for a universe of symbols.")
+    parser.add_argument('--universe', default='all', help="'all', HOSE, HNX, UPCOM or an index group like VN30")
+    parser.add_argument('--start', default='2015-01-01', help="Start date (YYYY-MM-DD)")
+    parser.add_argument('--end', default=None, help="End date (YYYY-MM-DD), default today")
+    parser.add_argument('--interval', default='1D', help="Bar interval")
+    parser.add_argument('--source', default='VCI', help="Data source")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="Requests in flight per process")
+    parser.add_argument('--rate', type=float, default=None, help="Calls per second across all processes")
+    parser.add_argument('--no-resume', action='store_true', help="Refetch symbols completed by an earlier run")
+    parser.add_argument('--benchmark', action='store_true', help="Interrupt and resume a fake-market backfill")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = benchmark()
+        resumed = result['resumed']
+        print(f"Interrupted run completed {result['completed_before_interrupt']} of {result['symbols']} symbols; "
+              f"resumed run skipped {resumed['skipped']} and fetched {resumed['completed']} "
+              f"in {resumed['seconds']:.1f}s (estimated {resumed['estimated_seconds']:.1f}s)")
+        print(f"Stored symbols: {result['stored_symbols']}, failures: {result['failures']}")
+        return result
+
+    summary, failures = backfill(args.universe, args.start, args.end, interval=args.interval, source=args.source,
+                                 processes=args.processes, threads=args.threads, rate_limit=args.rate,
+                                 resume=not args.no_resume)
+    if not failures.empty:
+        print(failures.to_string(index=False))
+    return summary, failures
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+"""
+Tick-to-Bar Aggregation Module
+
+This module builds intraday OHLCV bars for several intervals at once from
+intraday ticks (ticks.py) or finer bars, instead of requesting each interval
+from quote.history separately.
+
+Aggregation works on flat numpy arrays for many symbols together: rows are
+grouped by symbol and bar start, and each group's open, high, low, close and
+volume are taken with one ufunc.reduceat call per field. Intervals are built
+as a cascade (ticks -> 1m -> 5m -> 15m -> 1H), each from the previous one.
+
+- aggregate_ticks() / aggregate_bars(): batch aggregation of DataFrames
+- BarBuilder: subscribes to a ticks.TickIngestor, keeps the forming bar of
+  every symbol and interval up to date as ticks arrive and collects the
+  finished bars
+- write_bars(): stores finished bars in the cache.HistoryCache used for
+  quote.history results, so later history() calls for those days are
+  served locally
+
+    ingestor = TickIngestor(symbols)
+    builder = BarBuilder(symbols)
+    ingestor.subscribe(builder.update)
+    ...
+    builder.flush(HistoryCache(), complete=True)   # after the session
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from cache import HistoryCache
+from storage import DataStore
+from ticks import TICK_DATASET
+
+# Interval names as used by Quote.history -> bar length in seconds
+INTERVAL_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '30m': 1800, '1H': 3600}
+
+DEFAULT_INTERVALS = ['1m', '5m', '15m', '1H']
+
+BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+_NS = 1_000_000_000
+
+
+def _widths(intervals):
+    unknown = [interval for interval in intervals if interval not in INTERVAL_SECONDS]
+    if unknown:
+        raise ValueError(f"Unknown intervals {unknown}; expected some of {list(INTERVAL_SECONDS)}")
+    return sorted(((interval, INTERVAL_SECONDS[interval] * _NS) for interval in intervals), key=lambda x: x[1])
+
+
+def resample(codes, times, open_, high, low, close, volume, width):
+    """
+    Aggregate bars (or ticks, with open = high = low = close = price) into
+    bars of `width` nanoseconds.
+
+    Rows must be sorted by symbol code, then time. Bars start at multiples of
+    the width counted from midnight, in the times' own clock.
+
+    Parameters:
+    -----------
+    codes : numpy.ndarray or None
+        Integer symbol code of each row, or None for a single symbol
+    times : numpy.ndarray
+        int64 nanosecond times
+    open_, high, low, close : numpy.ndarray
+        float64 prices
+    volume : numpy.ndarray
+        int64 volumes
+    width : int
+        Bar length in nanoseconds
+
+    Returns:
+    --------
+    dict
+        'code' (None for a single symbol), 'time', 'open', 'high', 'low',
+        'close' and 'volume' arrays, one element per bar
+    """
+    buckets = times - times % width
+    count = len(times)
+    if not count:
+        return {'code': None if codes is None else codes[:0], 'time': buckets, 'open': open_, 'high': high,
+                'low': low, 'close': close, 'volume': volume}
+    change = np.empty(count, dtype=bool)
+    change[0] = True
+    np.not_equal(buckets[1:], buckets[:-1], out=change[1:])
+    if codes is not None:
+        change[1:] |= codes[1:] != codes[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:] - 1
+    ends[-1] = count - 1
+    return {
+        'code': None if codes is None else codes[starts],
+        'time': buckets[starts],
+        'open': open_[starts],
+        'high': np.maximum.reduceat(high, starts),
+        'low': np.minimum.reduceat(low, starts),
+        'close': close[ends],
+        'volume': np.add.reduceat(volume, starts),
+    }
+
+
+def _cascade(codes, times, open_, high, low, close, volume, intervals, source_width=0):
+    """Resample to every interval, each from the widest finer interval dividing it."""
+    built = []
+    result = {}
+    for interval, width in _widths(intervals):
+        if width < source_width or width % max(source_width, 1):
+            raise ValueError(f"Cannot build {interval} bars from bars of {source_width // _NS}s")
+        base = None
+        for finer_width, finer in reversed(built):
+            if width % finer_width == 0:
+                base = finer
+                break
+        if base is None:
+            bars = resample(codes, times, open_, high, low, close, volume, width)
+        else:
+            bars = resample(base['code'], base['time'], base['open'], base['high'], base['low'],
+                            base['close'], base['volume'], width)
+        built.append((width, bars))
+        result[interval] = bars
+    return result
+
+
+def _sorted_codes(frame):
+    """Symbol codes and category names of a frame, and the row order grouping symbols by time."""
+    symbols = frame['symbol']
+    if isinstance(symbols.dtype, pd.CategoricalDtype):
+        codes = symbols.cat.codes.to_numpy().astype(np.int32)
+        names = np.asarray(symbols.cat.categories, dtype=object)
+    else:
+        codes, names = pd.factorize(symbols)
+        codes = codes.astype(np.int32)
+        names = np.asarray(names, dtype=object)
+    times = frame['time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    code_steps = np.diff(codes)
+    in_order = ((code_steps > 0) | ((code_steps == 0) & (np.diff(times) >= 0))).all()
+    order = None if in_order else np.lexsort((times, codes))
+    return codes, names, times, order
+
+
+def _bars_frame(bars, names):
+    frame = pd.DataFrame({
+        'symbol': pd.Categorical.from_codes(bars['code'], categories=names),
+        'time': bars['time'].view('datetime64[ns]'),
+        'open': bars['open'],
+        'high': bars['high'],
+        'low': bars['low'],
+        'close': bars['close'],
+        'volume': bars['volume'],
+    })
+    return frame
+
+
+def _aggregate_frame(frame, price_columns, intervals, source_width=0):
+    if frame.empty:
+        empty = pd.DataFrame(columns=['symbol'] + BAR_COLUMNS)
+        return {interval: empty.copy() for interval in intervals}
+    codes, names, times, order = _sorted_codes(frame)
+    columns = [frame[column].to_numpy(dtype=np.float64) for column in price_columns]
+    volume = frame['volume'].to_numpy(dtype=np.int64)
+    if order is not None:
+        codes, times, volume = codes[order], times[order], volume[order]
+        columns = [values[order] for values in columns]
+    if len(columns) == 1:
+        columns = columns * 4
+    bars = _cascade(codes, times, *columns, volume, intervals, source_width)
+    return {interval: _bars_frame(result, names) for interval, result in bars.items()}
+
+
+@instrument.timed()
+def aggregate_ticks(ticks, intervals=DEFAULT_INTERVALS):
+    """
+    Build OHLCV bars of several intervals from the ticks of many symbols.
+
+    Parameters:
+    -----------
+    ticks : pandas.DataFrame
+        'symbol', 'time', 'price' and 'volume' columns, as stored by
+        ticks.TickIngestor (any row order)
+    intervals : list of str
+        Intervals among INTERVAL_SECONDS (default: DEFAULT_INTERVALS)
+
+    Returns:
+    --------
+    dict
+        Interval -> DataFrame with 'symbol' and BAR_COLUMNS, sorted by symbol
+        and time; bars are labelled by their start time
+    """
+    return _aggregate_frame(ticks, ['price'], intervals)
+
+
+@instrument.timed()
+def aggregate_bars(bars, intervals, interval='1m'):
+    """
+    Build wider bars from finer bars of many symbols, e.g. 5m and 1H from 1m.
+
+    Parameters:
+    -----------
+    bars : pandas.DataFrame
+        'symbol' and BAR_COLUMNS columns
+    intervals : list of str
+        Target intervals; each must be a multiple of `interval`
+    interval : str
+        Interval of the input bars (default: '1m')
+
+    Returns:
+    --------
+    dict
+        Interval -> DataFrame with 'symbol' and BAR_COLUMNS
+    """
+    return _aggregate_frame(bars, ['open', 'high', 'low', 'close'], intervals,
+                            source_width=INTERVAL_SECONDS[interval] * _NS)
+
+
+class BarBuilder:
+    """
+    Incremental bars of many symbols, updated as ticks arrive.
+
+    For each symbol and interval the builder keeps the forming bar; ticks in
+    a later bar finish it. Finished bars are collected until flush(). Ticks
+    of a symbol must arrive in time order, as ticks.TickIngestor delivers
+    them to its subscribers.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Symbols to build bars for
+    intervals : list of str
+        Intervals among INTERVAL_SECONDS (default: DEFAULT_INTERVALS)
+    """
+
+    FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, symbols, intervals=DEFAULT_INTERVALS):
+        self.symbols = list(symbols)
+        self.intervals = [interval for interval, _ in _widths(intervals)]
+        self._codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        self._names = np.asarray(self.symbols, dtype=object)
+        # Forming bars: one array per field, indexed by symbol code; time -1
+        # means no forming bar
+        self._forming = {}
+        for interval in self.intervals:
+            forming = {field: np.zeros(len(self.symbols), dtype=np.float64) for field in self.FIELDS[1:5]}
+            forming['time'] = np.full(len(self.symbols), -1, dtype=np.int64)
+            forming['volume'] = np.zeros(len(self.symbols), dtype=np.int64)
+            self._forming[interval] = forming
+        self._finished = {interval: [] for interval in self.intervals}
+
+    def update(self, symbol, ticks):
+        """
+        Add a symbol's new ticks (TICK_COLUMNS arrays, as passed by
+        TickIngestor.subscribe) to its bars.
+
+        Returns:
+        --------
+        dict
+            Interval -> number of bars finished by these ticks
+        """
+        code = self._codes[symbol]
+        times = ticks['time']
+        if not len(times):
+            return {interval: 0 for interval in self.intervals}
+        price = ticks['price']
+        bars = _cascade(None, times, price, price, price, price, ticks['volume'], self.intervals)
+        finished = {}
+        for interval in self.intervals:
+            new = bars[interval]
+            forming = self._forming[interval]
+            done = []
+            forming_time = forming['time'][code]
+            if forming_time >= 0:
+                if new['time'][0] < forming_time:
+                    raise ValueError(f"{symbol} ticks at {pd.Timestamp(times[0])} arrived after later ticks")
+                if new['time'][0] == forming_time:
+                    new['open'][0] = forming['open'][code]
+                    new['high'][0] = max(new['high'][0], forming['high'][code])
+                    new['low'][0] = min(new['low'][0], forming['low'][code])
+                    new['volume'][0] += forming['volume'][code]
+                else:
+                    done.append({field: forming[field][code:code + 1].copy() for field in self.FIELDS})
+            if len(new['time']) > 1:
+                done.append({field: new[field][:-1] for field in self.FIELDS})
+            for field in self.FIELDS:
+                forming[field][code] = new[field][-1]
+            for bars_done in done:
+                bars_done['code'] = np.full(len(bars_done['time']), code, dtype=np.int32)
+                self._finished[interval].append(bars_done)
+            finished[interval] = sum(len(bars_done['time']) for bars_done in done)
+        return finished
+
+    def finish(self, now=None):
+        """
+        Finish the forming bars that ended at or before `now`.
+
+        Parameters:
+        -----------
+        now : str or pandas.Timestamp, optional
+            Current time, in the ticks' clock (default: None, finish every
+            forming bar, e.g. after the session)
+
+        Returns:
+        --------
+        int
+            Number of bars finished
+        """
+        total = 0
+        cutoff = None if now is None else pd.Timestamp(now).value
+        for interval in self.intervals:
+            forming = self._forming[interval]
+            ready = forming['time'] >= 0
+            if cutoff is not None:
+                ready &= forming['time'] + INTERVAL_SECONDS[interval] * _NS <= cutoff
+            codes = np.flatnonzero(ready).astype(np.int32)
+            if not len(codes):
+                continue
+            bars = {field: forming[field][codes].copy() for field in self.FIELDS}
+            bars['code'] = codes
+            self._finished[interval].append(bars)
+            forming['time'][codes] = -1
+            total += len(codes)
+        return total
+
+    def forming(self, interval):
+        """
+        Return the forming bar of every symbol that has one.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            'symbol' and BAR_COLUMNS
+        """
+        forming = self._forming[interval]
+        codes = np.flatnonzero(forming['time'] >= 0).astype(np.int32)
+        bars = {field: forming[field][codes] for field in self.FIELDS}
+        bars['code'] = codes
+        return _bars_frame(bars, self._names)
+
+    def finished(self, interval):
+        """
+        Return the finished bars not yet flushed.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            'symbol' and BAR_COLUMNS, sorted by symbol and time
+        """
+        parts = self._finished[interval]
+        if not parts:
+            return _bars_frame({'code': np.empty(0, dtype=np.int32),
+                                **{field: self._forming[interval][field][:0] for field in self.FIELDS}},
+                               self._names)
+        bars = {field: np.concatenate([part[field] for part in parts]) for field in ('code',) + self.FIELDS}
+        order = np.lexsort((bars['time'], bars['code']))
+        return _bars_frame({field: values[order] for field, values in bars.items()}, self._names)
+
+    def flush(self, cache, complete=False):
+        """
+        Write the finished bars to a HistoryCache and drop them from memory.
+
+        Parameters:
+        -----------
+        cache : cache.HistoryCache
+            Store of quote.history results
+        complete : bool
+            Finish every forming bar first and mark the bars' days as
+            covered, once the session has closed (default: False)
+
+        Returns:
+        --------
+        dict
+            Interval -> number of bars written
+        """
+        if complete:
+            self.finish()
+        written = {}
+        for interval in self.intervals:
+            bars = self.finished(interval)
+            write_bars(cache, {interval: bars}, complete=complete)
+            self._finished[interval] = []
+            written[interval] = len(bars)
+        return written
+
+
+@instrument.timed()
+def write_bars(cache, bars, complete=True):
+    """
+    Store bars of many symbols in a HistoryCache, one dataset per symbol and
+    interval, next to the bars fetched by quote.history.
+
+    Parameters:
+    -----------
+    cache : cache.HistoryCache
+        Store of quote.history results
+    bars : dict
+        Interval -> DataFrame with 'symbol' and BAR_COLUMNS, e.g. the result
+        of aggregate_ticks()
+    complete : bool
+        Mark the days of the bars as covered, so history() does not request
+        them again; only for sessions that have closed (default: True)
+
+    Returns:
+    --------
+    int
+        Number of bars written
+    """
+    total = 0
+    for interval, frame in bars.items():
+        if frame.empty:
+            continue
+        for symbol, group in frame.groupby('symbol', observed=True, sort=False):
+            group = group[BAR_COLUMNS].reset_index(drop=True)
+            covered = None
+            if complete:
+                days = group['time'].dt.normalize().unique()
+                covered = [(day, day) for day in days]
+            cache.store_bars(str(symbol), group, interval=interval, covered=covered)
+            total += len(group)
+    return total
+
+
+def aggregate_session(session, intervals=DEFAULT_INTERVALS, store=None, cache=None, verbose=True):
+    """
+    Aggregate a stored session of ticks into bars and write them to the
+    history cache.
+
+    Parameters:
+    -----------
+    session : str
+        Session date 'YYYY-MM-DD' of the 'ticks/{session}' dataset
+    intervals : list of str
+        Intervals among INTERVAL_SECONDS (default: DEFAULT_INTERVALS)
+    store : storage.DataStore, optional
+        Store holding the ticks (default: DataStore())
+    cache : cache.HistoryCache, optional
+        Store receiving the bars (default: HistoryCache())
+
+    Returns:
+    --------
+    dict
+        Interval -> DataFrame of bars
+    """
+    store = store or DataStore()
+    cache = cache or HistoryCache()
+    ticks = store.read(TICK_DATASET.format(session=session), columns=['time', 'price', 'volume'])
+    t0 = time.perf_counter()
+    bars = aggregate_ticks(ticks, intervals)
+    aggregate_seconds = time.perf_counter() - t0
+    written = write_bars(cache, bars)
+    if verbose:
+        print(f"Aggregated {len(ticks):,} ticks into {written:,} bars "
+              f"({', '.join(intervals)}) in {aggregate_seconds:.3f}s")
+    return bars
+
+
+def benchmark(num_symbols=400, mean_ticks=5_000, intervals=DEFAULT_INTERVALS, repeat=5):
+    """
+    Aggregate a replayed session of ticks (ticks.ReplaySource) into bars,
+    in batch and incrementally, and check both against pandas resampling.
+
+    Returns:
+    --------
+    dict
+        Ticks, bars per interval, best batch seconds and incremental seconds
+    """
+    from ticks import ReplaySource
+
+    symbols = [f'S{i:03d}' for i in range(num_symbols)]
+    replay = ReplaySource(symbols, mean_ticks=mean_ticks)
+    frames = [replay.full_session(symbol).assign(symbol=symbol) for symbol in symbols]
+    ticks = pd.concat(frames, ignore_index=True)
+    ticks['symbol'] = ticks['symbol'].astype('category')
+
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        bars = aggregate_ticks(ticks, intervals)
+        timings.append(time.perf_counter() - t0)
+
+    # Spot-check against pandas
+    for interval in intervals:
+        rule = f"{INTERVAL_SECONDS[interval]}s"
+        one = ticks[ticks['symbol'] == symbols[0]].set_index('time')
+        expected = one['price'].resample(rule).ohlc().join(one['volume'].resample(rule).sum())
+        expected = expected.dropna().reset_index()
+        got = bars[interval][bars[interval]['symbol'] == symbols[0]].reset_index(drop=True)
+        assert len(got) == len(expected), interval
+        assert np.allclose(got[['open', 'high', 'low', 'close']].to_numpy(),
+                           expected[['open', 'high', 'low', 'close']].to_numpy()), interval
+        assert (got['volume'].to_numpy() == expected['volume'].to_numpy()).all(), interval
+
+    # Same ticks delivered in five-minute batches, as a TickIngestor would
+    builder = BarBuilder(symbols, intervals)
+    t0 = time.perf_counter()
+    for symbol in symbols:
+        arrays = replay._ticks[symbol]
+        batches = np.flatnonzero(np.diff(arrays['time'] // (300 * _NS))) + 1
+        for start, end in zip(np.r_[0, batches], np.r_[batches, len(arrays['time'])]):
+            builder.update(symbol, {column: values[start:end] for column, values in arrays.items()})
+    builder.finish()
+    incremental_seconds = time.perf_counter() - t0
+    for interval in intervals:
+        incremental = builder.finished(interval)
+        assert incremental['time'].equals(bars[interval]['time']), interval
+        assert np.allclose(incremental[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float),
+                           bars[interval][['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float))
+
+    return {
+        'symbols': num_symbols,
+        'ticks': len(ticks),
+        'bars': {interval: len(frame) for interval, frame in bars.items()},
+        'seconds': min(timings),
+        'incremental_seconds': incremental_seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate stored intraday ticks into OHLCV bars.")
+    parser.add_argument('--session', help="Session date (YYYY-MM-DD) of the stored ticks")
+    parser.add_argument('--intervals', nargs='+', default=DEFAULT_INTERVALS, choices=list(INTERVAL_SECONDS),
+                        help="Bar intervals to build")
+    parser.add_argument('--benchmark', action='store_true', help="Time aggregation of a replayed session")
+    args = parser.parse_args(argv)
+
+    if args.benchmark or not args.session:
+        result = benchmark(intervals=args.intervals)
+        print(f"Aggregated {result['ticks']:,} ticks for {result['symbols']} symbols into "
+              f"{', '.join(f'{n:,} {i}' for i, n in result['bars'].items())} bars "
+              f"in {result['seconds']:.3f}s")
+        print(f"Incremental updates in 5-minute batches: {result['incremental_seconds']:.2f}s, same bars")
+        return result
+
+    return aggregate_session(args.session, args.intervals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Benchmark Suite Module
+
+This module times the project's main paths end to end against the fake
+vnstock provider (fake_vnstock.py), so results are reproducible and do not
+depend on the VCI/TCBS endpoints:
+
+- fetch: fetcher.fetch_histories through a cold cache.HistoryCache
+- gold_fx: Gold.py and ex.py date-range backfills
+- merge: assembly.build_wide_frames
+- returns: calculations.calculate_returns and the annualized covariance
+- monte_carlo: calculations.simulate_portfolios
+- frontier: frontier.efficient_frontier
+- screener: screener.py fetch, heating-up filter and strategy evaluation
+- statements: fs.fetch_statements into the statement warehouse
+
+Every run is appended to a history file together with the commit and the
+library versions, and each case is compared with the median of its recent
+runs under the same settings; cases that got slower than the threshold are
+reported as regressions (and the script exits with status 1).
+
+    python benchmarks.py                    # every case at the quick scale
+    python benchmarks.py fetch merge --scale full --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from fake_vnstock import FakeProvider, installed
+
+DEFAULT_HISTORY = os.path.join('.cache', 'benchmarks', 'history.jsonl')
+
+# Seconds every fake call sleeps by default, so concurrency shows up in the fetch paths
+DEFAULT_LATENCY = 0.005
+
+# Slowdown against the recent median reported as a regression
+REGRESSION_THRESHOLD = 0.2
+
+# Problem sizes per scale
+SCALES = {
+    'quick': {
+        'symbols': 20, 'start': '2022-01-01', 'end': '2024-12-31', 'merge_symbols': 100,
+        'assets': 20, 'portfolios': 50_000, 'frontier_points': 20, 'screener_rows': 1700,
+        'dates': ('2024-01-01', '2024-03-31'), 'statement_symbols': 10,
+    },
+    'full': {
+        'symbols': 200, 'start': '2020-01-01', 'end': '2024-12-31', 'merge_symbols': 1000,
+        'assets': 30, 'portfolios': 1_000_000, 'frontier_points': 50, 'screener_rows': 1700,
+        'dates': ('2024-01-01', '2024-12-31'), 'statement_symbols': 100,
+    },
+}
+
+
+def _histories(provider, count, start, end):
+    return {symbol: provider.history(symbol, start, end) for symbol in provider.symbols[:count]}
+
+
+def _fetch(provider, scale):
+    from cache import HistoryCache
+    from fetcher import fetch_histories
+
+    symbols = provider.symbols[:scale['symbols']]
+
+    def run():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            history_cache = HistoryCache(cache_dir)
+            results, _ = fetch_histories(symbols, scale['start'], scale['end'], max_workers=16,
+                                         quote_factory=history_cache.quote, verbose=False)
+        return len(results)
+    return run, 'symbols'
+
+
+def _gold_fx(provider, scale):
+    from ex import get_exchange_rates_for_date_range
+    from Gold import get_gold_prices_for_date_range
+
+    start, end = scale['dates']
+
+    def run():
+        kwargs = {'interval_days': 1, 'delay_seconds': 0, 'max_workers': 8, 'trading_days_only': False}
+        gold = get_gold_prices_for_date_range(start, end, **kwargs)
+        rates = get_exchange_rates_for_date_range(start, end, **kwargs)
+        return gold['date'].nunique() + rates['date'].nunique()
+    return run, 'dates'
+
+
+def _merge(provider, scale):
+    from assembly import build_wide_frames
+
+    histories = _histories(provider, scale['merge_symbols'], scale['start'], scale['end'])
+
+    def run():
+        build_wide_frames(histories)
+        return len(histories)
+    return run, 'symbols'
+
+
+def _moments_inputs(provider, scale, count):
+    from assembly import build_wide_frames
+    from calculations import calculate_returns
+    from stats import RunningMoments
+
+    _, prices = build_wide_frames(_histories(provider, count, scale['start'], scale['end']))
+    moments = RunningMoments.from_returns(calculate_returns(prices))
+    return prices, moments.ann_returns(), moments.ann_cov()
+
+
+def _returns(provider, scale):
+    from calculations import calculate_returns
+    from stats import RunningMoments
+
+    prices, _, _ = _moments_inputs(provider, scale, scale['merge_symbols'])
+
+    def run():
+        returns = calculate_returns(prices)
+        RunningMoments.from_returns(returns).ann_cov()
+        return returns.shape[1]
+    return run, 'symbols'
+
+
+def _monte_carlo(provider, scale):
+    from calculations import simulate_portfolios
+
+    _, ann_returns, cov_mat = _moments_inputs(provider, scale, scale['assets'])
+
+    def run():
+        simulate_portfolios(ann_returns, cov_mat, num_port=scale['portfolios'])
+        return scale['portfolios']
+    return run, 'portfolios'
+
+
+def _frontier(provider, scale):
+    from frontier import efficient_frontier
+
+    _, ann_returns, cov_mat = _moments_inputs(provider, scale, scale['assets'])
+
+    def run():
+        efficient_frontier(ann_returns, cov_mat, num_points=scale['frontier_points'])
+        return scale['frontier_points']
+    return run, 'points'
+
+
+def _screener(provider, scale):
+    from screener import find_heating_up_stocks, get_screener_data
+    from strategies import evaluate_strategies
+
+    def run():
+        snapshot = get_screener_data(limit=scale['screener_rows'])
+        find_heating_up_stocks(snapshot)
+        evaluate_strategies(snapshot)
+        return len(snapshot)
+    return run, 'rows'
+
+
+def _statements(provider, scale):
+    from fs import fetch_statements
+    from warehouse import StatementWarehouse
+
+    symbols = provider.symbols[:scale['statement_symbols']]
+
+    def run():
+        statements = {symbol: fetch_statements(symbol, 'VCI', 'quarter') for symbol in symbols}
+        with tempfile.TemporaryDirectory() as root:
+            StatementWarehouse(root).ingest_many(statements)
+        return len(statements)
+    return run, 'symbols'
+
+
+# Case name -> function (provider, scale) -> (run, unit); run() returns the items processed
+CASES = {
+    'fetch': _fetch,
+    'gold_fx': _gold_fx,
+    'merge': _merge,
+    'returns': _returns,
+    'monte_carlo': _monte_carlo,
+    'frontier': _frontier,
+    'screener': _screener,
+    'statements': _statements,
+}
+
+
+def run_suite(cases=None, scale='quick', repeat=3, latency=DEFAULT_LATENCY, error_rate=0.0, seed=0,
+              warmup=1, verbose=True):
+    """
+    Time benchmark cases against the fake vnstock provider.
+
+    Parameters:
+    -----------
+    cases : list of str, optional
+        Case names from CASES (default: every case)
+    scale : str
+        Problem sizes from SCALES (default: 'quick')
+    repeat : int
+        Timed runs per case; the median is reported (default: 3)
+    latency : float
+        Seconds every fake call sleeps (default: DEFAULT_LATENCY)
+    error_rate : float
+        Probability that a fake call fails with OSError (default: 0.0)
+    seed : int
+        Seed of the synthetic data and injected errors (default: 0)
+    warmup : int
+        Untimed runs per case before the timed ones, so imports and first-use
+        costs are not measured (default: 1)
+    verbose : bool
+        Print each case as it finishes (default: True)
+
+    Returns:
+    --------
+    dict
+        Case name -> 'seconds' (median), 'min', 'p95', 'items', 'unit',
+        'throughput' (items per second at the median), 'calls' and 'errors'
+        (fake calls and injected errors per run) and 'failed_runs'; the
+        timings are None when every run failed
+    """
+    cases = list(cases or CASES)
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {unknown}; choose from {list(CASES)}")
+    sizes = SCALES[scale]
+
+    results = {}
+    with installed(FakeProvider(latency=latency, error_rate=error_rate, seed=seed)) as provider:
+        for case in cases:
+            # Setup data is generated without latency, and the scripts' own
+            # progress output is not part of the measurement
+            provider.latency, provider.error_rate = 0.0, 0.0
+            run, unit = CASES[case](provider, sizes)
+            provider.latency, provider.error_rate = latency, error_rate
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(warmup):
+                    try:
+                        run()
+                    except Exception:
+                        pass
+            provider.reset_stats()
+
+            # Injected errors that a path does not retry fail the whole run;
+            # failed runs are counted and left out of the timings
+            timings = []
+            items = 0
+            failed = 0
+            for _ in range(repeat):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    t0 = time.perf_counter()
+                    try:
+                        items = run()
+                    except Exception:
+                        failed += 1
+                        continue
+                    timings.append(time.perf_counter() - t0)
+            calls = provider.stats()
+            result = {
+                'seconds': None, 'min': None, 'p95': None, 'items': int(items), 'unit': unit, 'throughput': None,
+                'calls': int(calls['calls'].sum()) // repeat,
+                'errors': int(calls['errors'].sum()) // repeat,
+                'failed_runs': failed,
+            }
+            if timings:
+                seconds = float(np.median(timings))
+                result.update({
+                    'seconds': seconds,
+                    'min': float(np.min(timings)),
+                    'p95': float(np.percentile(timings, 95)),
+                    'throughput': items / seconds if seconds > 0 else float('inf'),
+                })
+            results[case] = result
+            if verbose and timings:
+                print(f"{case:<12} {seconds * 1000:>10.1f} ms  (p95 {result['p95'] * 1000:.1f} ms)  "
+                      f"{result['throughput']:>14,.1f} {unit}/s" + (f"  {failed} failed runs" if failed else ''))
+            elif verbose:
+                print(f"{case:<12} every run failed")
+    return results
+
+
+def _commit():
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                   timeout=10, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def load_history(path=DEFAULT_HISTORY):
+    """
+    Read the recorded benchmark runs.
+
+    Returns:
+    --------
+    list of dict
+        Runs in the order they were recorded (empty if there is no history)
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record_run(results, config, path=DEFAULT_HISTORY):
+    """
+    Append one run to the history file.
+
+    Parameters:
+    -----------
+    results : dict
+        run_suite() results
+    config : dict
+        Settings of the run (scale, repeat, latency, error_rate, seed); only
+        runs with equal settings are compared
+
+    Returns:
+    --------
+    dict
+        The recorded entry
+    """
+    entry = {
+        'timestamp': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'config': config,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+    return entry
+
+
+def find_regressions(results, history, config, threshold=REGRESSION_THRESHOLD, window=5):
+    """
+    Compare each case with the median of its recent runs under the same settings.
+
+    Parameters:
+    -----------
+    results : dict
+        run_suite() results of the current run
+    history : list of dict
+        Earlier runs, as returned by load_history()
+    config : dict
+        Settings of the current run
+    threshold : float
+        Relative slowdown reported as a regression (default: 0.2, i.e. 20%)
+    window : int
+        Number of most recent comparable runs in the baseline (default: 5)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per case with 'baseline', 'seconds', 'change' and 'regression'
+        (cases without a baseline are left out)
+    """
+    rows = []
+    comparable = [entry for entry in history if entry.get('config') == config]
+    for case, result in results.items():
+        previous = [entry['results'][case]['seconds'] for entry in comparable
+                    if entry['results'].get(case, {}).get('seconds') is not None]
+        if not previous or result['seconds'] is None:
+            continue
+        baseline = float(np.median(previous[-window:]))
+        change = result['seconds'] / baseline - 1 if baseline > 0 else 0.0
+        rows.append({'case': case, 'baseline': baseline, 'seconds': result['seconds'], 'change': change,
+                     'regression': change > threshold})
+    return pd.DataFrame(rows, columns=['case', 'baseline', 'seconds', 'change', 'regression'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the project's main paths against a fake vnstock provider.")
+    parser.add_argument('cases', nargs='*', help=f"Cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--scale', default='quick', choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help="Seconds per fake call")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability that a fake call fails")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown against recent runs reported as a regression")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="History file (JSON lines)")
+    parser.add_argument('--no-record', action='store_true', help="Do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    config = {'scale': args.scale, 'repeat': args.repeat, 'latency': args.latency,
+              'error_rate': args.error_rate, 'seed': args.seed}
+    results = run_suite(args.cases or None, args.scale, args.repeat, args.latency, args.error_rate, args.seed)
+
+    regressions = find_regressions(results, load_history(args.history), config, args.threshold)
+    if not regressions.empty:
+        print("\nAgainst recent runs:")
+        for row in regressions.itertuples():
+            flag = '  REGRESSION' if row.regression else ''
+            print(f"{row.case:<12} {row.baseline * 1000:>10.1f} ms -> {row.seconds * 1000:.1f} ms "
+                  f"({row.change:+.0%}){flag}")
+    if not args.no_record:
+        record_run(results, config, args.history)
+    return results, regressions
+
+
+if __name__ == "__main__":
+    _, regressions = main()
+    sys.exit(1 if regressions['regression'].any() else 0)
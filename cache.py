@@ -0,0 +1,376 @@
+"""
+OHLCV History Cache Module
+
+This module keeps a persistent per-symbol, per-interval store of historical
+bars. Ranges that are already stored are served locally; only the missing
+head, tail or gaps are requested from the data source, then merged and
+de-duplicated by time.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from fetcher import vnstock_quote
+from storage import DataStore
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'history')
+
+# Number of hit/miss ranges kept for stats()
+RANGE_LOG_SIZE = 10_000
+
+RANGE_LOG_COLUMNS = ['symbol', 'interval', 'start', 'end', 'status', 'rows', 'seconds']
+
+
+def _to_day(value):
+    return pd.Timestamp(value).normalize()
+
+
+def merge_ranges(ranges):
+    """
+    Merge overlapping or adjacent (start, end) day ranges.
+
+    Parameters:
+    -----------
+    ranges : list of tuple
+        Inclusive (start, end) pandas Timestamps
+
+    Returns:
+    --------
+    list of tuple
+        Sorted, non-overlapping ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(covered, start, end):
+    """
+    Return the parts of [start, end] that are not inside any covered range.
+
+    Parameters:
+    -----------
+    covered : list of tuple
+        Sorted, non-overlapping inclusive (start, end) ranges
+    start, end : pandas.Timestamp
+        Inclusive requested range
+
+    Returns:
+    --------
+    list of tuple
+        Inclusive (start, end) ranges still to be fetched
+    """
+    missing = []
+    cursor = start
+    for range_start, range_end in covered:
+        if range_end < cursor:
+            continue
+        if range_start > end:
+            break
+        if range_start > cursor:
+            missing.append((cursor, range_start - timedelta(days=1)))
+        cursor = max(cursor, range_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+class HistoryCache:
+    """
+    Persistent store of Quote.history results with incremental top-up.
+
+    Parameters:
+    -----------
+    cache_dir : str
+        Directory holding one dataset per symbol and interval, written through
+        storage.DataStore (default: DEFAULT_CACHE_DIR)
+    source : str
+        Data source used for missing ranges (default: 'VCI')
+    quote_factory : callable, optional
+        Function (symbol, source) -> object with a ``history`` method. Defaults to
+        vnstock's Quote; pass a stub to run without network access.
+    calendar : trading_calendar.TradingCalendar, optional
+        For daily intervals, missing ranges are trimmed to trading days and
+        ranges with no trading day (weekends, holidays) are not requested
+        (default: None, every missing day is requested)
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, source='VCI', quote_factory=None, calendar=None):
+        self.cache_dir = cache_dir
+        self.calendar = calendar
+        self.store = DataStore(cache_dir)
+        self.source = source
+        self.quote_factory = quote_factory or vnstock_quote
+        self._entries = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._range_log = deque(maxlen=RANGE_LOG_SIZE)
+        self.counters = {
+            'hits': 0,
+            'partial_hits': 0,
+            'misses': 0,
+            'requests': 0,
+            'bars_served_locally': 0,
+            'bars_fetched': 0,
+            'days_served_locally': 0,
+            'days_fetched': 0,
+            'requests_skipped': 0,
+        }
+
+    @staticmethod
+    def _dataset(symbol, interval):
+        return f'{interval}/{symbol}'
+
+    def _ranges_path(self, symbol, interval):
+        return os.path.join(self.cache_dir, interval, f'{symbol}.ranges.json')
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load(self, symbol, interval):
+        key = (symbol, interval)
+        entry = self._entries.get(key)
+        if entry is None:
+            ranges_path = self._ranges_path(symbol, interval)
+            if os.path.exists(ranges_path):
+                with open(ranges_path) as f:
+                    ranges = [(_to_day(s), _to_day(e)) for s, e in json.load(f)]
+                data = self.store.read(self._dataset(symbol, interval))
+            else:
+                ranges, data = [], pd.DataFrame()
+            entry = {'data': data, 'ranges': ranges}
+            self._entries[key] = entry
+        return entry
+
+    def _save(self, symbol, interval, entry):
+        # Bars first, then the covered ranges, so the ranges never claim bars
+        # that were not written
+        self.store.write(self._dataset(symbol, interval), entry['data'])
+        ranges_path = self._ranges_path(symbol, interval)
+        tmp_path = f'{ranges_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump([(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in entry['ranges']], f)
+        os.replace(tmp_path, ranges_path)
+
+    def cached_symbols(self, interval='1D'):
+        """List the symbols with stored bars for an interval."""
+        pattern = os.path.join(self.cache_dir, interval, '*.ranges.json')
+        return sorted(os.path.basename(path)[:-len('.ranges.json')] for path in glob.glob(pattern))
+
+    def stored(self, symbol, interval='1D'):
+        """
+        Return the stored bars and covered day ranges of a symbol without fetching.
+
+        Returns:
+        --------
+        tuple of (pandas.DataFrame, list of tuple)
+            All stored bars, and the inclusive (start, end) day ranges they cover
+        """
+        with self._lock((symbol, interval)):
+            entry = self._load(symbol, interval)
+            return entry['data'], list(entry['ranges'])
+
+    def _requested_ranges(self, missing, interval):
+        # Only daily bars follow the trading calendar
+        if self.calendar is None or interval != '1D':
+            return missing
+        requested = []
+        for range_start, range_end in missing:
+            trimmed = self.calendar.trim_range(range_start, range_end)
+            if trimmed is not None:
+                requested.append(trimmed)
+        return requested
+
+    def _log(self, symbol, interval, start, end, status, rows, seconds):
+        self._range_log.append({
+            'symbol': symbol,
+            'interval': interval,
+            'start': start,
+            'end': end,
+            'status': status,
+            'rows': rows,
+            'seconds': seconds,
+        })
+        instrument.record('history_cache', seconds, rows=rows, cache=status, symbol=symbol)
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def history(self, symbol, start, end, interval='1D'):
+        """
+        Return historical bars for a symbol, fetching only what is not stored.
+
+        Parameters:
+        -----------
+        symbol : str
+            Symbol to fetch
+        start : str
+            Start date in 'YYYY-MM-DD' format
+        end : str
+            End date in 'YYYY-MM-DD' format
+        interval : str
+            Bar interval passed to Quote.history (default: '1D')
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Bars with start <= time <= end, sorted by time
+        """
+        start_day = _to_day(start)
+        end_day = _to_day(end)
+        # Today's bars are still forming, so today is never marked as covered
+        last_complete_day = _to_day(pd.Timestamp.now()) - timedelta(days=1)
+
+        with self._lock((symbol, interval)):
+            entry = self._load(symbol, interval)
+            missing = missing_ranges(entry['ranges'], start_day, end_day)
+
+            if missing:
+                requested_days = (end_day - start_day).days + 1
+                fetched_days = sum((e - s).days + 1 for s, e in missing)
+                frames = [entry['data']] if not entry['data'].empty else []
+                # Missing days outside trading sessions are covered without a request
+                to_fetch = self._requested_ranges(missing, interval)
+                self._count(requests_skipped=len(missing) - len(to_fetch))
+                for range_start, range_end in to_fetch:
+                    t0 = time.perf_counter()
+                    quote = self.quote_factory(symbol, self.source)
+                    fetched = quote.history(
+                        start=range_start.strftime('%Y-%m-%d'),
+                        end=range_end.strftime('%Y-%m-%d'),
+                        interval=interval,
+                        to_df=True,
+                    )
+                    rows = 0 if fetched is None else len(fetched)
+                    if rows:
+                        frames.append(fetched)
+                    self._count(requests=1, bars_fetched=rows)
+                    self._log(symbol, interval, range_start, range_end, 'miss', rows,
+                              time.perf_counter() - t0)
+
+                if frames:
+                    data = pd.concat(frames, ignore_index=True)
+                    data['time'] = pd.to_datetime(data['time'])
+                    data = (data.drop_duplicates('time', keep='last')
+                                .sort_values('time')
+                                .reset_index(drop=True))
+                else:
+                    data = entry['data']
+
+                covered = [(s, min(e, last_complete_day)) for s, e in missing
+                           if s <= last_complete_day]
+                entry = {'data': data, 'ranges': merge_ranges(entry['ranges'] + covered)}
+                self._entries[(symbol, interval)] = entry
+                self._save(symbol, interval, entry)
+
+                if fetched_days < requested_days:
+                    self._count(partial_hits=1,
+                                days_served_locally=requested_days - fetched_days,
+                                days_fetched=fetched_days)
+                else:
+                    self._count(misses=1, days_fetched=fetched_days)
+            else:
+                self._count(hits=1, days_served_locally=(end_day - start_day).days + 1)
+
+            data = entry['data']
+
+        if data.empty:
+            return data
+        times = data['time'].values
+        lo = np.searchsorted(times, start_day.to_datetime64(), side='left')
+        hi = np.searchsorted(times, (end_day + timedelta(days=1)).to_datetime64(), side='left')
+        result = data.iloc[lo:hi]
+        if not missing:
+            self._count(bars_served_locally=len(result))
+            self._log(symbol, interval, start_day, end_day, 'hit', len(result), 0.0)
+        return result
+
+    def store_bars(self, symbol, bars, interval='1D', covered=None):
+        """
+        Merge bars built locally (e.g. aggregated from intraday ticks) into the store.
+
+        Parameters:
+        -----------
+        symbol : str
+            Symbol of the bars
+        bars : pandas.DataFrame
+            Bars with 'time', 'open', 'high', 'low', 'close' and 'volume'
+            columns; they replace stored bars with the same time
+        interval : str
+            Bar interval, as passed to Quote.history (default: '1D')
+        covered : list of tuple, optional
+            Inclusive (start, end) days the bars cover completely; history()
+            serves these days without a request (default: None, no day is
+            marked as covered)
+        """
+        with self._lock((symbol, interval)):
+            entry = self._load(symbol, interval)
+            frames = [frame for frame in (entry['data'], bars) if not frame.empty]
+            if not frames:
+                return
+            data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].copy()
+            data['time'] = pd.to_datetime(data['time'])
+            data = (data.drop_duplicates('time', keep='last')
+                        .sort_values('time')
+                        .reset_index(drop=True))
+            ranges = entry['ranges'] + [(_to_day(s), _to_day(e)) for s, e in covered or []]
+            entry = {'data': data, 'ranges': merge_ranges(ranges)}
+            self._entries[(symbol, interval)] = entry
+            self._save(symbol, interval, entry)
+
+    def quote(self, symbol, source=None):
+        """
+        Return a Quote-like object whose ``history`` calls go through this cache.
+
+        The signature matches the ``quote_factory`` argument of
+        fetcher.fetch_histories, so a cache can be plugged into the bulk fetcher.
+        """
+        return CachedQuote(self, symbol)
+
+    def stats(self):
+        """
+        Return cache counters and the log of hit and miss ranges.
+
+        Returns:
+        --------
+        tuple of (dict, pandas.DataFrame)
+            Counters including the hit ratio, and one row per served or fetched range
+        """
+        with self._stats_lock:
+            counters = dict(self.counters)
+            range_log = pd.DataFrame(list(self._range_log), columns=RANGE_LOG_COLUMNS)
+        lookups = counters['hits'] + counters['partial_hits'] + counters['misses']
+        counters['hit_ratio'] = counters['hits'] / lookups if lookups else 0.0
+        return counters, range_log
+
+
+class CachedQuote:
+    """
+    Quote-like wrapper that serves ``history`` from a HistoryCache.
+    """
+
+    def __init__(self, cache, symbol):
+        self.cache = cache
+        self.symbol = symbol
+
+    def history(self, start, end, interval='1D', to_df=True):
+        return self.cache.history(self.symbol, start, end, interval)
@@ -1,127 +1,237 @@
 """
 Stock Price Calculations Module
 
-This module calculates percentage changes (returns) from close prices
-using the combined_prices variable imported from test.py.
+This module calculates percentage changes (returns) from close prices and
+simulates and optimizes portfolios from them. Close prices come from the
+lazy providers.combined_prices provider (built by test.py) unless passed in,
+so importing the module does not fetch anything; --matrix reads them from the
+memory-mapped matrices of price_matrix.py instead. Incremental versions of the
+return statistics live in stats.py.
 """
 
+import argparse
+import time
+
 import pandas as pd
 import numpy as np
 
-# Import combined_prices from test.py
-from test import combined_prices
+import instrument
+import providers
+from frontier import efficient_frontier
+from price_matrix import open_matrix
+from stats import RunningMoments
 
 
-def calculate_returns():
+@instrument.timed()
+def calculate_returns(combined_prices=None):
     """
-    Calculate percentage changes (returns) from close prices using the combined_prices variable.
+    Calculate percentage changes (returns) from close prices.
+
+    Parameters:
+    -----------
+    combined_prices : pandas.DataFrame, optional
+        Close prices with a 'time' column and one '{symbol}_close' column per
+        symbol (default: providers.combined_prices, loaded on first use)
     
     Returns:
     --------
     pandas.DataFrame
         DataFrame containing the percentage changes with time as index
     """
-    # Make a copy to avoid modifying the original
-    returns_data = combined_prices.copy()
-    
-    # Ensure time is in datetime format and sorted
+    if combined_prices is None:
+        combined_prices = providers.combined_prices.get()
+
+    returns_data = combined_prices
+
+    # Ensure time is in datetime format and sorted, without copying the price columns
     if 'time' in returns_data.columns:
-        returns_data['time'] = pd.to_datetime(returns_data['time'])
-        returns_data.sort_values('time', inplace=True)
-        returns_data.set_index('time', inplace=True)
-    
-    # Calculate percentage change for each price column
-    for column in returns_data.columns:
-        if column != 'time':  # Exclude time column
-            returns_data[f'{column}_pct_change'] = returns_data[column].pct_change()
-    
-    # Drop the original price columns
-    price_columns = [col for col in returns_data.columns if not col.endswith('_pct_change')]
-    returns_data = returns_data.drop(columns=price_columns)
-    
+        returns_data = returns_data.set_index(pd.to_datetime(returns_data['time'])) \
+            .drop(columns='time').sort_index(kind='stable')
+
+    # Percentage change of every price column in one vectorized pass
+    returns_data = returns_data.pct_change()
+    returns_data.columns = [f'{column}_pct_change' for column in returns_data.columns]
+
     # Drop rows with NaN values
     returns_data = returns_data.dropna()
-    
+
     # Keep time as index - do not reset
     return returns_data
 
-returns_data = calculate_returns()
-
-print(returns_data.head())
-
-# We'll use the percentage changes directly instead of calculating log returns
-# This avoids issues with zero or negative values
-daily_returns = returns_data
-
-# Calculate annualized returns (252 trading days)
-ann_returns = daily_returns.mean() * 252
-
-# Calculate covariance matrix of returns (annualized)
-cov_mat = daily_returns.cov() * 252
-
-# Define the number of portfolios to simulate
-num_port = 5000
-
-# Initialize arrays for portfolio weights, returns, risk, and Sharpe ratios
-all_wts = np.zeros((num_port, len(daily_returns.columns)))
-port_returns = np.zeros(num_port)
-port_risk = np.zeros(num_port)
-sharpe_ratio = np.zeros(num_port)
-
-# Simulate random portfolios
-np.random.seed(42)
-for i in range(num_port):
-    # Generate random portfolio weights
-    wts = np.random.uniform(size=len(daily_returns.columns))
-    wts = wts / np.sum(wts)
-    all_wts[i, :] = wts
-
-    # Calculate portfolio return (using annualized returns)
-    port_ret = np.sum(ann_returns * wts)
-    port_returns[i] = port_ret
-
-    # Calculate portfolio risk (standard deviation)
-    port_sd = np.sqrt(np.dot(wts.T, np.dot(cov_mat, wts)))
-    port_risk[i] = port_sd
-
-    # Calculate Sharpe Ratio, assuming a risk-free rate of 0%
-    sr = port_ret / port_sd if port_sd > 0 else 0
-    sharpe_ratio[i] = sr
-
-# Identify portfolios with max Sharpe ratio, max return, and minimum variance
-max_sr_idx = sharpe_ratio.argmax()
-max_ret_idx = port_returns.argmax()
-min_var_idx = port_risk.argmin()
-
-max_sr_ret = port_returns[max_sr_idx]
-max_sr_risk = port_risk[max_sr_idx]
-max_sr_w = all_wts[max_sr_idx, :]
-
-max_ret_ret = port_returns[max_ret_idx]
-max_ret_risk = port_risk[max_ret_idx]
-max_ret_w = all_wts[max_ret_idx, :]
-
-min_var_ret = port_returns[min_var_idx]
-min_var_risk = port_risk[min_var_idx]
-min_var_w = all_wts[min_var_idx, :]
-
-# Print the results
-print("\nOptimal Portfolio Results:")
-print("Maximum Sharpe Ratio Portfolio:")
-print(f"  Expected Return: {max_sr_ret:.4f}")
-print(f"  Risk: {max_sr_risk:.4f}")
-print(f"  Sharpe Ratio: {max_sr_ret/max_sr_risk:.4f}")
-print("  Weights:")
-for j, col in enumerate(daily_returns.columns):
-    symbol = col.split('_close_pct_change')[0]
-    print(f"    {symbol}: {max_sr_w[j]:.4f}")
-
-print("\nMaximum Return Portfolio:")
-print(f"  Expected Return: {max_ret_ret:.4f}")
-print(f"  Risk: {max_ret_risk:.4f}")
-print(f"  Sharpe Ratio: {max_ret_ret/max_ret_risk:.4f}")
-
-print("\nMinimum Variance Portfolio:")
-print(f"  Expected Return: {min_var_ret:.4f}")
-print(f"  Risk: {min_var_risk:.4f}")
-print(f"  Sharpe Ratio: {min_var_ret/min_var_risk:.4f}")
\ No newline at end of file
+
+@instrument.timed()
+def simulate_portfolios(ann_returns, cov_mat, num_port=5000, seed=42, chunk_size=100_000,
+                        risk_free_rate=0.0):
+    """
+    Simulate random long-only portfolios with batched matrix operations.
+
+    Weights are drawn for a whole chunk at once and portfolio returns and
+    variances are computed for the chunk in one step. Only the best portfolios
+    seen so far are kept between chunks, so memory stays bounded by chunk_size
+    even for tens of millions of portfolios. With the same seed the weights are
+    drawn in the same order as the former one-portfolio-at-a-time loop, so the
+    selected portfolios are the same.
+
+    Parameters:
+    -----------
+    ann_returns : pandas.Series or numpy.ndarray
+        Annualized expected return of each asset
+    cov_mat : pandas.DataFrame or numpy.ndarray
+        Annualized covariance matrix of asset returns
+    num_port : int
+        Number of portfolios to simulate (default: 5000)
+    seed : int
+        Seed for the random weights (default: 42)
+    chunk_size : int
+        Number of portfolios evaluated per batch (default: 100,000)
+    risk_free_rate : float
+        Annual risk-free rate used in the Sharpe ratio (default: 0.0)
+
+    Returns:
+    --------
+    dict
+        'max_sharpe', 'max_return' and 'min_variance' entries, each a dict with
+        'return', 'risk', 'sharpe' and 'weights', plus 'num_port', 'seconds'
+        and 'portfolios_per_second'
+    """
+    mu = np.asarray(ann_returns, dtype=float)
+    cov = np.asarray(cov_mat, dtype=float)
+    num_assets = len(mu)
+    rng = np.random.RandomState(seed)
+
+    best = {}
+    # Running best value of each selection criterion
+    best_values = {'max_sharpe': -np.inf, 'max_return': -np.inf, 'min_variance': np.inf}
+
+    started = time.perf_counter()
+    for offset in range(0, num_port, chunk_size):
+        size = min(chunk_size, num_port - offset)
+
+        # Generate random portfolio weights, one row per portfolio
+        wts = rng.uniform(size=(size, num_assets))
+        wts /= wts.sum(axis=1, keepdims=True)
+
+        # Portfolio returns and risk (standard deviation) for the whole chunk
+        port_returns = wts @ mu
+        port_risk = np.sqrt(np.einsum('ij,jk,ik->i', wts, cov, wts))
+
+        # Sharpe Ratio; zero-risk portfolios get 0 as in the scalar version
+        excess = port_returns - risk_free_rate
+        sharpe_ratio = np.divide(excess, port_risk, out=np.zeros(size), where=port_risk > 0)
+
+        candidates = {
+            'max_sharpe': (sharpe_ratio, sharpe_ratio.argmax()),
+            'max_return': (port_returns, port_returns.argmax()),
+            'min_variance': (port_risk, port_risk.argmin()),
+        }
+        for name, (values, idx) in candidates.items():
+            value = values[idx]
+            # Strict comparison keeps the earliest portfolio on ties, like argmax
+            improved = value < best_values[name] if name == 'min_variance' else value > best_values[name]
+            if improved:
+                best_values[name] = value
+                best[name] = {
+                    'return': port_returns[idx],
+                    'risk': port_risk[idx],
+                    'sharpe': sharpe_ratio[idx],
+                    'weights': wts[idx].copy(),
+                }
+
+    seconds = time.perf_counter() - started
+    best['num_port'] = num_port
+    best['seconds'] = seconds
+    best['portfolios_per_second'] = num_port / seconds if seconds > 0 else float('inf')
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate and optimize portfolios from close prices.")
+    parser.add_argument('--num-port', type=int, default=5000, help="Number of portfolios to simulate")
+    parser.add_argument('--risk-free-rate', type=float, default=0.0, help="Annual risk-free rate")
+    parser.add_argument('--matrix', metavar='DIR', help="Read close prices from a price_matrix.py directory")
+    parser.add_argument('--symbols', nargs='*', help="Symbols to use from the matrix (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.matrix:
+        combined_prices = open_matrix(args.matrix).combined_prices(symbols=args.symbols or None)
+        returns_data = calculate_returns(combined_prices)
+    else:
+        returns_data = calculate_returns()
+
+    print(returns_data.head())
+
+    # We'll use the percentage changes directly instead of calculating log returns
+    # This avoids issues with zero or negative values
+    daily_returns = returns_data
+
+    # Annualized returns and covariance matrix (252 trading days). The moments
+    # object can keep absorbing new bars (see stats.py) without a full recompute
+    moments = RunningMoments.from_returns(daily_returns)
+    ann_returns = moments.ann_returns()
+    cov_mat = moments.ann_cov()
+
+    # Number of portfolios to simulate and the annual risk-free rate used for
+    # the Sharpe ratios
+    num_port = args.num_port
+    risk_free_rate = args.risk_free_rate
+
+    # Simulate random portfolios and keep the max Sharpe, max return and
+    # minimum variance portfolios
+    simulation = simulate_portfolios(ann_returns, cov_mat, num_port=num_port, seed=42,
+                                     risk_free_rate=risk_free_rate)
+
+    max_sr_ret = simulation['max_sharpe']['return']
+    max_sr_risk = simulation['max_sharpe']['risk']
+    max_sr_sharpe = simulation['max_sharpe']['sharpe']
+    max_sr_w = simulation['max_sharpe']['weights']
+
+    max_ret_ret = simulation['max_return']['return']
+    max_ret_risk = simulation['max_return']['risk']
+    max_ret_sharpe = simulation['max_return']['sharpe']
+
+    min_var_ret = simulation['min_variance']['return']
+    min_var_risk = simulation['min_variance']['risk']
+    min_var_sharpe = simulation['min_variance']['sharpe']
+
+    print(f"\nSimulated {num_port} portfolios in {simulation['seconds']:.3f}s "
+          f"({simulation['portfolios_per_second']:,.0f} portfolios/s)")
+
+    # Print the results
+    print("\nOptimal Portfolio Results:")
+    print("Maximum Sharpe Ratio Portfolio:")
+    print(f"  Expected Return: {max_sr_ret:.4f}")
+    print(f"  Risk: {max_sr_risk:.4f}")
+    print(f"  Sharpe Ratio: {max_sr_sharpe:.4f}")
+    print("  Weights:")
+    for j, col in enumerate(daily_returns.columns):
+        symbol = col.split('_close_pct_change')[0]
+        print(f"    {symbol}: {max_sr_w[j]:.4f}")
+
+    print("\nMaximum Return Portfolio:")
+    print(f"  Expected Return: {max_ret_ret:.4f}")
+    print(f"  Risk: {max_ret_risk:.4f}")
+    print(f"  Sharpe Ratio: {max_ret_sharpe:.4f}")
+
+    print("\nMinimum Variance Portfolio:")
+    print(f"  Expected Return: {min_var_ret:.4f}")
+    print(f"  Risk: {min_var_risk:.4f}")
+    print(f"  Sharpe Ratio: {min_var_sharpe:.4f}")
+
+    # Solve the efficient frontier directly for comparison with the simulation
+    frontier_result = efficient_frontier(ann_returns, cov_mat, num_points=50, risk_free_rate=risk_free_rate)
+
+    print(f"\nOptimized Efficient Frontier (risk-free rate {risk_free_rate:.2%}):")
+    for label, key in [("Maximum Sharpe Ratio", 'max_sharpe'), ("Minimum Variance", 'min_variance')]:
+        portfolio = frontier_result[key]
+        print(f"{label} Portfolio:")
+        print(f"  Expected Return: {portfolio['return']:.4f}")
+        print(f"  Risk: {portfolio['risk']:.4f}")
+        print(f"  Sharpe Ratio: {portfolio['sharpe']:.4f}")
+        print("  Weights:")
+        for j, col in enumerate(daily_returns.columns):
+            symbol = col.split('_close_pct_change')[0]
+            print(f"    {symbol}: {portfolio['weights'][j]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
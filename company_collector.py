@@ -0,0 +1,354 @@
+"""
+Company Data Collector Module
+
+This module fetches the company tables of company_tcbs.py (TCBS: overview,
+profile, shareholders, ...) and company_vci.py (VCI: officers, reports,
+affiliate) for many symbols at once. Every (symbol, source, endpoint) call is
+a separate task on a thread pool, each source has one rate limit shared by
+all of its calls, and only the selected endpoints are ever called. Results are
+consolidated into one table per endpoint with a 'symbol' column.
+
+    from company_collector import collect_company_data
+
+    tables, failures = collect_company_data(['ACB', 'VCB'], endpoints={'TCBS': ['overview', 'dividends']})
+    tables['TCBS']['CompanyDividends']     # dividends of both symbols
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import instrument
+from fetcher import TRANSIENT_ERRORS, call_with_retries
+from ratelimit import get_source_limiter
+from storage import DataStore
+
+# Company endpoints per source: method name -> table name
+ENDPOINTS = {
+    'TCBS': {
+        'overview': 'CompanyOverview',
+        'profile': 'CompanyProfile',
+        'shareholders': 'CompanyShareholders',
+        'insider_deals': 'CompanyInsiderDeals',
+        'subsidiaries': 'CompanySubsidiaries',
+        'officers': 'CompanyOfficers',
+        'events': 'CompanyEvents',
+        'news': 'CompanyNews',
+        'dividends': 'CompanyDividends',
+    },
+    'VCI': {
+        'officers': 'CompanyOfficers',
+        'reports': 'CompanyReports',
+        'affiliate': 'CompanyAffiliate',
+    },
+}
+
+# Keyword arguments passed to an endpoint method
+ENDPOINT_KWARGS = {
+    ('VCI', 'officers'): {'filter_by': 'working'},
+}
+
+# Consolidated tables are stored per source, one dataset per table
+DATASET = 'company/{source}/{table}'
+
+FAILURE_COLUMNS = ['symbol', 'source', 'endpoint', 'error_type', 'error', 'attempts', 'elapsed']
+
+VN30 = [
+    'ACB', 'BCM', 'BID', 'BVH', 'CTG', 'FPT', 'GAS', 'GVR', 'HDB', 'HPG',
+    'LPB', 'MBB', 'MSN', 'MWG', 'PLX', 'SAB', 'SHB', 'SSB', 'SSI', 'STB',
+    'TCB', 'TPB', 'VCB', 'VHM', 'VIB', 'VIC', 'VJC', 'VNM', 'VPB', 'VRE',
+]
+
+
+def _vnstock_company(symbol, source):
+    if source == 'VCI':
+        from vnstock.explorer.vci import Company
+        company = Company(symbol)
+    else:
+        from vnstock import Vnstock
+        company = Vnstock().stock(symbol=symbol, source=source).company
+    return instrument.traced(company, 'company', source=source, symbol=symbol)
+
+
+def parse_endpoints(names):
+    """
+    Turn 'SOURCE.endpoint' names into an endpoints selection.
+
+    Parameters:
+    -----------
+    names : list of str
+        E.g. ['TCBS.overview', 'VCI.reports']; a bare source name ('VCI')
+        selects all of its endpoints
+
+    Returns:
+    --------
+    dict
+        Source -> list of endpoint names
+    """
+    selected = {}
+    for name in names:
+        source, _, endpoint = name.partition('.')
+        source = source.upper()
+        if source not in ENDPOINTS:
+            raise ValueError(f"Unknown source {source!r}; expected one of {sorted(ENDPOINTS)}")
+        endpoints = [endpoint] if endpoint else list(ENDPOINTS[source])
+        for endpoint in endpoints:
+            if endpoint not in ENDPOINTS[source]:
+                raise ValueError(f"Unknown {source} endpoint {endpoint!r}")
+            selected.setdefault(source, [])
+            if endpoint not in selected[source]:
+                selected[source].append(endpoint)
+    return selected
+
+
+class _Companies:
+    """Company objects created once per (symbol, source), on first use."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._companies = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol, source):
+        key = (symbol, source)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._companies:
+                self._companies[key] = self.factory(symbol, source)
+            return self._companies[key]
+
+
+def _fetch_endpoint(companies, symbol, source, endpoint, limiter, retries, backoff, retry_on):
+    """Call one endpoint with retries. Returns (data, attempts, error)."""
+    kwargs = ENDPOINT_KWARGS.get((source, endpoint), {})
+    return call_with_retries(
+        lambda: getattr(companies.get(symbol, source), endpoint)(**kwargs),
+        limiter, retries, backoff, retry_on, f'company.{endpoint}', source=source, symbol=symbol,
+    )
+
+
+@instrument.timed()
+def collect_company_data(symbols, endpoints=None, max_workers=16, rate_limit=None, retries=3,
+                         backoff=0.5, retry_on=TRANSIENT_ERRORS, store=None, company_factory=None,
+                         verbose=True):
+    """
+    Fetch company tables for many symbols concurrently.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Symbols to fetch
+    endpoints : dict, optional
+        Source -> list of endpoint names to call, e.g. {'TCBS': ['overview']}
+        (default: every endpoint of every source in ENDPOINTS)
+    max_workers : int
+        Maximum number of calls in flight at once (default: 16)
+    rate_limit : float or dict, optional
+        Calls per second per source, shared with every other fetcher using the
+        same source; a dict sets it per source. None disables rate limiting
+        (default: None)
+    retries : int
+        Maximum attempts per call, including the first one (default: 3)
+    backoff : float
+        Base of the exponential backoff between attempts, in seconds (default: 0.5)
+    retry_on : tuple of Exception types
+        Exceptions treated as transient and retried (default: TRANSIENT_ERRORS)
+    store : storage.DataStore, optional
+        Store to write each table to (dataset DATASET, partitioned by symbol)
+    company_factory : callable, optional
+        Function (symbol, source) -> object with the endpoint methods. Defaults
+        to vnstock's company objects; pass a stub to run without network access.
+    verbose : bool
+        Print progress for each call (default: True)
+
+    Returns:
+    --------
+    tuple of (dict, pandas.DataFrame)
+        Source -> {table name: DataFrame with a 'symbol' column}, and a failure
+        report with one row per call that failed (columns: FAILURE_COLUMNS)
+    """
+    if endpoints is None:
+        endpoints = {source: list(names) for source, names in ENDPOINTS.items()}
+    companies = _Companies(company_factory or _vnstock_company)
+    limiters = {
+        source: get_source_limiter(source, rate_limit.get(source) if isinstance(rate_limit, dict) else rate_limit)
+        for source in endpoints
+    }
+
+    frames = {}
+    failures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        # Endpoint-major order spreads the first calls over many symbols
+        for source, names in endpoints.items():
+            for endpoint in names:
+                for symbol in symbols:
+                    future = executor.submit(
+                        _fetch_endpoint, companies, symbol, source, endpoint,
+                        limiters[source], retries, backoff, retry_on,
+                    )
+                    futures[future] = (symbol, source, endpoint, time.perf_counter())
+
+        for future in as_completed(futures):
+            symbol, source, endpoint, started = futures[future]
+            data, attempts, error = future.result()
+            if error is not None:
+                failures.append({
+                    'symbol': symbol,
+                    'source': source,
+                    'endpoint': endpoint,
+                    'error_type': type(error).__name__,
+                    'error': str(error),
+                    'attempts': attempts,
+                    'elapsed': time.perf_counter() - started,
+                })
+                if verbose:
+                    print(f"Error fetching {source} {endpoint} for {symbol}: {error}")
+                continue
+            if data is None or data.empty:
+                if verbose:
+                    print(f"No {source} {endpoint} data for {symbol}")
+                continue
+            frames.setdefault((source, endpoint), {})[symbol] = data.assign(symbol=symbol)
+            if verbose:
+                print(f"Fetched {len(data)} {source} {endpoint} rows for {symbol}")
+
+    tables = {}
+    for source, names in endpoints.items():
+        for endpoint in names:
+            parts = frames.get((source, endpoint), {})
+            # Caller's symbol order rather than completion order
+            ordered = [parts[symbol] for symbol in symbols if symbol in parts]
+            table = pd.concat(ordered, ignore_index=True) if ordered else pd.DataFrame(columns=['symbol'])
+            tables.setdefault(source, {})[ENDPOINTS[source][endpoint]] = table
+
+    if store is not None:
+        save_company_tables(tables, store)
+    return tables, pd.DataFrame(failures, columns=FAILURE_COLUMNS)
+
+
+def save_company_tables(tables, store=None):
+    """Save consolidated company tables to the data store, partitioned by symbol."""
+    store = store or DataStore()
+    for source, source_tables in tables.items():
+        for table, frame in source_tables.items():
+            if not frame.empty:
+                store.write(DATASET.format(source=source, table=table), frame, partition_cols=['symbol'])
+
+
+def load_company_table(source, table, symbols=None, store=None):
+    """
+    Read a consolidated company table, optionally for some symbols only.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Rows of the table with a 'symbol' column
+    """
+    store = store or DataStore()
+    filters = {'symbol': list(symbols)} if symbols is not None else None
+    return store.read(DATASET.format(source=source, table=table), filters=filters)
+
+
+class StubCompany:
+    """
+    Offline stand-in for vnstock's company objects: every endpoint method
+    sleeps for a fixed latency and returns a small frame.
+
+    Parameters:
+    -----------
+    symbol : str
+        Symbol the object was created for
+    latency : float
+        Seconds each endpoint call sleeps to simulate network wait (default: 0.2)
+    """
+
+    def __init__(self, symbol, latency=0.2):
+        self.symbol = symbol
+        self.latency = latency
+        self.calls = []
+
+    def __getattr__(self, endpoint):
+        if endpoint.startswith('_'):
+            raise AttributeError(endpoint)
+
+        def call(**kwargs):
+            self.calls.append(endpoint)
+            time.sleep(self.latency)
+            return pd.DataFrame({'endpoint': [endpoint] * 3, 'value': range(3)})
+        return call
+
+
+def benchmark(symbols=VN30, latency=0.2, max_workers=32):
+    """
+    Compare sequential calls to every TCBS endpoint with collect_company_data,
+    using StubCompany.
+
+    Returns:
+    --------
+    dict
+        Sequential time, concurrent time, the single-call latency and speedup
+    """
+    endpoints = {'TCBS': list(ENDPOINTS['TCBS'])}
+
+    t0 = time.perf_counter()
+    for symbol in symbols:
+        company = StubCompany(symbol, latency)
+        for endpoint in endpoints['TCBS']:
+            getattr(company, endpoint)()
+    sequential = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    tables, failures = collect_company_data(
+        symbols, endpoints, max_workers=max_workers,
+        company_factory=lambda symbol, source: StubCompany(symbol, latency), verbose=False,
+    )
+    concurrent = time.perf_counter() - t0
+    assert failures.empty
+    assert all(len(table) == 3 * len(symbols) for table in tables['TCBS'].values())
+
+    return {
+        'calls': len(symbols) * len(endpoints['TCBS']),
+        'sequential': sequential,
+        'concurrent': concurrent,
+        'latency': latency,
+        'speedup': sequential / concurrent,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch company data for many symbols concurrently.")
+    parser.add_argument('symbols', nargs='*', default=VN30, help="Symbols to fetch (default: VN30)")
+    parser.add_argument('--endpoints', nargs='+', default=None,
+                        help="Endpoints as SOURCE.endpoint, e.g. TCBS.overview VCI.reports, "
+                             "or a bare source for all of its endpoints (default: all)")
+    parser.add_argument('--workers', type=int, default=16, help="Maximum calls in flight")
+    parser.add_argument('--rate', type=float, default=None, help="Calls per second per source")
+    parser.add_argument('--benchmark', action='store_true', help="Run the offline benchmark instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = benchmark()
+        print(f"{result['calls']} calls, {result['latency']:.2f}s each")
+        print(f"Sequential: {result['sequential']:.2f}s")
+        print(f"Concurrent: {result['concurrent']:.2f}s")
+        print(f"Speedup: {result['speedup']:.1f}x")
+        return result
+
+    endpoints = parse_endpoints(args.endpoints) if args.endpoints else None
+    tables, failures = collect_company_data(
+        args.symbols, endpoints, max_workers=args.workers, rate_limit=args.rate, store=DataStore(),
+    )
+    if not failures.empty:
+        print(f"{len(failures)} calls failed:")
+        print(failures[['symbol', 'source', 'endpoint', 'error_type', 'error']].to_string(index=False))
+    return tables, failures
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,83 @@
+import argparse
+
+import instrument
+from response_cache import ResponseCache
+from storage import DataStore
+
 CompanyDataSource='TCBS'
-company = Vnstock().stock(symbol='VCB', source=CompanyDataSource).company
-
-# Tổng quan
-CompanyOverview = company.overview()
-# Hồ sơ
-CompanyProfile = company.profile()
-# Cổ đông
-CompanyShareholders = company.shareholders()
-# Giao dịch nội bộ
-CompanyInsiderDeals = company.insider_deals()
-# Giao dịch ngoại bộ
-CompanySubsidiaries = company.subsidiaries()
-# Ban lãnh đạo
-CompanyOfficers = company.officers()
-# Sự kiện
-CompanyEvents = company.events()
-# Tin tức
-CompanyNews = company.news()
-# Cổ tức        
-CompanyDividends = company.dividends()
-
-
-def save_company_data():
-    CompanyOverview.to_csv('CompanyOverview.csv', index=False)
-    CompanyProfile.to_csv('CompanyProfile.csv', index=False)
-    CompanyShareholders.to_csv('CompanyShareholders.csv', index=False)
-    CompanyInsiderDeals.to_csv('CompanyInsiderDeals.csv', index=False)
-    CompanySubsidiaries.to_csv('CompanySubsidiaries.csv', index=False)
-    CompanyOfficers.to_csv('CompanyOfficers.csv', index=False)
-    CompanyEvents.to_csv('CompanyEvents.csv', index=False)
-    CompanyNews.to_csv('CompanyNews.csv', index=False)
-    CompanyDividends.to_csv('CompanyDividends.csv', index=False)
-#save_company_data()
+CompanySymbol='VCB'
+
+
+def fetch_company_data(symbol=CompanySymbol, source=CompanyDataSource, cache=None):
+    """
+    Fetch every company table for one symbol.
+
+    Parameters:
+    -----------
+    cache : response_cache.ResponseCache, optional
+        Serve tables from this cache while they are fresh (default: None)
+
+    Returns:
+    --------
+    dict
+        Table name (e.g. 'CompanyOverview') to DataFrame
+    """
+    from vnstock import Vnstock
+
+    company = instrument.traced(Vnstock().stock(symbol=symbol, source=source).company, 'company',
+                                source=source, symbol=symbol)
+    if cache is not None:
+        company = cache.wrap(company, source, symbol)
+    return {
+        # Tổng quan
+        'CompanyOverview': company.overview(),
+        # Hồ sơ
+        'CompanyProfile': company.profile(),
+        # Cổ đông
+        'CompanyShareholders': company.shareholders(),
+        # Giao dịch nội bộ
+        'CompanyInsiderDeals': company.insider_deals(),
+        # Giao dịch ngoại bộ
+        'CompanySubsidiaries': company.subsidiaries(),
+        # Ban lãnh đạo
+        'CompanyOfficers': company.officers(),
+        # Sự kiện
+        'CompanyEvents': company.events(),
+        # Tin tức
+        'CompanyNews': company.news(),
+        # Cổ tức
+        'CompanyDividends': company.dividends(),
+    }
+
+
+def save_company_data(company_data, symbol=CompanySymbol, store=None):
+    """Save every company table to the data store, partitioned by symbol."""
+    store = store or DataStore()
+    for name, frame in company_data.items():
+        store.write(f'company/{name}', frame.assign(symbol=symbol), partition_cols=['symbol'])
+
+
+def export_company_data_to_csv(company_data):
+    """Explicitly export every company table to CSV files."""
+    store = DataStore()
+    for name, frame in company_data.items():
+        store.export_csv(frame, f'{name}.csv')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch and save TCBS company data.")
+    parser.add_argument('symbol', nargs='?', default=CompanySymbol, help="Company symbol")
+    parser.add_argument('--csv', action='store_true', help="Also export CSV copies")
+    parser.add_argument('--no-cache', action='store_true', help="Always refetch instead of using the response cache")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else ResponseCache()
+    company_data = fetch_company_data(args.symbol, cache=cache)
+    save_company_data(company_data, args.symbol)
+    if args.csv:
+        export_company_data_to_csv(company_data)
+    return company_data
+
+
+if __name__ == "__main__":
+    main()
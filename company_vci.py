@@ -1,15 +1,64 @@
-from vnstock.explorer.vci import Company
-company = Company('ACB')
-# Báo cáo
-CompanyReports = company.reports()
-CompanyAffiliate = company.affiliate()
+import argparse
 
+import instrument
+from response_cache import ResponseCache
+from storage import DataStore
+
+CompanySymbol='ACB'
 WorkStatus='working'
-CompanyOfficers = company.officers(filter_by=WorkStatus).head() 
 # filter_by='all' hoặc 'working' hoặc 'resigned'
 
-def save_to_csv():
-    CompanyOfficers.to_csv('CompanyOfficers.csv', index=False)
-    CompanyReports.to_csv('CompanyReports.csv', index=False)
-    CompanyAffiliate.to_csv('CompanyAffiliate.csv', index=False)1
-save_to_csv()
\ No newline at end of file
+def fetch_company_data(symbol=CompanySymbol, work_status=WorkStatus, cache=None):
+    """
+    Fetch the VCI company tables for one symbol.
+
+    Parameters:
+    -----------
+    cache : response_cache.ResponseCache, optional
+        Serve tables from this cache while they are fresh (default: None)
+
+    Returns:
+    --------
+    dict
+        Table name (e.g. 'CompanyReports') to DataFrame
+    """
+    from vnstock.explorer.vci import Company
+
+    company = instrument.traced(Company(symbol), 'company', source='VCI', symbol=symbol)
+    if cache is not None:
+        company = cache.wrap(company, 'VCI', symbol)
+    return {
+        'CompanyOfficers': company.officers(filter_by=work_status).head(),
+        # Báo cáo
+        'CompanyReports': company.reports(),
+        'CompanyAffiliate': company.affiliate(),
+    }
+
+def save_company_data(company_data, symbol=CompanySymbol, store=None):
+    """Save the company tables to the data store, partitioned by symbol."""
+    store = store or DataStore()
+    for name, frame in company_data.items():
+        store.write(f'company/{name}', frame.assign(symbol=symbol), partition_cols=['symbol'])
+
+def save_to_csv(company_data):
+    """Explicitly export the company tables to CSV files."""
+    store = DataStore()
+    for name, frame in company_data.items():
+        store.export_csv(frame, f'{name}.csv')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch and save VCI company data.")
+    parser.add_argument('symbol', nargs='?', default=CompanySymbol, help="Company symbol")
+    parser.add_argument('--csv', action='store_true', help="Also export CSV copies")
+    parser.add_argument('--no-cache', action='store_true', help="Always refetch instead of using the response cache")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else ResponseCache()
+    company_data = fetch_company_data(args.symbol, cache=cache)
+    save_company_data(company_data, args.symbol)
+    if args.csv:
+        save_to_csv(company_data)
+    return company_data
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
-from vnstock.explorer.misc import *
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+import argparse
 
-# Test single date
-single_rate = vcb_exchange_rate(date='2024-05-25')
-print("Single date result:")
-print(single_rate.head())
+import instrument
+from cache import HistoryCache
+from scheduler import fetch_date_range
+from storage import DataStore
+from trading_calendar import TradingCalendar
 
-def get_exchange_rates_for_date_range(start_date_str, end_date_str, interval_days=7, delay_seconds=2):
+# Per-date rows of resumable backfills, partitioned by requested date
+BACKFILL_DATASET = 'backfill/exchange_rates'
+
+def get_exchange_rates_for_date_range(start_date_str, end_date_str, interval_days=7, delay_seconds=2,
+                                      max_workers=4, store=None, resume=True, calendar=None,
+                                      trading_days_only=True):
     """
     Fetch VCB exchange rates for a range of dates with rate limiting.
     
@@ -20,86 +23,93 @@ def get_exchange_rates_for_date_range(start_date_str, end_date_str, interval_day
         End date in 'YYYY-MM-DD' format
     interval_days : int
         Number of days between each data point (to avoid excessive API calls)
-    delay_seconds : int
-        Number of seconds to wait between API calls to respect rate limits
+    delay_seconds : float
+        Average number of seconds between API calls to respect rate limits;
+        0 disables rate limiting
+    max_workers : int
+        Number of API calls in flight at once, within the rate limit (default: 4)
+    store : storage.DataStore, optional
+        Store for resumable backfills: each date's rows are saved under
+        BACKFILL_DATASET as they arrive and dates already stored are skipped
+        (default: None, nothing is saved)
+    resume : bool
+        Skip dates completed by an earlier run when a store is given (default: True)
+    calendar : trading_calendar.TradingCalendar, optional
+        Calendar used to skip non-trading days (default: built from the history
+        cache and the holiday list)
+    trading_days_only : bool
+        Only request trading days; weekends and market holidays return empty
+        frames (default: True)
         
     Returns:
     --------
     pandas.DataFrame
         Combined DataFrame with exchange rates for the date range
     """
-    # Convert string dates to datetime objects
-    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-    
-    # Initialize an empty list to store DataFrames
-    all_rates = []
-    
-    # Calculate total number of API calls
-    total_days = (end_date - start_date).days
-    total_calls = (total_days // interval_days) + 1
-    
-    print(f"Will make approximately {total_calls} API calls with {delay_seconds} second delay between calls")
-    print(f"Estimated completion time: {total_calls * delay_seconds} seconds")
-    
-    # Loop through the date range with the specified interval
-    current_date = start_date
-    call_count = 0
-    
-    while current_date <= end_date:
-        # Convert current date to string format
-        date_str = current_date.strftime("%Y-%m-%d")
-        
-        try:
-            # Fetch exchange rates for the current date
-            call_count += 1
-            print(f"[{call_count}/{total_calls}] Fetching exchange rates for {date_str}...")
-            rates = vcb_exchange_rate(date=date_str)
-            
-            # Check if we got valid data
-            if not rates.empty:
-                # Append to the list
-                all_rates.append(rates)
-                print(f"  Retrieved {len(rates)} records")
-            else:
-                print(f"  No data available for {date_str}")
-            
-        except Exception as e:
-            print(f"  Error fetching data for {date_str}: {e}")
-        
-        # Move to the next date
-        current_date += timedelta(days=interval_days)
-        
-        # Add delay to respect rate limits (if not the last request)
-        if current_date <= end_date:
-            print(f"  Waiting {delay_seconds} seconds to respect API rate limits...")
-            time.sleep(delay_seconds)
-    
-    # Combine all DataFrames
-    if all_rates:
-        exchange_rates = pd.concat(all_rates, ignore_index=True)
-        return exchange_rates
-    else:
+    from vnstock.explorer.misc import vcb_exchange_rate
+
+    vcb_exchange_rate = instrument.timed('misc.vcb_exchange_rate')(vcb_exchange_rate)
+
+    if trading_days_only and calendar is None:
+        calendar = TradingCalendar.from_history_cache(HistoryCache())
+
+    # Calls are spaced delay_seconds apart on average by a token bucket,
+    # with up to max_workers requests in flight
+    exchange_rates, failures = fetch_date_range(
+        lambda date_str: vcb_exchange_rate(date=date_str),
+        start_date_str,
+        end_date_str,
+        interval_days=interval_days,
+        rate=1.0 / delay_seconds if delay_seconds else None,
+        max_workers=max_workers,
+        store=store,
+        dataset=BACKFILL_DATASET if store is not None else None,
+        resume=resume,
+        calendar=calendar if trading_days_only else None,
+        label='exchange rate',
+    )
+
+    if not failures.empty:
+        print(f"\nDates that could not be fetched (retried on the next resumed run): {failures['date'].tolist()}")
+
+    if exchange_rates.empty:
         print("No data was fetched for the specified date range.")
-        return pd.DataFrame()
+    return exchange_rates
 
-# Test the function with a date range
-start_date = "2025-03-20"
-end_date = "2025-03-27"  # Today's date
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch VCB exchange rates for a date range.")
+    parser.add_argument('--start', default="2025-03-20", help="Start date (YYYY-MM-DD)")
+    parser.add_argument('--end', default="2025-03-27", help="End date (YYYY-MM-DD)")
+    parser.add_argument('--interval-days', type=int, default=2, help="Days between data points")
+    parser.add_argument('--delay', type=float, default=2, help="Seconds between API calls")
+    parser.add_argument('--workers', type=int, default=4, help="API calls in flight at once")
+    parser.add_argument('--all-days', action='store_true',
+                        help="Also request weekends and market holidays")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"Store each date under {BACKFILL_DATASET} and skip dates already fetched")
+    args = parser.parse_args(argv)
 
-print("\nFetching exchange rates for date range:")
-exchange_rates = get_exchange_rates_for_date_range(start_date, end_date, interval_days=2, delay_seconds=2)
+    print("\nFetching exchange rates for date range:")
+    exchange_rates = get_exchange_rates_for_date_range(args.start, args.end, interval_days=args.interval_days,
+                                                       delay_seconds=args.delay, max_workers=args.workers,
+                                                       store=DataStore() if args.resume else None,
+                                                       trading_days_only=not args.all_days)
 
-# Display the results
-if not exchange_rates.empty:
-    print(f"\nFetched {len(exchange_rates)} exchange rate records from {start_date} to {end_date}")
-    print("\nFirst few records:")
-    print(exchange_rates.head())
-    
-    print("\nLast few records:")
-    print(exchange_rates.tail())
-    
-    # Save to CSV
-    output_file = "exchange_rates.csv"
-    exchange_rates.to_csv(output_file, index=False)
-    print(f"\nExchange rates saved to {output_file}")
\ No newline at end of file
+    # Display the results
+    if not exchange_rates.empty:
+        print(f"\nFetched {len(exchange_rates)} exchange rate records from {args.start} to {args.end}")
+        print("\nFirst few records:")
+        print(exchange_rates.head())
+
+        print("\nLast few records:")
+        print(exchange_rates.tail())
+
+        # Save to the data store
+        store = DataStore()
+        store.write('exchange_rates', exchange_rates)
+        print(f"\nExchange rates saved to {store.root}/exchange_rates")
+
+    return exchange_rates
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Fake vnstock Provider Module
+
+This module is a local stand-in for the vnstock data sources, so the fetch
+and analysis scripts can be run and timed without network access. A
+FakeProvider serves deterministic synthetic data for the endpoints this
+project uses:
+
+- Quote.history: daily OHLCV random walks with staggered listing dates
+- stock.screener.stock: screener snapshots with ScreenerDocs.md columns
+- stock.finance: balance sheet, income statement, cash flow and ratios
+- vnstock.explorer.misc: SJC gold prices and VCB exchange rates
+- Listing.all_symbols, symbols_by_exchange, symbols_by_group: the
+  provider's symbol list, spread over HOSE, HNX and UPCOM
+- stock.trading.price_board: a live board where each call moves a share of
+  the requested symbols
+
+Every call can sleep for a configurable latency and fail with a configurable
+probability. installed() registers the provider as the `vnstock` package, so
+the scripts' own `from vnstock import ...` imports reach it unchanged:
+
+    with installed(FakeProvider(latency=0.05, error_rate=0.01)) as provider:
+        prices = test.fetch_price_data(['S0000', 'S0001'])
+    print(provider.stats())
+"""
+
+import sys
+import threading
+import time
+import types
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from screener_index import synthetic_snapshot
+
+# Every symbol's price series starts here; requests slice the same series,
+# so overlapping windows always agree
+ORIGIN = '2015-01-01'
+HORIZON = '2030-12-31'
+
+STATEMENTS = ('balance_sheet', 'income_statement', 'cash_flow', 'ratio')
+
+GOLD_PRODUCTS = ['SJC 1L, 10L, 1KG', 'SJC 5 chỉ', 'Nhẫn SJC 99,99 1 chỉ, 2 chỉ, 5 chỉ']
+CURRENCIES = {'USD': 25_000.0, 'EUR': 27_000.0, 'JPY': 165.0, 'CNY': 3_450.0, 'SGD': 18_700.0}
+
+
+@lru_cache(maxsize=1)
+def _trading_days():
+    return pd.bdate_range(ORIGIN, HORIZON)
+
+
+def _key(*parts):
+    return zlib.crc32('|'.join(str(part) for part in parts).encode())
+
+
+class FakeProvider:
+    """
+    Deterministic synthetic data with latency and error injection.
+
+    Parameters:
+    -----------
+    num_symbols : int
+        Number of listed symbols, named S0000, S0001, ... (default: 1700)
+    latency : float
+        Seconds every call sleeps to simulate network wait (default: 0.0)
+    jitter : float
+        Extra random latency, uniform between 0 and jitter seconds (default: 0.0)
+    error_rate : float
+        Probability that a call raises `error` (default: 0.0)
+    error : Exception type
+        Exception raised by failing calls; OSError is retried by the
+        fetchers (default: OSError)
+    seed : int
+        Seed of the synthetic data and of the injected errors (default: 0)
+    board_change_rate : float
+        Share of the requested symbols whose quote changes on each
+        price_board call (default: 0.05)
+    max_board_symbols : int, optional
+        Largest price_board request accepted; larger ones raise
+        ConnectionError with a 413 status, as vnstock does for a non-200
+        response (default: None, no limit)
+    """
+
+    def __init__(self, num_symbols=1700, latency=0.0, jitter=0.0, error_rate=0.0, error=OSError, seed=0,
+                 board_change_rate=0.05, max_board_symbols=None):
+        self.symbols = [f'S{i:04d}' for i in range(num_symbols)]
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error = error
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._errors = {}
+        self.board_change_rate = board_change_rate
+        self.max_board_symbols = max_board_symbols
+        self._board = None
+
+    def _call(self, endpoint):
+        """Count a call, wait for its latency and maybe fail it."""
+        with self._lock:
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise self.error(f"injected {endpoint} failure")
+
+    def stats(self):
+        """
+        Return the calls and injected errors per endpoint.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            'calls' and 'errors' indexed by endpoint
+        """
+        with self._lock:
+            endpoints = sorted(self._calls)
+            return pd.DataFrame({
+                'calls': [self._calls[endpoint] for endpoint in endpoints],
+                'errors': [self._errors.get(endpoint, 0) for endpoint in endpoints],
+            }, index=pd.Index(endpoints, name='endpoint'))
+
+    def reset_stats(self):
+        with self._lock:
+            self._calls.clear()
+            self._errors.clear()
+
+    def history(self, symbol, start, end, interval='1D'):
+        """Daily OHLCV bars between start and end, like Quote.history."""
+        self._call('quote.history')
+        if interval != '1D':
+            raise ValueError(f"FakeProvider only serves daily bars, not {interval}")
+        # The whole series is drawn every time so any window of it is the same
+        rng = np.random.default_rng([self.seed, _key(symbol)])
+        times = _trading_days()
+        # Later symbols list later so the time indexes do not all match
+        listed = int(rng.integers(0, len(times) // 3))
+        count = len(times) - listed
+        close = rng.uniform(5, 80) * np.exp(np.cumsum(rng.normal(0.0002, 0.02, count)))
+        spread = np.abs(rng.normal(0, 0.01, count))
+        noise = rng.normal(0, 0.005, count)
+        volume = rng.integers(1_000, 2_000_000, count)
+
+        lo = max(times.searchsorted(pd.Timestamp(start)), listed)
+        hi = times.searchsorted(pd.Timestamp(end), side='right')
+        window = slice(lo - listed, max(hi - listed, lo - listed))
+        close = close[window]
+        return pd.DataFrame({
+            'time': times[lo:max(hi, lo)],
+            'open': np.round(close * (1 + noise[window]), 2),
+            'high': np.round(close * (1 + spread[window]), 2),
+            'low': np.round(close * (1 - spread[window]), 2),
+            'close': np.round(close, 2),
+            'volume': volume[window],
+        })
+
+    def screener(self, params=None, limit=1700):
+        """Screener snapshot of the first `limit` symbols, like stock.screener.stock."""
+        self._call('screener.stock')
+        snapshot = synthetic_snapshot(min(limit, len(self.symbols)), seed=self.seed)
+        snapshot['ticker'] = self.symbols[:len(snapshot)]
+        exchanges = (params or {}).get('exchangeName')
+        if exchanges:
+            snapshot = snapshot[snapshot['exchange'].isin(exchanges.split(','))].reset_index(drop=True)
+        return snapshot
+
+    def statement(self, symbol, statement, period='quarter', num_quarters=20, num_items=40):
+        """
+        Statement frame shaped like VCI's output, for the quarters ending
+        with the last quarter before today, or their yearly sums.
+        """
+        self._call(f'finance.{statement}')
+        rng = np.random.default_rng([self.seed, _key(symbol, statement)])
+        end = pd.Period(pd.Timestamp.now(), freq='Q') - 1
+        quarters = pd.period_range(end=end, periods=num_quarters, freq='Q')
+        frame = pd.DataFrame(np.round(rng.normal(1000, 300, (num_quarters, num_items)), 2),
+                             columns=[f'{statement} item {i:02d}' for i in range(num_items)])
+        frame.insert(0, 'lengthReport', [q.quarter for q in quarters])
+        frame.insert(0, 'yearReport', [q.year for q in quarters])
+        if period == 'year':
+            frame = frame.drop(columns='lengthReport').groupby('yearReport', as_index=False).sum()
+            frame.insert(1, 'lengthReport', 5)
+        frame.insert(0, 'ticker', symbol)
+        return frame.iloc[::-1].reset_index(drop=True)
+
+    def gold_price(self, date):
+        """SJC gold prices of one day, like vnstock.explorer.misc.sjc_gold_price."""
+        self._call('misc.sjc_gold_price')
+        rng = np.random.default_rng([self.seed, _key('gold', date)])
+        base = 80_000_000 + rng.normal(0, 2_000_000)
+        buy = np.round(base - np.arange(len(GOLD_PRODUCTS)) * 500_000, -4)
+        return pd.DataFrame({'name': GOLD_PRODUCTS, 'branch': 'Hồ Chí Minh', 'buy_price': buy,
+                             'sell_price': buy + 2_000_000, 'date': date})
+
+    def exchange_rate(self, date):
+        """VCB exchange rates of one day, like vnstock.explorer.misc.vcb_exchange_rate."""
+        self._call('misc.vcb_exchange_rate')
+        rng = np.random.default_rng([self.seed, _key('fx', date)])
+        mid = np.array(list(CURRENCIES.values())) * (1 + rng.normal(0, 0.005, len(CURRENCIES)))
+        return pd.DataFrame({'currency_code': list(CURRENCIES), 'buy _cash': np.round(mid * 0.99, 2),
+                             'buy _transfer': np.round(mid * 0.995, 2), 'sell': np.round(mid * 1.01, 2),
+                             'date': date})
+
+    def price_board(self, symbols):
+        """
+        Current quotes of the symbols, with VCI's two-level columns, like
+        stock.trading.price_board. Each call moves board_change_rate of them.
+        """
+        self._call('trading.price_board')
+        if self.max_board_symbols and len(symbols) > self.max_board_symbols:
+            raise ConnectionError(f"Tải dữ liệu không thành công: 413 - Payload Too Large "
+                                  f"({len(symbols)} symbols, at most {self.max_board_symbols})")
+        positions = pd.Index(self.symbols).get_indexer(symbols)
+        if (positions < 0).any():
+            raise ValueError(f"Unknown symbols {[s for s, p in zip(symbols, positions) if p < 0]}")
+        with self._lock:
+            if self._board is None:
+                rng = np.random.default_rng([self.seed, _key('board')])
+                ref = np.round(rng.uniform(5, 80, len(self.symbols)), 2)
+                self._board = {'ref': ref, 'price': ref.copy(), 'high': ref.copy(), 'low': ref.copy(),
+                               'volume': np.zeros(len(self.symbols), dtype=np.int64)}
+            board = self._board
+            moved = positions[self._rng.random(len(positions)) < self.board_change_rate]
+            if len(moved):
+                tick = np.maximum(np.round(board['ref'][moved] * 0.001, 2), 0.01)
+                step = self._rng.choice([-1, 1], len(moved)) * tick
+                board['price'][moved] = np.clip(np.round(board['price'][moved] + step, 2),
+                                                board['ref'][moved] * 0.93, board['ref'][moved] * 1.07)
+                board['volume'][moved] += self._rng.integers(1, 50, len(moved)) * 100
+                board['high'][moved] = np.maximum(board['high'][moved], board['price'][moved])
+                board['low'][moved] = np.minimum(board['low'][moved], board['price'][moved])
+            price = board['price'][positions]
+            ref = board['ref'][positions]
+            return pd.DataFrame({
+                ('listing', 'symbol'): list(symbols),
+                ('listing', 'ceiling'): np.round(ref * 1.07, 2),
+                ('listing', 'floor'): np.round(ref * 0.93, 2),
+                ('listing', 'ref_price'): ref,
+                ('match', 'match_price'): price,
+                ('match', 'accumulated_volume'): board['volume'][positions],
+                ('match', 'highest'): board['high'][positions],
+                ('match', 'lowest'): board['low'][positions],
+                ('bid_ask', 'bid_1_price'): np.round(price - 0.05, 2),
+                ('bid_ask', 'ask_1_price'): np.round(price + 0.05, 2),
+            })
+
+    def all_symbols(self):
+        """Listed symbols, like Listing.all_symbols."""
+        self._call('listing.all_symbols')
+        return pd.DataFrame({'symbol': self.symbols, 'organ_name': [f'Company {s}' for s in self.symbols]})
+
+    def symbols_by_exchange(self):
+        """Symbols with their exchange (HSX, HNX or UPCOM), like Listing.symbols_by_exchange."""
+        self._call('listing.symbols_by_exchange')
+        exchanges = np.array(['HSX', 'HNX', 'UPCOM'])[[_key(symbol) % 3 for symbol in self.symbols]]
+        return pd.DataFrame({'symbol': self.symbols, 'exchange': exchanges, 'type': 'STOCK'})
+
+    def symbols_by_group(self, group='VN30'):
+        """Members of an index group, like Listing.symbols_by_group."""
+        self._call('listing.symbols_by_group')
+        size = int(''.join(filter(str.isdigit, group)) or 30)
+        return pd.Series(self.symbols[:size], name='symbol')
+
+    def modules(self):
+        """
+        Build the `vnstock`, `vnstock.explorer` and `vnstock.explorer.misc`
+        modules served by this provider.
+
+        Returns:
+        --------
+        dict
+            Module name -> module object
+        """
+        provider = self
+
+        class Quote:
+            def __init__(self, symbol='VCI', source='VCI'):
+                self.symbol = symbol
+                self.source = source
+
+            def history(self, start, end=None, interval='1D', to_df=True, **kwargs):
+                return provider.history(self.symbol, start, end or pd.Timestamp.now(), interval)
+
+        class Finance:
+            def __init__(self, symbol='VCI', source='VCI'):
+                self.symbol = symbol
+                self.source = source
+
+            def __getattr__(self, name):
+                if name not in STATEMENTS:
+                    raise AttributeError(name)
+                return lambda period='quarter', **kwargs: provider.statement(self.symbol, name, period)
+
+        class Screener:
+            def stock(self, params=None, limit=1700, **kwargs):
+                return provider.screener(params, limit)
+
+        class Listing:
+            def __init__(self, source='VCI'):
+                self.source = source
+
+            def all_symbols(self, **kwargs):
+                return provider.all_symbols()
+
+            def symbols_by_exchange(self, **kwargs):
+                return provider.symbols_by_exchange()
+
+            def symbols_by_group(self, group='VN30', **kwargs):
+                return provider.symbols_by_group(group)
+
+        class Trading:
+            def __init__(self, symbol='VCI', source='VCI'):
+                self.symbol = symbol
+                self.source = source
+
+            def price_board(self, symbols_list, **kwargs):
+                return provider.price_board(symbols_list)
+
+        class Stock:
+            def __init__(self, symbol, source):
+                self.symbol = symbol
+                self.quote = Quote(symbol, source)
+                self.finance = Finance(symbol, source)
+                self.screener = Screener()
+                self.listing = Listing(source)
+                self.trading = Trading(symbol, source)
+
+        class Vnstock:
+            def stock(self, symbol='VCI', source='VCI'):
+                return Stock(symbol, source)
+
+        vnstock = types.ModuleType('vnstock')
+        vnstock.__dict__.update(Vnstock=Vnstock, Quote=Quote, Finance=Finance, Listing=Listing,
+                                Screener=Screener, Trading=Trading, provider=provider)
+        explorer = types.ModuleType('vnstock.explorer')
+        misc = types.ModuleType('vnstock.explorer.misc')
+        misc.sjc_gold_price = lambda date=None, **kwargs: provider.gold_price(date)
+        misc.vcb_exchange_rate = lambda date=None, **kwargs: provider.exchange_rate(date)
+        explorer.misc = misc
+        vnstock.explorer = explorer
+        return {'vnstock': vnstock, 'vnstock.explorer': explorer, 'vnstock.explorer.misc': misc}
+
+
+class QuoteFactory:
+    """
+    Picklable quote_factory (symbol, source) -> fake Quote, for worker
+    processes. Each process builds its own FakeProvider from the keyword
+    arguments; the data is the same in every process for the same seed.
+    """
+
+    def __init__(self, **provider_kwargs):
+        self.provider_kwargs = provider_kwargs
+        self._quote = None
+
+    def __getstate__(self):
+        return {'provider_kwargs': self.provider_kwargs, '_quote': None}
+
+    def __call__(self, symbol, source='VCI'):
+        if self._quote is None:
+            self._quote = FakeProvider(**self.provider_kwargs).modules()['vnstock'].Quote
+        return self._quote(symbol, source)
+
+
+@contextmanager
+def installed(provider=None, **kwargs):
+    """
+    Serve `import vnstock` from a FakeProvider inside a with block.
+
+    Parameters:
+    -----------
+    provider : FakeProvider, optional
+        Provider to install (default: FakeProvider(**kwargs))
+
+    Yields:
+    -------
+    FakeProvider
+        The installed provider; the previous modules are restored on exit
+    """
+    provider = provider or FakeProvider(**kwargs)
+    modules = provider.modules()
+    saved = {name: sys.modules.get(name) for name in modules}
+    sys.modules.update(modules)
+    try:
+        yield provider
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
@@ -0,0 +1,377 @@
+"""
+Efficient Frontier Module
+
+This module computes the minimum variance portfolio, the maximum Sharpe ratio
+portfolio and points along the efficient frontier directly from annualized
+returns and a covariance matrix, instead of approximating them by random
+sampling as calculations.simulate_portfolios does.
+
+Each portfolio is the solution of a quadratic program with a budget
+constraint, optional target return and per-asset weight bounds (long-only
+with a weight cap by default). The programs are solved with a primal-dual
+active-set method that only factorizes the system of the assets that are not
+at a bound, warm-started from the previous solution along the frontier,
+with a primal active-set method as a fallback when those iterations cycle.
+"""
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+
+def _kkt_solve(Q, A, free, rhs_top, rhs_bottom):
+    """Solve the equality-constrained system restricted to the free assets."""
+    k = len(free)
+    m = A.shape[0]
+    kkt = np.zeros((k + m, k + m))
+    kkt[:k, :k] = Q[np.ix_(free, free)]
+    kkt[:k, k:] = A[:, free].T
+    kkt[k:, :k] = A[:, free]
+    rhs = np.concatenate([rhs_top, rhs_bottom])
+    try:
+        solution = np.linalg.solve(kkt, rhs)
+    except np.linalg.LinAlgError:
+        solution = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+    return solution[:k], solution[k:]
+
+
+def _primal_dual_active_set(Q, c, A, b, lower, upper, w0, nu0, max_iter):
+    """
+    Primal-dual active-set iterations. Fast (a handful of iterations from a
+    warm start) but can cycle; returns None when it does not converge.
+    """
+    n = len(c)
+    w = np.clip(w0, lower, upper)
+    nu = np.zeros(n) if nu0 is None else nu0.copy()
+    # Puts multipliers (variance units) and weight gaps on a comparable scale
+    scale = max(np.trace(Q) / n, 1e-12)
+
+    previous = None
+    seen = set()
+    for _ in range(max_iter):
+        at_lower = nu + scale * (lower - w) > 0
+        at_upper = (nu + scale * (upper - w) < 0) & ~at_lower
+        state = np.where(at_lower, -1, np.where(at_upper, 1, 0)).astype(np.int8)
+        if previous is not None and np.array_equal(state, previous):
+            return w, nu
+        key = state.tobytes()
+        if key in seen:
+            # Revisiting an earlier active set: the iterations are cycling
+            return None
+        seen.add(key)
+        previous = state
+
+        free = np.flatnonzero(state == 0)
+        bound = np.flatnonzero(state != 0)
+        w = np.where(at_lower, lower, np.where(at_upper, upper, 0.0))
+        w[free], y = _kkt_solve(
+            Q, A, free,
+            c[free] - Q[np.ix_(free, bound)] @ w[bound],
+            b - A[:, bound] @ w[bound],
+        )
+        nu = Q @ w - c + A.T @ y
+        nu[free] = 0.0
+    return None
+
+
+def _primal_active_set(Q, c, A, b, lower, upper, w_start, max_iter):
+    """
+    Primal active-set method from a feasible starting point. Slower than the
+    primal-dual iterations (one bound changes per step) but does not cycle.
+    """
+    w = w_start.copy()
+    n = len(c)
+    tol = 1e-12 * max(np.trace(Q) / n, 1.0)
+    state = np.where(w <= lower, -1, np.where(w >= upper, 1, 0))
+
+    for _ in range(max_iter):
+        free = np.flatnonzero(state == 0)
+        gradient = Q @ w - c
+        if len(free):
+            step, y = _kkt_solve(Q, A, free, -gradient[free], np.zeros(A.shape[0]))
+        else:
+            step, y = np.zeros(0), np.zeros(A.shape[0])
+        if len(free) < A.shape[0] or np.abs(A[:, free] @ step).max(initial=0.0) > 1e-9:
+            # Not enough free assets to move along the equality constraints
+            step = np.zeros(len(free))
+            y = np.linalg.lstsq(A[:, free].T, -gradient[free], rcond=None)[0] if len(free) else \
+                np.linalg.lstsq(A.T, -gradient, rcond=None)[0]
+
+        if np.abs(step).max(initial=0.0) <= 1e-12:
+            nu = gradient + A.T @ y
+            violation = np.where(state == -1, -nu, np.where(state == 1, nu, 0.0))
+            worst = violation.argmax()
+            if violation[worst] <= tol:
+                nu[free] = 0.0
+                return w, nu
+            state[worst] = 0
+            continue
+
+        # Longest step that keeps every free weight inside its bounds
+        current = w[free]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(step < 0, (lower[free] - current) / step,
+                              np.where(step > 0, (upper[free] - current) / step, np.inf))
+        blocking = ratios.argmin()
+        alpha = min(1.0, ratios[blocking])
+        w[free] = current + alpha * step
+        if alpha < 1.0:
+            j = free[blocking]
+            state[j] = -1 if step[blocking] < 0 else 1
+            w[j] = lower[j] if state[j] == -1 else upper[j]
+
+    raise RuntimeError("Portfolio optimization did not converge")
+
+
+def _solve_qp(Q, c, A, b, lower, upper, w0=None, nu0=None, feasible_start=None):
+    """
+    Minimize 1/2 w'Qw - c'w subject to Aw = b and lower <= w <= upper.
+
+    Primal-dual active-set iterations are tried first; if they cycle, a primal
+    active-set method is run from feasible_start (equal weights by default,
+    which is only feasible for the budget constraint alone).
+
+    Returns:
+    --------
+    tuple of (numpy.ndarray, numpy.ndarray)
+        Optimal weights and the bound multipliers, which can be passed back as
+        w0/nu0 to warm-start a nearby problem
+    """
+    n = len(c)
+    equal_weights = np.full(n, 1.0 / n)
+    result = _primal_dual_active_set(Q, c, A, b, lower, upper,
+                                     equal_weights if w0 is None else w0, nu0, max_iter=30)
+    if result is not None:
+        return result
+    if feasible_start is None:
+        feasible_start = equal_weights
+    return _primal_active_set(Q, c, A, b, lower, upper, feasible_start, max_iter=20 * n)
+
+
+def _bounds(num_assets, min_weight, max_weight):
+    lower = np.full(num_assets, float(min_weight))
+    upper = np.full(num_assets, float(max_weight))
+    if lower.sum() > 1 + 1e-12 or upper.sum() < 1 - 1e-12:
+        raise ValueError(
+            f"No portfolio of {num_assets} assets satisfies "
+            f"{min_weight} <= weight <= {max_weight} with weights summing to 1"
+        )
+    return lower, upper
+
+
+def _portfolio(weights, mu, cov, risk_free_rate):
+    ret = float(weights @ mu)
+    risk = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    return {
+        'return': ret,
+        'risk': risk,
+        'sharpe': (ret - risk_free_rate) / risk if risk > 0 else 0.0,
+        'weights': weights,
+    }
+
+
+def _max_return_weights(mu, lower, upper):
+    # Linear objective: fill the highest-return assets up to their caps
+    weights = lower.copy()
+    remaining = 1.0 - weights.sum()
+    for i in np.argsort(-mu, kind='stable'):
+        step = min(upper[i] - weights[i], remaining)
+        weights[i] += step
+        remaining -= step
+        if remaining <= 0:
+            break
+    return weights
+
+
+class _FrontierSolver:
+    """Solves target-return problems along one frontier, reusing warm starts."""
+
+    def __init__(self, mu, cov, lower, upper):
+        self.mu = mu
+        self.cov = cov
+        self.lower = lower
+        self.upper = upper
+        self.c = np.zeros(len(mu))
+        self._warm = (None, None)
+
+        budget = np.ones((1, len(mu)))
+        w, nu = _solve_qp(cov, self.c, budget, np.array([1.0]), lower, upper)
+        self.min_variance = w
+        self.max_return = _max_return_weights(mu, lower, upper)
+        self.min_return = float(w @ mu)
+        self.top_return = float(self.max_return @ mu)
+        self._warm = (w, nu)
+
+    def solve(self, target_return):
+        if target_return <= self.min_return:
+            return self.min_variance
+        if target_return >= self.top_return:
+            return self.max_return
+        A = np.vstack([np.ones(len(self.mu)), self.mu])
+        b = np.array([1.0, target_return])
+        w, nu = _solve_qp(self.cov, self.c, A, b, self.lower, self.upper, *self._warm,
+                          feasible_start=self._feasible(target_return))
+        self._warm = (w, nu)
+        return w
+
+    def _feasible(self, target_return):
+        # Mix the last solution with an end of the frontier to hit the target;
+        # bounds and budget hold for any convex combination of feasible weights
+        previous = self._warm[0]
+        previous_return = float(previous @ self.mu)
+        end = self.max_return if target_return > previous_return else self.min_variance
+        end_return = float(end @ self.mu)
+        if end_return == previous_return:
+            return previous.copy()
+        alpha = (target_return - previous_return) / (end_return - previous_return)
+        return (1 - alpha) * previous + alpha * end
+
+
+def _prepare(ann_returns, cov_mat):
+    mu = np.asarray(ann_returns, dtype=float)
+    cov = np.asarray(cov_mat, dtype=float)
+    if isinstance(ann_returns, pd.Series):
+        names = list(ann_returns.index)
+    else:
+        names = [f'asset_{i}' for i in range(len(mu))]
+    return mu, cov, names
+
+
+def min_variance_portfolio(ann_returns, cov_mat, risk_free_rate=0.0, min_weight=0.0, max_weight=1.0):
+    """
+    Compute the minimum variance portfolio.
+
+    Parameters:
+    -----------
+    ann_returns : pandas.Series or numpy.ndarray
+        Annualized expected return of each asset
+    cov_mat : pandas.DataFrame or numpy.ndarray
+        Annualized covariance matrix of asset returns
+    risk_free_rate : float
+        Annual risk-free rate used for the reported Sharpe ratio (default: 0.0)
+    min_weight : float
+        Lower bound on every weight; 0 means long-only (default: 0.0)
+    max_weight : float
+        Upper bound on every weight (default: 1.0)
+
+    Returns:
+    --------
+    dict
+        'return', 'risk', 'sharpe' and 'weights' of the portfolio
+    """
+    mu, cov, _ = _prepare(ann_returns, cov_mat)
+    lower, upper = _bounds(len(mu), min_weight, max_weight)
+    weights, _ = _solve_qp(cov, np.zeros(len(mu)), np.ones((1, len(mu))), np.array([1.0]), lower, upper)
+    return _portfolio(weights, mu, cov, risk_free_rate)
+
+
+def max_sharpe_portfolio(ann_returns, cov_mat, risk_free_rate=0.0, min_weight=0.0, max_weight=1.0,
+                         tol=1e-9):
+    """
+    Compute the maximum Sharpe ratio portfolio.
+
+    The Sharpe ratio is unimodal along the efficient frontier, so the optimum
+    is located by a golden-section search over the target return.
+
+    Parameters:
+    -----------
+    ann_returns : pandas.Series or numpy.ndarray
+        Annualized expected return of each asset
+    cov_mat : pandas.DataFrame or numpy.ndarray
+        Annualized covariance matrix of asset returns
+    risk_free_rate : float
+        Annual risk-free rate (default: 0.0)
+    min_weight : float
+        Lower bound on every weight; 0 means long-only (default: 0.0)
+    max_weight : float
+        Upper bound on every weight (default: 1.0)
+    tol : float
+        Search tolerance on the target return (default: 1e-9)
+
+    Returns:
+    --------
+    dict
+        'return', 'risk', 'sharpe' and 'weights' of the portfolio
+    """
+    mu, cov, _ = _prepare(ann_returns, cov_mat)
+    lower, upper = _bounds(len(mu), min_weight, max_weight)
+    solver = _FrontierSolver(mu, cov, lower, upper)
+    return _max_sharpe(solver, risk_free_rate, tol)
+
+
+def _max_sharpe(solver, risk_free_rate, tol):
+    def sharpe(target):
+        return _portfolio(solver.solve(target), solver.mu, solver.cov, risk_free_rate)['sharpe']
+
+    inv_phi = (np.sqrt(5) - 1) / 2
+    lo, hi = solver.min_return, solver.top_return
+    x1 = hi - inv_phi * (hi - lo)
+    x2 = lo + inv_phi * (hi - lo)
+    f1, f2 = sharpe(x1), sharpe(x2)
+    while hi - lo > tol * max(1.0, abs(hi)):
+        if f1 < f2:
+            lo, x1, f1 = x1, x2, f2
+            x2 = lo + inv_phi * (hi - lo)
+            f2 = sharpe(x2)
+        else:
+            hi, x2, f2 = x2, x1, f1
+            x1 = hi - inv_phi * (hi - lo)
+            f1 = sharpe(x1)
+
+    candidates = [solver.solve((lo + hi) / 2), solver.min_variance, solver.max_return]
+    portfolios = [_portfolio(w, solver.mu, solver.cov, risk_free_rate) for w in candidates]
+    return max(portfolios, key=lambda p: p['sharpe'])
+
+
+@instrument.timed()
+def efficient_frontier(ann_returns, cov_mat, num_points=50, risk_free_rate=0.0, min_weight=0.0,
+                       max_weight=1.0):
+    """
+    Compute the efficient frontier and its key portfolios.
+
+    Parameters:
+    -----------
+    ann_returns : pandas.Series or numpy.ndarray
+        Annualized expected return of each asset
+    cov_mat : pandas.DataFrame or numpy.ndarray
+        Annualized covariance matrix of asset returns
+    num_points : int
+        Number of frontier points, evenly spaced in return from the minimum
+        variance portfolio to the maximum return portfolio (default: 50)
+    risk_free_rate : float
+        Annual risk-free rate (default: 0.0)
+    min_weight : float
+        Lower bound on every weight; 0 means long-only (default: 0.0)
+    max_weight : float
+        Upper bound on every weight (default: 1.0)
+
+    Returns:
+    --------
+    dict
+        'frontier': DataFrame with 'return', 'risk', 'sharpe' and one weight
+        column per asset; 'min_variance', 'max_sharpe' and 'max_return':
+        portfolio dicts as returned by min_variance_portfolio
+    """
+    mu, cov, names = _prepare(ann_returns, cov_mat)
+    lower, upper = _bounds(len(mu), min_weight, max_weight)
+    solver = _FrontierSolver(mu, cov, lower, upper)
+
+    rows = []
+    weights = []
+    for target in np.linspace(solver.min_return, solver.top_return, num_points):
+        portfolio = _portfolio(solver.solve(target), mu, cov, risk_free_rate)
+        rows.append((portfolio['return'], portfolio['risk'], portfolio['sharpe']))
+        weights.append(portfolio['weights'])
+
+    frontier = pd.concat([
+        pd.DataFrame(rows, columns=['return', 'risk', 'sharpe']),
+        pd.DataFrame(np.array(weights), columns=names),
+    ], axis=1)
+
+    return {
+        'frontier': frontier,
+        'min_variance': _portfolio(solver.min_variance, mu, cov, risk_free_rate),
+        'max_sharpe': _max_sharpe(solver, risk_free_rate, 1e-9),
+        'max_return': _portfolio(solver.max_return, mu, cov, risk_free_rate),
+    }
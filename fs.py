@@ -1,25 +1,79 @@
-from vnstock import Vnstock
+import argparse
+
+import instrument
+from response_cache import ResponseCache
+from storage import DataStore
+from warehouse import StatementWarehouse
+
 source = 'VCI' # 'VCI' hoặc 'TCBS'
+symbol = 'VCI'
+
+def fetch_statements(symbol=symbol, source=source, period='year', cache=None):
+    """
+    Fetch the financial statements of one company.
 
-stock = Vnstock().stock(symbol='VCI', source=source)
-# Bảng cân đối kế toán - năm (period='quarter')
-BalanceSheet = stock.finance.balance_sheet(period='year', lang='vi', dropna=True)
+    Parameters:
+    -----------
+    symbol : str
+        Company symbol (default: 'VCI')
+    source : str
+        Data source, 'VCI' or 'TCBS' (default: 'VCI')
+    period : str
+        'year' or 'quarter' (default: 'year')
+    cache : response_cache.ResponseCache, optional
+        Serve statements from this cache while they are fresh (default: None)
 
-IncomeStatement = stock.finance.income_statement(period='year', lang='vi', dropna=True)
-# Lưu chuyển tiền tệ
-CashFlow = stock.finance.cash_flow(period='year', dropna=True)
-# Chỉ số tài chính
-Ratio = stock.finance.ratio(period='year', lang='vi', dropna=True)
+    Returns:
+    --------
+    dict
+        'BalanceSheet', 'IncomeStatement', 'CashFlow' and 'Ratio' DataFrames
+    """
+    from vnstock import Vnstock
 
-def save_to_csv():
-    BalanceSheet.to_csv('BalanceSheet.csv', index=False)
-    IncomeStatement.to_csv('IncomeStatement.csv', index=False)
-    CashFlow.to_csv('CashFlow.csv', index=False)
-    Ratio.to_csv('Ratio.csv', index=False)
-#save_to_csv()
+    stock = Vnstock().stock(symbol=symbol, source=source)
+    finance = instrument.traced(stock.finance, 'finance', source=source, symbol=symbol)
+    if cache is not None:
+        finance = cache.wrap(finance, source, symbol)
+    return {
+        # Bảng cân đối kế toán - năm (period='quarter')
+        'BalanceSheet': finance.balance_sheet(period=period, lang='vi', dropna=True),
+        'IncomeStatement': finance.income_statement(period=period, lang='vi', dropna=True),
+        # Lưu chuyển tiền tệ
+        'CashFlow': finance.cash_flow(period=period, dropna=True),
+        # Chỉ số tài chính
+        'Ratio': finance.ratio(period=period, lang='vi', dropna=True),
+    }
 
-#-------------------------------------------------
+def save_statements(statements, symbol=symbol, store=None):
+    """Save the statements to the data store, partitioned by symbol."""
+    store = store or DataStore()
+    for name, frame in statements.items():
+        store.write(f'finance/{name}', frame.assign(symbol=symbol), partition_cols=['symbol'])
 
+def save_to_csv(statements):
+    """Explicitly export the statements to CSV files."""
+    store = DataStore()
+    for name, frame in statements.items():
+        store.export_csv(frame, f'{name}.csv')
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch and save a company's financial statements.")
+    parser.add_argument('symbol', nargs='?', default=symbol, help="Company symbol")
+    parser.add_argument('--source', default=source, help="Data source: VCI or TCBS")
+    parser.add_argument('--period', default='year', choices=['year', 'quarter'])
+    parser.add_argument('--csv', action='store_true', help="Also export CSV copies")
+    parser.add_argument('--no-cache', action='store_true', help="Always refetch instead of using the response cache")
+    parser.add_argument('--warehouse', action='store_true', help="Also add the statements to the statement warehouse")
+    args = parser.parse_args(argv)
 
+    cache = None if args.no_cache else ResponseCache()
+    statements = fetch_statements(args.symbol, args.source, args.period, cache)
+    save_statements(statements, args.symbol)
+    if args.warehouse:
+        StatementWarehouse().ingest(args.symbol, statements)
+    if args.csv:
+        save_to_csv(statements)
+    return statements
 
+if __name__ == "__main__":
+    main()
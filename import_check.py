@@ -0,0 +1,133 @@
+"""
+Import Budget Check
+
+This script imports each library module in a fresh interpreter with network
+access blocked and fails if an import opens a connection, pulls in vnstock,
+or takes longer than the time budget. Run it after changing module-level code:
+
+    python import_check.py
+"""
+
+import json
+import subprocess
+import sys
+
+# Modules that must stay cheap to import
+MODULES = [
+    'assembly',
+    'backfill',
+    'bars',
+    'benchmarks',
+    'cache',
+    'calculations',
+    'company_collector',
+    'company_tcbs',
+    'company_vci',
+    'ex',
+    'fake_vnstock',
+    'fetcher',
+    'frontier',
+    'fs',
+    'Gold',
+    'indicators',
+    'instrument',
+    'price_board',
+    'price_matrix',
+    'providers',
+    'ratelimit',
+    'response_cache',
+    'scheduler',
+    'screener',
+    'screener_index',
+    'snapshots',
+    'statement_refresh',
+    'stats',
+    'storage',
+    'strategies',
+    'test',
+    'ticks',
+    'trading_calendar',
+    'warehouse',
+]
+
+# Seconds allowed for importing one module, including pandas/numpy
+IMPORT_BUDGET_SECONDS = 3.0
+
+_CHILD = r'''
+import json
+import socket
+import sys
+import time
+
+network_calls = []
+
+def _blocked(*args, **kwargs):
+    network_calls.append(repr(args[:2]))
+    raise OSError("network access during import")
+
+socket.socket.connect = _blocked
+socket.socket.connect_ex = _blocked
+socket.create_connection = _blocked
+socket.getaddrinfo = _blocked
+
+started = time.perf_counter()
+error = None
+try:
+    __import__(sys.argv[1])
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+seconds = time.perf_counter() - started
+
+print(json.dumps({
+    'seconds': seconds,
+    'network_calls': network_calls,
+    'vnstock_imported': 'vnstock' in sys.modules,
+    'error': error,
+}))
+'''
+
+
+def check_module(module):
+    """
+    Import one module in a child interpreter.
+
+    Returns:
+    --------
+    dict
+        'seconds', 'network_calls', 'vnstock_imported' and 'error' for the import
+    """
+    completed = subprocess.run(
+        [sys.executable, '-c', _CHILD, module],
+        capture_output=True, text=True, check=False,
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {'seconds': None, 'network_calls': [], 'vnstock_imported': False,
+                'error': completed.stderr.strip() or 'child interpreter failed'}
+    return json.loads(lines[-1])
+
+
+def main(modules=MODULES, budget=IMPORT_BUDGET_SECONDS):
+    failures = 0
+    for module in modules:
+        result = check_module(module)
+        problems = []
+        if result['error']:
+            problems.append(result['error'])
+        if result['network_calls']:
+            problems.append(f"{len(result['network_calls'])} network calls")
+        if result['vnstock_imported']:
+            problems.append("imports vnstock")
+        if result['seconds'] is not None and result['seconds'] > budget:
+            problems.append(f"over the {budget:.1f}s budget")
+
+        seconds = f"{result['seconds']:.3f}s" if result['seconds'] is not None else "-"
+        status = "FAIL" if problems else "ok"
+        print(f"{status:4} {module:15} {seconds:>8}  {'; '.join(problems)}")
+        failures += bool(problems)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
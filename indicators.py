@@ -0,0 +1,484 @@
+"""
+Technical Indicator Engine Module
+
+This module recomputes the screener's technical fields (price_vs_sma*,
+vol_vs_sma*, rsi14, macd_histogram, bolling_band_signal, consecutive up/down
+days, price growth, 52-week breakouts, ...) locally for every symbol at once
+from stored daily bars. Prices are held as time x symbols matrices and every
+indicator is computed for the whole matrix in one vectorized step.
+
+After the initial computation, update() adds one new bar for all symbols and
+only computes the new row (EMA-based indicators carry their state, window-based
+ones read the last few hundred rows), so a live process does not recompute
+years of history. snapshot(date) rebuilds a screener-like frame for any past
+date, for backtesting strategies from strategies.py.
+
+Text fields use the same Vietnamese labels as the synthetic screener snapshots
+in screener_index.py; percent fields are in percent.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import price_matrix
+from assembly import align_histories
+from screener_index import _ABOVE, _BELOW, _VOL_ABOVE, _VOL_BELOW
+
+PRICE_SMA_WINDOWS = (5, 10, 20, 50, 100)
+VOLUME_SMA_WINDOWS = (5, 10, 20, 50)
+TRADING_VALUE_WINDOWS = (5, 10, 20)
+# Bars in a week and a month for price_growth_1w / price_growth_1m
+GROWTH_PERIODS = {'price_growth_1w': 5, 'price_growth_1m': 21}
+RSI_PERIOD = 14
+MACD_SPANS = (12, 26, 9)
+# One of PRICE_SMA_WINDOWS, whose SMA is the middle band
+BOLLINGER_WINDOW = 20
+BOLLINGER_WIDTH = 2.0
+WEEKS_52_BARS = 250
+
+# Rows update() needs to look back for window-based indicators
+LOOKBACK_ROWS = WEEKS_52_BARS + 1
+# Spare rows allocated for update() at a time (about a year of daily bars)
+GROW_ROWS = 256
+
+RSI_STATUS = {'overbought': 'Quá mua', 'oversold': 'Quá bán', 'neutral': 'Trung tính'}
+BOLLINGER_SIGNALS = {'above': 'Vượt dải trên', 'below': 'Dưới dải dưới', 'inside': 'Trong dải'}
+
+
+def _rolling(values, window, how='mean'):
+    """
+    Rolling aggregate down each column of a time x symbols matrix.
+
+    The columns are stacked into one series separated by `window` missing
+    rows, so pandas makes a single pass instead of one per symbol; a window
+    that reaches into the padding has too few values and is missing, exactly
+    as at the start of each column.
+    """
+    num_rows, num_columns = values.shape
+    padded = np.full((num_rows + window, num_columns), np.nan)
+    padded[window:] = values
+    rolling = pd.Series(padded.ravel(order='F')).rolling(window, min_periods=window)
+    result = rolling.std(ddof=0) if how == 'std' else getattr(rolling, how)()
+    return result.to_numpy().reshape(padded.shape, order='F')[window:]
+
+
+def _streak(condition):
+    """Length of the run of True values ending at each row, per column."""
+    counts = np.cumsum(condition, axis=0)
+    resets = np.maximum.accumulate(np.where(condition, 0, counts), axis=0)
+    return (counts - resets).astype(float)
+
+
+def _ema_step(previous, value, alpha):
+    # Same as pandas ewm(adjust=False): the first valid value starts the
+    # average and missing values leave it unchanged
+    updated = np.where(np.isnan(previous), value, previous + alpha * (value - previous))
+    return np.where(np.isnan(value), previous, updated)
+
+
+def _ewm(values, alpha):
+    """Exponential moving average down each column, one row at a time."""
+    result = np.empty_like(values)
+    previous = np.full(values.shape[1], np.nan)
+    for row, value in enumerate(values):
+        previous = result[row] = _ema_step(previous, value, alpha)
+    return result
+
+
+class IndicatorEngine:
+    """
+    Screener indicators for many symbols computed from daily bars.
+
+    Parameters:
+    -----------
+    close : pandas.DataFrame
+        Close prices, indexed by time with one column per symbol
+    volume : pandas.DataFrame
+        Volumes with the same shape
+    high, low : pandas.DataFrame, optional
+        Highs and lows for the 52-week breakout fields (default: close)
+    """
+
+    def __init__(self, close, volume, high=None, low=None):
+        close = close.sort_index()
+        self.symbols = list(close.columns)
+        self._times = list(close.index)
+        raw = {
+            'close': close,
+            'volume': volume.reindex(index=close.index, columns=self.symbols),
+            'high': (high if high is not None else close).reindex(index=close.index, columns=self.symbols),
+            'low': (low if low is not None else close).reindex(index=close.index, columns=self.symbols),
+        }
+        # Suspended days keep the last price with no volume; rows before a
+        # listing stay missing
+        filled = raw['close'].ffill()
+        listed = filled.notna()
+        self._length = len(close)
+        self._capacity = self._length + GROW_ROWS
+        self._arrays = {}
+        for name, frame in raw.items():
+            values = frame.ffill() if name != 'volume' else frame.fillna(0).where(listed)
+            self._store(name, values.to_numpy(dtype=float))
+        self._compute_all()
+
+    @classmethod
+    def from_histories(cls, all_historical_data):
+        """
+        Build from per-symbol bars, e.g. the results of fetcher.fetch_histories.
+
+        Parameters:
+        -----------
+        all_historical_data : dict
+            Mapping of symbol to a DataFrame with 'time', 'close', 'volume' and
+            optionally 'high'/'low' columns
+        """
+        aligned = align_histories(all_historical_data)
+        fields = set(aligned.columns.get_level_values(1))
+        frames = {field: aligned.xs(field, axis=1, level=1) for field in ('close', 'volume', 'high', 'low')
+                  if field in fields}
+        return cls(frames['close'], frames['volume'], frames.get('high'), frames.get('low'))
+
+    @classmethod
+    def from_history_cache(cls, history_cache, symbols, start, end):
+        """
+        Build from the daily bars of a cache.HistoryCache; only ranges not
+        stored yet are downloaded.
+        """
+        return cls.from_histories({symbol: history_cache.history(symbol, start, end) for symbol in symbols})
+
+    @classmethod
+    def from_price_matrix(cls, root=None, start=None, end=None, symbols=None):
+        """
+        Build from the close and volume matrices written by price_matrix.py,
+        without reloading or re-aligning per-symbol bars.
+        """
+        root = root or price_matrix.DEFAULT_MATRIX_DIR
+        close = price_matrix.open_matrix(root, 'close').frame(start, end, symbols)
+        volume = price_matrix.open_matrix(root, 'volume').frame(start, end, symbols)
+        if not (close.index.equals(volume.index) and close.columns.equals(volume.columns)):
+            raise ValueError(f"The close and volume matrices under {root} are not aligned; rebuild them")
+        return cls(close, volume)
+
+    def _store(self, name, values):
+        array = np.full((self._capacity, len(self.symbols)), np.nan)
+        array[:len(values)] = values
+        self._arrays[name] = array
+
+    def _column(self, name):
+        return self._arrays[name][:self._length]
+
+    def _compute_all(self):
+        close = self._column('close')
+        volume = self._column('volume')
+        results = {}
+
+        for window in PRICE_SMA_WINDOWS:
+            results[f'sma{window}'] = _rolling(close, window)
+        for window in VOLUME_SMA_WINDOWS:
+            results[f'vol_sma{window}'] = _rolling(volume, window)
+        for window in TRADING_VALUE_WINDOWS:
+            results[f'avg_trading_value_{window}d'] = _rolling(close * volume, window)
+
+        change = np.full_like(close, np.nan)
+        change[1:] = close[1:] - close[:-1]
+
+        # Wilder's RSI
+        alpha = 1.0 / RSI_PERIOD
+        results['avg_gain'] = _ewm(np.clip(change, 0, None), alpha)
+        results['avg_loss'] = _ewm(np.clip(-change, 0, None), alpha)
+        results['rsi_count'] = np.cumsum(~np.isnan(change), axis=0).astype(float)
+
+        fast, slow, signal = MACD_SPANS
+        results['ema_fast'] = _ewm(close, 2.0 / (fast + 1))
+        results['ema_slow'] = _ewm(close, 2.0 / (slow + 1))
+        results['macd_signal'] = _ewm(results['ema_fast'] - results['ema_slow'], 2.0 / (signal + 1))
+
+        results['bb_std'] = _rolling(close, BOLLINGER_WINDOW, 'std')
+
+        results['num_increase_continuous_day'] = _streak(np.nan_to_num(change) > 0)
+        results['num_decrease_continuous_day'] = _streak(np.nan_to_num(change) < 0)
+
+        prior_high = np.full_like(close, np.nan)
+        prior_low = np.full_like(close, np.nan)
+        prior_high[1:] = self._column('high')[:-1]
+        prior_low[1:] = self._column('low')[:-1]
+        results['high_52w'] = _rolling(prior_high, WEEKS_52_BARS, 'max')
+        results['low_52w'] = _rolling(prior_low, WEEKS_52_BARS, 'min')
+
+        for name, values in results.items():
+            self._store(name, values)
+
+    def _grow(self):
+        self._capacity += GROW_ROWS
+        for name, array in self._arrays.items():
+            grown = np.full((self._capacity, array.shape[1]), np.nan)
+            grown[:self._length] = array[:self._length]
+            self._arrays[name] = grown
+
+    def update(self, close, volume, high=None, low=None, time=None):
+        """
+        Add one bar for every symbol and compute only the new row.
+
+        Parameters:
+        -----------
+        close, volume : pandas.Series or dict
+            Values indexed by symbol; missing symbols keep their last price
+            with zero volume
+        high, low : pandas.Series or dict, optional
+            Highs and lows (default: close)
+        time : optional
+            Time of the bar (default: the previous time plus one day)
+
+        Returns:
+        --------
+        pandas.DataFrame
+            The screener snapshot for the new bar
+        """
+        if self._length == self._capacity:
+            self._grow()
+        row = self._length
+
+        def values(series, default=None):
+            if series is None:
+                return default
+            return pd.Series(series, dtype=float).reindex(self.symbols).to_numpy()
+
+        new_close = values(close)
+        prev_close = self._arrays['close'][row - 1] if row else np.full(len(self.symbols), np.nan)
+        listed = ~np.isnan(new_close) | ~np.isnan(prev_close)
+        new_close = np.where(np.isnan(new_close), prev_close, new_close)
+        new_volume = np.where(listed, np.nan_to_num(values(volume)), np.nan)
+        new_high = values(high, new_close)
+        new_low = values(low, new_close)
+        new_high = np.where(np.isnan(new_high), new_close, new_high)
+        new_low = np.where(np.isnan(new_low), new_close, new_low)
+
+        arrays = self._arrays
+        arrays['close'][row] = new_close
+        arrays['volume'][row] = new_volume
+        arrays['high'][row] = new_high
+        arrays['low'][row] = new_low
+        self._length += 1
+        self._times.append(time if time is not None else pd.Timestamp(self._times[-1]) + pd.Timedelta(days=1))
+
+        start = max(0, self._length - LOOKBACK_ROWS)
+        recent_close = arrays['close'][start:self._length]
+        recent_volume = arrays['volume'][start:self._length]
+
+        def window_mean(values, window):
+            if len(values) < window:
+                return np.full(values.shape[1], np.nan)
+            return values[-window:].mean(axis=0)
+
+        for window in PRICE_SMA_WINDOWS:
+            arrays[f'sma{window}'][row] = window_mean(recent_close, window)
+        for window in VOLUME_SMA_WINDOWS:
+            arrays[f'vol_sma{window}'][row] = window_mean(recent_volume, window)
+        for window in TRADING_VALUE_WINDOWS:
+            arrays[f'avg_trading_value_{window}d'][row] = window_mean(recent_close * recent_volume, window)
+
+        change = new_close - prev_close
+        valid_change = ~np.isnan(change)
+        alpha = 1.0 / RSI_PERIOD
+
+        def last(name):
+            return arrays[name][row - 1] if row else np.full(len(self.symbols), np.nan)
+
+        arrays['avg_gain'][row] = _ema_step(last('avg_gain'), np.clip(change, 0, None), alpha)
+        arrays['avg_loss'][row] = _ema_step(last('avg_loss'), np.clip(-change, 0, None), alpha)
+        arrays['rsi_count'][row] = np.nan_to_num(last('rsi_count')) + valid_change
+
+        fast, slow, signal = MACD_SPANS
+        arrays['ema_fast'][row] = _ema_step(last('ema_fast'), new_close, 2.0 / (fast + 1))
+        arrays['ema_slow'][row] = _ema_step(last('ema_slow'), new_close, 2.0 / (slow + 1))
+        macd = arrays['ema_fast'][row] - arrays['ema_slow'][row]
+        arrays['macd_signal'][row] = _ema_step(last('macd_signal'), macd, 2.0 / (signal + 1))
+
+        if len(recent_close) >= BOLLINGER_WINDOW:
+            arrays['bb_std'][row] = recent_close[-BOLLINGER_WINDOW:].std(axis=0)
+        else:
+            arrays['bb_std'][row] = np.nan
+
+        up = np.nan_to_num(change) > 0
+        down = np.nan_to_num(change) < 0
+        arrays['num_increase_continuous_day'][row] = np.where(up, np.nan_to_num(last('num_increase_continuous_day')) + 1, 0)
+        arrays['num_decrease_continuous_day'][row] = np.where(down, np.nan_to_num(last('num_decrease_continuous_day')) + 1, 0)
+
+        prior_high = arrays['high'][start:self._length - 1]
+        prior_low = arrays['low'][start:self._length - 1]
+        for name, prior, reduce in (('high_52w', prior_high, np.nanmax), ('low_52w', prior_low, np.nanmin)):
+            window = prior[-WEEKS_52_BARS:]
+            enough = (~np.isnan(window)).sum(axis=0) >= WEEKS_52_BARS
+            with np.errstate(all='ignore'):
+                reduced = reduce(window, axis=0) if len(window) else np.full(len(self.symbols), np.nan)
+            arrays[name][row] = np.where(enough, reduced, np.nan)
+
+        return self.snapshot(self._times[-1])
+
+    @property
+    def times(self):
+        """Bar times, oldest first."""
+        return list(self._times)
+
+    def _row(self, date):
+        if date is None:
+            return self._length - 1
+        position = pd.Index(self._times).get_indexer([pd.Timestamp(date)])[0]
+        if position < 0:
+            raise KeyError(f"No bar for {date}")
+        return position
+
+    def snapshot(self, date=None):
+        """
+        Build the screener fields for one bar.
+
+        Parameters:
+        -----------
+        date : optional
+            Bar time (default: the latest bar)
+
+        Returns:
+        --------
+        pandas.DataFrame
+            One row per symbol with a 'ticker' column and screener field names
+        """
+        row = self._row(date)
+
+        def get(name):
+            return self._arrays[name][row]
+
+        close = get('close')
+        volume = get('volume')
+
+        def growth(periods):
+            if row < periods:
+                return np.full(len(self.symbols), np.nan)
+            return (close / self._arrays['close'][row - periods] - 1) * 100
+
+        def labels(above, valid, above_label, below_label):
+            result = np.where(above, above_label, below_label).astype(object)
+            result[~valid] = None
+            return result
+
+        data = {
+            'ticker': self.symbols,
+            'price': close,
+            'volume': volume,
+            'change_percent': growth(1),
+            'prev_1d_growth_pct': growth(1),
+        }
+        for window in PRICE_SMA_WINDOWS:
+            sma = get(f'sma{window}')
+            data[f'price_vs_sma{window}'] = labels(close > sma, ~np.isnan(sma),
+                                                   f'{_ABOVE}{window}', f'{_BELOW}{window}')
+        for window in VOLUME_SMA_WINDOWS:
+            sma = get(f'vol_sma{window}')
+            data[f'vol_vs_sma{window}'] = labels(volume > sma, ~np.isnan(sma),
+                                                 f'{_VOL_ABOVE}{window}', f'{_VOL_BELOW}{window}')
+        for window in TRADING_VALUE_WINDOWS:
+            data[f'avg_trading_value_{window}d'] = get(f'avg_trading_value_{window}d')
+
+        avg_gain, avg_loss = get('avg_gain'), get('avg_loss')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+        rsi[(get('rsi_count') < RSI_PERIOD) | np.isnan(avg_gain)] = np.nan
+        data['rsi14'] = rsi
+        status = np.where(rsi > 70, RSI_STATUS['overbought'],
+                          np.where(rsi < 30, RSI_STATUS['oversold'], RSI_STATUS['neutral'])).astype(object)
+        status[np.isnan(rsi)] = None
+        data['rsi14_status'] = status
+
+        data['macd_histogram'] = get('ema_fast') - get('ema_slow') - get('macd_signal')
+
+        middle = get(f'sma{BOLLINGER_WINDOW}')
+        width = BOLLINGER_WIDTH * get('bb_std')
+        band = np.where(close > middle + width, BOLLINGER_SIGNALS['above'],
+                        np.where(close < middle - width, BOLLINGER_SIGNALS['below'],
+                                 BOLLINGER_SIGNALS['inside'])).astype(object)
+        band[np.isnan(width)] = None
+        data['bolling_band_signal'] = band
+
+        data['num_increase_continuous_day'] = get('num_increase_continuous_day')
+        data['num_decrease_continuous_day'] = get('num_decrease_continuous_day')
+        for name, periods in GROWTH_PERIODS.items():
+            data[name] = growth(periods)
+
+        high_52w, low_52w = get('high_52w'), get('low_52w')
+        data['price_break_out52_week'] = np.where(np.isnan(high_52w), False, get('high') > high_52w)
+        data['price_wash_out52_week'] = np.where(np.isnan(low_52w), False, get('low') < low_52w)
+        return pd.DataFrame(data)
+
+    def snapshots(self, dates=None):
+        """
+        Rebuild screener snapshots for many past bars, e.g. for backtesting.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Snapshots stacked with a 'date' column (default: every bar)
+        """
+        dates = self._times if dates is None else dates
+        frames = [self.snapshot(date).assign(date=pd.Timestamp(date)) for date in dates]
+        return pd.concat(frames, ignore_index=True)
+
+
+def synthetic_bars(num_symbols=1700, num_days=1250, seed=0):
+    """
+    Random-walk close and volume matrices for benchmarks.
+
+    Returns:
+    --------
+    tuple of (pandas.DataFrame, pandas.DataFrame)
+        close and volume, indexed by business day with one column per symbol
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.bdate_range('2020-01-01', periods=num_days)
+    symbols = [f"T{i:04d}" for i in range(num_symbols)]
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, (num_days, num_symbols)), axis=0))
+    volume = rng.integers(1_000, 1_000_000, (num_days, num_symbols)).astype(float)
+    # Later listings start with missing bars
+    listing = rng.integers(0, num_days // 2, num_symbols) * (rng.random(num_symbols) < 0.2)
+    for column, first in enumerate(listing):
+        close[:first, column] = np.nan
+        volume[:first, column] = np.nan
+    return (pd.DataFrame(close, index=times, columns=symbols),
+            pd.DataFrame(volume, index=times, columns=symbols))
+
+
+def benchmark(num_symbols=1700, num_days=1250):
+    """
+    Time the full computation and one incremental update, and check that the
+    update matches a full recomputation.
+
+    Returns:
+    --------
+    dict
+        Seconds for the full computation, the snapshot and one update
+    """
+    close, volume = synthetic_bars(num_symbols, num_days + 1)
+
+    t0 = time.perf_counter()
+    engine = IndicatorEngine(close.iloc[:-1], volume.iloc[:-1])
+    full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    engine.snapshot()
+    snapshot = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    updated = engine.update(close.iloc[-1], volume.iloc[-1], time=close.index[-1])
+    update = time.perf_counter() - t0
+
+    expected = IndicatorEngine(close, volume).snapshot()
+    pd.testing.assert_frame_equal(updated, expected, check_exact=False, rtol=1e-9)
+
+    return {'full_seconds': full, 'snapshot_seconds': snapshot, 'update_seconds': update}
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"Full computation (1,700 symbols x 5 years): {result['full_seconds']:.2f}s")
+    print(f"Snapshot: {result['snapshot_seconds'] * 1000:.1f} ms")
+    print(f"Incremental update: {result['update_seconds'] * 1000:.1f} ms")
@@ -0,0 +1,496 @@
+"""
+Instrumentation Module
+
+This module times outbound data-source calls (quote.history, screener.stock,
+finance.*, company.*, sjc_gold_price, ...) and the main processing stages
+(merging, returns, simulation, storage), so a slow run shows where the time
+went. Each timed event records its duration, rows and payload bytes of the
+result, errors, retries and cache status; events are aggregated per name into
+latency histograms and can be written as JSON lines as they happen.
+
+Instrumentation is off by default. Disabled, timed functions cost one flag
+check per call and traced() returns its target unchanged. Enable it in code
+or for a whole run with the environment variable:
+
+    instrument.enable('logs/events.jsonl')      # or enable() for metrics only
+    ...
+    print(instrument.snapshot())
+    instrument.write_snapshot('logs/metrics.json')
+
+    VNSTOCK_FETCH_INSTRUMENT=logs/events.jsonl python test.py
+
+With the environment variable, the metrics snapshot is written next to the
+log ('logs/events.metrics.json') when the process exits.
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Environment variable enabling instrumentation at import: a log path, or 1
+INSTRUMENT_ENV = 'VNSTOCK_FETCH_INSTRUMENT'
+
+# Upper bounds of the latency histogram buckets, in seconds; the last bucket
+# holds everything slower
+BUCKET_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_COLUMNS = ['count', 'errors', 'total_seconds', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+                  'rows', 'bytes', 'retries', 'cache_hits', 'cache_stale', 'cache_misses']
+
+_enabled = False
+_metrics = {}
+_lock = threading.Lock()
+_local = threading.local()
+_log_file = None
+
+
+class _Metric:
+    """Aggregated events of one name."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.rows = 0
+        self.bytes = 0
+        self.retries = 0
+        self.cache = {}
+
+    def add(self, seconds, rows, nbytes, error, retries, cache):
+        if seconds is not None:
+            self.count += 1
+            self.total += seconds
+            self.min = min(self.min, seconds)
+            self.max = max(self.max, seconds)
+            bucket = 0
+            while bucket < len(BUCKET_BOUNDS) and seconds > BUCKET_BOUNDS[bucket]:
+                bucket += 1
+            self.buckets[bucket] += 1
+        self.errors += bool(error)
+        self.rows += rows or 0
+        self.bytes += nbytes or 0
+        self.retries += retries or 0
+        if cache:
+            self.cache[cache] = self.cache.get(cache, 0) + 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, capped at the maximum."""
+        if not self.count:
+            return float('nan')
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS + (self.max,), self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        cache = dict(self.cache)
+        stale = sum(count for status, count in cache.items() if status.startswith('stale'))
+        hits = sum(count for status, count in cache.items() if status.endswith('hit')) - stale
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_seconds': self.total,
+            'mean_ms': self.total / self.count * 1000 if self.count else float('nan'),
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'cache_hits': hits,
+            'cache_stale': stale,
+            'cache_misses': cache.get('miss', 0),
+            'cache': cache,
+            'buckets': list(self.buckets),
+        }
+
+
+def _payload(value):
+    """Rows and in-memory bytes of a call result; (None, None) if unknown."""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return len(value), int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, np.ndarray):
+        return (len(value) if value.ndim else 1), value.nbytes
+    if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+        sizes = [_payload(frame) for frame in value.values()]
+        return sum(rows for rows, _ in sizes), sum(nbytes for _, nbytes in sizes)
+    return None, None
+
+
+def record(name, seconds=None, rows=None, nbytes=None, error=None, retries=None, cache=None, **tags):
+    """
+    Add one event that was timed by the caller.
+
+    Parameters:
+    -----------
+    name : str
+        Metric name, e.g. 'quote.history' or 'ratelimit.wait'
+    seconds : float, optional
+        Duration; None records counters only (e.g. a retry count)
+    rows, nbytes : int, optional
+        Rows and bytes of the result
+    error : str, optional
+        Error message of a failed event
+    retries : int, optional
+        Extra attempts made
+    cache : str, optional
+        Cache status: 'hit', 'memory_hit', 'disk_hit', 'stale_hit' or 'miss'
+    **tags
+        Extra fields written to the event log, e.g. symbol='ACB'
+    """
+    if not _enabled:
+        return
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = _Metric()
+        metric.add(seconds, rows, nbytes, error, retries, cache)
+        if _log_file is not None:
+            event = {'time': time.time(), 'name': name, 'seconds': seconds, 'rows': rows, 'bytes': nbytes,
+                     'error': error, 'retries': retries, 'cache': cache, 'thread': threading.current_thread().name}
+            event.update(tags)
+            _log_file.write(json.dumps({key: value for key, value in event.items() if value is not None},
+                                       default=str) + '\n')
+
+
+class Span:
+    """One timed event, recorded when its with block exits."""
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.fields = dict(tags)
+        self._start = None
+
+    def annotate(self, **fields):
+        """Set fields of the event, e.g. rows=10, cache='hit', retries=1."""
+        self.fields.update(fields)
+
+    def result(self, value):
+        """Take rows and bytes from a call result (DataFrame, dict of frames, ...)."""
+        rows, nbytes = _payload(value)
+        if rows is not None:
+            self.fields.setdefault('rows', rows)
+            self.fields.setdefault('nbytes', nbytes)
+        return value
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        _local.stack.pop()
+        if exc is not None:
+            self.fields['error'] = f'{exc_type.__name__}: {exc}'
+        record(self.name, seconds, **self.fields)
+        return False
+
+
+class _NoSpan:
+    """Span used while instrumentation is disabled."""
+
+    def annotate(self, **fields):
+        pass
+
+    def result(self, value):
+        return value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **tags):
+    """
+    Time a block of code.
+
+        with instrument.span('warehouse.ingest', statements=4) as s:
+            rows = ...
+            s.annotate(rows=len(rows))
+
+    Returns:
+    --------
+    Span
+        A span recorded on exit (errors included), or a no-op when disabled
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return Span(name, tags)
+
+
+def annotate(**fields):
+    """Set fields of the innermost span of the current thread, if any."""
+    if not _enabled:
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].annotate(**fields)
+
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function, with rows and bytes of its result.
+
+    Parameters:
+    -----------
+    name : str, optional
+        Metric name (default: 'module.function')
+    """
+    def decorate(fn):
+        label = name or f'{fn.__module__}.{fn.__qualname__}'
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(label, {}) as s:
+                return s.result(fn(*args, **kwargs))
+        return wrapper
+    return decorate
+
+
+class TracedEndpoints:
+    """
+    Proxy timing every method call of a data-source object as
+    '{prefix}.{method}', e.g. 'finance.balance_sheet'.
+    """
+
+    def __init__(self, target, prefix, tags):
+        self._target = target
+        self._prefix = prefix
+        self._tags = tags
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            with span(f'{self._prefix}.{name}', **self._tags) as s:
+                return s.result(attr(*args, **kwargs))
+        return call
+
+
+def traced(target, prefix, **tags):
+    """
+    Time the method calls of a vnstock object (Quote, stock.finance,
+    stock.company, stock.screener, ...).
+
+    Parameters:
+    -----------
+    target : object
+        Object whose public methods are data-source calls
+    prefix : str
+        Metric name prefix, e.g. 'quote'
+    **tags
+        Extra fields for the event log, e.g. source='VCI', symbol='ACB'
+
+    Returns:
+    --------
+    object
+        A TracedEndpoints proxy, or target itself when disabled
+    """
+    if not _enabled:
+        return target
+    return TracedEndpoints(target, prefix, tags)
+
+
+def enabled():
+    """True while instrumentation is on."""
+    return _enabled
+
+
+def enable(log_path=None):
+    """
+    Start recording events.
+
+    Parameters:
+    -----------
+    log_path : str, optional
+        Append every event to this file as one JSON object per line
+        (default: None, metrics only)
+    """
+    global _enabled, _log_file
+    with _lock:
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+            _log_file = open(log_path, 'a', encoding='utf-8', buffering=1)
+        _enabled = True
+
+
+def disable():
+    """Stop recording events and close the event log; metrics are kept."""
+    global _enabled, _log_file
+    with _lock:
+        _enabled = False
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+
+def reset():
+    """Drop every aggregated metric."""
+    with _lock:
+        _metrics.clear()
+
+
+def metrics():
+    """
+    Return the aggregated metrics with their histogram buckets.
+
+    Returns:
+    --------
+    dict
+        Name -> metric dict (METRIC_COLUMNS plus 'cache' status counts and
+        'buckets', counts per BUCKET_BOUNDS bucket)
+    """
+    with _lock:
+        return {name: metric.to_dict() for name, metric in sorted(_metrics.items())}
+
+
+def snapshot():
+    """
+    Return the aggregated metrics as a table.
+
+    Percentiles are read from the histogram buckets, so they are the upper
+    bound of the bucket holding the percentile.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per metric name with METRIC_COLUMNS
+    """
+    rows = metrics()
+    table = pd.DataFrame([{column: row[column] for column in METRIC_COLUMNS} for row in rows.values()],
+                         columns=METRIC_COLUMNS, index=pd.Index(list(rows), name='name'))
+    return table
+
+
+def write_snapshot(path):
+    """
+    Write the aggregated metrics and histograms to a JSON file.
+
+    Returns:
+    --------
+    dict
+        The written snapshot
+    """
+    data = {'created': pd.Timestamp.now().isoformat(timespec='seconds'), 'bucket_bounds': list(BUCKET_BOUNDS),
+            'metrics': metrics()}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, path)
+    return data
+
+
+def read_snapshot(path):
+    """Read a snapshot file written by write_snapshot() as a METRIC_COLUMNS table."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    rows = data['metrics']
+    return pd.DataFrame([{column: row[column] for column in METRIC_COLUMNS} for row in rows.values()],
+                        columns=METRIC_COLUMNS, index=pd.Index(list(rows), name='name'))
+
+
+def _enable_from_environment():
+    value = os.environ.get(INSTRUMENT_ENV)
+    if not value or value == '0':
+        return
+    log_path = None if value == '1' else value
+    enable(log_path)
+    snapshot_path = f'{os.path.splitext(log_path)[0]}.metrics.json' if log_path else 'instrument.metrics.json'
+    atexit.register(write_snapshot, snapshot_path)
+
+
+def benchmark(calls=200_000):
+    """
+    Measure the cost of a timed function per call, disabled and enabled.
+
+    Returns:
+    --------
+    dict
+        Nanoseconds per call for the plain function, the timed function while
+        disabled, and the timed function while enabled (metrics only)
+    """
+    def plain(x):
+        return x
+
+    global _enabled, _log_file
+    decorated = timed('instrument.benchmark')(plain)
+
+    def per_call(fn):
+        t0 = time.perf_counter()
+        for i in range(calls):
+            fn(i)
+        return (time.perf_counter() - t0) / calls * 1e9
+
+    # Set the event log aside rather than closing it, and put it back after
+    with _lock:
+        was_enabled, log_file = _enabled, _log_file
+        _enabled, _log_file = False, None
+    try:
+        result = {'plain_ns': per_call(plain), 'disabled_ns': per_call(decorated)}
+        _enabled = True
+        result['enabled_ns'] = per_call(decorated)
+    finally:
+        with _lock:
+            _metrics.pop('instrument.benchmark', None)
+            _enabled, _log_file = was_enabled, log_file
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show an instrumentation metrics snapshot.")
+    parser.add_argument('snapshot', nargs='?', help="Snapshot file written by write_snapshot()")
+    parser.add_argument('--benchmark', action='store_true', help="Measure the per-call overhead instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark or not args.snapshot:
+        result = benchmark()
+        print(f"Plain call: {result['plain_ns']:.0f} ns")
+        print(f"Timed call, disabled: {result['disabled_ns']:.0f} ns")
+        print(f"Timed call, enabled: {result['enabled_ns']:.0f} ns")
+        return result
+    table = read_snapshot(args.snapshot)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.round(1))
+    return table
+
+
+_enable_from_environment()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,7 +25,9 @@ from vnstock import Quote
 #stock.trading.price_board(['ACB'])
 from vnstock import Vnstock
 stock = Vnstock().stock(symbol='ACB', source='VCI')
-stock.quote.history(start='2024-01-01', end='2024-12-31')
+# Lịch sử giá được lưu cục bộ, chỉ tải phần còn thiếu
+from cache import HistoryCache
+HistoryCache(source='VCI').history('ACB', start='2024-01-01', end='2024-12-31')
 #print(stock.quote.history(start='2024-01-01', end='2024-12-31'))
 
 #Giá và khối lượng khớp lệnh
@@ -0,0 +1,513 @@
+"""
+Price Board Poller Module
+
+This module watches the price board (stock.trading.price_board) of a large
+watchlist and passes on only what changed:
+
+- the watchlist is split into as few price_board requests as the source
+  accepts. The poller remembers the largest batch that succeeded and the
+  smallest one the source rejected (an HTTP 4xx status such as 413, which
+  vnstock raises as ConnectionError), splits rejected batches and searches
+  between the two bounds, and now and then retries the rejected size in
+  case the source's limit grew;
+- each response is compared with the previous board column by column, and
+  only rows with a changed value are emitted to subscribers (callbacks, or
+  asyncio queues from queue());
+- polls follow an adaptive schedule: the interval halves while a large
+  share of the board is moving (BUSY_SHARE), grows when it is quiet
+  (QUIET_SHARE) and stretches outside trading hours. Polls with failed
+  batches leave the interval unchanged.
+
+    poller = PriceBoardPoller(watchlist)
+    poller.subscribe(lambda changes: print(changes[['match_price']]))
+    poller.run(until='14:45')
+
+Run `python price_board.py --benchmark` to compare the rows emitted with
+re-processing the full board, against fake_vnstock.
+"""
+
+import argparse
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from ratelimit import get_source_limiter
+
+# Largest number of symbols per price_board request
+DEFAULT_BATCH_SIZE = 500
+
+# Fetches between retries of the smallest rejected batch size
+PROBE_POLLS = 100
+
+# Share of the watchlist changing in one poll above which the interval
+# halves, and below which it grows by half
+BUSY_SHARE = 0.10
+QUIET_SHARE = 0.01
+
+# Continuous trading sessions (local time); outside them the poller waits
+# up to closed_interval seconds between polls
+MARKET_SESSIONS = (('09:00', '11:30'), ('13:00', '14:45'))
+
+# HTTP statuses meaning the request itself was refused (e.g. too many
+# symbols), as opposed to network failures or rate limiting (429). vnstock
+# raises ConnectionError with the status in the message for any non-200
+# response, matched by REJECTION_PATTERN
+REJECTED_STATUSES = (400, 413, 414, 431)
+REJECTION_PATTERN = re.compile(r'không thành công:\s*(\d{3})\s*-')
+
+SYMBOL_COLUMNS = ('symbol', 'ticker')
+
+FAILURE_COLUMNS = ['time', 'symbols', 'error_type', 'error']
+
+
+def _vnstock_board(source):
+    from vnstock import Vnstock
+    trading = Vnstock().stock(symbol='VCI', source=source).trading
+    return instrument.traced(trading, 'trading', source=source).price_board
+
+
+def is_rejection(error):
+    """Whether an error from price_board means the source refused the batch."""
+    if not isinstance(error, OSError):
+        return False
+    match = REJECTION_PATTERN.search(str(error))
+    return match is not None and int(match.group(1)) in REJECTED_STATUSES
+
+
+def normalize_board(board):
+    """
+    Flatten a price_board response to one row per symbol.
+
+    Two-level columns such as ('match', 'match_price') keep their last level
+    when those names are unique, and are joined with '_' otherwise.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Board indexed by symbol
+    """
+    board = board.copy()
+    if isinstance(board.columns, pd.MultiIndex):
+        last = board.columns.get_level_values(-1)
+        board.columns = last if last.is_unique else ['_'.join(map(str, column)) for column in board.columns]
+    symbol_column = next((column for column in board.columns if column in SYMBOL_COLUMNS
+                          or str(column).endswith('_symbol')), None)
+    if symbol_column is None:
+        raise ValueError(f"price_board response has no symbol column: {list(board.columns)}")
+    return board.set_index(symbol_column).rename_axis('symbol')
+
+
+def changed_rows(previous, current):
+    """
+    Compare two boards with the same index and columns, column by column.
+
+    Parameters:
+    -----------
+    previous, current : dict
+        Column -> numpy array, rows aligned
+
+    Returns:
+    --------
+    numpy.ndarray
+        Boolean mask of rows where any value differs (missing == missing)
+    """
+    changed = None
+    for column, new in current.items():
+        old = previous[column]
+        differs = old != new
+        if differs.dtype != bool:
+            differs = np.asarray(differs, dtype=bool)
+        if new.dtype.kind in 'fO' or old.dtype.kind in 'fO':
+            differs &= ~(pd.isna(old) & pd.isna(new))
+        changed = differs if changed is None else changed | differs
+    return changed
+
+
+class PriceBoardPoller:
+    """
+    Polls the price board of a watchlist and emits the rows that changed.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Watchlist
+    source : str
+        Data source (default: 'VCI')
+    batch_size : int
+        Largest number of symbols per price_board request; the poller settles
+        on the largest size the source accepts below it (default:
+        DEFAULT_BATCH_SIZE)
+    min_interval, max_interval : float
+        Bounds of the seconds between polls during trading hours
+        (default: 1.0 and 30.0)
+    closed_interval : float
+        Longest wait outside trading hours (default: 300.0)
+    max_workers : int
+        Batches requested at once (default: 4)
+    rate_limit : float, optional
+        Calls per second to the source, shared with other fetchers using the
+        same source. None disables rate limiting (default: None)
+    board_factory : callable, optional
+        Function (source) -> function(symbols) returning a price_board
+        DataFrame. Defaults to vnstock's stock.trading.price_board.
+    calendar : trading_calendar.TradingCalendar, optional
+        Holidays count as closed days (default: None, weekdays are open)
+    """
+
+    def __init__(self, symbols, source='VCI', batch_size=DEFAULT_BATCH_SIZE, min_interval=1.0, max_interval=30.0,
+                 closed_interval=300.0, max_workers=4, rate_limit=None, board_factory=None, calendar=None):
+        self.symbols = pd.Index(list(dict.fromkeys(symbols)), name='symbol')
+        self.source = source
+        self.max_batch_size = batch_size
+        self.batch_size = batch_size
+        # Largest batch the source accepted and smallest it rejected
+        self._accepted = 0
+        self._rejected = None
+        self._fetches = 0
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.closed_interval = closed_interval
+        self.interval = min_interval
+        self.max_workers = max_workers
+        self.limiter = get_source_limiter(source, rate_limit)
+        self.calendar = calendar
+        self._board_fn = (board_factory or _vnstock_board)(source)
+        self._columns = None
+        self._values = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.failures = []
+        self.counters = {'polls': 0, 'requests': 0, 'rejected_batches': 0, 'failed_batches': 0,
+                         'rows_received': 0, 'rows_emitted': 0}
+
+    def subscribe(self, callback):
+        """Call callback(changes) after each poll with changed rows (a DataFrame indexed by symbol)."""
+        self._subscribers.append(callback)
+
+    def queue(self, loop=None, maxsize=0):
+        """
+        Return an asyncio.Queue receiving the changed rows of each poll.
+
+        The poller may run in another thread; items are put through the
+        loop with call_soon_threadsafe.
+
+        Parameters:
+        -----------
+        loop : asyncio.AbstractEventLoop, optional
+            Loop owning the queue (default: the running loop)
+        maxsize : int
+            Queue size; when full, the oldest change set is dropped (default: 0, unbounded)
+        """
+        loop = loop or asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=maxsize)
+
+        def put(changes):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(changes)
+
+        self.subscribe(lambda changes: loop.call_soon_threadsafe(put, changes))
+        return queue
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def _settle(self):
+        """Batch size between the accepted and rejected bounds (with the lock held)."""
+        if self._rejected is None:
+            self.batch_size = self.max_batch_size
+        elif self._accepted:
+            self.batch_size = max(self._accepted, (self._accepted + self._rejected) // 2)
+        else:
+            self.batch_size = max(1, self._rejected // 2)
+
+    def _fetch_batch(self, batch):
+        """Request one batch, splitting it while the source rejects its size."""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        self._count(requests=1)
+        try:
+            board = normalize_board(self._board_fn(list(batch)))
+        except OSError as e:
+            if len(batch) == 1 or not is_rejection(e):
+                raise
+            with self._lock:
+                self._rejected = min(self._rejected or len(batch), len(batch))
+                self._accepted = min(self._accepted, len(batch) - 1)
+                self._settle()
+                size = self.batch_size
+                self.counters['rejected_batches'] += 1
+            instrument.annotate(rejected_batch=len(batch), error=str(e))
+            return [frame for i in range(0, len(batch), size) for frame in self._fetch_batch(batch[i:i + size])]
+        with self._lock:
+            if len(batch) > self._accepted:
+                self._accepted = len(batch)
+                if self._rejected is not None and self._rejected <= len(batch):
+                    self._rejected = None
+                self._settle()
+        return [board]
+
+    def fetch(self):
+        """
+        Request the board of the whole watchlist, in batches.
+
+        Batches that fail are recorded in failures and left out; their
+        symbols keep their previous values.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Board indexed by symbol (watchlist order, missing rows dropped)
+        """
+        with self._lock:
+            self._fetches += 1
+            # Retry the smallest rejected size now and then: the source's
+            # limit may have grown
+            probe = self._rejected is not None and self._fetches % PROBE_POLLS == 0
+            size = min(self._rejected, self.max_batch_size) if probe else self.batch_size
+        batches = [self.symbols[i:i + size] for i in range(0, len(self.symbols), size)]
+
+        def fetch(batch):
+            try:
+                return self._fetch_batch(batch), None
+            except Exception as e:
+                return [], e
+
+        frames = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches) or 1)) as executor:
+            for batch, (parts, error) in zip(batches, executor.map(fetch, batches)):
+                if error is not None:
+                    self._count(failed_batches=1)
+                    self.failures.append({'time': pd.Timestamp.now(), 'symbols': len(batch),
+                                          'error_type': type(error).__name__, 'error': str(error)})
+                frames.extend(parts)
+        if not frames:
+            return pd.DataFrame(index=self.symbols[:0])
+        board = pd.concat(frames)
+        board = board[~board.index.duplicated(keep='last')]
+        return board.reindex(self.symbols.intersection(board.index, sort=False))
+
+    def diff(self, board):
+        """
+        Update the stored board and return the rows that changed.
+
+        The first board, and any board whose columns differ from the
+        previous one, is emitted in full.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Changed rows of `board`
+        """
+        if board.empty:
+            # Nothing received (e.g. every batch failed): keep the stored board
+            return board
+        positions = self.symbols.get_indexer(board.index)
+        known = positions >= 0
+        board = board[known]
+        positions = positions[known]
+        current = {column: board[column].to_numpy() for column in board.columns}
+        with self._lock:
+            if self._values is None or list(board.columns) != self._columns:
+                self._columns = list(board.columns)
+                self._values = {column: np.full(len(self.symbols), None, dtype=object) for column in self._columns}
+                for column, values in current.items():
+                    if values.dtype.kind != 'O':
+                        self._values[column] = np.full(len(self.symbols), np.nan, dtype=np.float64)
+                previous = None
+            else:
+                previous = {column: stored[positions] for column, stored in self._values.items()}
+            for column, values in current.items():
+                self._values[column][positions] = values
+        if previous is None:
+            return board
+        return board[changed_rows(previous, current)]
+
+    def market_open(self, now=None):
+        """Whether `now` (default: the current local time) is inside a trading session."""
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        if now.weekday() >= 5 or (self.calendar is not None and not self.calendar.is_trading_day(now)):
+            return False
+        clock = now.strftime('%H:%M')
+        return any(start <= clock < end for start, end in MARKET_SESSIONS)
+
+    def poll(self):
+        """
+        Fetch the board, emit the changed rows and schedule the next poll.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Changed rows
+        """
+        failed = self.counters['failed_batches']
+        board = self.fetch()
+        failed = self.counters['failed_batches'] > failed
+        changes = self.diff(board)
+        self._count(polls=1, rows_received=len(board), rows_emitted=len(changes))
+        share = len(changes) / max(len(self.symbols), 1)
+        # Symbols of failed batches were not received rather than unchanged,
+        # so such a poll says nothing about how quiet the board is
+        if not failed:
+            if share > BUSY_SHARE:
+                self.interval = max(self.min_interval, self.interval / 2)
+            elif share < QUIET_SHARE:
+                self.interval = min(self.max_interval, self.interval * 1.5)
+        if len(changes):
+            for callback in self._subscribers:
+                callback(changes)
+        return changes
+
+    def next_wait(self, now=None):
+        """Seconds to wait before the next poll."""
+        if self.market_open(now):
+            return self.interval
+        return self.closed_interval
+
+    def run(self, until=None, cycles=None, clock=None, sleep=time.sleep, verbose=False):
+        """
+        Poll until a time of day, a number of polls or stop().
+
+        Parameters:
+        -----------
+        until : str, optional
+            Local time 'HH:MM' to stop at (default: None)
+        cycles : int, optional
+            Number of polls (default: None, no limit)
+        clock : callable, optional
+            Function returning the current pandas.Timestamp (default: now)
+        sleep : callable
+            Function used to wait between polls (default: time.sleep)
+
+        Returns:
+        --------
+        int
+            Number of polls run
+        """
+        clock = clock or pd.Timestamp.now
+        stop = pd.Timestamp(f"{clock():%Y-%m-%d} {until}") if until else None
+        done = 0
+        while not self._stop.is_set() and (cycles is None or done < cycles) and (stop is None or clock() < stop):
+            started = time.monotonic()
+            changes = self.poll()
+            done += 1
+            if verbose:
+                print(f"Poll {done}: {len(changes)} changed rows, next in {self.next_wait(clock()):.1f}s")
+            wait = max(0.0, self.next_wait(clock()) - (time.monotonic() - started))
+            if sleep is time.sleep:
+                self._stop.wait(wait)
+            else:
+                sleep(wait)
+        return done
+
+    def start(self, **kwargs):
+        """Run the poller in a background thread; arguments are passed to run()."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """Stop a poller started with start()."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def failure_report(self):
+        """Failed batches, as a DataFrame with FAILURE_COLUMNS."""
+        return pd.DataFrame(self.failures, columns=FAILURE_COLUMNS)
+
+    def stats(self):
+        """Return the poll counters and the current batch size and interval."""
+        with self._lock:
+            counters = dict(self.counters)
+        counters['batch_size'] = self.batch_size
+        counters['interval'] = self.interval
+        return counters
+
+
+def benchmark(num_symbols=1600, polls=50, change_rate=0.05, max_board_symbols=200):
+    """
+    Poll a fake board whose source accepts at most max_board_symbols per
+    request, and compare the rows emitted with the full boards received.
+
+    Returns:
+    --------
+    dict
+        Requests, final batch size, rows received and emitted, and the mean
+        seconds per poll
+    """
+    import fake_vnstock
+
+    provider = fake_vnstock.FakeProvider(num_symbols=num_symbols, board_change_rate=change_rate,
+                                         max_board_symbols=max_board_symbols)
+    with fake_vnstock.installed(provider):
+        poller = PriceBoardPoller(provider.symbols)
+        received = []
+        poller.subscribe(received.append)
+        t0 = time.perf_counter()
+        for _ in range(polls):
+            poller.poll()
+        seconds = time.perf_counter() - t0
+
+    # The emitted rows rebuild the last board exactly
+    rebuilt = pd.concat(received)
+    rebuilt = rebuilt[~rebuilt.index.duplicated(keep='last')].reindex(poller.symbols)
+    with fake_vnstock.installed(fake_vnstock.FakeProvider(num_symbols=num_symbols, board_change_rate=0)) as check:
+        check._board = provider._board
+        latest = normalize_board(check.price_board(provider.symbols))
+    assert rebuilt.equals(latest), "emitted rows do not rebuild the board"
+
+    counters = poller.stats()
+    return {
+        'symbols': num_symbols,
+        'polls': polls,
+        'requests': counters['requests'],
+        'rejected_batches': counters['rejected_batches'],
+        'batch_size': counters['batch_size'],
+        'rows_received': counters['rows_received'],
+        'rows_emitted': counters['rows_emitted'],
+        'seconds_per_poll': seconds / polls,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch the price board of a watchlist and print changes.")
+    parser.add_argument('symbols', nargs='*', help="Symbols to watch")
+    parser.add_argument('--source', default='VCI', help="Data source")
+    parser.add_argument('--until', default='14:45', help="Local time to stop polling (HH:MM)")
+    parser.add_argument('--min-interval', type=float, default=1.0, help="Shortest seconds between polls")
+    parser.add_argument('--max-interval', type=float, default=30.0, help="Longest seconds between polls")
+    parser.add_argument('--rate', type=float, default=None, help="Calls per second to the source")
+    parser.add_argument('--benchmark', action='store_true', help="Poll a fake board instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark or not args.symbols:
+        result = benchmark()
+        print(f"{result['polls']} polls of {result['symbols']} symbols: {result['requests']} requests "
+              f"(batch size settled at {result['batch_size']} after {result['rejected_batches']} rejections)")
+        print(f"Rows emitted: {result['rows_emitted']:,} of {result['rows_received']:,} received "
+              f"({result['rows_emitted'] / result['rows_received']:.1%}), "
+              f"{result['seconds_per_poll'] * 1000:.1f} ms per poll")
+        return result
+
+    poller = PriceBoardPoller(args.symbols, source=args.source, min_interval=args.min_interval,
+                              max_interval=args.max_interval, rate_limit=args.rate)
+    poller.subscribe(lambda changes: print(changes.to_string(), flush=True))
+    poller.run(until=args.until, verbose=True)
+    return poller
+
+
+if __name__ == "__main__":
+    main()
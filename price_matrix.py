@@ -0,0 +1,584 @@
+"""
+Price Matrix Module
+
+This module keeps aligned dates x symbols matrices (close prices, volumes,
+daily returns) in memory-mapped files, so the analytics scripts can open the
+full-market matrix in milliseconds instead of reloading and re-aligning
+per-symbol frames:
+
+- each field is a directory holding one raw C-order array of
+  capacity x symbols values (float64 or float32), a matching array of int64
+  dates and a small meta.json with the symbols, row count and file names;
+- PriceMatrix maps the files read-only (np.memmap): slicing rows, or a
+  contiguous run of symbols, returns views without copying, and processes
+  opening the same matrix share the operating system's page cache instead
+  of each holding a copy;
+- append() writes new days into the spare rows in place, then updates
+  meta.json; readers see them after refresh(). New symbols rewrite the
+  matrix into new files, which meta.json then points to.
+
+    python price_matrix.py build                # from the backfilled history_1D dataset
+    matrix = open_matrix()                      # close prices
+    window = matrix.frame('2024-01-01', '2024-12-31')
+
+One writer at a time; any number of readers.
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from storage import DataStore
+
+DEFAULT_MATRIX_DIR = os.path.join('data', 'price_matrix')
+
+# Fields built from daily bars; 'returns' is derived from 'close'
+FIELDS = ('close', 'volume')
+
+# Spare rows allocated at a time for append() (about a year of daily bars)
+GROW_ROWS = 256
+
+_META = 'meta.json'
+
+
+def _write_meta(path, meta):
+    tmp_path = os.path.join(path, f'{_META}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, _META))
+
+
+def _allocate(path, name, dtype, shape):
+    """Create a zero-filled file for an array and map it for writing."""
+    file_path = os.path.join(path, name)
+    with open(file_path, 'wb') as f:
+        f.truncate(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return np.memmap(file_path, dtype=dtype, mode='r+', shape=shape)
+
+
+def _day_values(dates):
+    return pd.DatetimeIndex(pd.to_datetime(dates)).normalize().as_unit('ns').asi8
+
+
+class PriceMatrix:
+    """
+    Memory-mapped dates x symbols matrix of one field.
+
+    Parameters:
+    -----------
+    path : str
+        Directory of the matrix, as written by PriceMatrix.create
+    mode : str
+        'r' to read, 'r+' to also append (default: 'r')
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError("mode must be 'r' or 'r+'")
+        self.path = path
+        self.mode = mode
+        self._meta = None
+        self.refresh()
+
+    @classmethod
+    def create(cls, path, dates, symbols, values, dtype='float64', spare_rows=GROW_ROWS):
+        """
+        Write a new matrix, replacing any matrix at `path`.
+
+        Parameters:
+        -----------
+        path : str
+            Directory to write to
+        dates : sequence of dates
+            Sorted, unique row dates
+        symbols : list of str
+            Column symbols
+        values : numpy.ndarray
+            len(dates) x len(symbols) values; missing values are NaN
+        dtype : str
+            'float64' or 'float32' (default: 'float64')
+        spare_rows : int
+            Rows allocated beyond the data for later appends (default: GROW_ROWS)
+
+        Returns:
+        --------
+        PriceMatrix
+            The matrix opened for appending
+        """
+        os.makedirs(path, exist_ok=True)
+        days = _day_values(dates)
+        if len(days) > 1 and not (np.diff(days) > 0).all():
+            raise ValueError("dates must be sorted and unique")
+        symbols = [str(symbol) for symbol in symbols]
+        rows = len(days)
+        capacity = rows + max(spare_rows, 1)
+        version = uuid.uuid4().hex[:8]
+        meta = {'dtype': np.dtype(dtype).name, 'symbols': symbols, 'rows': rows, 'capacity': capacity,
+                'values_file': f'values-{version}.bin', 'dates_file': f'dates-{version}.bin'}
+        array = _allocate(path, meta['values_file'], meta['dtype'], (capacity, len(symbols)))
+        array[:rows] = values
+        array[rows:] = np.nan
+        array.flush()
+        dates_array = _allocate(path, meta['dates_file'], np.int64, (capacity,))
+        dates_array[:rows] = days
+        dates_array.flush()
+        previous = cls._read_meta(path)
+        # Data files first, then meta.json, so readers never see a row count
+        # the files do not hold
+        _write_meta(path, meta)
+        if previous is not None:
+            for name in (previous['values_file'], previous['dates_file']):
+                if name not in (meta['values_file'], meta['dates_file']):
+                    try:
+                        os.remove(os.path.join(path, name))
+                    except OSError:
+                        pass
+        return cls(path, mode='r+')
+
+    @classmethod
+    def from_frame(cls, path, frame, dtype='float64', spare_rows=GROW_ROWS):
+        """Write a matrix from a DataFrame indexed by date with one column per symbol."""
+        frame = frame.sort_index()
+        return cls.create(path, frame.index, list(frame.columns), frame.to_numpy(dtype=dtype), dtype, spare_rows)
+
+    @staticmethod
+    def _read_meta(path):
+        meta_path = os.path.join(path, _META)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def refresh(self):
+        """
+        Pick up days appended (or symbols added) by a writer since opening.
+
+        Returns:
+        --------
+        bool
+            True if the matrix changed
+        """
+        meta = self._read_meta(self.path)
+        if meta is None:
+            raise FileNotFoundError(f"No price matrix at {self.path}")
+        if meta == self._meta:
+            return False
+        same_files = self._meta is not None and self._meta['values_file'] == meta['values_file'] \
+            and self._meta['capacity'] == meta['capacity']
+        if not same_files:
+            shape = (meta['capacity'], len(meta['symbols']))
+            self._values = np.memmap(os.path.join(self.path, meta['values_file']), dtype=meta['dtype'],
+                                     mode=self.mode, shape=shape)
+            self._dates = np.memmap(os.path.join(self.path, meta['dates_file']), dtype=np.int64,
+                                    mode=self.mode, shape=(meta['capacity'],))
+        if self._meta is None or self._meta['symbols'] != meta['symbols']:
+            self.symbols = meta['symbols']
+            self._positions = None
+        self.rows = meta['rows']
+        self._meta = meta
+        return True
+
+    @property
+    def dtype(self):
+        return self._values.dtype
+
+    @property
+    def shape(self):
+        return self.rows, len(self.symbols)
+
+    @property
+    def values(self):
+        """All rows as a view of the mapped file (writable only in mode 'r+')."""
+        return self._values[:self.rows]
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self._dates[:self.rows].view('datetime64[ns]'), name='time')
+
+    def _index(self):
+        if self._positions is None:
+            self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return self._positions
+
+    def positions(self, symbols):
+        """Column positions of symbols; raises KeyError for unknown symbols."""
+        index = self._index()
+        try:
+            return np.array([index[symbol] for symbol in symbols], dtype=np.intp)
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]} is not in the price matrix") from None
+
+    def row_slice(self, start=None, end=None):
+        """Rows with start <= date <= end, as a slice."""
+        days = self._dates[:self.rows]
+        lo = 0 if start is None else int(np.searchsorted(days, _day_values([start])[0], side='left'))
+        hi = self.rows if end is None else int(np.searchsorted(days, _day_values([end])[0], side='right'))
+        return slice(lo, hi)
+
+    def slice(self, start=None, end=None, symbols=None):
+        """
+        Return the values between two dates for some symbols.
+
+        Date ranges and contiguous runs of symbols are views of the mapped
+        file; other symbol selections are copied.
+
+        Returns:
+        --------
+        numpy.ndarray
+            rows x symbols values
+        """
+        rows = self.row_slice(start, end)
+        if symbols is None:
+            return self._values[rows]
+        positions = self.positions(symbols)
+        if len(positions) and (np.diff(positions) == 1).all():
+            return self._values[rows, positions[0]:positions[-1] + 1]
+        return self._values[rows][:, positions]
+
+    def column(self, symbol, start=None, end=None):
+        """One symbol's values as a strided view."""
+        return self._values[self.row_slice(start, end), self.positions([symbol])[0]]
+
+    def frame(self, start=None, end=None, symbols=None):
+        """
+        Return the values as a DataFrame indexed by date, one column per symbol.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Built on the mapped values without copying where slice() does not
+        """
+        rows = self.row_slice(start, end)
+        values = self.slice(start, end, symbols)
+        columns = list(self.symbols) if symbols is None else list(symbols)
+        return pd.DataFrame(values, index=self.dates[rows], columns=columns, copy=False)
+
+    def combined_prices(self, start=None, end=None, symbols=None):
+        """
+        Return close prices in test.py's layout: a 'time' column followed by
+        one '{symbol}_close' column per symbol, as calculations.py expects.
+        """
+        frame = self.frame(start, end, symbols)
+        frame.columns = [f'{symbol}_close' for symbol in frame.columns]
+        return frame.reset_index()
+
+    def _require_writable(self):
+        if self.mode != 'r+':
+            raise ValueError("Open the matrix with mode='r+' to append")
+
+    def _grow(self, rows_needed):
+        """Extend the files in place so at least rows_needed rows fit."""
+        capacity = rows_needed + GROW_ROWS
+        symbols = len(self.symbols)
+        for name, width, dtype in ((self._meta['values_file'], symbols, self.dtype),
+                                   (self._meta['dates_file'], 1, np.dtype(np.int64))):
+            with open(os.path.join(self.path, name), 'r+b') as f:
+                f.truncate(capacity * width * dtype.itemsize)
+        self._values.flush()
+        self._values = np.memmap(os.path.join(self.path, self._meta['values_file']), dtype=self.dtype,
+                                 mode='r+', shape=(capacity, symbols))
+        self._values[self._meta['capacity']:] = np.nan
+        self._dates = np.memmap(os.path.join(self.path, self._meta['dates_file']), dtype=np.int64,
+                                mode='r+', shape=(capacity,))
+        self._meta = dict(self._meta, capacity=capacity)
+
+    @instrument.timed()
+    def append(self, rows):
+        """
+        Write days into the matrix in place.
+
+        Days already in the matrix are overwritten (e.g. today's prices
+        refreshed after the close); later days are appended. Symbols missing
+        from `rows` are NaN on new days and unchanged on existing ones.
+        Symbols not in the matrix yet rewrite it with the extra columns.
+
+        Parameters:
+        -----------
+        rows : pandas.DataFrame
+            Values indexed by date with one column per symbol
+
+        Returns:
+        --------
+        slice
+            Rows written, including overwritten ones
+        """
+        self._require_writable()
+        rows = rows.sort_index()
+        symbols = [str(symbol) for symbol in rows.columns]
+        index = self._index()
+        new_symbols = [symbol for symbol in symbols if symbol not in index]
+        if new_symbols:
+            self._add_symbols(new_symbols)
+        days = _day_values(rows.index)
+        existing = self._dates[:self.rows]
+        at = np.searchsorted(existing, days)
+        overwrite = (at < self.rows) & (existing[np.minimum(at, max(self.rows - 1, 0))] == days) \
+            if self.rows else np.zeros(len(days), dtype=bool)
+        if (~overwrite & (at < self.rows)).any():
+            raise ValueError("Days before the last stored day can only be overwritten, not inserted")
+        added = int((~overwrite).sum())
+        if self.rows + added > self._meta['capacity']:
+            self._grow(self.rows + added)
+        targets = np.where(overwrite, at, self.rows + np.cumsum(~overwrite) - 1)
+        columns = self.positions(symbols)
+        values = rows.to_numpy(dtype=self.dtype)
+        # New days start from NaN so symbols not in `rows` stay missing
+        self._values[targets[~overwrite]] = np.nan
+        self._values[targets[:, None], columns] = values
+        self._dates[targets] = days
+        self._values.flush()
+        self._dates.flush()
+        self.rows += added
+        self._meta = dict(self._meta, rows=self.rows)
+        _write_meta(self.path, self._meta)
+        return slice(int(targets.min()), self.rows) if len(targets) else slice(self.rows, self.rows)
+
+    def _add_symbols(self, symbols):
+        values = np.full((self.rows, len(self.symbols) + len(symbols)), np.nan, dtype=self.dtype)
+        values[:, :len(self.symbols)] = self.values
+        spare = self._meta['capacity'] - self.rows
+        PriceMatrix.create(self.path, self.dates, list(self.symbols) + symbols, values, self.dtype.name, spare)
+        self._meta = None
+        self.refresh()
+
+
+def open_matrix(root=DEFAULT_MATRIX_DIR, field='close', mode='r'):
+    """Open one field's matrix under root ('close', 'volume' or 'returns')."""
+    return PriceMatrix(os.path.join(root, field), mode=mode)
+
+
+def _returns(close, previous=None):
+    """Daily returns of close rows; the first row uses `previous` (NaN without it)."""
+    close = np.asarray(close, dtype=np.float64)
+    before = np.empty_like(close)
+    before[0] = np.nan if previous is None else previous
+    before[1:] = close[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return close / before - 1
+
+
+@instrument.timed()
+def build_price_matrices(frames, root=DEFAULT_MATRIX_DIR, dtype='float64'):
+    """
+    Write the matrices of several fields, plus daily returns from 'close'.
+
+    Parameters:
+    -----------
+    frames : dict or pandas.DataFrame
+        Field -> DataFrame indexed by date with one column per symbol, or just
+        the close prices. test.py's combined_prices layout ('time' and
+        '{symbol}_close' columns) is accepted for close.
+    root : str
+        Directory holding one sub-directory per field (default: DEFAULT_MATRIX_DIR)
+    dtype : str
+        'float64' or 'float32' (default: 'float64')
+
+    Returns:
+    --------
+    dict
+        Field -> PriceMatrix
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = {'close': frames}
+    close = frames['close']
+    if 'time' in close.columns:
+        close = close.set_index(pd.to_datetime(close['time'])).drop(columns='time')
+        close.columns = [column[:-len('_close')] if column.endswith('_close') else column
+                         for column in close.columns]
+    close = close.sort_index()
+    frames = dict(frames, close=close)
+    matrices = {}
+    for field, frame in frames.items():
+        frame = frame.sort_index().reindex(index=close.index, columns=close.columns)
+        matrices[field] = PriceMatrix.from_frame(os.path.join(root, field), frame, dtype)
+    returns = _returns(close.to_numpy(dtype=np.float64)) if len(close) else close.to_numpy(dtype=np.float64)
+    matrices['returns'] = PriceMatrix.create(os.path.join(root, 'returns'), close.index, list(close.columns),
+                                             returns, dtype)
+    return matrices
+
+
+def stored_fields(root=DEFAULT_MATRIX_DIR):
+    """Fields with a matrix under root, e.g. ['close', 'returns', 'volume']."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, _META)))
+
+
+def append_prices(frames, root=DEFAULT_MATRIX_DIR):
+    """
+    Append new days to the matrices under root and update the returns.
+
+    Every stored field gets the new days, so the matrices stay aligned:
+    fields missing from `frames` are NaN on new days (and gain any new
+    symbols) and keep their values on days already stored.
+
+    Parameters:
+    -----------
+    frames : dict or pandas.DataFrame
+        Field -> DataFrame of new days indexed by date, one column per symbol,
+        or just the close prices
+
+    Returns:
+    --------
+    int
+        Number of rows in the close matrix afterwards
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = {'close': frames}
+    fields = [field for field in stored_fields(root) if field != 'returns']
+    unknown = set(frames) - set(fields)
+    if unknown:
+        raise ValueError(f"No {', '.join(sorted(unknown))} matrix under {root}; build it first")
+    close_rows = frames['close']
+    for field in fields:
+        matrix = open_matrix(root, field, 'r+')
+        frame = frames.get(field)
+        if frame is None:
+            days = pd.DatetimeIndex(pd.to_datetime(close_rows.index)).normalize()
+            new_days = close_rows.index[~days.isin(matrix.dates)]
+            frame = pd.DataFrame(np.nan, index=new_days, columns=close_rows.columns)
+        matrix.append(frame)
+    close = open_matrix(root, 'close')
+    returns = open_matrix(root, 'returns', 'r+')
+    # Recompute returns from the first written day on
+    first = close.row_slice(start=close_rows.index.min()).start
+    previous = close.values[first - 1] if first > 0 else None
+    values = _returns(close.values[first:], previous)
+    returns.append(pd.DataFrame(values, index=close.dates[first:], columns=close.symbols))
+    return close.rows
+
+
+def frames_from_store(store=None, dataset='history_1D', fields=FIELDS, symbols=None):
+    """
+    Pivot a symbol-partitioned bar dataset (e.g. written by backfill.py) into
+    one dates x symbols frame per field.
+
+    Returns:
+    --------
+    dict
+        Field -> DataFrame indexed by date with one column per symbol
+    """
+    store = store or DataStore()
+    bars = store.read(dataset, columns=['time'] + list(fields),
+                      filters={'symbol': symbols} if symbols is not None else None)
+    if bars.empty:
+        return {field: pd.DataFrame() for field in fields}
+    symbol_codes = bars['symbol'].astype('category').cat.remove_unused_categories()
+    names = [str(name) for name in symbol_codes.cat.categories]
+    columns = symbol_codes.cat.codes.to_numpy()
+    days = _day_values(bars['time'])
+    dates, rows = np.unique(days, return_inverse=True)
+    index = pd.DatetimeIndex(dates.view('datetime64[ns]'), name='time')
+    frames = {}
+    for field in fields:
+        values = np.full((len(dates), len(names)), np.nan)
+        values[rows, columns] = bars[field].to_numpy(dtype=np.float64)
+        frames[field] = pd.DataFrame(values, index=index, columns=names)
+    return frames
+
+
+def benchmark(num_symbols=1700, num_days=2520, root=os.path.join('.cache', 'price_matrix_bench'), repeat=20):
+    """
+    Build a num_days x num_symbols matrix, then time opening and slicing it,
+    appending a day, and loading the same prices from the data store.
+
+    Returns:
+    --------
+    dict
+        Seconds for each step (opening and slicing: best of `repeat`)
+    """
+    import shutil
+
+    shutil.rmtree(root, ignore_errors=True)
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2015-01-01', periods=num_days + 1)
+    symbols = [f'S{i:04d}' for i in range(num_symbols)]
+    close = pd.DataFrame(20 * np.exp(np.cumsum(rng.normal(0, 0.02, (num_days + 1, num_symbols)), axis=0)),
+                         index=dates, columns=symbols)
+    close.iloc[:rng.integers(0, num_days // 2), :num_symbols // 4] = np.nan
+
+    t0 = time.perf_counter()
+    build_price_matrices(close.iloc[:-1], root)
+    build_seconds = time.perf_counter() - t0
+
+    def best(fn):
+        timings = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - t)
+        return min(timings)
+
+    open_seconds = best(lambda: open_matrix(root))
+    matrix = open_matrix(root)
+    slice_seconds = best(lambda: matrix.frame('2020-01-01', '2020-12-31'))
+    returns_seconds = best(lambda: open_matrix(root, 'returns').values.mean())
+
+    t0 = time.perf_counter()
+    append_prices(close.iloc[-1:], root)
+    append_seconds = time.perf_counter() - t0
+    matrix.refresh()
+    assert matrix.rows == num_days + 1
+    assert np.allclose(matrix.values, close.to_numpy(), equal_nan=True)
+    expected = close.pct_change(fill_method=None).to_numpy()
+    assert np.allclose(open_matrix(root, 'returns').values[1:], expected[1:], equal_nan=True)
+
+    store = DataStore(os.path.join(root, 'store'))
+    store.write('combined_close_prices', close.add_suffix('_close').rename_axis('time').reset_index())
+    store_seconds = best(lambda: store.read('combined_close_prices'))
+
+    return {
+        'shape': matrix.shape,
+        'megabytes': matrix.values.nbytes / 2**20,
+        'build_seconds': build_seconds,
+        'open_seconds': open_seconds,
+        'slice_seconds': slice_seconds,
+        'returns_scan_seconds': returns_seconds,
+        'append_seconds': append_seconds,
+        'store_read_seconds': store_seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the memory-mapped price matrices.")
+    parser.add_argument('command', nargs='?', default='benchmark', choices=['build', 'info', 'benchmark'],
+                        help="build from the stored bars, show the stored matrix, or time a synthetic one")
+    parser.add_argument('--root', default=DEFAULT_MATRIX_DIR, help="Matrix directory")
+    parser.add_argument('--dataset', default='history_1D', help="Bar dataset to build from")
+    parser.add_argument('--dtype', default='float64', choices=['float64', 'float32'], help="Value type")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        frames = frames_from_store(dataset=args.dataset)
+        if frames['close'].empty:
+            print(f"No bars in {args.dataset}; run backfill.py first")
+            return None
+        matrices = build_price_matrices(frames, args.root, args.dtype)
+        print(f"Built {', '.join(matrices)} matrices of {matrices['close'].shape[0]} days x "
+              f"{matrices['close'].shape[1]} symbols in {args.root}")
+        return matrices
+
+    if args.command == 'info':
+        matrix = open_matrix(args.root)
+        print(f"{matrix.shape[0]} days x {matrix.shape[1]} symbols ({matrix.dtype}), "
+              f"{matrix.dates[0]:%Y-%m-%d} to {matrix.dates[-1]:%Y-%m-%d}")
+        return matrix
+
+    result = benchmark()
+    print(f"Matrix {result['shape'][0]} days x {result['shape'][1]} symbols ({result['megabytes']:.0f} MB), "
+          f"built in {result['build_seconds']:.2f}s")
+    print(f"Open: {result['open_seconds'] * 1000:.2f} ms, one-year frame: {result['slice_seconds'] * 1000:.2f} ms, "
+          f"full returns scan: {result['returns_scan_seconds'] * 1000:.1f} ms")
+    print(f"Append one day in place: {result['append_seconds'] * 1000:.1f} ms; "
+          f"reading the same prices from the data store: {result['store_read_seconds'] * 1000:.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    main()
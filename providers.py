@@ -0,0 +1,91 @@
+"""
+Lazy Data Providers Module
+
+This module holds the shared datasets used by the analytics code (combined
+close prices, gold prices, exchange rates). Nothing is fetched when the module
+is imported: each provider loads its data on first access and keeps it.
+Callers can inject a ready-made DataFrame (e.g. read from the local store or
+built from a stub) with set(), or swap the loader with set_loader().
+"""
+
+import threading
+
+
+class LazyData:
+    """
+    Value loaded on first access and kept afterwards.
+
+    Parameters:
+    -----------
+    loader : callable
+        Function with no arguments that returns the value
+    name : str
+        Name used in messages (default: 'data')
+    """
+
+    def __init__(self, loader, name='data'):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """True once the value has been loaded or injected."""
+        return self._loaded
+
+    def get(self):
+        """Return the value, loading it on the first call."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._loader()
+                    self._loaded = True
+        return self._value
+
+    def set(self, value):
+        """Inject a value, so the loader is never called."""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+
+    def set_loader(self, loader):
+        """Replace the loader and drop any loaded value."""
+        with self._lock:
+            self._loader = loader
+            self._value = None
+            self._loaded = False
+
+    def reset(self):
+        """Drop the loaded value so the next get() calls the loader again."""
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+def _load_combined_prices():
+    from test import fetch_price_data
+    _, prices, _ = fetch_price_data()
+    return prices
+
+
+def _load_gold_prices():
+    from Gold import get_gold_prices_for_date_range
+    return get_gold_prices_for_date_range("2025-01-01", "2025-03-27", interval_days=14, delay_seconds=3)
+
+
+def _load_exchange_rates():
+    from ex import get_exchange_rates_for_date_range
+    return get_exchange_rates_for_date_range("2025-03-20", "2025-03-27", interval_days=2, delay_seconds=2)
+
+
+# Close prices with a 'time' column and one '{symbol}_close' column per symbol,
+# as built by test.py
+combined_prices = LazyData(_load_combined_prices, 'combined_prices')
+
+# SJC gold prices with 'name', 'buy_price', 'sell_price' and 'date' columns
+gold_prices = LazyData(_load_gold_prices, 'gold_prices')
+
+# VCB exchange rates
+exchange_rates = LazyData(_load_exchange_rates, 'exchange_rates')
@@ -0,0 +1,192 @@
+"""
+Rate Limiting Module
+
+This module provides a thread-safe token-bucket rate limiter used to keep
+concurrent requests to the vnstock data sources within a calls-per-second budget,
+and a variant whose bucket is shared between worker processes.
+"""
+
+import multiprocessing
+import threading
+import time
+
+import instrument
+
+# Shared limiters, one per data source, so every fetcher hitting the same
+# source draws from the same budget
+_source_limiters = {}
+_source_limiters_lock = threading.Lock()
+# Sources whose limiter was set with set_source_limiter
+_registered_sources = set()
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter that can be shared between threads.
+
+    Parameters:
+    -----------
+    rate : float
+        Number of calls allowed per second
+    capacity : float, optional
+        Maximum burst size in calls (default: one second worth of calls, at least 1)
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self._default_capacity = capacity is None
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """
+        Change the calls per second, keeping the tokens already in the bucket.
+        A default capacity follows the new rate.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            if self._default_capacity:
+                self.capacity = max(1.0, self.rate)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens from the bucket without waiting.
+
+        Returns:
+        --------
+        bool
+            True if the tokens were taken, False if the bucket is short
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        Block until the requested number of tokens is available, then take them.
+
+        Returns:
+        --------
+        float
+            Number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    break
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+        instrument.record('ratelimit.wait', waited)
+        return waited
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token-bucket rate limiter whose bucket lives in shared memory, so worker
+    processes draw from one budget.
+
+    Create it in the parent process and hand it to the workers when they
+    start (e.g. through a ProcessPoolExecutor initializer), then register it
+    with set_source_limiter() in each worker.
+
+    Parameters:
+    -----------
+    rate : float
+        Number of calls allowed per second, across all processes
+    capacity : float, optional
+        Maximum burst size in calls (default: one second worth of calls, at least 1)
+    context : multiprocessing context, optional
+        Context the workers are started with (default: the default context)
+    """
+
+    def __init__(self, rate, capacity=None, context=None):
+        context = context or multiprocessing.get_context()
+        # [tokens, last refill time]; time.monotonic is system-wide, so the
+        # refill time is comparable between processes
+        self._state = context.RawArray('d', 2)
+        super().__init__(rate, capacity)
+        self._lock = context.Lock()
+
+    @property
+    def _tokens(self):
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value):
+        self._state[0] = value
+
+    @property
+    def _updated(self):
+        return self._state[1]
+
+    @_updated.setter
+    def _updated(self, value):
+        self._state[1] = value
+
+
+def set_source_limiter(source, limiter):
+    """
+    Make `limiter` the shared limiter of a data source in this process, e.g.
+    a SharedRateLimiter received by a worker process. get_source_limiter
+    returns it from then on, whatever rate its callers pass.
+    """
+    with _source_limiters_lock:
+        _source_limiters[source] = limiter
+        _registered_sources.add(source)
+
+
+def get_source_limiter(source, rate):
+    """
+    Return the shared rate limiter for a data source, creating it on first use.
+
+    Parameters:
+    -----------
+    source : str
+        Data source name, e.g. 'VCI' or 'TCBS'
+    rate : float or None
+        Calls per second allowed for the source. None disables rate limiting,
+        unless a limiter was registered with set_source_limiter.
+
+    Returns:
+    --------
+    RateLimiter or None
+        The limiter shared by all callers using this source, or None when unlimited.
+        There is one limiter per source: a caller passing another rate changes
+        the rate of the existing limiter, which every caller keeps using. A
+        limiter registered with set_source_limiter (e.g. a SharedRateLimiter
+        spanning processes) is always returned unchanged, so a caller passing
+        another rate cannot leave the shared budget.
+    """
+    with _source_limiters_lock:
+        if source in _registered_sources:
+            return _source_limiters[source]
+    if not rate:
+        return None
+    with _source_limiters_lock:
+        limiter = _source_limiters.get(source)
+        if limiter is None:
+            limiter = RateLimiter(rate)
+            _source_limiters[source] = limiter
+        elif limiter.rate != float(rate):
+            limiter.set_rate(rate)
+        return limiter
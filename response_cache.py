@@ -0,0 +1,429 @@
+"""
+Response Cache Module
+
+This module caches the results of slowly changing vnstock endpoints (company
+profile, officers, subsidiaries, financial statements, ...) so repeated
+script runs do not refetch them. Entries are keyed by (source, symbol,
+endpoint, params) and expire after a per-endpoint TTL. Recently used entries
+are kept in memory (LRU) and every DataFrame result is also written to disk,
+so a new process starts warm. An expired entry that is not too old is served
+immediately while a background thread refetches it (stale-while-revalidate).
+
+    from response_cache import ResponseCache
+
+    cache = ResponseCache()
+    company = cache.wrap(Vnstock().stock(symbol='VCB', source='TCBS').company, 'TCBS', 'VCB')
+    company.profile()            # fetched once, then served from the cache for a day
+    counters, log = cache.stats()
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import instrument
+from storage import DataStore
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'responses')
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+QUARTER = 91 * DAY
+
+
+def _statement_ttl(params):
+    # Annual statements only change once a year is reported; quarterly ones
+    # are checked weekly during reporting season
+    return QUARTER if params.get('period', 'quarter') == 'year' else 7 * DAY
+
+
+# Seconds an endpoint result stays fresh, or a function of the call's
+# keyword arguments returning seconds
+DEFAULT_TTLS = {
+    'price_depth': MINUTE,
+    'news': 5 * MINUTE,
+    'events': HOUR,
+    'insider_deals': HOUR,
+    'overview': DAY,
+    'profile': 7 * DAY,
+    'officers': 7 * DAY,
+    'subsidiaries': 7 * DAY,
+    'affiliate': 7 * DAY,
+    'shareholders': 7 * DAY,
+    'dividends': DAY,
+    'reports': DAY,
+    'balance_sheet': _statement_ttl,
+    'income_statement': _statement_ttl,
+    'cash_flow': _statement_ttl,
+    'ratio': _statement_ttl,
+}
+
+# TTL for endpoints missing from the TTL table
+DEFAULT_TTL = HOUR
+
+# Number of lookups kept for stats()
+LOOKUP_LOG_SIZE = 10_000
+
+LOOKUP_LOG_COLUMNS = ['source', 'symbol', 'endpoint', 'status', 'seconds']
+
+
+def _key(source, symbol, endpoint, params):
+    return (source, symbol, endpoint, tuple(sorted(params.items())))
+
+
+def _digest(key):
+    return hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier TTL cache for endpoint results.
+
+    Parameters:
+    -----------
+    cache_dir : str, optional
+        Directory of the disk tier, written through storage.DataStore. None
+        keeps entries in memory only (default: DEFAULT_CACHE_DIR)
+    ttls : dict, optional
+        Endpoint -> seconds (or function of the call's keyword arguments),
+        merged over DEFAULT_TTLS
+    max_entries : int
+        Entries kept in memory; the least recently used are evicted (default: 256)
+    stale_while_revalidate : bool
+        Serve expired entries while refetching them in the background
+        (default: True)
+    max_stale : float, optional
+        Seconds past the TTL an entry may still be served stale (default: the
+        endpoint's TTL, i.e. up to twice its age limit)
+    refresh_workers : int
+        Background refresh threads (default: 2)
+    clock : callable
+        Function returning the current time in seconds (default: time.time)
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttls=None, max_entries=256, stale_while_revalidate=True,
+                 max_stale=None, refresh_workers=2, clock=time.time):
+        self.cache_dir = cache_dir
+        self.store = DataStore(cache_dir) if cache_dir is not None else None
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_stale = max_stale
+        self.refresh_workers = refresh_workers
+        self.clock = clock
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+        self._stats_lock = threading.Lock()
+        self._lookup_log = deque(maxlen=LOOKUP_LOG_SIZE)
+        self._seconds = {'hit': 0.0, 'miss': 0.0}
+        self.counters = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'evictions': 0,
+            'disk_errors': 0,
+        }
+
+    def ttl(self, endpoint, params=None):
+        """Seconds a result of the endpoint stays fresh."""
+        ttl = self.ttls.get(endpoint, DEFAULT_TTL)
+        return ttl(params or {}) if callable(ttl) else ttl
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def _log(self, key, status, seconds):
+        source, symbol, endpoint, _ = key
+        with self._stats_lock:
+            self._seconds['miss' if status == 'miss' else 'hit'] += seconds
+            self._lookup_log.append({
+                'source': source,
+                'symbol': symbol,
+                'endpoint': endpoint,
+                'status': status,
+                'seconds': seconds,
+            })
+        instrument.record(f'response_cache.{endpoint}', seconds, cache=status, source=source, symbol=symbol)
+
+    def _paths(self, key):
+        source, _, endpoint, _ = key
+        digest = _digest(key)
+        dataset = f'{source}/{endpoint}/{digest}'
+        return dataset, os.path.join(self.cache_dir, source, endpoint, f'{digest}.json')
+
+    def _remember(self, key, entry):
+        with self._memory_lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._count(evictions=1)
+
+    def _lookup(self, key):
+        """Return (entry, tier) from memory or disk, or (None, None)."""
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry, 'memory'
+        if self.store is None:
+            return None, None
+        dataset, meta_path = self._paths(key)
+        if not os.path.exists(meta_path):
+            return None, None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            value = self.store.read(dataset)
+            if meta['index']:
+                value = value.set_index(meta['index'])
+                value.index.names = meta['index_names']
+        except (OSError, ValueError, KeyError):
+            self._count(disk_errors=1)
+            return None, None
+        entry = {'value': value, 'fetched_at': meta['fetched_at']}
+        self._remember(key, entry)
+        return entry, 'disk'
+
+    def _write_disk(self, key, entry):
+        value = entry['value']
+        if self.store is None or not isinstance(value, pd.DataFrame):
+            return
+        dataset, meta_path = self._paths(key)
+        index = []
+        index_names = list(value.index.names)
+        if not isinstance(value.index, pd.RangeIndex):
+            index = [f'__index_{level}__' for level in range(value.index.nlevels)]
+            value = value.copy()
+            value.index.names = index
+            value = value.reset_index()
+        try:
+            # Data first, then the metadata, so the metadata never points at
+            # data that was not written
+            self.store.write(dataset, value)
+            tmp_path = f'{meta_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'key': key, 'fetched_at': entry['fetched_at'], 'index': index,
+                           'index_names': index_names}, f, default=str)
+            os.replace(tmp_path, meta_path)
+        except (OSError, ValueError, TypeError):
+            # Results the store cannot write (e.g. non-string column names)
+            # stay in memory only
+            self._count(disk_errors=1)
+
+    def _fetch(self, key, fetch, params):
+        value = fetch(**params)
+        entry = {'value': value, 'fetched_at': self.clock()}
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def _refresh(self, key, fetch, params):
+        try:
+            with self._lock(key):
+                self._fetch(key, fetch, params)
+            self._count(refreshes=1)
+        except Exception:
+            self._count(refresh_errors=1)
+        finally:
+            with self._memory_lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, fetch, params):
+        with self._memory_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers)
+        self._executor.submit(self._refresh, key, fetch, params)
+
+    def get(self, source, symbol, endpoint, fetch, **params):
+        """
+        Return an endpoint result from the cache, fetching it when needed.
+
+        Parameters:
+        -----------
+        source : str
+            Data source, e.g. 'TCBS'
+        symbol : str
+            Symbol the result belongs to
+        endpoint : str
+            Endpoint name, used for the TTL (e.g. 'profile', 'balance_sheet')
+        fetch : callable
+            Function called with **params to fetch the result
+        **params
+            Keyword arguments of the call; part of the cache key
+
+        Returns:
+        --------
+        object
+            The cached or freshly fetched result
+        """
+        key = _key(source, symbol, endpoint, params)
+        ttl = self.ttl(endpoint, params)
+        max_stale = ttl if self.max_stale is None else self.max_stale
+        t0 = time.perf_counter()
+
+        with self._lock(key):
+            entry, tier = self._lookup(key)
+            if entry is not None:
+                age = self.clock() - entry['fetched_at']
+                if age <= ttl:
+                    self._count(hits=1, **{f'{tier}_hits': 1})
+                    self._log(key, f'{tier}_hit', time.perf_counter() - t0)
+                    return entry['value']
+                if self.stale_while_revalidate and age <= ttl + max_stale:
+                    self._count(stale_hits=1)
+                    self._log(key, 'stale_hit', time.perf_counter() - t0)
+                    stale = entry['value']
+                else:
+                    entry = None
+            if entry is None:
+                entry = self._fetch(key, fetch, params)
+                self._count(misses=1)
+                self._log(key, 'miss', time.perf_counter() - t0)
+                return entry['value']
+
+        self._schedule_refresh(key, fetch, params)
+        return stale
+
+    def wrap(self, target, source, symbol):
+        """
+        Return a proxy whose method calls go through the cache, e.g. for
+        ``stock.company`` or ``stock.finance``.
+        """
+        return CachedEndpoints(self, target, source, symbol)
+
+    def company_factory(self, factory):
+        """
+        Wrap a company_factory (symbol, source) -> company object, as used by
+        company_collector.collect_company_data, so its calls are cached.
+        """
+        return lambda symbol, source: self.wrap(factory(symbol, source), source, symbol)
+
+    def invalidate(self, source=None, symbol=None, endpoint=None):
+        """Drop matching entries from memory; None matches everything."""
+        with self._memory_lock:
+            for key in list(self._memory):
+                if ((source is None or key[0] == source) and (symbol is None or key[1] == symbol)
+                        and (endpoint is None or key[2] == endpoint)):
+                    del self._memory[key]
+
+    def wait(self):
+        """Block until background refreshes have finished."""
+        with self._memory_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        """
+        Return cache counters and the log of recent lookups.
+
+        Returns:
+        --------
+        tuple of (dict, pandas.DataFrame)
+            Counters including the hit ratio and the mean latency of hits and
+            misses, and one row per lookup
+        """
+        with self._stats_lock:
+            counters = dict(self.counters)
+            seconds = dict(self._seconds)
+            lookup_log = pd.DataFrame(list(self._lookup_log), columns=LOOKUP_LOG_COLUMNS)
+        served = counters['hits'] + counters['stale_hits']
+        lookups = served + counters['misses']
+        counters['hit_ratio'] = served / lookups if lookups else 0.0
+        counters['mean_hit_seconds'] = seconds['hit'] / served if served else 0.0
+        counters['mean_miss_seconds'] = seconds['miss'] / counters['misses'] if counters['misses'] else 0.0
+        return counters, lookup_log
+
+
+class CachedEndpoints:
+    """
+    Proxy that serves method calls of a vnstock object from a ResponseCache.
+    Positional arguments are not part of the cache key, so endpoint
+    arguments must be passed by keyword.
+    """
+
+    def __init__(self, cache, target, source, symbol):
+        self.cache = cache
+        self.target = target
+        self.source = source
+        self.symbol = symbol
+
+    def __getattr__(self, endpoint):
+        method = getattr(self.target, endpoint)
+        if not callable(method):
+            return method
+
+        def call(**params):
+            return self.cache.get(self.source, self.symbol, endpoint, method, **params)
+        return call
+
+
+def benchmark(symbols=('ACB', 'VCB', 'FPT', 'HPG', 'VNM'), latency=0.2, cache_dir=None):
+    """
+    Time cold, warm and stale passes over the TCBS company endpoints of a few
+    symbols, using company_collector.StubCompany.
+
+    Returns:
+    --------
+    dict
+        Seconds per pass and the cache counters
+    """
+    from company_collector import ENDPOINTS, StubCompany
+
+    now = [0.0]
+    cache = ResponseCache(cache_dir=cache_dir, max_stale=DAY, clock=lambda: now[0])
+    companies = {symbol: cache.wrap(StubCompany(symbol, latency), 'TCBS', symbol) for symbol in symbols}
+
+    def run():
+        t0 = time.perf_counter()
+        for company in companies.values():
+            for endpoint in ENDPOINTS['TCBS']:
+                getattr(company, endpoint)()
+        return time.perf_counter() - t0
+
+    cold = run()
+    warm = run()
+    # Two hours later news, events and insider deals are stale: served at
+    # once and refreshed in the background
+    now[0] += 2 * HOUR
+    stale = run()
+    cache.wait()
+    counters, _ = cache.stats()
+    return {'cold': cold, 'warm': warm, 'stale': stale, 'counters': counters}
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"Cold pass: {result['cold']:.2f}s")
+    print(f"Warm pass: {result['warm'] * 1000:.2f} ms")
+    print(f"Stale pass: {result['stale'] * 1000:.2f} ms")
+    counters = result['counters']
+    print(f"Hits: {counters['hits']}, stale hits: {counters['stale_hits']}, misses: {counters['misses']}, "
+          f"background refreshes: {counters['refreshes']}")
+    print(f"Mean hit: {counters['mean_hit_seconds'] * 1e6:.0f} us, "
+          f"mean miss: {counters['mean_miss_seconds'] * 1000:.0f} ms")
@@ -0,0 +1,292 @@
+"""
+Date-Range Scheduler Module
+
+This module runs a per-date fetch function (e.g. sjc_gold_price or
+vcb_exchange_rate) over a date range. Calls are paced by a token-bucket rate
+limiter instead of fixed sleeps and run in a small thread pool within that
+budget. When a data store is given, each date's rows are saved as soon as they
+arrive and completed dates are recorded in a progress file, so an interrupted
+backfill resumes where it stopped and dates already stored are not fetched again.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import instrument
+from ratelimit import RateLimiter
+
+FAILURE_COLUMNS = ['date', 'error_type', 'error']
+
+# Partition column holding the requested date in stored datasets
+DATE_PARTITION = 'fetch_date'
+
+
+def date_range(start_date_str, end_date_str, interval_days=1, calendar=None):
+    """
+    List the dates from start to end (inclusive) stepping interval_days.
+
+    With a trading calendar each date moves to the first trading day on or
+    after it and duplicates are dropped, so a 1-day step lists trading days only.
+
+    Returns:
+    --------
+    list of str
+        Dates in 'YYYY-MM-DD' format
+    """
+    if interval_days < 1:
+        raise ValueError("interval_days must be at least 1")
+    current = datetime.strptime(start_date_str, "%Y-%m-%d")
+    end = datetime.strptime(end_date_str, "%Y-%m-%d")
+    dates = []
+    while current <= end:
+        dates.append(current.strftime("%Y-%m-%d"))
+        current += timedelta(days=interval_days)
+    if calendar is not None:
+        dates = calendar.roll_forward(dates, end_date_str)
+    return dates
+
+
+def _progress_path(store, dataset):
+    return os.path.join(store.root, f'{dataset}.progress.json')
+
+
+def load_progress(store, dataset):
+    """Return the set of dates recorded as completed for a dataset."""
+    path = _progress_path(store, dataset)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f)['completed'])
+
+
+def _save_progress(store, dataset, completed):
+    path = _progress_path(store, dataset)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'completed': sorted(completed)}, f)
+    os.replace(tmp_path, path)
+
+
+def _stored_dates(store, dataset):
+    if not store.exists(dataset):
+        return set()
+    partitions = store.partitions(dataset)
+    if DATE_PARTITION not in partitions.columns:
+        return set()
+    return set(partitions[DATE_PARTITION])
+
+
+@instrument.timed()
+def fetch_date_range(fetch, start_date_str, end_date_str, interval_days=7, rate=0.5, max_workers=4,
+                     store=None, dataset=None, resume=True, limiter=None, calendar=None, label='data',
+                     verbose=True):
+    """
+    Call fetch(date) for every date in a range within a calls-per-second budget.
+
+    Parameters:
+    -----------
+    fetch : callable
+        Function taking a 'YYYY-MM-DD' string and returning a DataFrame
+    start_date_str : str
+        Start date in 'YYYY-MM-DD' format
+    end_date_str : str
+        End date in 'YYYY-MM-DD' format
+    interval_days : int
+        Number of days between each data point (default: 7)
+    rate : float or None
+        Calls per second allowed across all workers; None disables rate
+        limiting (default: 0.5)
+    max_workers : int
+        Number of concurrent calls (default: 4)
+    store : storage.DataStore, optional
+        Store used to persist each date's rows and the progress file. Without a
+        store nothing is saved and every date is fetched (default: None)
+    dataset : str, optional
+        Dataset name in the store; required with store
+    resume : bool
+        Skip dates that are stored or recorded as completed (default: True)
+    limiter : ratelimit.RateLimiter, optional
+        Limiter to draw from, e.g. one shared with other jobs on the same source
+        (default: a new limiter at `rate` without bursts)
+    calendar : trading_calendar.TradingCalendar, optional
+        Only request trading days (see date_range) (default: None, every date)
+    label : str
+        Name used in progress messages (default: 'data')
+    verbose : bool
+        Print per-date progress (default: True)
+
+    Returns:
+    --------
+    tuple of (pandas.DataFrame, pandas.DataFrame)
+        Rows for every date in the range in date order (including dates
+        fetched by earlier runs when a store is used), and the failed dates
+        with columns FAILURE_COLUMNS. Failed dates are not recorded as
+        completed, so the next run retries them.
+    """
+    if store is not None and not dataset:
+        raise ValueError("dataset is required when a store is given")
+
+    dates = date_range(start_date_str, end_date_str, interval_days, calendar)
+    if limiter is None and rate:
+        limiter = RateLimiter(rate, capacity=1)
+
+    completed = set()
+    if store is not None:
+        completed = load_progress(store, dataset) if resume else set()
+        if resume:
+            completed |= _stored_dates(store, dataset)
+    pending = [date for date in dates if date not in completed]
+
+    if verbose:
+        skipped = len(dates) - len(pending)
+        pace = f"at {limiter.rate:g} calls/s " if limiter is not None else ""
+        print(f"Will make {len(pending)} API calls {pace}with {max_workers} workers"
+              + (f" ({skipped} dates already stored)" if skipped else ""))
+        if limiter is not None:
+            print(f"Estimated completion time: {len(pending) / limiter.rate:.0f} seconds")
+
+    def run(date):
+        if limiter is not None:
+            limiter.acquire()
+        return fetch(date)
+
+    results = {}
+    failures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, date): date for date in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            date = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                failures.append({'date': date, 'error_type': type(e).__name__, 'error': str(e)})
+                if verbose:
+                    print(f"[{done}/{len(pending)}] Error fetching {label} for {date}: {e}")
+                continue
+
+            if data is not None and not data.empty:
+                results[date] = data
+                if store is not None:
+                    store.write(dataset, data.assign(**{DATE_PARTITION: date}),
+                                partition_cols=[DATE_PARTITION])
+                if verbose:
+                    print(f"[{done}/{len(pending)}] Retrieved {len(data)} {label} records for {date}")
+            elif verbose:
+                print(f"[{done}/{len(pending)}] No {label} available for {date}")
+
+            # Results are handled on this thread only, so the progress file
+            # needs no locking
+            if store is not None:
+                completed.add(date)
+                _save_progress(store, dataset, completed)
+
+    failures = pd.DataFrame(failures, columns=FAILURE_COLUMNS).sort_values('date', ignore_index=True)
+
+    if store is not None:
+        stored = store.read(dataset, filters={DATE_PARTITION: dates})
+        if stored.empty:
+            return stored, failures
+        stored[DATE_PARTITION] = stored[DATE_PARTITION].astype(str)
+        stored = stored.sort_values(DATE_PARTITION, kind='stable', ignore_index=True)
+        return stored.drop(columns=DATE_PARTITION), failures
+
+    frames = [results[date] for date in dates if date in results]
+    if not frames:
+        return pd.DataFrame(), failures
+    return pd.concat(frames, ignore_index=True), failures
+
+
+class FakeDateFetcher:
+    """
+    Offline stand-in for a per-date fetch function that records when each call
+    started, used to check the scheduler's pacing without network access.
+
+    Parameters:
+    -----------
+    latency : float
+        Seconds each call sleeps to simulate network wait (default: 0.2)
+    fail_dates : iterable of str, optional
+        Dates that raise OSError
+    empty_dates : iterable of str, optional
+        Dates that return an empty DataFrame
+    """
+
+    def __init__(self, latency=0.2, fail_dates=(), empty_dates=()):
+        self.latency = latency
+        self.fail_dates = set(fail_dates)
+        self.empty_dates = set(empty_dates)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, date):
+        with self._lock:
+            self.calls.append((time.monotonic(), date))
+        time.sleep(self.latency)
+        if date in self.fail_dates:
+            raise OSError(f"simulated failure for {date}")
+        if date in self.empty_dates:
+            return pd.DataFrame()
+        return pd.DataFrame({'name': ['SJC', 'RING'], 'buy_price': [80.0, 79.0],
+                             'sell_price': [82.0, 80.5], 'date': [date, date]})
+
+    def observed_rate(self):
+        """Calls per second between the first and last call start."""
+        starts = sorted(t for t, _ in self.calls)
+        if len(starts) < 2:
+            return float('nan')
+        return (len(starts) - 1) / (starts[-1] - starts[0])
+
+    def max_calls_in_window(self, seconds=1.0):
+        """Largest number of calls that started within any window of the given length."""
+        starts = sorted(t for t, _ in self.calls)
+        best = 0
+        first = 0
+        for last in range(len(starts)):
+            while starts[last] - starts[first] >= seconds:
+                first += 1
+            best = max(best, last - first + 1)
+        return best
+
+
+def benchmark(num_dates=40, rate=5.0, latency=0.5, max_workers=4):
+    """
+    Run the scheduler against FakeDateFetcher and report the achieved call rate.
+
+    Returns:
+    --------
+    dict
+        Configured rate, observed rate, most calls started in any one second,
+        elapsed seconds and the time the serial sleep-based loop would take
+    """
+    fetcher = FakeDateFetcher(latency=latency)
+    start = datetime(2020, 1, 1)
+    end = (start + timedelta(days=num_dates - 1)).strftime("%Y-%m-%d")
+
+    t0 = time.perf_counter()
+    fetch_date_range(fetcher, start.strftime("%Y-%m-%d"), end, interval_days=1, rate=rate,
+                     max_workers=max_workers, verbose=False)
+    elapsed = time.perf_counter() - t0
+
+    return {
+        'rate': rate,
+        'observed_rate': fetcher.observed_rate(),
+        'max_calls_per_second': fetcher.max_calls_in_window(1.0),
+        'elapsed': elapsed,
+        # Former loop: each call's latency plus a 1/rate sleep between calls
+        'serial_estimate': num_dates * latency + (num_dates - 1) / rate,
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"Configured rate: {result['rate']:.2f} calls/s")
+    print(f"Observed rate: {result['observed_rate']:.2f} calls/s")
+    print(f"Most calls started in one second: {result['max_calls_per_second']}")
+    print(f"Elapsed: {result['elapsed']:.2f}s (serial loop: {result['serial_estimate']:.2f}s)")
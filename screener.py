@@ -1,7 +1,9 @@
-from vnstock import Screener
-from vnstock import Vnstock
 import pandas as pd
 
+import instrument
+from snapshots import SnapshotArchive
+from storage import DataStore
+
 symbol='VCI'
 source='VCI'
 def get_screener_data(exchange_names="HOSE,HNX,UPCOM", limit=1700):
@@ -20,10 +22,13 @@ def get_screener_data(exchange_names="HOSE,HNX,UPCOM", limit=1700):
     pandas.DataFrame
         DataFrame containing screener data for all stocks
     """
+    from vnstock import Vnstock
+
     stock = Vnstock().stock(symbol=symbol, source=source)
-    screener_df = stock.screener.stock(params={"exchangeName": exchange_names}, limit=limit)
+    screener_df = instrument.traced(stock.screener, 'screener', source=source).stock(params={"exchangeName": exchange_names}, limit=limit)
     return screener_df
 
+@instrument.timed()
 def find_heating_up_stocks(screener_df=None, exchange_names="HOSE,HNX,UPCOM", limit=1700):
     """
     Find stocks that have any non-None values in the heating_up column.
@@ -57,9 +62,114 @@ def find_heating_up_stocks(screener_df=None, exchange_names="HOSE,HNX,UPCOM", li
     
     return heating_up_stocks
 
+def save_screener_snapshot(screener_df, date=None, store=None):
+    """
+    Save a screener snapshot to the data store, partitioned by date.
+
+    Parameters:
+    -----------
+    screener_df : pandas.DataFrame
+        Screener data as returned by get_screener_data
+    date : str, optional
+        Snapshot date in 'YYYY-MM-DD' format (default: today)
+    store : storage.DataStore, optional
+        Store to write to (default: DataStore())
+    """
+    store = store or DataStore()
+    date = date or pd.Timestamp.now().strftime('%Y-%m-%d')
+    store.write('screener', screener_df.assign(date=date), partition_cols=['date'],
+                categories=['ticker', 'exchange'])
+    print(f"Saved screener snapshot of {len(screener_df)} stocks for {date}")
+
+def load_screener_snapshots(dates=None, columns=None, store=None):
+    """
+    Load stored screener snapshots.
+
+    Parameters:
+    -----------
+    dates : str or list of str, optional
+        Snapshot dates to load (default: all stored dates)
+    columns : list of str, optional
+        Columns to load (default: all)
+    store : storage.DataStore, optional
+        Store to read from (default: DataStore())
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Snapshots with a categorical 'date' column
+    """
+    store = store or DataStore()
+    filters = {'date': dates} if dates is not None else None
+    return store.read('screener', columns=columns, filters=filters)
+
+def archive_screener_snapshot(screener_df, date=None, archive=None):
+    """
+    Add a screener snapshot to the snapshot archive (stored as changes since the previous day).
+
+    Parameters:
+    -----------
+    screener_df : pandas.DataFrame
+        Screener data as returned by get_screener_data
+    date : str, optional
+        Snapshot date in 'YYYY-MM-DD' format (default: today)
+    archive : snapshots.SnapshotArchive, optional
+        Archive to add to (default: SnapshotArchive())
+    """
+    archive = archive or SnapshotArchive()
+    kind = archive.add(screener_df, date)
+    print(f"Archived screener snapshot of {len(screener_df)} stocks as a {kind}")
+
+def find_new_heating_up_stocks(date=None, previous_date=None, archive=None):
+    """
+    Find stocks that started heating up on a date, compared with the previous archived snapshot.
+
+    Parameters:
+    -----------
+    date : str, optional
+        Archived snapshot date (default: the latest)
+    previous_date : str, optional
+        Snapshot to compare against (default: the one before date)
+    archive : snapshots.SnapshotArchive, optional
+        Archive to read (default: SnapshotArchive())
+
+    Returns:
+    --------
+    list of str
+        Tickers whose heating_up signal is new on date
+    """
+    archive = archive or SnapshotArchive()
+    dates = archive.dates()
+    date = date or dates[-1]
+    if previous_date is None:
+        position = dates.index(date)
+        if position == 0:
+            return []
+        previous_date = dates[position - 1]
+    entries = archive.diff(previous_date, date, signals=['heating_up'], fields=[])['entries']
+    return entries['ticker'].tolist()
+
+def save_heating_up_stocks(heating_up_stocks, store=None):
+    """
+    Save the heating up stocks to the data store.
+
+    Parameters:
+    -----------
+    heating_up_stocks : pandas.DataFrame
+        DataFrame containing heating up stocks
+    store : storage.DataStore, optional
+        Store to write to (default: DataStore())
+    """
+    if not heating_up_stocks.empty:
+        store = store or DataStore()
+        store.write('heating_up_stocks', heating_up_stocks, categories=['ticker', 'exchange'])
+        print(f"Saved {len(heating_up_stocks)} heating up stocks to {store.root}/heating_up_stocks")
+    else:
+        print("No heating up stocks to save")
+
 def save_heating_up_stocks_to_csv(heating_up_stocks, filename="heating_up_stocks.csv"):
     """
-    Save the heating up stocks to a CSV file.
+    Explicitly export the heating up stocks to a CSV file.
     
     Parameters:
     -----------
@@ -69,7 +179,7 @@ def save_heating_up_stocks_to_csv(heating_up_stocks, filename="heating_up_stocks
         Name of the CSV file to save (default: "heating_up_stocks.csv")
     """
     if not heating_up_stocks.empty:
-        heating_up_stocks.to_csv(filename, index=False)
+        DataStore().export_csv(heating_up_stocks, filename)
         print(f"Saved {len(heating_up_stocks)} heating up stocks to {filename}")
     else:
         print("No heating up stocks to save")
@@ -94,5 +204,5 @@ if __name__ == "__main__":
         display_columns = [col for col in display_columns if col in heating_up_stocks.columns]
         print(heating_up_stocks[display_columns].head(10))  # Show only first 10 rows
         
-        # Save to CSV
-        #save_heating_up_stocks_to_csv(heating_up_stocks)
\ No newline at end of file
+        # Save to the data store
+        #save_heating_up_stocks(heating_up_stocks)
@@ -0,0 +1,484 @@
+"""
+Screener Query Engine Module
+
+This module loads a screener snapshot (as returned by screener.get_screener_data)
+into a typed columnar index and evaluates filter expressions against it without
+scanning the whole DataFrame:
+
+- numeric fields (pe, roe, market_cap, rsi14, ...) keep a sorted index, so a
+  range predicate is two binary searches
+- categorical fields (exchange, rsi14_status, breakout, price_vs_sma20, ...) keep
+  one bitmap per value, so equality and membership are bitmap lookups
+- intermediate results are packed bitmaps combined with &, | and ~
+
+Expressions are built with Field:
+
+    from screener_index import Field as F, ScreenerIndex
+
+    index = ScreenerIndex(screener_df)
+    value = (F('pe') < 15) & (F('pb') < 1.5) & (F('roe') > 15)
+    index.select(value)
+    index.tickers(F('price_vs_sma20').contains('trên') & F('exchange').isin(['HOSE']))
+
+Comparisons follow pandas: rows with missing values never match <, <=, >, >=
+or ==, and != matches everything == does not.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# Categorical fields with more distinct values than this (e.g. ticker) keep
+# integer codes instead of one bitmap per value
+MAX_BITMAP_CATEGORIES = 256
+
+
+def _pack(mask):
+    return np.packbits(mask, bitorder='little')
+
+
+def _category_value(value):
+    # Unhashable cells such as {'vi': ..., 'en': ...} dicts are indexed by their text
+    return value if isinstance(value, (str, bool, int, float, np.bool_)) else str(value)
+
+
+class Expr:
+    """Filter expression; combine with &, | and ~."""
+
+    key = None
+
+    def evaluate(self, index):
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return _BoolOp('and', (self, other))
+
+    def __or__(self, other):
+        return _BoolOp('or', (self, other))
+
+    def __invert__(self):
+        return _Not(self)
+
+    def __repr__(self):
+        return f"Expr{self.key!r}"
+
+
+class _BoolOp(Expr):
+    def __init__(self, op, operands):
+        flat = []
+        for operand in operands:
+            # (a & b) & c is evaluated as one n-ary and
+            if isinstance(operand, _BoolOp) and operand.op == op:
+                flat.extend(operand.operands)
+            else:
+                flat.append(operand)
+        self.op = op
+        self.operands = tuple(flat)
+        self.key = (op,) + tuple(operand.key for operand in flat)
+
+    def evaluate(self, index):
+        bits = index.evaluate(self.operands[0])
+        for operand in self.operands[1:]:
+            bits = (bits & index.evaluate(operand)) if self.op == 'and' else (bits | index.evaluate(operand))
+        return bits
+
+
+class _Not(Expr):
+    def __init__(self, operand):
+        self.operand = operand
+        self.key = ('not', operand.key)
+
+    def evaluate(self, index):
+        return ~index.evaluate(self.operand) & index.all_bits
+
+
+class _Predicate(Expr):
+    def __init__(self, field, op, value):
+        self.field = field
+        self.op = op
+        self.value = value
+        hashable = tuple(value) if isinstance(value, (list, tuple, set, frozenset)) else value
+        self.key = (op, field, hashable)
+
+    def evaluate(self, index):
+        return index._predicate(self.field, self.op, self.value)
+
+
+class Field:
+    """
+    Reference to a screener column for building expressions.
+
+    Parameters:
+    -----------
+    name : str
+        Column name, e.g. 'pe' or 'rsi14_status'
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __lt__(self, value):
+        return _Predicate(self.name, '<', value)
+
+    def __le__(self, value):
+        return _Predicate(self.name, '<=', value)
+
+    def __gt__(self, value):
+        return _Predicate(self.name, '>', value)
+
+    def __ge__(self, value):
+        return _Predicate(self.name, '>=', value)
+
+    def __eq__(self, value):
+        return _Predicate(self.name, '==', value)
+
+    def __ne__(self, value):
+        return ~_Predicate(self.name, '==', value)
+
+    __hash__ = None
+
+    def between(self, low, high):
+        """Inclusive range low <= value <= high."""
+        return _Predicate(self.name, 'between', (low, high))
+
+    def isin(self, values):
+        """Value is one of the given values."""
+        return _Predicate(self.name, 'isin', frozenset(values))
+
+    def contains(self, text):
+        """Categorical value contains the given text, like Series.str.contains(text, na=False)."""
+        return _Predicate(self.name, 'contains', text)
+
+    def notna(self):
+        """Value is present."""
+        return _Predicate(self.name, 'notna', None)
+
+    def isna(self):
+        """Value is missing."""
+        return ~_Predicate(self.name, 'notna', None)
+
+
+class ScreenerIndex:
+    """
+    Columnar index of one screener snapshot.
+
+    Parameters:
+    -----------
+    screener_df : pandas.DataFrame
+        Snapshot with one row per ticker
+    numeric_fields : list of str, optional
+        Columns to index as numbers (default: every numeric column)
+    categorical_fields : list of str, optional
+        Columns to index as categories (default: every other column)
+    fields : list of str, optional
+        Only index these columns, e.g. the fields a set of strategies uses
+        (default: all columns)
+    """
+
+    def __init__(self, screener_df, numeric_fields=None, categorical_fields=None, fields=None):
+        self.frame = screener_df.reset_index(drop=True)
+        columns = self.frame.columns if fields is None else [col for col in self.frame.columns if col in set(fields)]
+        self.num_rows = len(self.frame)
+        self.all_bits = _pack(np.ones(self.num_rows, dtype=bool))
+        self.tickers_array = (self.frame['ticker'].astype(str).to_numpy()
+                              if 'ticker' in self.frame.columns else np.arange(self.num_rows))
+
+        if numeric_fields is None:
+            numeric_fields = [col for col in columns
+                              if pd.api.types.is_numeric_dtype(self.frame[col])
+                              and not pd.api.types.is_bool_dtype(self.frame[col])]
+        if categorical_fields is None:
+            categorical_fields = [col for col in columns if col not in set(numeric_fields)]
+
+        self._numeric = {}
+        for col in numeric_fields:
+            values = pd.to_numeric(self.frame[col], errors='coerce').to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            # Missing values sort last and are excluded by num_valid
+            order = np.argsort(values, kind='stable')
+            self._numeric[col] = {
+                'values': values,
+                'order': order,
+                'sorted': values[order],
+                'num_valid': int(valid.sum()),
+                'valid_bits': _pack(valid),
+            }
+
+        self._categorical = {}
+        for col in categorical_fields:
+            series = self.frame[col]
+            valid = series.notna().to_numpy()
+            labels = series[valid]
+            if labels.dtype == object:
+                labels = labels.map(_category_value)
+            codes = np.full(self.num_rows, -1, dtype=np.int32)
+            codes_valid, categories = pd.factorize(labels, sort=False)
+            codes[valid] = codes_valid
+            entry = {
+                'codes': codes,
+                'categories': list(categories),
+                'lookup': {value: code for code, value in enumerate(categories)},
+                'valid_bits': _pack(valid),
+                'bitmaps': None,
+            }
+            if len(categories) <= MAX_BITMAP_CATEGORIES:
+                entry['bitmaps'] = [_pack(codes == code) for code in range(len(categories))]
+            self._categorical[col] = entry
+
+        self._empty_bits = np.zeros_like(self.all_bits)
+        self._cache = {}
+
+    @property
+    def fields(self):
+        """Indexed field names by kind."""
+        return {'numeric': list(self._numeric), 'categorical': list(self._categorical)}
+
+    def _range_bits(self, entry, lo, hi):
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[entry['order'][lo:hi]] = True
+        return _pack(mask)
+
+    def _numeric_predicate(self, entry, op, value):
+        sorted_values = entry['sorted'][:entry['num_valid']]
+        if op == 'notna':
+            return entry['valid_bits']
+        if op == 'isin':
+            bits = self._empty_bits
+            for item in value:
+                bits = bits | self._numeric_predicate(entry, '==', item)
+            return bits
+        if op == 'between':
+            low, high = value
+            lo = np.searchsorted(sorted_values, low, side='left')
+            hi = np.searchsorted(sorted_values, high, side='right')
+        elif op == '<':
+            lo, hi = 0, np.searchsorted(sorted_values, value, side='left')
+        elif op == '<=':
+            lo, hi = 0, np.searchsorted(sorted_values, value, side='right')
+        elif op == '>':
+            lo, hi = np.searchsorted(sorted_values, value, side='right'), len(sorted_values)
+        elif op == '>=':
+            lo, hi = np.searchsorted(sorted_values, value, side='left'), len(sorted_values)
+        elif op == '==':
+            lo = np.searchsorted(sorted_values, value, side='left')
+            hi = np.searchsorted(sorted_values, value, side='right')
+        else:
+            raise ValueError(f"Operator {op!r} is not supported on numeric fields")
+        return self._range_bits(entry, lo, hi)
+
+    def _codes_bits(self, entry, codes):
+        if not codes:
+            return self._empty_bits
+        if entry['bitmaps'] is not None:
+            bits = entry['bitmaps'][codes[0]]
+            for code in codes[1:]:
+                bits = bits | entry['bitmaps'][code]
+            return bits
+        return _pack(np.isin(entry['codes'], codes))
+
+    def _categorical_predicate(self, entry, op, value):
+        if op == 'notna':
+            return entry['valid_bits']
+        if op == '==':
+            code = entry['lookup'].get(_category_value(value))
+            return self._codes_bits(entry, [] if code is None else [code])
+        if op == 'isin':
+            codes = [entry['lookup'][item] for item in map(_category_value, value) if item in entry['lookup']]
+            return self._codes_bits(entry, codes)
+        if op == 'contains':
+            # Only the distinct values are scanned, not the rows
+            codes = [code for code, category in enumerate(entry['categories'])
+                     if isinstance(category, str) and value in category]
+            return self._codes_bits(entry, codes)
+        raise ValueError(f"Operator {op!r} is not supported on categorical fields")
+
+    def _predicate(self, field, op, value):
+        if field in self._numeric:
+            return self._numeric_predicate(self._numeric[field], op, value)
+        if field in self._categorical:
+            return self._categorical_predicate(self._categorical[field], op, value)
+        raise KeyError(f"Field {field!r} is not indexed")
+
+    def evaluate(self, expr):
+        """
+        Evaluate an expression to a packed bitmap, reusing earlier results.
+
+        Results are memoized by expression, so sub-expressions shared between
+        queries on the same snapshot are evaluated once.
+        """
+        bits = self._cache.get(expr.key)
+        if bits is None:
+            bits = expr.evaluate(self)
+            self._cache[expr.key] = bits
+        return bits
+
+    def mask(self, expr):
+        """Boolean mask over the snapshot rows."""
+        return np.unpackbits(self.evaluate(expr), count=self.num_rows, bitorder='little').astype(bool)
+
+    def count(self, expr):
+        """Number of matching rows."""
+        return int(np.unpackbits(self.evaluate(expr), count=self.num_rows, bitorder='little').sum())
+
+    def tickers(self, expr):
+        """Tickers of the matching rows, in snapshot order."""
+        return self.tickers_array[self.mask(expr)]
+
+    def select(self, expr, columns=None):
+        """
+        Return the matching rows of the snapshot.
+
+        Parameters:
+        -----------
+        expr : Expr
+            Filter expression
+        columns : list of str, optional
+            Columns to return (default: all)
+
+        Returns:
+        --------
+        pandas.DataFrame
+        """
+        rows = self.frame[self.mask(expr)]
+        return rows if columns is None else rows[columns]
+
+    def clear_cache(self):
+        """Forget memoized expression results."""
+        self._cache.clear()
+
+
+# Categorical values as they appear in VCI screener snapshots
+_ABOVE, _BELOW = 'Giá nằm trên SMA', 'Giá nằm dưới SMA'
+_VOL_ABOVE, _VOL_BELOW = 'Khối lượng trên SMA', 'Khối lượng dưới SMA'
+
+
+def synthetic_snapshot(num_rows=1700, seed=0):
+    """
+    Build a synthetic screener snapshot with ScreenerDocs.md columns.
+
+    Used for benchmarks and offline runs; values are random but have the types
+    and rough distributions of a real VCI snapshot.
+
+    Returns:
+    --------
+    pandas.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+
+    def numeric(low, high, missing=0.1):
+        values = rng.uniform(low, high, num_rows)
+        values[rng.random(num_rows) < missing] = np.nan
+        return values
+
+    def choice(options, p=None, missing=0.0):
+        values = rng.choice(np.array(options, dtype=object), num_rows, p=p)
+        values[rng.random(num_rows) < missing] = None
+        return values
+
+    data = {
+        'ticker': [f"T{i:04d}" for i in range(num_rows)],
+        'exchange': choice(['HOSE', 'HNX', 'UPCOM'], p=[0.25, 0.2, 0.55]),
+        'industry_name': choice([f"Industry {i}" for i in range(20)]),
+        'price': numeric(1, 150, 0.0) * 1000,
+        'change_percent': numeric(-7, 7, 0.0),
+        'volume': rng.integers(0, 5_000_000, num_rows).astype(float),
+        'market_cap': numeric(10, 200_000, 0.02),
+        'pe': numeric(-20, 60, 0.2),
+        'pb': numeric(0.2, 6, 0.15),
+        'roe': numeric(-30, 40, 0.15),
+        'eps': numeric(-2000, 8000, 0.15),
+        'dividend_yield': numeric(0, 12, 0.3),
+        'rsi14': numeric(10, 90, 0.05),
+        'macd_histogram': numeric(-2, 2, 0.05),
+        'num_increase_continuous_day': rng.integers(0, 8, num_rows).astype(float),
+        'num_decrease_continuous_day': rng.integers(0, 8, num_rows).astype(float),
+        'price_growth_1w': numeric(-20, 20, 0.05),
+        'price_growth_1m': numeric(-40, 40, 0.05),
+        'rel_strength_3m': numeric(0, 100, 0.05),
+        'rsi14_status': choice(['Trung tính', 'Quá mua', 'Quá bán'], p=[0.8, 0.1, 0.1], missing=0.05),
+        'breakout': choice(['Vượt đỉnh', 'Không'], p=[0.05, 0.95], missing=0.3),
+        'uptrend': choice(['Xu hướng tăng', 'Xu hướng giảm', 'Đi ngang'], missing=0.1),
+        'heating_up': choice(["{'vi': 'Tăng nóng vào phiên hôm trước', "
+                              "'en': 'Overheated in previous trading session'}"], missing=0.97),
+        'tcbs_recommend': choice(['Mua', 'Bán', 'Nắm giữ'], missing=0.4),
+    }
+    for window in (5, 10, 20, 50, 100):
+        data[f'price_vs_sma{window}'] = choice([_ABOVE + str(window), _BELOW + str(window)], missing=0.05)
+    for window in (5, 10, 20, 50):
+        data[f'vol_vs_sma{window}'] = choice([_VOL_ABOVE + str(window), _VOL_BELOW + str(window)], missing=0.05)
+    return pd.DataFrame(data)
+
+
+def benchmark(num_rows=1700, repeat=200):
+    """
+    Time the ScreenerDocs.md example strategies as pandas masks and as indexed queries.
+
+    Index results are recomputed on every run (the memo is cleared), so the
+    timings compare evaluation work rather than cache lookups.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per strategy with microseconds per evaluation for both approaches
+    """
+    df = synthetic_snapshot(num_rows)
+    t0 = time.perf_counter()
+    index = ScreenerIndex(df)
+    build_seconds = time.perf_counter() - t0
+
+    F = Field
+    strategies = {
+        'momentum': (
+            lambda d: d[d['price_vs_sma20'].str.contains('trên', na=False)
+                        & d['price_vs_sma50'].str.contains('trên', na=False)
+                        & (d['rsi14'] > 50) & (d['change_percent'] > 0)],
+            F('price_vs_sma20').contains('trên') & F('price_vs_sma50').contains('trên')
+            & (F('rsi14') > 50) & (F('change_percent') > 0),
+        ),
+        'volume_breakout': (
+            lambda d: d[d['vol_vs_sma20'].str.contains('trên', na=False)
+                        & d['price_vs_sma20'].str.contains('trên', na=False)
+                        & (d['num_increase_continuous_day'] >= 2)],
+            F('vol_vs_sma20').contains('trên') & F('price_vs_sma20').contains('trên')
+            & (F('num_increase_continuous_day') >= 2),
+        ),
+        'value': (
+            lambda d: d[(d['pe'] < 15) & (d['pb'] < 1.5) & (d['dividend_yield'] > 3) & (d['roe'] > 15)],
+            (F('pe') < 15) & (F('pb') < 1.5) & (F('dividend_yield') > 3) & (F('roe') > 15),
+        ),
+        'heating_up': (
+            lambda d: d[pd.notna(d['heating_up'])],
+            F('heating_up').notna(),
+        ),
+    }
+
+    rows = []
+    for name, (pandas_filter, expr) in strategies.items():
+        expected = pandas_filter(df)['ticker'].tolist()
+        index.clear_cache()
+        assert index.tickers(expr).tolist() == expected, name
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            pandas_filter(df)
+        pandas_us = (time.perf_counter() - t0) / repeat * 1e6
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            index.clear_cache()
+            index.evaluate(expr)
+        index_us = (time.perf_counter() - t0) / repeat * 1e6
+
+        rows.append({'strategy': name, 'matches': len(expected), 'pandas_us': pandas_us,
+                     'index_us': index_us, 'speedup': pandas_us / index_us})
+
+    result = pd.DataFrame(rows)
+    result.attrs['build_seconds'] = build_seconds
+    return result
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"Index built in {result.attrs['build_seconds'] * 1000:.1f} ms")
+    print(result.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
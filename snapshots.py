@@ -0,0 +1,494 @@
+"""
+Screener Snapshot Archive Module
+
+This module keeps a history of daily screener snapshots and answers "what
+changed" questions between any two days, e.g. which tickers newly started
+heating up today.
+
+Snapshots are stored through storage.DataStore (Parquet/zstd). Every
+`keyframe_every` days, or when the set of columns changes, the full snapshot is
+stored as a keyframe; the days in between only store the cells that changed
+since the previous day, plus the tickers that were added or removed. A snapshot
+is rebuilt from its keyframe and the following deltas, and recently rebuilt
+snapshots are kept in memory so diffs over nearby days are cheap.
+
+Rebuilt snapshots are sorted by ticker. Numeric columns come back as float64
+and other columns as strings (cells such as the heating_up dicts are stored
+as their text).
+"""
+
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from storage import DataStore
+
+DEFAULT_ARCHIVE_DIR = os.path.join('data', 'screener_archive')
+
+# Days between full snapshots; at most keyframe_every - 1 deltas are applied
+# to rebuild a day
+KEYFRAME_EVERY = 20
+
+# Rebuilt snapshots kept in memory
+STATE_CACHE_SIZE = 8
+
+# Screener columns treated as signals by diff(): a ticker enters a signal when
+# the column gets a new non-missing value and exits when it loses one
+SIGNAL_COLUMNS = [
+    'heating_up', 'breakout', 'uptrend', 'price_break_out52_week', 'price_wash_out52_week',
+    'rsi14_status', 'bolling_band_signal', 'dmi_signal', 'tcbs_recommend', 'tcbs_buy_sell_signal',
+]
+
+CHANGE_COLUMNS = ['ticker', 'field', 'old', 'new']
+SIGNAL_EVENT_COLUMNS = ['signal', 'ticker', 'old', 'new']
+DELTA_COLUMNS = ['ticker', 'field', 'num_value', 'str_value']
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+class _State:
+    """One snapshot as a ticker index plus one array per column."""
+
+    def __init__(self, tickers, columns, kinds):
+        self.tickers = tickers
+        self.columns = columns
+        self.kinds = kinds
+
+    @classmethod
+    def from_frame(cls, screener_df, kinds=None):
+        df = screener_df.drop_duplicates('ticker', keep='last')
+        df = df.assign(ticker=df['ticker'].astype(str)).sort_values('ticker')
+        tickers = pd.Index(df['ticker'].to_numpy(dtype=object))
+        columns = {}
+        derived_kinds = {}
+        for col in df.columns:
+            if col == 'ticker':
+                continue
+            series = df[col]
+            kind = (kinds or {}).get(col)
+            if kind is None:
+                kind = 'num' if pd.api.types.is_numeric_dtype(series) else 'str'
+            if kind == 'num':
+                columns[col] = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+            else:
+                columns[col] = np.array([_text(value) for value in series.to_numpy(dtype=object)], dtype=object)
+            derived_kinds[col] = kind
+        return cls(tickers, columns, derived_kinds)
+
+    def copy(self):
+        return _State(self.tickers, {col: values.copy() for col, values in self.columns.items()},
+                      dict(self.kinds))
+
+    def to_frame(self, columns=None):
+        names = list(self.columns) if columns is None else [col for col in columns if col in self.columns]
+        data = {'ticker': self.tickers.to_numpy()}
+        data.update({col: self.columns[col] for col in names})
+        return pd.DataFrame(data)
+
+
+def _cell_changes(old_values, new_values, kind):
+    """Positions where two aligned columns differ, treating missing == missing."""
+    if kind == 'num':
+        same = (old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values))
+    else:
+        same = old_values == new_values
+    return np.flatnonzero(~same)
+
+
+class _Events:
+    """Collects changed cells column by column and builds one DataFrame at the end."""
+
+    def __init__(self):
+        self.parts = []
+
+    def add(self, col, tickers, old_values, new_values, rows):
+        if len(rows):
+            self.parts.append((np.full(len(rows), col, dtype=object), tickers[rows],
+                               old_values[rows].astype(object), new_values[rows].astype(object)))
+
+    def frame(self, columns):
+        # columns picks and orders the output columns, e.g. CHANGE_COLUMNS
+        if not self.parts:
+            return pd.DataFrame(columns=columns)
+        cols, tickers, old, new = (np.concatenate(arrays) for arrays in zip(*self.parts))
+        data = {'signal': cols, 'field': cols, 'ticker': tickers, 'old': old, 'new': new}
+        return pd.DataFrame({name: data[name] for name in columns})
+
+
+def _align(old, new):
+    """Row positions of the tickers both states share."""
+    common = old.tickers.intersection(new.tickers, sort=False)
+    return common, old.tickers.get_indexer(common), new.tickers.get_indexer(common)
+
+
+class SnapshotArchive:
+    """
+    Append-only archive of daily screener snapshots with a diff API.
+
+    Parameters:
+    -----------
+    root : str
+        Directory of the archive (default: DEFAULT_ARCHIVE_DIR)
+    keyframe_every : int
+        Days between full snapshots (default: KEYFRAME_EVERY)
+    """
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, keyframe_every=KEYFRAME_EVERY):
+        self.root = root
+        self.keyframe_every = keyframe_every
+        self.store = DataStore(root, fmt='parquet')
+        self._index_path = os.path.join(root, 'index.json')
+        self._entries = []
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self._entries = json.load(f)
+        self._states = OrderedDict()
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f'{self._index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self._index_path)
+
+    def dates(self):
+        """Archived snapshot dates, oldest first."""
+        return [entry['date'] for entry in self._entries]
+
+    def _position(self, date):
+        date = pd.Timestamp(date).strftime('%Y-%m-%d')
+        for position, entry in enumerate(self._entries):
+            if entry['date'] == date:
+                return position
+        raise KeyError(f"No snapshot archived for {date}")
+
+    def _remember(self, date, state):
+        self._states[date] = state
+        self._states.move_to_end(date)
+        while len(self._states) > STATE_CACHE_SIZE:
+            self._states.popitem(last=False)
+
+    def add(self, screener_df, date=None):
+        """
+        Archive a snapshot.
+
+        Parameters:
+        -----------
+        screener_df : pandas.DataFrame
+            Screener data as returned by screener.get_screener_data
+        date : str, optional
+            Snapshot date in 'YYYY-MM-DD' format (default: today). It must be
+            after every archived date, or equal to the last one to replace it.
+
+        Returns:
+        --------
+        str
+            'keyframe' or 'delta', how the snapshot was stored
+        """
+        date = pd.Timestamp(date or pd.Timestamp.now()).strftime('%Y-%m-%d')
+        if self._entries and date < self._entries[-1]['date']:
+            raise ValueError(f"Snapshots are appended in date order; {date} is before "
+                             f"{self._entries[-1]['date']}")
+        if self._entries and date == self._entries[-1]['date']:
+            self._drop_last()
+
+        previous = self._state(self._entries[-1]['date']) if self._entries else None
+        state = _State.from_frame(screener_df, previous.kinds if previous is not None else None)
+        since_keyframe = 0
+        for entry in reversed(self._entries):
+            if entry['kind'] == 'keyframe':
+                break
+            since_keyframe += 1
+
+        keyframe = (previous is None or since_keyframe + 1 >= self.keyframe_every
+                    or list(state.columns) != list(previous.columns)
+                    or state.kinds != previous.kinds)
+        if keyframe:
+            self.store.write(f'keyframe/{date}', state.to_frame(), categories=['ticker'])
+            entry = {'date': date, 'kind': 'keyframe', 'kinds': state.kinds}
+        else:
+            delta, added, removed = self._delta(previous, state)
+            self.store.write(f'delta/{date}', delta, categories=['ticker', 'field'])
+            entry = {'date': date, 'kind': 'delta', 'added': added, 'removed': removed}
+
+        self._entries.append(entry)
+        self._save_index()
+        self._remember(date, state)
+        return entry['kind']
+
+    def _drop_last(self):
+        entry = self._entries.pop()
+        self.store.delete(f"{entry['kind']}/{entry['date']}")
+        self._states.pop(entry['date'], None)
+
+    @staticmethod
+    def _delta(old, new):
+        common, old_rows, new_rows = _align(old, new)
+        added = new.tickers.difference(old.tickers, sort=False)
+        removed = old.tickers.difference(new.tickers, sort=False)
+        added_rows = new.tickers.get_indexer(added)
+
+        tickers, fields, num_values, str_values = [], [], [], []
+        for col, kind in new.kinds.items():
+            new_values = new.columns[col]
+            changed = new_rows[_cell_changes(old.columns[col][old_rows], new_values[new_rows], kind)]
+            # Added tickers carry all their non-missing cells
+            present = added_rows[pd.notna(new_values[added_rows])]
+            rows = np.concatenate([changed, present])
+            if not len(rows):
+                continue
+            tickers.append(new.tickers.to_numpy()[rows])
+            fields.append(np.full(len(rows), col, dtype=object))
+            values = new_values[rows]
+            if kind == 'num':
+                num_values.append(values)
+                str_values.append(np.full(len(rows), None, dtype=object))
+            else:
+                num_values.append(np.full(len(rows), np.nan))
+                str_values.append(values)
+
+        if tickers:
+            delta = pd.DataFrame({
+                'ticker': np.concatenate(tickers),
+                'field': np.concatenate(fields),
+                'num_value': np.concatenate(num_values),
+                'str_value': np.concatenate(str_values),
+            })
+        else:
+            delta = pd.DataFrame({col: pd.Series(dtype=object if col in ('ticker', 'field', 'str_value')
+                                                 else float) for col in DELTA_COLUMNS})
+        return delta, list(added), list(removed)
+
+    def _apply(self, state, entry):
+        delta = self.store.read(f"delta/{entry['date']}")
+        state = state.copy()
+
+        if entry['removed'] or entry['added']:
+            keep = ~state.tickers.isin(entry['removed'])
+            tickers = state.tickers[keep].append(pd.Index(entry['added'], dtype=object))
+            order = np.argsort(tickers.to_numpy(dtype=str), kind='stable')
+            for col, values in state.columns.items():
+                filler = np.full(len(entry['added']), np.nan if state.kinds[col] == 'num' else None,
+                                 dtype=values.dtype)
+                state.columns[col] = np.concatenate([values[keep], filler])[order]
+            state.tickers = tickers[order]
+
+        if not delta.empty:
+            rows = state.tickers.get_indexer(delta['ticker'].astype(str))
+            fields = delta['field'].astype(str).to_numpy()
+            num_values = delta['num_value'].to_numpy(dtype=float)
+            str_values = delta['str_value'].to_numpy(dtype=object)
+            order = np.argsort(fields, kind='stable')
+            boundaries = np.flatnonzero(fields[order][1:] != fields[order][:-1]) + 1
+            for group in np.split(order, boundaries):
+                col = fields[group[0]]
+                if state.kinds[col] == 'num':
+                    state.columns[col][rows[group]] = num_values[group]
+                else:
+                    state.columns[col][rows[group]] = [_text(value) for value in str_values[group]]
+        return state
+
+    def _state(self, date):
+        position = self._position(date)
+        entry = self._entries[position]
+        if entry['date'] in self._states:
+            self._states.move_to_end(entry['date'])
+            return self._states[entry['date']]
+
+        # Walk back to a rebuilt day or the keyframe, then replay deltas forward
+        start = position
+        while self._entries[start]['kind'] != 'keyframe' and self._entries[start]['date'] not in self._states:
+            start -= 1
+        start_entry = self._entries[start]
+        if start_entry['date'] in self._states:
+            state = self._states[start_entry['date']]
+        else:
+            frame = self.store.read(f"keyframe/{start_entry['date']}")
+            state = _State.from_frame(frame, start_entry['kinds'])
+            self._remember(start_entry['date'], state)
+        for step in range(start + 1, position + 1):
+            state = self._apply(state, self._entries[step])
+            self._remember(self._entries[step]['date'], state)
+        return state
+
+    def snapshot(self, date, columns=None):
+        """
+        Rebuild the snapshot of one day.
+
+        Parameters:
+        -----------
+        date : str
+            Archived date
+        columns : list of str, optional
+            Columns to return besides 'ticker' (default: all)
+
+        Returns:
+        --------
+        pandas.DataFrame
+            One row per ticker, sorted by ticker
+        """
+        return self._state(date).to_frame(columns)
+
+    def diff(self, old_date, new_date, signals=None, fields=None):
+        """
+        Compare two archived snapshots.
+
+        Parameters:
+        -----------
+        old_date, new_date : str
+            Archived dates to compare
+        signals : list of str, optional
+            Signal columns for entries/exits (default: SIGNAL_COLUMNS present)
+        fields : list of str, optional
+            Columns reported in 'changes' (default: all)
+
+        Returns:
+        --------
+        dict
+            'entries': tickers whose signal got a new non-missing value, with
+            columns SIGNAL_EVENT_COLUMNS
+            'exits': tickers whose signal value went away or was replaced
+            'changes': every changed cell of tickers in both snapshots, with
+            columns CHANGE_COLUMNS
+            'added', 'removed': tickers only in the new or the old snapshot;
+            entries, exits and changes cover tickers in both
+        """
+        old = self._state(old_date)
+        new = self._state(new_date)
+        common, old_rows, new_rows = _align(old, new)
+        common_tickers = common.to_numpy()
+        shared = [col for col in new.columns if col in old.columns]
+
+        if signals is None:
+            signals = [col for col in SIGNAL_COLUMNS if col in shared]
+        entries, exits = _Events(), _Events()
+        for col in signals:
+            old_values = old.columns[col][old_rows]
+            new_values = new.columns[col][new_rows]
+            changed = _cell_changes(old_values, new_values, old.kinds[col])
+            entries.add(col, common_tickers, old_values, new_values,
+                        changed[pd.notna(new_values[changed])])
+            exits.add(col, common_tickers, old_values, new_values,
+                      changed[pd.notna(old_values[changed])])
+
+        changes = _Events()
+        for col in (shared if fields is None else fields):
+            old_values = old.columns[col][old_rows]
+            new_values = new.columns[col][new_rows]
+            changes.add(col, common_tickers, old_values, new_values,
+                        _cell_changes(old_values, new_values, old.kinds[col]))
+
+        return {
+            'entries': entries.frame(SIGNAL_EVENT_COLUMNS),
+            'exits': exits.frame(SIGNAL_EVENT_COLUMNS),
+            'changes': changes.frame(CHANGE_COLUMNS),
+            'added': list(new.tickers.difference(old.tickers, sort=False)),
+            'removed': list(old.tickers.difference(new.tickers, sort=False)),
+        }
+
+    def size(self):
+        """Bytes used by the archive on disk."""
+        total = 0
+        for directory, _, files in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return total
+
+
+def evolve_snapshot(screener_df, rng):
+    """
+    Produce the next day's synthetic snapshot: prices and technicals move for
+    most tickers, signals flip for a few and fundamentals rarely change.
+    """
+    df = screener_df.copy()
+    n = len(df)
+    moves = rng.normal(0, 0.02, n)
+    df['change_percent'] = np.round(moves * 100, 2)
+    df['price'] = np.round(df['price'] * (1 + moves), -1)
+    for col in ('market_cap', 'pe', 'pb'):
+        df[col] = np.round(df[col] * (1 + moves), 2)
+    df['volume'] = np.round(df['volume'] * rng.uniform(0.5, 1.5, n))
+    for col, scale in (('rsi14', 3), ('macd_histogram', 0.1), ('price_growth_1w', 2),
+                       ('price_growth_1m', 1), ('rel_strength_3m', 2)):
+        df[col] = np.round(df[col] + rng.normal(0, scale, n), 2)
+    for col in ('roe', 'eps', 'dividend_yield'):
+        update = rng.random(n) < 0.01
+        df.loc[update, col] = np.round(df.loc[update, col] * rng.uniform(0.8, 1.2, update.sum()), 2)
+    for col in ('rsi14_status', 'breakout', 'uptrend', 'heating_up', 'tcbs_recommend',
+                'num_increase_continuous_day', 'num_decrease_continuous_day',
+                'price_vs_sma5', 'price_vs_sma10', 'price_vs_sma20', 'vol_vs_sma5', 'vol_vs_sma20'):
+        flip = rng.random(n) < 0.05
+        df.loc[flip, col] = rng.permutation(df[col].to_numpy())[:flip.sum()]
+    return df
+
+
+def benchmark(days=250, num_rows=1700, root=os.path.join('.cache', 'snapshot_bench')):
+    """
+    Archive a year of synthetic daily snapshots and compare the size with raw CSV.
+
+    Returns:
+    --------
+    dict
+        CSV and archive sizes, archive time per day and diff timings
+    """
+    from screener_index import synthetic_snapshot
+
+    if days < 3:
+        raise ValueError("benchmark needs at least 3 days to time diffs")
+    shutil.rmtree(root, ignore_errors=True)
+    rng = np.random.default_rng(1)
+    archive = SnapshotArchive(root)
+    dates = pd.bdate_range('2024-01-01', periods=days).strftime('%Y-%m-%d')
+
+    snapshot = synthetic_snapshot(num_rows)
+    csv_bytes = 0
+    add_seconds = 0.0
+    for position, date in enumerate(dates):
+        if position:
+            snapshot = evolve_snapshot(snapshot, rng)
+        csv_bytes += len(snapshot.to_csv(index=False).encode('utf-8'))
+        t0 = time.perf_counter()
+        archive.add(snapshot, date)
+        add_seconds += time.perf_counter() - t0
+
+    # Check the last day rebuilds exactly from a cold archive
+    cold = SnapshotArchive(root)
+    rebuilt = cold.snapshot(dates[-1])
+    expected = _State.from_frame(snapshot).to_frame()
+    pd.testing.assert_frame_equal(rebuilt, expected, check_dtype=False)
+
+    cold = SnapshotArchive(root)
+    t0 = time.perf_counter()
+    cold.diff(dates[-3], dates[-2])
+    cold_adjacent = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    cold.diff(dates[-2], dates[-1])
+    warm_adjacent = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    cold.diff(dates[0], dates[-1])
+    far_apart = time.perf_counter() - t0
+
+    archive_bytes = archive.size()
+    shutil.rmtree(root)
+    return {
+        'csv_mb': csv_bytes / 1e6,
+        'archive_mb': archive_bytes / 1e6,
+        'size_ratio': archive_bytes / csv_bytes,
+        'add_ms_per_day': add_seconds / days * 1000,
+        'diff_cold_ms': cold_adjacent * 1000,
+        'diff_next_day_ms': warm_adjacent * 1000,
+        'diff_far_apart_ms': far_apart * 1000,
+    }
+
+
+if __name__ == "__main__":
+    for key, value in benchmark().items():
+        print(f"{key}: {value:.3f}")
@@ -0,0 +1,646 @@
+"""
+Incremental Financial Statement Refresh Module
+
+This module keeps the statement warehouse (warehouse.py) up to date for the
+whole listing without reloading every company's full history. For each
+symbol and statement it compares the latest stored period with the latest
+period that should have been reported by now (quarter end plus the
+reporting deadline), and:
+
+- skips statements that are already up to date;
+- asks the source for recent periods only when it can and the history is
+  already stored (TCBS, by passing get_all=False to each report call; its
+  Finance constructor and the generic Finance wrapper drop that argument);
+- probes one statement (IncomeStatement) first, and only fetches the others
+  when the probe shows a new or restated period;
+- merges only new periods and recent periods whose values changed, and
+  records every changed value as a restatement.
+
+Calls run concurrently under a shared per-source rate limit. Results are
+written to the warehouse in batches, so an interrupted run resumes by
+simply running again: statements written before the interruption are up to
+date and skipped.
+
+    python statement_refresh.py --period quarter      # whole listing
+    python statement_refresh.py ACB VCB --period year
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from fetcher import TRANSIENT_ERRORS, call_with_retries
+from ratelimit import get_source_limiter
+from warehouse import LONG_COLUMNS, StatementWarehouse, normalize_statements
+
+# Statement name -> (finance method, keyword arguments), as in fs.py
+STATEMENT_METHODS = {
+    'BalanceSheet': ('balance_sheet', {'lang': 'vi', 'dropna': True}),
+    'IncomeStatement': ('income_statement', {'lang': 'vi', 'dropna': True}),
+    'CashFlow': ('cash_flow', {'dropna': True}),
+    'Ratio': ('ratio', {'lang': 'vi', 'dropna': True}),
+}
+
+# Arguments a source does not take; vnstock drops them with a log line per call
+UNSUPPORTED_KWARGS = {
+    'TCBS': ('lang', 'dropna'),
+}
+
+# Statement fetched first; the others are only fetched when it changed
+PROBE_STATEMENT = 'IncomeStatement'
+
+# Days after the end of a period by which listed companies must report it
+REPORTING_LAG_DAYS = {'quarter': 45, 'year': 90}
+
+RESTATEMENT_COLUMNS = ['symbol', 'statement', 'period', 'item', 'old_value', 'new_value']
+
+FAILURE_COLUMNS = ['symbol', 'statement', 'error_type', 'error', 'attempts']
+
+# Warehouse dataset collecting detected restatements
+RESTATEMENTS_DATASET = 'restatements'
+
+
+def _tcbs_finance(symbol):
+    from vnstock.explorer.tcbs.financial import Finance
+    return Finance(symbol)
+
+
+def _tcbs_recent(finance, method, period):
+    # get_all given to the constructor is ignored: every report method has its
+    # own get_all=True default, so it is passed on each call
+    if method == 'ratio':
+        return finance.ratio(period=period, get_all=False)
+    return finance._get_report(method, period=period, get_all=False)
+
+
+# Sources that can return their most recent periods only: source ->
+# (function (symbol) -> finance object, function (finance, method, period) ->
+# recent periods of one statement)
+RECENT_ONLY_CALLS = {
+    'TCBS': (_tcbs_finance, _tcbs_recent),
+}
+
+
+def expected_period(today=None, period='quarter', lag_days=None):
+    """
+    Latest period whose reporting deadline has passed.
+
+    Parameters:
+    -----------
+    today : str or pandas.Timestamp, optional
+        Reference day (default: today)
+    period : str
+        'quarter' or 'year' (default: 'quarter')
+    lag_days : int, optional
+        Days from the end of a period to its deadline (default: REPORTING_LAG_DAYS)
+
+    Returns:
+    --------
+    str
+        Period label as used by the warehouse, e.g. '2025Q1' or '2024'
+    """
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.now()).normalize()
+    lag = REPORTING_LAG_DAYS[period] if lag_days is None else lag_days
+    reference = today - pd.Timedelta(days=lag)
+    if period == 'quarter':
+        quarter = pd.Period(reference, freq='Q') - 1
+        return f'{quarter.year}Q{quarter.quarter}'
+    return str(reference.year - 1)
+
+
+class VnstockStatements:
+    """
+    Statement fetcher backed by vnstock's finance objects, one per symbol.
+    Recent-only calls go through the source's entry in RECENT_ONLY_CALLS when
+    there is one, and fetch everything otherwise.
+
+    Parameters:
+    -----------
+    source : str
+        Data source, 'TCBS' or 'VCI' (default: 'TCBS')
+    finance_factory : callable, optional
+        Function (symbol, recent_only) -> finance object. Defaults to the
+        source's own Finance for recent-only calls and to vnstock's Finance
+        wrapper otherwise; pass a stub to run without network access.
+    """
+
+    def __init__(self, source='TCBS', finance_factory=None):
+        self.source = source
+        self.supports_recent_only = source in RECENT_ONLY_CALLS
+        self.finance_factory = finance_factory or self._vnstock_finance
+        self._finance = {}
+        self._lock = threading.Lock()
+
+    def _vnstock_finance(self, symbol, recent_only):
+        if recent_only:
+            return RECENT_ONLY_CALLS[self.source][0](symbol)
+        from vnstock import Vnstock
+        return Vnstock().stock(symbol=symbol, source=self.source).finance
+
+    def _finance_for(self, symbol, recent_only):
+        with self._lock:
+            finance = self._finance.get((symbol, recent_only))
+        if finance is None:
+            finance = self.finance_factory(symbol, recent_only)
+            with self._lock:
+                self._finance[(symbol, recent_only)] = finance
+        return finance
+
+    def __call__(self, symbol, statement, period, recent_only):
+        method, kwargs = STATEMENT_METHODS[statement]
+        recent_only = recent_only and self.supports_recent_only
+        finance = self._finance_for(symbol, recent_only)
+        if recent_only:
+            with instrument.span(f'finance.{method}', source=self.source, symbol=symbol) as s:
+                return s.result(RECENT_ONLY_CALLS[self.source][1](finance, method, period))
+        unsupported = UNSUPPORTED_KWARGS.get(self.source, ())
+        kwargs = {key: value for key, value in kwargs.items() if key not in unsupported}
+        finance = instrument.traced(finance, 'finance', source=self.source, symbol=symbol)
+        return getattr(finance, method)(period=period, **kwargs)
+
+
+def listed_symbols(source='VCI'):
+    """Return every listed symbol from vnstock's listing."""
+    from vnstock import Listing
+    listing = instrument.traced(Listing(source=source), 'listing', source=source).all_symbols()
+    column = 'symbol' if 'symbol' in listing.columns else 'ticker'
+    return listing[column].astype(str).tolist()
+
+
+class _Stored:
+    """Stored rows of one statement, looked up by symbol."""
+
+    def __init__(self, warehouse, statement, kind):
+        self.long = warehouse.long(statement)
+        self.latest = warehouse.latest_periods(statement, kind)
+        self._positions = self.long.groupby('symbol', observed=True).indices if not self.long.empty else {}
+
+    def latest_period(self, symbol):
+        return self.latest.get(symbol)
+
+    def rows(self, symbols):
+        """Long rows stored for the given symbols."""
+        positions = [self._positions[symbol] for symbol in symbols if symbol in self._positions]
+        if not positions:
+            return pd.DataFrame(columns=LONG_COLUMNS)
+        rows = self.long.iloc[np.concatenate(positions)]
+        return rows.astype({'symbol': str, 'period': str, 'item': str}).reset_index(drop=True)
+
+
+def compare_periods(stored, fetched, kind, window=4, tolerance=1e-6):
+    """
+    Find the new and restated periods in freshly fetched statement rows.
+
+    Parameters:
+    -----------
+    stored, fetched : pandas.DataFrame
+        Long (symbol, period, item, value) rows already stored and just
+        fetched, for any number of symbols
+    kind : str
+        'quarter' or 'year'; periods of the other kind are ignored
+    window : int
+        Number of most recent stored periods per symbol checked for
+        restatements (default: 4)
+    tolerance : float
+        Relative difference below which values are equal (default: 1e-6)
+
+    Returns:
+    --------
+    tuple of pandas.DataFrame
+        New (symbol, period) pairs, restated (symbol, period) pairs, and one
+        row per changed value with 'symbol', 'period', 'item', 'old_value'
+        and 'new_value'
+    """
+    keys = ['symbol', 'period']
+    quarterly = kind == 'quarter'
+    fetched = fetched[fetched['period'].astype(str).str.contains('Q', regex=False) == quarterly]
+    stored = stored[stored['period'].astype(str).str.contains('Q', regex=False) == quarterly]
+
+    fetched_pairs = fetched[keys].drop_duplicates()
+    stored_pairs = stored[keys].drop_duplicates()
+    latest = fetched_pairs['symbol'].map(stored_pairs.groupby('symbol')['period'].max()).fillna('')
+    new = fetched_pairs[fetched_pairs['period'] > latest].reset_index(drop=True)
+
+    recent = stored_pairs.sort_values('period', ascending=False).groupby('symbol').head(window)
+    recent = recent.merge(fetched_pairs, on=keys) if window else recent.iloc[:0]
+    changes = pd.DataFrame(columns=keys + ['item', 'old_value', 'new_value'])
+    if not recent.empty:
+        merged = pd.merge(
+            stored.merge(recent, on=keys).rename(columns={'value': 'old_value'}),
+            fetched.merge(recent, on=keys).rename(columns={'value': 'new_value'}),
+            on=keys + ['item'], how='outer',
+        )
+        old = merged['old_value'].to_numpy(dtype=float)
+        current = merged['new_value'].to_numpy(dtype=float)
+        same = np.isclose(old, current, rtol=tolerance, atol=0) | (np.isnan(old) & np.isnan(current))
+        changes = merged[~same].sort_values(keys + ['item']).reset_index(drop=True)
+    return new, changes[keys].drop_duplicates().reset_index(drop=True), changes
+
+
+def _fetch_statement(fetch, symbol, statement, period, recent_only, limiter, retries, backoff, retry_on):
+    """Fetch one statement with retries. Returns (data, attempts, error)."""
+    method, _ = STATEMENT_METHODS[statement]
+    return call_with_retries(
+        lambda: fetch(symbol, statement, period, recent_only),
+        limiter, retries, backoff, retry_on, f'finance.{method}', symbol=symbol,
+    )
+
+
+@instrument.timed()
+def refresh_statements(symbols=None, period='quarter', statements=tuple(STATEMENT_METHODS), warehouse=None,
+                       source='TCBS', fetch=None, today=None, force=False, restatement_window=4,
+                       tolerance=1e-6, max_workers=8, rate_limit=None, retries=3, backoff=0.5,
+                       retry_on=TRANSIENT_ERRORS, batch_size=500, verbose=True):
+    """
+    Bring the warehouse up to date with newly reported and restated periods.
+
+    Parameters:
+    -----------
+    symbols : list of str, optional
+        Symbols to refresh (default: the whole listing)
+    period : str
+        'quarter' or 'year' (default: 'quarter')
+    statements : tuple of str
+        Statements to refresh (default: every statement in STATEMENT_METHODS)
+    warehouse : warehouse.StatementWarehouse, optional
+        Warehouse to update (default: StatementWarehouse())
+    source : str
+        Data source (default: 'TCBS', which can return recent periods only)
+    fetch : callable, optional
+        Function (symbol, statement, period, recent_only) -> wide statement
+        frame; recent_only is only requested when its supports_recent_only
+        attribute is true. Defaults to VnstockStatements(source); pass a stub
+        to run without network access.
+    today : str, optional
+        Reference day for the expected period (default: today)
+    force : bool
+        Fetch every statement, even when it is up to date (default: False)
+    restatement_window : int
+        Most recent stored periods checked for restatements (default: 4)
+    tolerance : float
+        Relative difference below which values are equal (default: 1e-6)
+    max_workers : int
+        Maximum number of calls in flight at once (default: 8)
+    rate_limit : float, optional
+        Calls per second to the source, shared with every other fetcher using
+        the same source. None disables rate limiting (default: None)
+    retries : int
+        Maximum attempts per call, including the first one (default: 3)
+    backoff : float
+        Base of the exponential backoff between attempts, in seconds (default: 0.5)
+    retry_on : tuple of Exception types
+        Exceptions treated as transient and retried (default: TRANSIENT_ERRORS)
+    batch_size : int
+        Fetched statements compared and written to the warehouse together;
+        an interrupted run loses at most one batch (default: 500)
+    verbose : bool
+        Print progress (default: True)
+
+    Returns:
+    --------
+    tuple of (dict, pandas.DataFrame, pandas.DataFrame)
+        Run summary (calls made and skipped, new and restated periods, rows
+        fetched and written), the restatements found (columns:
+        RESTATEMENT_COLUMNS) and the failed calls (columns: FAILURE_COLUMNS)
+    """
+    warehouse = warehouse or StatementWarehouse()
+    fetch = fetch or VnstockStatements(source)
+    symbols = list(symbols) if symbols is not None else listed_symbols()
+    limiter = get_source_limiter(source, rate_limit)
+    supports_recent_only = getattr(fetch, 'supports_recent_only', False)
+    target = expected_period(today, period)
+    stored = {statement: _Stored(warehouse, statement, period) for statement in statements}
+
+    summary = {
+        'target_period': target,
+        'symbols': len(symbols),
+        'statements_up_to_date': 0,
+        'calls': 0,
+        'recent_only_calls': 0,
+        'skipped_by_probe': 0,
+        'new_periods': 0,
+        'restated_periods': 0,
+        'rows_fetched': 0,
+        'rows_written': 0,
+    }
+
+    # Statements to fetch per symbol; with stored history the probe goes first
+    first_calls = {}
+    followups = {}
+    for symbol in symbols:
+        stale = []
+        for statement in statements:
+            latest = stored[statement].latest_period(symbol)
+            if force or latest is None or latest < target:
+                stale.append(statement)
+            else:
+                summary['statements_up_to_date'] += 1
+        if not stale:
+            continue
+        probe = PROBE_STATEMENT in stale and stored[PROBE_STATEMENT].latest_period(symbol) is not None
+        if probe and len(stale) > 1 and not force:
+            first_calls[symbol] = [PROBE_STATEMENT]
+            followups[symbol] = [statement for statement in stale if statement != PROBE_STATEMENT]
+        else:
+            first_calls[symbol] = stale
+
+    if verbose:
+        print(f"Refreshing {len(first_calls)} of {len(symbols)} symbols up to {target}")
+
+    restatements = []
+    failures = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def submit(symbol, statement):
+            recent_only = (supports_recent_only and not force
+                           and stored[statement].latest_period(symbol) is not None)
+            future = executor.submit(
+                _fetch_statement, fetch, symbol, statement, period, recent_only,
+                limiter, retries, backoff, retry_on,
+            )
+            running[future] = (symbol, statement)
+            summary['calls'] += 1
+            summary['recent_only_calls'] += recent_only
+
+        def process(batch):
+            frames_by_statement = {}
+            for symbol, statement, data in batch:
+                frames_by_statement.setdefault(statement, {})[symbol] = data
+            for statement, frames in frames_by_statement.items():
+                fetched = normalize_statements(frames)
+                fetched = fetched[fetched['symbol'].isin(list(frames))]
+                summary['rows_fetched'] += len(fetched)
+                new, restated, changes = compare_periods(
+                    stored[statement].rows(frames), fetched, period, restatement_window, tolerance,
+                )
+                summary['new_periods'] += len(new)
+                summary['restated_periods'] += len(restated)
+                changed = pd.concat([new, restated]).drop_duplicates()
+                if not changed.empty:
+                    summary['rows_written'] += warehouse.write(statement, fetched.merge(changed, on=['symbol', 'period']))
+                if not changes.empty:
+                    found = changes.assign(statement=statement)[RESTATEMENT_COLUMNS]
+                    warehouse.store.write(RESTATEMENTS_DATASET, found.assign(detected=pd.Timestamp.now()), mode='append')
+                    restatements.append(found)
+                    if verbose:
+                        for symbol, periods in restated.groupby('symbol')['period']:
+                            print(f"{symbol} restated {statement} for {', '.join(periods)}")
+
+                # The probe decides whether the other statements are fetched
+                if statement == PROBE_STATEMENT:
+                    changed_symbols = set(changed['symbol'])
+                    for symbol in frames:
+                        remaining = followups.pop(symbol, [])
+                        if symbol in changed_symbols:
+                            for other in remaining:
+                                submit(symbol, other)
+                        else:
+                            summary['skipped_by_probe'] += len(remaining)
+
+        for symbol, calls in first_calls.items():
+            for statement in calls:
+                submit(symbol, statement)
+
+        batch = []
+        processed = 0
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                symbol, statement = running.pop(future)
+                data, attempts, error = future.result()
+                if error is None:
+                    batch.append((symbol, statement, data))
+                    continue
+                failures.append({
+                    'symbol': symbol,
+                    'statement': statement,
+                    'error_type': type(error).__name__,
+                    'error': str(error),
+                    'attempts': attempts,
+                })
+                followups.pop(symbol, None)
+                if verbose:
+                    print(f"Error fetching {statement} for {symbol}: {error}")
+            if len(batch) >= batch_size or (batch and not running):
+                process(batch)
+                processed += len(batch)
+                batch = []
+                if verbose:
+                    print(f"{processed} statements processed")
+
+    summary['failures'] = len(failures)
+    restatements = pd.concat(restatements, ignore_index=True) if restatements else pd.DataFrame(columns=RESTATEMENT_COLUMNS)
+    return summary, restatements, pd.DataFrame(failures, columns=FAILURE_COLUMNS)
+
+
+class _FakeFinance:
+    """
+    Finance object of FakeStatementSource with TCBS's signatures: get_all
+    given to the constructor is ignored, and every report method returns the
+    full history unless it is called with get_all=False.
+    """
+
+    def __init__(self, source, symbol, get_all=True):
+        self._source = source
+        self.symbol = symbol
+
+    def _get_report(self, report_type, period='quarter', dropna=True, get_all=True, show_log=False):
+        statement = {method: name for name, (method, _) in STATEMENT_METHODS.items()}[report_type]
+        return self._source.report(self.symbol, statement, get_all)
+
+    def balance_sheet(self, period='quarter', dropna=True, show_log=False):
+        return self._get_report('balance_sheet', period=period)
+
+    def income_statement(self, period='quarter', dropna=True, show_log=False):
+        return self._get_report('income_statement', period=period)
+
+    def cash_flow(self, period='quarter', dropna=True, show_log=False):
+        return self._get_report('cash_flow', period=period)
+
+    def ratio(self, period='quarter', dropna=True, get_all=True, show_log=False):
+        return self._source.report(self.symbol, 'Ratio', get_all)
+
+
+class FakeStatementSource:
+    """
+    Offline statement source with deterministic quarterly data, used to
+    measure refresh savings without network access.
+
+    Every symbol has statements through `latest`; a `reported` fraction of
+    the symbols also has the following quarter, and a `restated` fraction
+    reports changed values for `latest`. `finance` builds finance objects
+    shaped like TCBS's, which return the last `recent_periods` quarters when
+    a report method is called with get_all=False.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Symbols to serve
+    latest : str
+        Last quarter every symbol has reported, e.g. '2024Q4'
+    num_quarters : int
+        Quarters of history up to `latest` (default: 20)
+    num_items : int
+        Line items per statement (default: 40)
+    reported, restated : float
+        Fractions of symbols with the next quarter and with restated
+        values (default: 0.0)
+    recent_periods : int
+        Quarters returned by calls with get_all=False (default: 5)
+    latency : float
+        Seconds each call sleeps to simulate network wait (default: 0.0)
+    """
+
+    def __init__(self, symbols, latest, num_quarters=20, num_items=40, reported=0.0, restated=0.0,
+                 recent_periods=5, latency=0.0, seed=0):
+        self.latest = pd.Period(latest, freq='Q')
+        self.num_quarters = num_quarters
+        self.num_items = num_items
+        self.recent_periods = recent_periods
+        self.latency = latency
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.reported = {symbol for symbol in symbols if rng.random() < reported}
+        self.restated = {symbol for symbol in symbols if rng.random() < restated}
+        self.calls = 0
+        self.cells = 0
+        self.full_cells = 0
+        self._lock = threading.Lock()
+
+    def frame(self, symbol, statement, recent_only=False):
+        """Wide statement frame shaped like TCBS output (period index, 'ticker')."""
+        extra = 1 if symbol in self.reported else 0
+        quarters = pd.period_range(end=self.latest + extra, periods=self.num_quarters + extra, freq='Q')
+        key = sum(ord(c) for c in symbol + statement)
+        rng = np.random.default_rng(self.seed * 100_003 + key)
+        values = np.round(rng.normal(1000, 300, (len(quarters), self.num_items)), 2)
+        if symbol in self.restated:
+            values[self.num_quarters - 1, :3] *= 1.1
+        frame = pd.DataFrame(values, columns=[f'{statement} item {i:02d}' for i in range(self.num_items)],
+                             index=pd.Index([f'{q.year}-Q{q.quarter}' for q in quarters], name='period'))
+        frame.insert(0, 'ticker', symbol)
+        if recent_only:
+            frame = frame.iloc[-self.recent_periods:]
+        return frame
+
+    def finance(self, symbol, recent_only=False):
+        """Finance object for one symbol, usable as VnstockStatements' finance_factory."""
+        return _FakeFinance(self, symbol, get_all=not recent_only)
+
+    def report(self, symbol, statement, get_all=True):
+        """Serve one report call and count its calls and cells."""
+        if self.latency:
+            time.sleep(self.latency)
+        frame = self.frame(symbol, statement, recent_only=not get_all)
+        full_size = (self.num_quarters + (symbol in self.reported)) * (self.num_items + 1)
+        with self._lock:
+            self.calls += 1
+            self.cells += frame.size
+            # Cells the same calls transfer from a source without recent-only calls
+            self.full_cells += full_size
+        return frame
+
+
+def benchmark(num_symbols=1700, reported=0.6, restated=0.02, root='.cache/refresh_bench'):
+    """
+    Refresh a warehouse holding 20 quarters for every symbol after the next
+    quarter's deadline, and compare the calls and cells transferred with a
+    full reload of every statement. The cells are also reported for the same
+    calls without recent-only requests (probe and skip savings only, as for
+    sources that always return the full history).
+
+    Returns:
+    --------
+    dict
+        Full reload and refresh transfer, the refresh summary, and the calls of
+        a second refresh on the same day
+    """
+    import shutil
+
+    shutil.rmtree(root, ignore_errors=True)
+    symbols = [f'S{i:04d}' for i in range(num_symbols)]
+    statements = tuple(STATEMENT_METHODS)
+    warehouse = StatementWarehouse(root)
+    base = FakeStatementSource(symbols, '2024Q4')
+    warehouse.ingest_many({symbol: {statement: base.frame(symbol, statement) for statement in statements}
+                           for symbol in symbols})
+
+    source = FakeStatementSource(symbols, '2024Q4', reported=reported, restated=restated)
+    full_cells = sum(source.frame(symbol, statement).size for symbol in symbols for statement in statements)
+    full_calls = len(symbols) * len(statements)
+
+    t0 = time.perf_counter()
+    summary, restatements, failures = refresh_statements(
+        symbols, warehouse=warehouse, fetch=VnstockStatements('TCBS', finance_factory=source.finance),
+        today='2025-05-20', verbose=False,
+    )
+    seconds = time.perf_counter() - t0
+    assert failures.empty
+    assert set(restatements['symbol']) == source.restated
+
+    rerun = FakeStatementSource(symbols, '2024Q4', reported=reported, restated=restated)
+    second, _, _ = refresh_statements(symbols, warehouse=warehouse,
+                                      fetch=VnstockStatements('TCBS', finance_factory=rerun.finance),
+                                      today='2025-05-20', verbose=False)
+
+    return {
+        'full_calls': full_calls,
+        'full_cells': full_cells,
+        'calls': source.calls,
+        'cells': source.cells,
+        'cells_without_recent_only': source.full_cells,
+        'seconds': seconds,
+        'summary': summary,
+        'second_run_calls': rerun.calls,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch only newly reported statement periods into the warehouse.")
+    parser.add_argument('symbols', nargs='*', help="Symbols to refresh (default: the whole listing)")
+    parser.add_argument('--period', default='quarter', choices=['quarter', 'year'])
+    parser.add_argument('--source', default='TCBS', help="Data source: TCBS or VCI")
+    parser.add_argument('--workers', type=int, default=8, help="Maximum calls in flight")
+    parser.add_argument('--rate', type=float, default=None, help="Calls per second to the source")
+    parser.add_argument('--force', action='store_true', help="Fetch every statement even if up to date")
+    parser.add_argument('--benchmark', action='store_true', help="Run the offline benchmark instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = benchmark()
+        summary = result['summary']
+        print(f"Full reload: {result['full_calls']} calls, {result['full_cells']:,} cells")
+        print(f"Refresh: {result['calls']} calls ({result['calls'] / result['full_calls']:.0%}), "
+              f"{result['cells']:,} cells ({result['cells'] / result['full_cells']:.1%}) "
+              f"in {result['seconds']:.1f}s")
+        print(f"Same calls without recent-only requests (probe and skip only): "
+              f"{result['cells_without_recent_only']:,} cells "
+              f"({result['cells_without_recent_only'] / result['full_cells']:.1%})")
+        print(f"New periods: {summary['new_periods']}, restated periods: {summary['restated_periods']}, "
+              f"skipped by probe: {summary['skipped_by_probe']}")
+        print(f"Second refresh the same day: {result['second_run_calls']} calls")
+        return result
+
+    summary, restatements, failures = refresh_statements(
+        args.symbols or None, period=args.period, source=args.source, max_workers=args.workers,
+        rate_limit=args.rate, force=args.force,
+    )
+    print(summary)
+    if not restatements.empty:
+        print(f"{len(restatements)} restated values:")
+        print(restatements.to_string(index=False))
+    if not failures.empty:
+        print(f"{len(failures)} calls failed:")
+        print(failures.to_string(index=False))
+    return summary, restatements, failures
+
+
+if __name__ == "__main__":
+    main()
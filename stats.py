@@ -0,0 +1,329 @@
+"""
+Incremental Return Statistics Module
+
+This module maintains the mean vector and covariance matrix of asset returns
+as new bars arrive, instead of recomputing them over the whole history. Each
+update costs O(assets^2) regardless of how much history has been seen.
+
+Three estimators share the same interface (update, mean, cov, ann_returns,
+ann_cov):
+
+- RunningMoments: all observations, Welford-style updates
+- RollingMoments: the last `window` observations
+- EWMoments: exponentially weighted observations
+
+PriceReturns turns incoming close prices into returns and feeds an estimator,
+so a live process can refresh ann_returns/cov_mat on every new bar.
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Trading days per year used for annualization, as in calculations.py
+PERIODS_PER_YEAR = 252
+
+
+class _Moments:
+    """Shared output helpers; subclasses keep self.count, self._mean and self._m2."""
+
+    def __init__(self, num_assets, columns=None):
+        self.num_assets = num_assets
+        self.columns = list(columns) if columns is not None else list(range(num_assets))
+        self.count = 0
+        self.skipped = 0
+        self._mean = np.zeros(num_assets)
+        self._m2 = np.zeros((num_assets, num_assets))
+
+    def _valid(self, x):
+        x = np.asarray(x, dtype=float)
+        if x.shape != (self.num_assets,):
+            raise ValueError(f"Expected {self.num_assets} values, got shape {x.shape}")
+        # Rows with missing returns are skipped, as calculate_returns drops them
+        if np.isnan(x).any():
+            self.skipped += 1
+            return None
+        return x
+
+    def _cov_matrix(self, ddof):
+        raise NotImplementedError
+
+    def mean(self):
+        """Mean return per asset as a pandas Series."""
+        return pd.Series(self._mean.copy(), index=self.columns)
+
+    def cov(self, ddof=1):
+        """Covariance matrix of returns as a pandas DataFrame."""
+        return pd.DataFrame(self._cov_matrix(ddof), index=self.columns, columns=self.columns)
+
+    def ann_returns(self, periods=PERIODS_PER_YEAR):
+        """Annualized mean returns, equal to daily_returns.mean() * 252."""
+        return self.mean() * periods
+
+    def ann_cov(self, periods=PERIODS_PER_YEAR, ddof=1):
+        """Annualized covariance matrix, equal to daily_returns.cov() * 252."""
+        return self.cov(ddof) * periods
+
+    def update_frame(self, returns):
+        """Feed every row of a returns DataFrame, in order."""
+        for row in np.asarray(returns, dtype=float):
+            self.update(row)
+        return self
+
+
+class RunningMoments(_Moments):
+    """
+    Mean and covariance over every observation seen so far.
+
+    Parameters:
+    -----------
+    num_assets : int
+        Number of assets (columns) per observation
+    columns : list, optional
+        Labels for the outputs, e.g. the returns DataFrame columns
+    """
+
+    def update(self, x):
+        """Add one observation (one return per asset)."""
+        x = self._valid(x)
+        if x is None:
+            return self
+        self.count += 1
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += np.outer(delta, x - self._mean)
+        return self
+
+    def update_batch(self, returns):
+        """
+        Add many observations at once by merging their moments (Chan et al.).
+
+        Parameters:
+        -----------
+        returns : pandas.DataFrame or numpy.ndarray
+            One row per observation; rows with missing values are skipped
+        """
+        block = np.asarray(returns, dtype=float)
+        valid = ~np.isnan(block).any(axis=1)
+        self.skipped += int((~valid).sum())
+        block = block[valid]
+        n_b = len(block)
+        if n_b == 0:
+            return self
+        mean_b = block.mean(axis=0)
+        centered = block - mean_b
+        m2_b = centered.T @ centered
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self._mean
+        self._mean = self._mean + delta * (n_b / n)
+        self._m2 = self._m2 + m2_b + np.outer(delta, delta) * (n_a * n_b / n)
+        self.count = n
+        return self
+
+    def _cov_matrix(self, ddof):
+        if self.count - ddof <= 0:
+            return np.full((self.num_assets, self.num_assets), np.nan)
+        return self._m2 / (self.count - ddof)
+
+    @classmethod
+    def from_returns(cls, returns):
+        """Build from a returns DataFrame such as calculate_returns() output."""
+        return cls(returns.shape[1], returns.columns).update_batch(returns)
+
+
+class RollingMoments(_Moments):
+    """
+    Mean and covariance over the last `window` observations.
+
+    Each update adds the new observation and removes the oldest one. To bound
+    floating-point drift from the repeated add/remove updates, the moments are
+    recomputed from the buffered window every `recompute_every` updates.
+
+    Parameters:
+    -----------
+    num_assets : int
+        Number of assets (columns) per observation
+    window : int
+        Number of most recent observations to keep
+    columns : list, optional
+        Labels for the outputs
+    recompute_every : int, optional
+        Updates between exact recomputations (default: window)
+    """
+
+    def __init__(self, num_assets, window, columns=None, recompute_every=None):
+        super().__init__(num_assets, columns)
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.window = window
+        self.recompute_every = recompute_every or window
+        self._buffer = deque()
+        self._since_recompute = 0
+
+    def _add(self, x):
+        self.count += 1
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += np.outer(delta, x - self._mean)
+
+    def _remove(self, x):
+        if self.count == 1:
+            self.count = 0
+            self._mean[:] = 0.0
+            self._m2[:] = 0.0
+            return
+        old_mean = self._mean.copy()
+        self.count -= 1
+        self._mean = (old_mean * (self.count + 1) - x) / self.count
+        self._m2 -= np.outer(x - self._mean, x - old_mean)
+
+    def _recompute(self):
+        block = np.array(self._buffer)
+        self._mean = block.mean(axis=0)
+        centered = block - self._mean
+        self._m2 = centered.T @ centered
+        self._since_recompute = 0
+
+    def update(self, x):
+        """Add one observation, dropping the oldest once the window is full."""
+        x = self._valid(x)
+        if x is None:
+            return self
+        self._buffer.append(x)
+        self._add(x)
+        if len(self._buffer) > self.window:
+            self._remove(self._buffer.popleft())
+        self._since_recompute += 1
+        if self._since_recompute >= self.recompute_every:
+            self._recompute()
+        return self
+
+    def _cov_matrix(self, ddof):
+        if self.count - ddof <= 0:
+            return np.full((self.num_assets, self.num_assets), np.nan)
+        return self._m2 / (self.count - ddof)
+
+
+class EWMoments(_Moments):
+    """
+    Exponentially weighted mean and covariance.
+
+    Matches pandas ewm(alpha=..., adjust=False) mean and cov(bias=True).
+
+    Parameters:
+    -----------
+    num_assets : int
+        Number of assets (columns) per observation
+    alpha : float, optional
+        Smoothing factor in (0, 1]
+    halflife : float, optional
+        Half-life in observations; used when alpha is not given
+    columns : list, optional
+        Labels for the outputs
+    """
+
+    def __init__(self, num_assets, alpha=None, halflife=None, columns=None):
+        super().__init__(num_assets, columns)
+        if alpha is None:
+            if halflife is None:
+                raise ValueError("Either alpha or halflife is required")
+            alpha = 1 - np.exp(-np.log(2) / halflife)
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+
+    def update(self, x):
+        """Add one observation with weight alpha, decaying older ones."""
+        x = self._valid(x)
+        if x is None:
+            return self
+        self.count += 1
+        if self.count == 1:
+            self._mean = x.copy()
+            return self
+        delta = x - self._mean
+        self._mean += self.alpha * delta
+        self._m2 = (1 - self.alpha) * (self._m2 + self.alpha * np.outer(delta, delta))
+        return self
+
+    def _cov_matrix(self, ddof):
+        # The weighted estimate is already normalized; ddof does not apply
+        if self.count == 0:
+            return np.full((self.num_assets, self.num_assets), np.nan)
+        return self._m2.copy()
+
+
+class PriceReturns:
+    """
+    Turn incoming close prices into percentage returns and feed an estimator.
+
+    Parameters:
+    -----------
+    moments : RunningMoments, RollingMoments or EWMoments
+        Estimator updated with each new return vector
+    """
+
+    def __init__(self, moments):
+        self.moments = moments
+        self._last_prices = None
+
+    def update(self, prices):
+        """
+        Add one bar of close prices (one per asset, in the estimator's order).
+
+        Returns:
+        --------
+        numpy.ndarray or None
+            The return vector fed to the estimator, or None for the first bar
+        """
+        prices = np.asarray(prices, dtype=float)
+        returns = None
+        if self._last_prices is not None:
+            returns = prices / self._last_prices - 1
+            self.moments.update(returns)
+        # Carry the last known price forward for assets without a new price
+        if self._last_prices is None:
+            self._last_prices = prices.copy()
+        else:
+            self._last_prices = np.where(np.isnan(prices), self._last_prices, prices)
+        return returns
+
+    @classmethod
+    def from_prices(cls, combined_prices, moments_cls=RunningMoments, **kwargs):
+        """
+        Bootstrap from a combined close price frame (as built by test.py).
+
+        Parameters:
+        -----------
+        combined_prices : pandas.DataFrame
+            'time' column plus one '{symbol}_close' column per symbol
+        moments_cls : type
+            Estimator class (default: RunningMoments)
+        **kwargs
+            Passed to the estimator, e.g. window=60 or halflife=20
+
+        Returns:
+        --------
+        PriceReturns
+            Tracker whose estimator has seen every historical return; call
+            update() with each new bar afterwards
+        """
+        prices = combined_prices
+        if 'time' in prices.columns:
+            prices = prices.set_index(pd.to_datetime(prices['time'])).drop(columns='time').sort_index()
+        # Carry prices forward over gaps, as update() does for live bars
+        prices = prices.ffill()
+        columns = [f'{col}_pct_change' for col in prices.columns]
+        tracker = cls(moments_cls(prices.shape[1], columns=columns, **kwargs))
+        values = prices.to_numpy(dtype=float)
+        returns = values[1:] / values[:-1] - 1
+        if isinstance(tracker.moments, RunningMoments):
+            tracker.moments.update_batch(returns)
+        else:
+            tracker.moments.update_frame(returns)
+        if len(values):
+            tracker._last_prices = values[-1].copy()
+        return tracker
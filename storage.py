@@ -0,0 +1,525 @@
+"""
+Storage Module
+
+This module is the single place where the scripts persist DataFrames.
+Datasets are written in a columnar binary format (Feather/Arrow IPC by
+default, or Parquet for smaller archives) that keeps dtypes such as datetime
+'time' columns and categorical tickers, optionally split into hive-style
+partitions (e.g. symbol=REE/ or date=2025-03-27/). CSV is only written
+through the explicit export_csv().
+"""
+
+import glob
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+import instrument
+
+DEFAULT_DATA_DIR = 'data'
+
+FORMATS = {
+    'feather': '.feather',
+    'parquet': '.parquet',
+}
+
+# Codec used when none is given: lz4 keeps Feather reads close to memory speed,
+# zstd gives Parquet the smallest files
+DEFAULT_COMPRESSION = {
+    'feather': 'lz4',
+    'parquet': 'zstd',
+}
+
+# Schema metadata key recording the MultiIndex columns of a partitioned write
+MULTIINDEX_KEY = b'datastore.multiindex'
+
+# Schema metadata key recording the column order and partition column dtypes
+# of a partitioned write
+PARTITIONS_KEY = b'datastore.partitions'
+
+
+def _partition_dir_value(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+    return str(value)
+
+
+def _coerce_mixed_objects(df):
+    """
+    Convert object columns holding mixed scalar types to strings so they can be
+    stored in a typed columnar format. Missing values are kept as missing.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        values = df[col]
+        types = values[values.notna()].map(type).unique()
+        if len(types) > 1:
+            df[col] = values.where(values.isna(), values.astype(str))
+    return df
+
+
+def _flat_name(col):
+    if all(level == '' for level in col[1:]):
+        return str(col[0])
+    return json.dumps([str(level) for level in col], ensure_ascii=False)
+
+
+def _flatten_columns(df):
+    """
+    Replace MultiIndex columns by strings so partition columns can be appended
+    on read. Columns whose lower levels are empty, such as ('symbol', '') from
+    frame.assign(symbol=...), keep their top-level name; the others are stored
+    as JSON lists.
+
+    Returns:
+    --------
+    tuple of (pandas.DataFrame, dict)
+        The flattened frame and the schema metadata needed to restore the columns
+    """
+    info = {'nlevels': df.columns.nlevels, 'names': list(df.columns.names)}
+    df = df.copy()
+    df.columns = [_flat_name(col) for col in df.columns]
+    return df, {MULTIINDEX_KEY: json.dumps(info, ensure_ascii=False).encode()}
+
+
+def _restore_columns(df, metadata):
+    """Rebuild MultiIndex columns flattened by _flatten_columns."""
+    info = json.loads(metadata[MULTIINDEX_KEY])
+    nlevels = info['nlevels']
+    tuples = []
+    for col in df.columns:
+        if isinstance(col, str) and col.startswith('['):
+            tuples.append(tuple(json.loads(col)))
+        else:
+            tuples.append((col,) + ('',) * (nlevels - 1))
+    df.columns = pd.MultiIndex.from_tuples(tuples, names=info['names'])
+    return df
+
+
+def _partition_column(values, dtype):
+    """Convert a partition column read back from directory names to its dtype."""
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if isinstance(dtype, pd.CategoricalDtype) or values.dtype == dtype:
+        return values
+    strings = values.astype(str)
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return pd.to_datetime(strings).dt.tz_localize(dtype.tz).astype(dtype)
+    if dtype.kind == 'M':
+        return pd.to_datetime(strings).astype(dtype)
+    if dtype.kind == 'b':
+        return strings == 'True'
+    return strings.astype(dtype)
+
+
+def _restore_partitions(df, metadata):
+    """Give partition columns their written dtype and position."""
+    info = json.loads(metadata[PARTITIONS_KEY])
+    for col, dtype in info['dtypes'].items():
+        if col in df.columns:
+            df[col] = _partition_column(df[col], dtype)
+    rank = {col: i for i, col in enumerate(info['columns'])}
+    order = sorted(range(df.shape[1]), key=lambda i: rank.get(df.columns[i], len(rank)))
+    return df.iloc[:, order]
+
+
+class DataStore:
+    """
+    Columnar dataset store rooted at one directory.
+
+    Parameters:
+    -----------
+    root : str
+        Directory holding all datasets (default: DEFAULT_DATA_DIR)
+    fmt : str
+        'feather' or 'parquet' (default: 'feather')
+    compression : str, optional
+        Codec passed to the writer, e.g. 'lz4', 'zstd', 'snappy', or 'uncompressed'
+        (default: DEFAULT_COMPRESSION for the format)
+    """
+
+    def __init__(self, root=DEFAULT_DATA_DIR, fmt='feather', compression=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}', expected one of {list(FORMATS)}")
+        self.root = root
+        self.fmt = fmt
+        self.compression = compression or DEFAULT_COMPRESSION[fmt]
+
+    def _dataset_path(self, name):
+        return os.path.join(self.root, name)
+
+    def _format_for(self, df):
+        # Feather only stores plain string column names; frames such as
+        # finance.ratio() with MultiIndex columns go to Parquet, which keeps them
+        if self.fmt == 'feather' and not all(isinstance(col, str) for col in df.columns):
+            return 'parquet'
+        return self.fmt
+
+    def _write_file(self, df, path, fmt, metadata=None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        df = df.reset_index(drop=True)
+        tmp_path = f'{path}.tmp'
+        try:
+            self._write_frame(df, tmp_path, fmt, metadata)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            self._write_frame(_coerce_mixed_objects(df), tmp_path, fmt, metadata)
+        os.replace(tmp_path, path)
+
+    def _write_frame(self, df, path, fmt, metadata=None):
+        compression = self.compression if fmt == self.fmt else DEFAULT_COMPRESSION[fmt]
+        if metadata:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+            if fmt == 'parquet':
+                pq.write_table(table, path, compression=None if compression == 'uncompressed' else compression)
+            else:
+                feather.write_feather(table, path, compression=compression)
+        elif fmt == 'parquet':
+            compression = None if compression == 'uncompressed' else compression
+            # index=None keeps the RangeIndex as metadata only and, unlike
+            # index=False, preserves MultiIndex column names
+            df.to_parquet(path, compression=compression)
+        else:
+            df.to_feather(path, compression=compression)
+
+    @staticmethod
+    def _read_table(path, columns=None):
+        if path.endswith(FORMATS['feather']):
+            return feather.read_table(path, columns=columns)
+        return pq.read_table(path, columns=columns)
+
+    @instrument.timed()
+    def write(self, name, df, partition_cols=None, mode='overwrite', categories=None):
+        """
+        Write a DataFrame as a dataset.
+
+        Parameters:
+        -----------
+        name : str
+            Dataset name; may contain '/' to nest datasets
+        df : pandas.DataFrame
+            Data to write. The index is not stored.
+        partition_cols : list of str, optional
+            Columns to split the data by; each distinct value combination goes to
+            its own directory and the columns are restored on read (default: None)
+        mode : str
+            'overwrite' replaces the whole dataset, or only the partitions present
+            in df when partitioned; 'append' adds new files next to existing ones
+            (default: 'overwrite')
+        categories : list of str, optional
+            Columns to store as categoricals, e.g. ['ticker'] (default: None)
+
+        Returns:
+        --------
+        list of str
+            Paths of the files written
+        """
+        if mode not in ('overwrite', 'append'):
+            raise ValueError("mode must be 'overwrite' or 'append'")
+        if categories:
+            df = df.astype({col: 'category' for col in categories if col in df.columns})
+        metadata = None
+        if partition_cols and isinstance(df.columns, pd.MultiIndex):
+            # Partition columns are appended to each file's table on read, which
+            # does not fit pandas' MultiIndex column metadata
+            df, metadata = _flatten_columns(df)
+        if partition_cols:
+            # Partition columns are read back from directory names; keep their
+            # dtypes and the column order to restore them
+            info = {'columns': [str(col) for col in df.columns],
+                    'dtypes': {col: str(df[col].dtype) for col in partition_cols}}
+            metadata = {**(metadata or {}), PARTITIONS_KEY: json.dumps(info, ensure_ascii=False).encode()}
+
+        fmt = self._format_for(df)
+        ext = FORMATS[fmt]
+        base = self._dataset_path(name)
+
+        if not partition_cols:
+            if mode == 'append' and os.path.isdir(base):
+                path = os.path.join(base, f'part-{uuid.uuid4().hex}{ext}')
+            elif mode == 'append' and self.exists(name):
+                # Turn the single-file dataset into a directory of parts
+                existing = self._single_file(name)
+                os.makedirs(base, exist_ok=True)
+                os.replace(existing, os.path.join(base, f'part-0{os.path.splitext(existing)[1]}'))
+                path = os.path.join(base, f'part-{uuid.uuid4().hex}{ext}')
+            else:
+                self.delete(name)
+                path = base + ext
+            self._write_file(df, path, fmt)
+            return [path]
+
+        written = []
+        for values, part in df.groupby(list(partition_cols), sort=False, observed=True, dropna=False):
+            if not isinstance(values, tuple):
+                values = (values,)
+            part_dir = os.path.join(base, *[
+                f'{col}={_partition_dir_value(value)}' for col, value in zip(partition_cols, values)
+            ])
+            if mode == 'overwrite' and os.path.isdir(part_dir):
+                shutil.rmtree(part_dir)
+            file_name = f'part-{uuid.uuid4().hex}{ext}' if mode == 'append' else f'part-0{ext}'
+            path = os.path.join(part_dir, file_name)
+            self._write_file(part.drop(columns=list(partition_cols)), path, fmt, metadata)
+            written.append(path)
+        return written
+
+    def _single_file(self, name):
+        base = self._dataset_path(name)
+        for ext in FORMATS.values():
+            if os.path.isfile(base + ext):
+                return base + ext
+        return None
+
+    def exists(self, name):
+        """Return True if the dataset has been written."""
+        return self._single_file(name) is not None or os.path.isdir(self._dataset_path(name))
+
+    def delete(self, name):
+        """Remove a dataset if it exists."""
+        single = self._single_file(name)
+        if single is not None:
+            os.remove(single)
+        base = self._dataset_path(name)
+        if os.path.isdir(base):
+            shutil.rmtree(base)
+
+    def partitions(self, name):
+        """
+        List the partitions of a dataset.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            One row per partition directory, one column per partition key
+        """
+        rows = []
+        for path in self._files(name):
+            rows.append(self._partition_values(name, path))
+        return pd.DataFrame(rows).drop_duplicates().reset_index(drop=True)
+
+    def _files(self, name, wanted=None):
+        single = self._single_file(name)
+        if single is not None:
+            return [single]
+        base = self._dataset_path(name)
+        roots = [base]
+        if wanted and os.path.isdir(base):
+            # Only descend into top-level partitions the filters keep, so reading
+            # one partition of a large dataset does not list all of them
+            roots = []
+            for entry in os.listdir(base):
+                key, sep, value = entry.partition('=')
+                if sep and key in wanted and value not in wanted[key]:
+                    continue
+                roots.append(os.path.join(base, entry))
+        files = []
+        for root in roots:
+            for ext in FORMATS.values():
+                if root != base and root.endswith(ext):
+                    files.append(root)
+                else:
+                    files.extend(glob.glob(os.path.join(root, '**', f'*{ext}'), recursive=True))
+        return sorted(files)
+
+    def _partition_values(self, name, path):
+        relative = os.path.relpath(os.path.dirname(path), self._dataset_path(name))
+        values = {}
+        if relative != '.':
+            for part in relative.split(os.sep):
+                if '=' in part:
+                    key, value = part.split('=', 1)
+                    values[key] = value
+        return values
+
+    @instrument.timed()
+    def read(self, name, columns=None, filters=None):
+        """
+        Read a dataset back into a DataFrame.
+
+        Parameters:
+        -----------
+        name : str
+            Dataset name
+        columns : list of str, optional
+            Data columns to read; partition columns are always included. Columns
+            of frames written with MultiIndex columns may be given as tuples
+            (default: all)
+        filters : dict, optional
+            Partition key to a value or list of values to keep, e.g.
+            {'symbol': ['REE', 'FMC']}. Other partitions are not opened.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            The stored data, with partition columns in their written dtype and
+            position. Empty if the dataset does not exist.
+        """
+        wanted = {}
+        for key, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            wanted[key] = {_partition_dir_value(v) for v in values}
+
+        if columns is not None:
+            columns = [_flat_name(col) if isinstance(col, tuple) else col for col in columns]
+
+        # Files are concatenated as Arrow tables and converted to pandas once
+        tables = []
+        for path in self._files(name, wanted):
+            partition = self._partition_values(name, path)
+            if any(partition.get(key) not in values for key, values in wanted.items()):
+                continue
+            table = self._read_table(path, columns=columns)
+            for key, value in partition.items():
+                column = pa.DictionaryArray.from_arrays(
+                    pa.array(np.zeros(table.num_rows, dtype=np.int32)), pa.array([value]),
+                )
+                table = table.append_column(key, column)
+            tables.append(table)
+
+        if not tables:
+            return pd.DataFrame()
+        metadata = tables[0].schema.metadata or {}
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables, promote_options='default')
+        df = table.to_pandas()
+        if PARTITIONS_KEY in metadata:
+            df = _restore_partitions(df, metadata)
+        if MULTIINDEX_KEY in metadata:
+            df = _restore_columns(df, metadata)
+        return df
+
+    def export_csv(self, df, path, **kwargs):
+        """
+        Explicitly export a DataFrame (or the name of a stored dataset) to CSV.
+
+        Parameters:
+        -----------
+        df : pandas.DataFrame or str
+            Data to export, or a dataset name to read first
+        path : str
+            Output CSV file
+        **kwargs
+            Passed to DataFrame.to_csv (index defaults to False)
+        """
+        if isinstance(df, str):
+            df = self.read(df)
+        kwargs.setdefault('index', False)
+        df.to_csv(path, **kwargs)
+        return path
+
+
+def check_round_trip(data_dir=os.path.join('.cache', 'storage_check')):
+    """
+    Write and read back a finance.ratio()-shaped frame (two-level MultiIndex
+    columns) partitioned by symbol, as fs.save_statements does, and a frame
+    partitioned by a datetime and an integer column, and check both come
+    back unchanged.
+    """
+    columns = pd.MultiIndex.from_tuples([
+        ('Meta', 'CP'), ('Meta', 'Năm'), ('Chỉ tiêu định giá', 'P/E'), ('Chỉ tiêu khả năng sinh lợi', 'ROE (%)'),
+    ])
+    ratio = pd.DataFrame([['VCI', 2023, 18.2, 0.11], ['VCI', 2024, 20.5, 0.12]], columns=columns)
+    store = DataStore(data_dir)
+    for symbol in ('VCI', 'REE'):
+        frame = ratio.copy()
+        frame[('Meta', 'CP')] = symbol
+        store.write('finance/Ratio', frame.assign(symbol=symbol), partition_cols=['symbol'])
+    stored = store.read('finance/Ratio', filters={'symbol': 'VCI'})
+    restored = stored.drop(columns='symbol', level=0)
+    assert stored[('symbol', '')].astype(str).eq('VCI').all()
+    pd.testing.assert_frame_equal(restored, ratio, check_column_type=False)
+    assert list(store.read('finance/Ratio', columns=[('Chỉ tiêu định giá', 'P/E')]).columns) == [
+        ('Chỉ tiêu định giá', 'P/E'), ('symbol', '')]
+
+    # Partition columns come back with their dtype and position
+    daily = pd.DataFrame({
+        'date': pd.to_datetime(['2025-03-27', '2025-03-27', '2025-03-28']),
+        'symbol': ['REE', 'FMC', 'REE'],
+        'year': [2025, 2025, 2025],
+        'close': [60.1, 45.2, 60.8],
+    })
+    store.write('daily', daily, partition_cols=['date', 'year'])
+    stored = store.read('daily').sort_values(['date', 'symbol'], ignore_index=True)
+    pd.testing.assert_frame_equal(stored, daily.sort_values(['date', 'symbol'], ignore_index=True))
+    shutil.rmtree(data_dir)
+
+
+def benchmark(days=250, tickers=1700, columns=70, data_dir=os.path.join('.cache', 'storage_bench')):
+    """
+    Compare reloading a year of daily screener snapshots from CSV and from a DataStore.
+
+    Parameters:
+    -----------
+    days : int
+        Number of daily snapshots (default: 250)
+    tickers : int
+        Rows per snapshot (default: 1700)
+    columns : int
+        Indicator columns per snapshot (default: 70)
+    data_dir : str
+        Scratch directory for the benchmark files
+
+    Returns:
+    --------
+    dict
+        Write and read times for CSV and the columnar store
+    """
+    rng = np.random.default_rng(0)
+    ticker_names = [f'T{i:04d}' for i in range(tickers)]
+    exchanges = rng.choice(['HOSE', 'HNX', 'UPCOM'], tickers)
+    dates = pd.bdate_range('2024-01-01', periods=days)
+
+    csv_dir = os.path.join(data_dir, 'csv')
+    os.makedirs(csv_dir, exist_ok=True)
+    store = DataStore(os.path.join(data_dir, 'store'))
+    store.delete('screener')
+
+    csv_write = store_write = 0.0
+    for date in dates:
+        snapshot = pd.DataFrame(rng.normal(size=(tickers, columns)),
+                                columns=[f'f{i}' for i in range(columns)])
+        snapshot.insert(0, 'ticker', ticker_names)
+        snapshot.insert(1, 'exchange', exchanges)
+        snapshot['date'] = date
+
+        t0 = time.perf_counter()
+        snapshot.to_csv(os.path.join(csv_dir, f'{date:%Y-%m-%d}.csv'), index=False)
+        csv_write += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        store.write('screener', snapshot, partition_cols=['date'], categories=['ticker', 'exchange'])
+        store_write += time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    csv_data = pd.concat(
+        [pd.read_csv(path, parse_dates=['date']) for path in sorted(glob.glob(os.path.join(csv_dir, '*.csv')))],
+        ignore_index=True,
+    )
+    csv_read = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store_data = store.read('screener')
+    store_read = time.perf_counter() - t0
+
+    assert len(csv_data) == len(store_data)
+    shutil.rmtree(data_dir)
+    return {
+        'csv_write': csv_write,
+        'store_write': store_write,
+        'csv_read': csv_read,
+        'store_read': store_read,
+        'read_speedup': csv_read / store_read,
+    }
+
+
+if __name__ == "__main__":
+    check_round_trip()
+    for key, value in benchmark().items():
+        print(f"{key}: {value:.3f}")
@@ -0,0 +1,272 @@
+"""
+Screening Strategy Registry Module
+
+This module keeps screening strategies as declarative screener_index
+expressions and evaluates all of them against a snapshot together. The
+strategies are compiled into one set of distinct predicates, so a predicate
+shared by many strategies (e.g. "price above SMA20") is evaluated once; every
+strategy is then a combination of precomputed bitmaps. The result is a
+ticker x strategy membership matrix.
+
+    from screener_index import Field as F
+    from strategies import register_strategy, evaluate_strategies
+
+    register_strategy('cheap_uptrend', (F('pe') < 10) & F('uptrend').contains('tăng'))
+    membership = evaluate_strategies(screener_df)
+    membership['cheap_uptrend']        # boolean column per strategy
+    membership.sum()                   # matches per strategy
+"""
+
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrument
+from screener_index import Field as F, ScreenerIndex, _BoolOp, _Not, _Predicate, synthetic_snapshot
+
+# Registered strategies: name -> {'expr': Expr, 'description': str}
+STRATEGIES = {}
+
+
+def register_strategy(name, expr, description=''):
+    """
+    Add or replace a strategy in the registry.
+
+    Parameters:
+    -----------
+    name : str
+        Strategy name, used as the membership matrix column
+    expr : screener_index.Expr
+        Filter expression built with screener_index.Field
+    description : str
+        Short description (default: '')
+    """
+    STRATEGIES[name] = {'expr': expr, 'description': description}
+    return expr
+
+
+def _above(field):
+    # price_vs_smaN / vol_vs_smaN hold Vietnamese text such as 'Giá nằm trên SMA20'
+    return F(field).contains('trên')
+
+
+register_strategy('heating_up', F('heating_up').notna(),
+                  "Overheated in the previous trading session")
+register_strategy('momentum',
+                  _above('price_vs_sma20') & _above('price_vs_sma50') & (F('rsi14') > 50)
+                  & (F('change_percent') > 0),
+                  "Price above SMA20 and SMA50, RSI above 50, positive daily change")
+register_strategy('volume_breakout',
+                  _above('vol_vs_sma20') & _above('price_vs_sma20') & (F('num_increase_continuous_day') >= 2),
+                  "Volume and price above SMA20 with at least 2 consecutive up days")
+register_strategy('value',
+                  (F('pe') < 15) & (F('pb') < 1.5) & (F('dividend_yield') > 3) & (F('roe') > 15),
+                  "Low P/E and P/B, good dividend yield, strong ROE")
+register_strategy('oversold_quality', (F('rsi14') < 30) & (F('roe') > 15) & (F('pe') > 0),
+                  "Oversold RSI with profitable, high-ROE businesses")
+register_strategy('short_term_strength',
+                  _above('price_vs_sma5') & _above('price_vs_sma10') & _above('vol_vs_sma5')
+                  & (F('price_growth_1w') > 0),
+                  "Price and volume above their short moving averages with weekly gains")
+register_strategy('long_term_trend',
+                  _above('price_vs_sma50') & _above('price_vs_sma100') & (F('rel_strength_3m') > 70),
+                  "Above SMA50 and SMA100 with high 3-month relative strength")
+register_strategy('large_cap_value', (F('market_cap') > 10_000) & (F('pe').between(0, 12)) & (F('pb') < 2),
+                  "Large caps trading below 12x earnings and 2x book")
+
+
+class StrategySet:
+    """
+    Strategies compiled for evaluation in one pass.
+
+    Parameters:
+    -----------
+    strategies : dict, optional
+        Name -> Expr, or name -> {'expr': Expr, ...} as in STRATEGIES
+        (default: every registered strategy)
+    """
+
+    def __init__(self, strategies=None):
+        strategies = STRATEGIES if strategies is None else strategies
+        self.names = list(strategies)
+        self.exprs = [value['expr'] if isinstance(value, dict) else value for value in strategies.values()]
+
+        # Distinct leaf predicates across all strategies, in first-use order
+        self.predicates = {}
+        self.total_predicates = 0
+        for expr in self.exprs:
+            for leaf in _leaves(expr):
+                self.total_predicates += 1
+                self.predicates.setdefault(leaf.key, leaf)
+
+    @property
+    def shared_predicates(self):
+        """Predicate evaluations saved by sharing across strategies."""
+        return self.total_predicates - len(self.predicates)
+
+    def evaluate(self, snapshot):
+        """
+        Match every strategy against a snapshot.
+
+        Parameters:
+        -----------
+        snapshot : pandas.DataFrame or screener_index.ScreenerIndex
+            Screener snapshot, or an index already built from one
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Boolean membership matrix, one row per ticker and one column per strategy
+        """
+        if isinstance(snapshot, ScreenerIndex):
+            index = snapshot
+        else:
+            # Only the columns the strategies refer to are indexed
+            index = ScreenerIndex(snapshot, fields={leaf.field for leaf in self.predicates.values()})
+        # Each distinct predicate is evaluated once and memoized by the index;
+        # the strategies then only combine bitmaps
+        for leaf in self.predicates.values():
+            index.evaluate(leaf)
+        if not self.exprs:
+            return pd.DataFrame(index=pd.Index(index.tickers_array, name='ticker'))
+        bits = np.vstack([index.evaluate(expr) for expr in self.exprs])
+        matrix = np.unpackbits(bits, axis=1, count=index.num_rows, bitorder='little').astype(bool)
+        return pd.DataFrame(matrix.T, index=pd.Index(index.tickers_array, name='ticker'), columns=self.names)
+
+
+@instrument.timed()
+def evaluate_strategies(snapshot, strategies=None):
+    """
+    Build the ticker x strategy membership matrix for a snapshot.
+
+    Parameters:
+    -----------
+    snapshot : pandas.DataFrame or screener_index.ScreenerIndex
+        Screener snapshot, or an index built from one
+    strategies : dict, optional
+        Name -> Expr (default: every registered strategy)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Boolean membership matrix indexed by ticker
+    """
+    return StrategySet(strategies).evaluate(snapshot)
+
+
+def _leaves(expr):
+    if isinstance(expr, _BoolOp):
+        for operand in expr.operands:
+            yield from _leaves(operand)
+    elif isinstance(expr, _Not):
+        yield from _leaves(expr.operand)
+    else:
+        yield expr
+
+
+def pandas_mask(expr, df):
+    """
+    Evaluate an expression as a plain pandas boolean mask over the whole frame.
+
+    This is the one-strategy-at-a-time scan the batch evaluator replaces; it
+    is kept as the reference for checks and benchmarks.
+    """
+    if isinstance(expr, _BoolOp):
+        masks = [pandas_mask(operand, df) for operand in expr.operands]
+        result = masks[0]
+        for mask in masks[1:]:
+            result = (result & mask) if expr.op == 'and' else (result | mask)
+        return result
+    if isinstance(expr, _Not):
+        return ~pandas_mask(expr.operand, df)
+    if not isinstance(expr, _Predicate):
+        raise TypeError(f"Unsupported expression {expr!r}")
+
+    column = df[expr.field]
+    op, value = expr.op, expr.value
+    if op == 'notna':
+        return column.notna()
+    if op == 'contains':
+        return column.astype('string').str.contains(value, regex=False).fillna(False).astype(bool)
+    if op == 'isin':
+        return column.isin(list(value))
+    if op == 'between':
+        return column.between(*value)
+    return {'<': column.lt, '<=': column.le, '>': column.gt, '>=': column.ge, '==': column.eq}[op](value)
+
+
+def strategy_grid(count=100):
+    """
+    Generate a grid of parameterized strategies for benchmarking.
+
+    The strategies combine a trend filter, an RSI band, a volume filter and a
+    valuation cap, so most of their predicates are shared.
+
+    Returns:
+    --------
+    dict
+        Name -> Expr with `count` entries
+    """
+    trends = ['price_vs_sma5', 'price_vs_sma10', 'price_vs_sma20', 'price_vs_sma50', 'price_vs_sma100']
+    rsi_floors = [30, 40, 50, 60, 70]
+    volumes = ['vol_vs_sma5', 'vol_vs_sma10', 'vol_vs_sma20', 'vol_vs_sma50']
+    pe_caps = [10, 15, 20, 30]
+    grid = {}
+    for trend, rsi_floor, volume, pe_cap in itertools.product(trends, rsi_floors, volumes, pe_caps):
+        if len(grid) == count:
+            break
+        grid[f'{trend}_rsi{rsi_floor}_{volume}_pe{pe_cap}'] = (
+            _above(trend) & (F('rsi14') >= rsi_floor) & _above(volume)
+            & (F('pe') < pe_cap) & (F('market_cap') > 500)
+        )
+    return grid
+
+
+def benchmark(count=100, num_rows=1700, repeat=5):
+    """
+    Compare `count` separate pandas mask scans with one batch evaluation.
+
+    The batch time includes building the ScreenerIndex for the snapshot.
+
+    Returns:
+    --------
+    dict
+        Seconds for both approaches, the speedup and predicate sharing counts
+    """
+    df = synthetic_snapshot(num_rows)
+    grid = strategy_grid(count)
+    strategy_set = StrategySet(grid)
+
+    membership = strategy_set.evaluate(df)
+    for name, expr in grid.items():
+        assert (pandas_mask(expr, df).to_numpy() == membership[name].to_numpy()).all(), name
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        {name: df[pandas_mask(expr, df)] for name, expr in grid.items()}
+    separate = (time.perf_counter() - t0) / repeat
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        StrategySet(grid).evaluate(df)
+    batch = (time.perf_counter() - t0) / repeat
+
+    return {
+        'strategies': len(grid),
+        'separate_seconds': separate,
+        'batch_seconds': batch,
+        'speedup': separate / batch,
+        'predicates': strategy_set.total_predicates,
+        'distinct_predicates': len(strategy_set.predicates),
+    }
+
+
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"{result['strategies']} strategies, {result['predicates']} predicates "
+          f"({result['distinct_predicates']} distinct)")
+    print(f"Separate mask scans: {result['separate_seconds'] * 1000:.1f} ms")
+    print(f"Batch evaluation: {result['batch_seconds'] * 1000:.1f} ms")
+    print(f"Speedup: {result['speedup']:.1f}x")
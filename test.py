@@ -1,93 +1,157 @@
-from vnstock import Quote
+"""
+Historical Price Fetch Script
+
+This module fetches historical price data for a list of symbols, builds the
+combined OHLCV and close price frames and saves them to the local data store.
+Importing it does not fetch anything; run it as a script or call
+fetch_price_data().
+"""
+
+import argparse
+
 import pandas as pd
 
-# Define the symbols you want to fetch data for
-symbols = ['REE', 'FMC', 'DHC']
-print(f"Fetching historical price data for: {symbols}")
+from assembly import build_wide_frames
+from cache import HistoryCache
+from fetcher import fetch_histories
+from price_matrix import build_price_matrices
+from storage import DataStore
+from trading_calendar import TradingCalendar
 
-# Dictionary to store historical data for each symbol
-all_historical_data = {}
+# Define the symbols you want to fetch data for
+SYMBOLS = ['REE', 'FMC', 'DHC']
 
 # Set date range
-start_date = '2024-01-01'
-end_date = '2025-03-19'
-interval = '1D'
-
-# Fetch historical data for each symbol
-for symbol in symbols:
-    try:
-        print(f"\nProcessing {symbol}...")
-        quote = Quote(symbol=symbol)
-        
-        # Fetch historical price data
-        historical_data = quote.history(
-            start=start_date,
-            end=end_date,
-            interval=interval,
-            to_df=True
-        )
-        
-        if not historical_data.empty:
-            all_historical_data[symbol] = historical_data
-            print(f"Successfully fetched {len(historical_data)} records for {symbol}")
-        else:
-            print(f"No historical data available for {symbol}")
-    except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
-
-# Export all historical data to a single CSV file
-if all_historical_data:
-    # Create a combined DataFrame with all data
-    combined_data = pd.DataFrame()
-    
-    for symbol, data in all_historical_data.items():
-        if not data.empty:
-            # Make a copy of the data and rename columns to include symbol
-            temp_df = data.copy()
-            # Keep 'time' column as is for merging
-            for col in temp_df.columns:
-                if col != 'time':
-                    temp_df.rename(columns={col: f'{symbol}_{col}'}, inplace=True)
-            
-            if combined_data.empty:
-                combined_data = temp_df
-            else:
-                combined_data = pd.merge(combined_data, temp_df, on='time', how='outer')
-    
-    # Sort by time
+START_DATE = '2024-01-01'
+END_DATE = '2025-03-19'
+INTERVAL = '1D'
+
+
+def fetch_price_data(symbols=SYMBOLS, start_date=START_DATE, end_date=END_DATE, interval=INTERVAL,
+                     history_cache=None, quote_factory=None):
+    """
+    Fetch historical data for all symbols concurrently and build the combined frames.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Symbols to fetch (default: SYMBOLS)
+    start_date : str
+        Start date in 'YYYY-MM-DD' format (default: START_DATE)
+    end_date : str
+        End date in 'YYYY-MM-DD' format (default: END_DATE)
+    interval : str
+        Bar interval (default: INTERVAL)
+    history_cache : cache.HistoryCache, optional
+        Local bar store; only bars not fetched by a previous run are downloaded
+        (default: a HistoryCache that skips weekends and market holidays)
+    quote_factory : callable, optional
+        Quote factory passed to fetcher.fetch_histories, e.g. a stub. When given,
+        the history cache is bypassed.
+
+    Returns:
+    --------
+    tuple of (pandas.DataFrame, pandas.DataFrame, pandas.DataFrame)
+        combined_data (all OHLCV columns), combined_prices (close prices only)
+        and the fetch failure report
+    """
+    print(f"Fetching historical price data for: {symbols}")
+
+    if quote_factory is None:
+        history_cache = history_cache or HistoryCache(calendar=TradingCalendar())
+        quote_factory = history_cache.quote
+
+    # all_historical_data maps each symbol to its historical data
+    all_historical_data, fetch_failures = fetch_histories(
+        symbols,
+        start=start_date,
+        end=end_date,
+        interval=interval,
+        max_workers=8,
+        rate_limit=5,
+        quote_factory=quote_factory,
+    )
+
+    if history_cache is not None:
+        cache_counters, _ = history_cache.stats()
+        print(f"History cache: {cache_counters['days_served_locally']} days served locally, "
+              f"{cache_counters['days_fetched']} days fetched in {cache_counters['requests']} requests")
+
+    if not fetch_failures.empty:
+        print("\nSymbols that could not be fetched:")
+        print(fetch_failures[['symbol', 'error_type', 'error', 'attempts']])
+
+    if not all_historical_data:
+        print("No historical data was fetched for any symbol.")
+        return pd.DataFrame(), pd.DataFrame(), fetch_failures
+
+    # Align every symbol on a shared time index once and build both the
+    # combined OHLCV frame and the combined close price frame from it
+    combined_data, combined_prices = build_wide_frames(all_historical_data)
+    return combined_data, combined_prices, fetch_failures
+
+
+def save_price_data(combined_data, combined_prices, store=None, export_csv=False, matrix_dir=None):
+    """
+    Save the combined frames to the data store, optionally exporting CSV copies.
+
+    Parameters:
+    -----------
+    combined_data : pandas.DataFrame
+        Combined OHLCV data
+    combined_prices : pandas.DataFrame
+        Combined close prices
+    store : storage.DataStore, optional
+        Store to write to (default: DataStore())
+    export_csv : bool
+        Also write CSV copies of both frames (default: False)
+    matrix_dir : str, optional
+        Also write memory-mapped close/returns matrices there (see price_matrix.py)
+    """
+    store = store or DataStore()
+
+    if not combined_data.empty:
+        store.write('all_historical_data', combined_data)
+        print(f"\nAll historical data saved to {store.root}/all_historical_data")
+
+        if export_csv:
+            combined_csv_filename = 'all_historical_data.csv'
+            store.export_csv(combined_data, combined_csv_filename, encoding='utf-8-sig')
+            print(f"All historical data exported to {combined_csv_filename}")
+
+    if not combined_prices.empty:
+        store.write('combined_close_prices', combined_prices)
+        print(f"Combined close price data saved to {store.root}/combined_close_prices")
+
+        if export_csv:
+            combined_close_csv_filename = 'combined_close_prices.csv'
+            store.export_csv(combined_prices, combined_close_csv_filename, encoding='utf-8-sig')
+            print(f"Combined close price data exported to {combined_close_csv_filename}")
+
+        if matrix_dir:
+            build_price_matrices(combined_prices, matrix_dir)
+            print(f"Price matrices saved to {matrix_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch historical prices and save the combined frames.")
+    parser.add_argument('symbols', nargs='*', default=SYMBOLS, help="Symbols to fetch")
+    parser.add_argument('--start', default=START_DATE, help="Start date (YYYY-MM-DD)")
+    parser.add_argument('--end', default=END_DATE, help="End date (YYYY-MM-DD)")
+    parser.add_argument('--interval', default=INTERVAL, help="Bar interval, e.g. 1D")
+    parser.add_argument('--csv', action='store_true', help="Also export CSV copies")
+    parser.add_argument('--matrix', metavar='DIR', help="Also write memory-mapped price matrices")
+    args = parser.parse_args(argv)
+
+    combined_data, combined_prices, _ = fetch_price_data(args.symbols, args.start, args.end, args.interval)
+
     if not combined_data.empty:
-        combined_data = combined_data.sort_values('time')
-        
         # Display sample of combined data
         print("\nSample of combined data:")
         print(combined_data.head(3))
-        
-        # Export combined data to CSV
-        combined_csv_filename = 'all_historical_data.csv'
-        combined_data.to_csv(combined_csv_filename, index=False, encoding='utf-8-sig')
-        print(f"\nAll historical data exported to {combined_csv_filename}")
-    
-    # Also create a combined DataFrame for close prices only (for comparison purposes)
-    combined_prices = pd.DataFrame()
-    
-    for symbol, data in all_historical_data.items():
-        if not data.empty:
-            # Extract time and close price
-            temp_df = data[['time', 'close']].copy()
-            temp_df.rename(columns={'close': f'{symbol}_close'}, inplace=True)
-            
-            if combined_prices.empty:
-                combined_prices = temp_df
-            else:
-                combined_prices = pd.merge(combined_prices, temp_df, on='time', how='outer')
-    
-    # Sort by time
-    if not combined_prices.empty:
-        combined_prices = combined_prices.sort_values('time')
-        
-        # Export combined close prices to CSV
-        combined_close_csv_filename = 'combined_close_prices.csv'
-        combined_prices.to_csv(combined_close_csv_filename, index=False, encoding='utf-8-sig')
-        print(f"Combined close price data exported to {combined_close_csv_filename}")
-else:
-    print("No historical data was fetched for any symbol.")
\ No newline at end of file
+
+    save_price_data(combined_data, combined_prices, export_csv=args.csv, matrix_dir=args.matrix)
+
+
+if __name__ == "__main__":
+    main()
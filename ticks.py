@@ -0,0 +1,814 @@
+"""
+Intraday Tick Ingestion Module
+
+This module streams intraday matches (stock.quote.intraday) for many symbols
+through a trading session with bounded memory:
+
+- intraday pages are requested newest first and yielded one at a time by
+  iter_new_ticks(), which stops as soon as a page overlaps ticks already
+  seen and drops duplicates between overlapping pages;
+- new ticks go into a TickBuffer per symbol: growable numpy arrays with
+  fixed dtypes (int64 time, float64 price, int64 volume, int8 side, int64
+  id), no Python object per tick;
+- when the buffered ticks of all symbols exceed a limit, the largest buffers
+  are spilled to the data store (dataset 'ticks/{session}', partitioned by
+  symbol) and cleared; close_session() spills the rest and compacts each
+  symbol's files into one.
+
+    ingestor = TickIngestor(hose_symbols, rate_limit=20)
+    ingestor.run(until='14:50')          # poll every few seconds
+    ingestor.close_session()
+    acb = ingestor.ticks('ACB')
+
+ReplaySource replays a synthetic session locally, so the pipeline can be
+run and measured without network access (python ticks.py).
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fetcher import vnstock_quote
+from ratelimit import get_source_limiter
+from storage import DataStore
+
+# Data store dataset holding one session's ticks, partitioned by symbol
+TICK_DATASET = 'ticks/{session}'
+
+TICK_COLUMNS = ['time', 'price', 'volume', 'side', 'id']
+
+# match_type values of vnstock intraday data -> int8 side code (0: unknown)
+MATCH_TYPES = {'Buy': 1, 'Sell': 2, 'ATO': 3, 'ATC': 4}
+SIDE_NAMES = np.array(['', 'Buy', 'Sell', 'ATO', 'ATC'], dtype=object)
+
+# Ticks requested per intraday call; after the first poll of a symbol the
+# page is sized from its recent tick rate, down to MIN_PAGE_SIZE
+DEFAULT_PAGE_SIZE = 5_000
+MIN_PAGE_SIZE = 100
+
+# Buffered ticks across all symbols before the largest buffers are spilled
+# (about 33 bytes per tick)
+DEFAULT_MEMORY_LIMIT = 1_000_000
+
+FAILURE_COLUMNS = ['symbol', 'error_type', 'error']
+
+# Exchange local time minus UTC; intraday paging cursors (truncTime) are
+# epoch seconds, while tick times are kept in local time. Vietnam has no
+# daylight saving time.
+UTC_OFFSET = pd.Timedelta(hours=7)
+
+
+def page_arrays(page):
+    """
+    Convert one intraday page (time, price, volume, match_type, id columns)
+    to tick arrays sorted by time and id.
+
+    Times are stored as int64 nanoseconds of the exchange's local time. Pages
+    without an id column get -1 ids (see iter_new_ticks for how their
+    duplicates are found).
+
+    Returns:
+    --------
+    dict
+        TICK_COLUMNS -> numpy array
+    """
+    if page is None or len(page) == 0:
+        return {column: np.empty(0, dtype=dtype) for column, dtype in zip(TICK_COLUMNS, TickBuffer.DTYPES)}
+    times = page['time']
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, cache=False)
+    if getattr(times.dt, 'tz', None) is not None:
+        times = times.dt.tz_convert('Asia/Ho_Chi_Minh').dt.tz_localize(None)
+    sides = np.zeros(len(page), dtype=np.int8)
+    if 'match_type' in page.columns:
+        match_types = page['match_type'].to_numpy(dtype=object)
+        for name, code in MATCH_TYPES.items():
+            sides[match_types == name] = code
+    ids = (pd.to_numeric(page['id'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+           if 'id' in page.columns else np.full(len(page), -1, dtype=np.int64))
+    arrays = {
+        'time': times.to_numpy(dtype='datetime64[ns]').view(np.int64),
+        'price': page['price'].to_numpy(dtype=np.float64),
+        'volume': page['volume'].to_numpy(dtype=np.int64),
+        'side': sides,
+        'id': ids,
+    }
+    order = np.lexsort((arrays['id'], arrays['time']))
+    if not (order[1:] > order[:-1]).all():
+        arrays = {column: values[order] for column, values in arrays.items()}
+    return arrays
+
+
+def _has_ids(arrays):
+    return len(arrays['id']) > 0 and arrays['id'][0] >= 0
+
+
+def _keys(arrays):
+    """Order key of each tick: its id, or its time when the source has no ids."""
+    return arrays['id'] if _has_ids(arrays) else arrays['time']
+
+
+def edge_ticks(arrays, at, previous=None):
+    """
+    Count the ticks at time `at` (nanoseconds) by (price, volume, side).
+
+    Sources without ids can report several ticks in the same second, so the
+    ticks already seen at a boundary time are tracked as a multiset.
+
+    Parameters:
+    -----------
+    previous : collections.Counter, optional
+        Counts from earlier pages or polls at the same time, added to the result
+
+    Returns:
+    --------
+    collections.Counter
+    """
+    counts = Counter(previous) if previous is not None else Counter()
+    at_time = arrays['time'] == at
+    counts.update(zip(arrays['price'][at_time].tolist(), arrays['volume'][at_time].tolist(),
+                      arrays['side'][at_time].tolist()))
+    return counts
+
+
+def _unseen(arrays, at, seen):
+    """Mask of the ticks at time `at` not in `seen`, matching repeats one for one."""
+    mask = np.zeros(len(arrays['time']), dtype=bool)
+    remaining = Counter(seen)
+    for i in np.flatnonzero(arrays['time'] == at):
+        row = (arrays['price'][i].item(), arrays['volume'][i].item(), arrays['side'][i].item())
+        if remaining[row]:
+            remaining[row] -= 1
+        else:
+            mask[i] = True
+    return mask
+
+
+def _cursor(local_time):
+    """Epoch seconds (truncTime) of a local time in nanoseconds, rounded up."""
+    return int(-(-(int(local_time) - UTC_OFFSET.value) // 1_000_000_000))
+
+
+def iter_new_ticks(quote, page_size=DEFAULT_PAGE_SIZE, last_key=None, last_ticks=None):
+    """
+    Page through a symbol's intraday matches, newest first, yielding only
+    ticks newer than last_key.
+
+    Each page asks for the page_size matches up to the oldest time of the
+    previous page, sent as epoch seconds (VCI's truncTime) rounded up.
+    Paging stops at the first page that reaches a tick already seen, at a
+    short page (start of the session) or when the cursor stops moving.
+
+    Ticks repeated by overlapping pages are dropped by id. Sources without
+    ids are compared by time; at the boundary times, where pages and polls
+    overlap, ticks are matched by (time, price, volume, side), so distinct
+    ticks in the same second are kept and only exact repeats dropped.
+
+    Parameters:
+    -----------
+    quote : object
+        Object with vnstock's ``intraday(page_size, last_time)`` method
+    page_size : int
+        Matches per request (default: DEFAULT_PAGE_SIZE)
+    last_key : int, optional
+        Id (or time in nanoseconds, for sources without ids) of the newest
+        tick already stored (default: None, page through the whole session)
+    last_ticks : collections.Counter, optional
+        For sources without ids, the stored ticks at time last_key, as
+        returned by edge_ticks (default: None)
+
+    Yields:
+    -------
+    dict
+        TICK_COLUMNS -> array of the page's new ticks, sorted by time
+    """
+    cursor = None
+    oldest = None
+    seen = None
+    while True:
+        kwargs = {'page_size': page_size, 'show_log': False}
+        if cursor is not None:
+            kwargs['last_time'] = cursor
+        arrays = page_arrays(quote.intraday(**kwargs))
+        count = len(arrays['time'])
+        if not count:
+            return
+        keys = _keys(arrays)
+        has_ids = _has_ids(arrays)
+        new = np.ones(count, dtype=bool)
+        if has_ids:
+            if last_key is not None:
+                new &= keys > last_key
+            if oldest is not None:
+                new &= keys < oldest
+        else:
+            if last_key is not None:
+                new &= keys >= last_key
+            if oldest is not None:
+                new &= keys <= oldest
+            # At the boundary times, drop only the ticks already seen there
+            for at in {last_key, oldest} - {None}:
+                known = Counter(last_ticks or ()) if at == last_key else Counter()
+                if at == oldest:
+                    known += seen
+                new &= (keys != at) | _unseen(arrays, at, known)
+        if new.any():
+            page = {column: values[new] for column, values in arrays.items()} if not new.all() else arrays
+            yield page
+            page_oldest = _keys(page).min()
+            if not has_ids:
+                seen = edge_ticks(page, page_oldest, seen if page_oldest == oldest else None)
+            oldest = page_oldest
+        # Ticks at last_key itself may still be new for sources without ids
+        overlapped = last_key is not None and (keys[0] <= last_key if has_ids else keys[0] < last_key)
+        # Rounded up so a cursor in whole seconds never skips ticks; the
+        # overlap it causes is dropped by the filters above
+        next_cursor = _cursor(arrays['time'][0])
+        if overlapped or count < page_size or next_cursor == cursor:
+            return
+        cursor = next_cursor
+
+
+class TickBuffer:
+    """
+    Growable column arrays holding one symbol's ticks.
+
+    Parameters:
+    -----------
+    capacity : int
+        Initial capacity in ticks; doubled when full (default: 1024)
+    """
+
+    DTYPES = (np.int64, np.float64, np.int64, np.int8, np.int64)
+
+    def __init__(self, capacity=1024):
+        self._columns = {column: np.empty(capacity, dtype=dtype)
+                         for column, dtype in zip(TICK_COLUMNS, self.DTYPES)}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._columns['time'])
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._columns.values())
+
+    def append(self, arrays):
+        """Append tick arrays (TICK_COLUMNS -> array of equal length)."""
+        count = len(arrays['time'])
+        if self._size + count > self.capacity:
+            capacity = max(self.capacity * 2, self._size + count)
+            for column, values in self._columns.items():
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self._size] = values[:self._size]
+                self._columns[column] = grown
+        for column, values in self._columns.items():
+            values[self._size:self._size + count] = arrays[column]
+        self._size += count
+
+    def arrays(self):
+        """Views of the buffered ticks, TICK_COLUMNS -> array."""
+        return {column: values[:self._size] for column, values in self._columns.items()}
+
+    def to_frame(self):
+        """Buffered ticks as a DataFrame with a datetime 'time' column."""
+        arrays = self.arrays()
+        frame = pd.DataFrame({column: values.copy() for column, values in arrays.items()})
+        frame['time'] = frame['time'].astype('datetime64[ns]')
+        return frame
+
+    def clear(self, capacity=1024):
+        """Drop the buffered ticks and release the arrays."""
+        self.__init__(capacity)
+
+
+def ticks_frame(arrays, symbol=None):
+    """Tick arrays as a DataFrame with datetime times and match_type names."""
+    frame = pd.DataFrame({
+        'time': arrays['time'].view('datetime64[ns]'),
+        'price': arrays['price'],
+        'volume': arrays['volume'],
+        'match_type': SIDE_NAMES[arrays['side']],
+        'id': arrays['id'],
+    })
+    if symbol is not None:
+        frame.insert(0, 'symbol', symbol)
+    return frame
+
+
+class TickIngestor:
+    """
+    Streams intraday ticks of many symbols into per-symbol buffers and the
+    data store, keeping at most about memory_limit ticks in memory.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Symbols to ingest, e.g. every HOSE symbol
+    store : storage.DataStore, optional
+        Store receiving spilled ticks (default: DataStore())
+    session : str, optional
+        Session date 'YYYY-MM-DD', used in the dataset name (default: today)
+    source : str
+        Data source (default: 'VCI')
+    page_size : int
+        Largest number of matches per intraday request; later polls of a
+        symbol ask for twice its previous new ticks (default: DEFAULT_PAGE_SIZE)
+    memory_limit : int
+        Buffered ticks across all symbols before spilling (default: DEFAULT_MEMORY_LIMIT)
+    max_workers : int
+        Symbols polled at once (default: 8)
+    rate_limit : float, optional
+        Calls per second to the source, shared with other fetchers using the
+        same source. None disables rate limiting (default: None)
+    quote_factory : callable, optional
+        Function (symbol, source) -> object with an ``intraday`` method.
+        Defaults to vnstock's Quote; pass ReplaySource.quote to run offline.
+    """
+
+    def __init__(self, symbols, store=None, session=None, source='VCI', page_size=DEFAULT_PAGE_SIZE,
+                 memory_limit=DEFAULT_MEMORY_LIMIT, max_workers=8, rate_limit=None, quote_factory=None):
+        self.symbols = list(symbols)
+        self.store = store or DataStore()
+        self.session = session or pd.Timestamp.now().strftime('%Y-%m-%d')
+        self.dataset = TICK_DATASET.format(session=self.session)
+        self.source = source
+        self.page_size = page_size
+        self.memory_limit = memory_limit
+        self.max_workers = max_workers
+        self.limiter = get_source_limiter(source, rate_limit)
+        self.quote_factory = quote_factory or vnstock_quote
+        self.buffers = {symbol: TickBuffer() for symbol in self.symbols}
+        self.subscribers = []
+        self._quotes = {}
+        self._last_keys = {}
+        self._last_ticks = {}
+        self._page_sizes = {}
+        self._locks = {symbol: threading.Lock() for symbol in self.symbols}
+        self._spill_lock = threading.Lock()
+        self.counters = {'polls': 0, 'requests': 0, 'ticks': 0, 'spills': 0, 'spilled_ticks': 0,
+                         'peak_buffered_ticks': 0}
+        self._counters_lock = threading.Lock()
+        self.failures = []
+
+    def subscribe(self, callback):
+        """Call callback(symbol, arrays) with every batch of new ticks, in time order."""
+        self.subscribers.append(callback)
+
+    @property
+    def buffered_ticks(self):
+        return sum(len(buffer) for buffer in self.buffers.values())
+
+    def _count(self, **increments):
+        with self._counters_lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+
+    def _quote(self, symbol):
+        quote = self._quotes.get(symbol)
+        if quote is None:
+            quote = self._quotes[symbol] = self.quote_factory(symbol, self.source)
+        return quote
+
+    def poll(self, symbol):
+        """
+        Fetch a symbol's ticks that arrived since the last poll.
+
+        Returns:
+        --------
+        int
+            Number of new ticks
+        """
+        with self._locks[symbol]:
+            quote = _LimitedQuote(self._quote(symbol), self.limiter, self)
+            page_size = self._page_sizes.get(symbol, self.page_size)
+            last_key = self._last_keys.get(symbol)
+            pages = list(iter_new_ticks(quote, page_size, last_key, self._last_ticks.get(symbol)))
+            self._count(polls=1)
+            new = sum(len(page['time']) for page in pages)
+            self._page_sizes[symbol] = min(self.page_size, max(MIN_PAGE_SIZE, 2 * new))
+            if not pages:
+                return 0
+            # Pages arrive newest first
+            arrays = pages[0] if len(pages) == 1 else {
+                column: np.concatenate([page[column] for page in reversed(pages)]) for column in TICK_COLUMNS
+            }
+            self.buffers[symbol].append(arrays)
+            self._last_keys[symbol] = int(_keys(arrays)[-1])
+            if not _has_ids(arrays):
+                newest = self._last_keys[symbol]
+                self._last_ticks[symbol] = edge_ticks(
+                    arrays, newest, self._last_ticks.get(symbol) if newest == last_key else None)
+            count = len(arrays['time'])
+            for callback in self.subscribers:
+                callback(symbol, arrays)
+        self._count(ticks=count)
+        return count
+
+    def poll_all(self, symbols=None):
+        """
+        Poll every symbol once, concurrently, and spill if over the memory limit.
+
+        Returns:
+        --------
+        dict
+            Symbol -> number of new ticks (failed symbols are left out and
+            recorded in failures)
+        """
+        symbols = self.symbols if symbols is None else symbols
+
+        def poll(symbol):
+            try:
+                return symbol, self.poll(symbol), None
+            except Exception as e:
+                return symbol, 0, e
+
+        new = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for symbol, count, error in executor.map(poll, symbols):
+                if error is not None:
+                    self.failures.append({'symbol': symbol, 'error_type': type(error).__name__,
+                                          'error': str(error)})
+                    continue
+                new[symbol] = count
+        buffered = self.buffered_ticks
+        with self._counters_lock:
+            self.counters['peak_buffered_ticks'] = max(self.counters['peak_buffered_ticks'], buffered)
+        if buffered > self.memory_limit:
+            self.spill(target=self.memory_limit // 2)
+        return new
+
+    def spill(self, symbols=None, target=0):
+        """
+        Write buffered ticks to the store and clear their buffers.
+
+        Parameters:
+        -----------
+        symbols : list of str, optional
+            Symbols to spill (default: the largest buffers until at most
+            `target` ticks stay buffered)
+        target : int
+            Buffered ticks allowed to remain when symbols is None (default: 0)
+
+        Returns:
+        --------
+        int
+            Number of ticks written
+        """
+        with self._spill_lock:
+            if symbols is None:
+                remaining = self.buffered_ticks
+                symbols = []
+                for symbol in sorted(self.buffers, key=lambda s: len(self.buffers[s]), reverse=True):
+                    if remaining <= target or not len(self.buffers[symbol]):
+                        break
+                    symbols.append(symbol)
+                    remaining -= len(self.buffers[symbol])
+            frames = []
+            for symbol in symbols:
+                with self._locks[symbol]:
+                    buffer = self.buffers[symbol]
+                    if len(buffer):
+                        frames.append(buffer.to_frame().assign(symbol=symbol))
+                        buffer.clear()
+            if not frames:
+                return 0
+            frame = pd.concat(frames, ignore_index=True)
+            self.store.write(self.dataset, frame, partition_cols=['symbol'], mode='append')
+            self._count(spills=1, spilled_ticks=len(frame))
+            return len(frame)
+
+    def close_session(self, compact=True):
+        """
+        Spill every buffer and, with compact, rewrite each symbol's spilled
+        files as one file sorted by time.
+
+        Returns:
+        --------
+        int
+            Number of ticks stored for the session
+        """
+        self.spill(self.symbols)
+        if not self.store.exists(self.dataset):
+            return 0
+        total = 0
+        stored = self.store.partitions(self.dataset)
+        symbols = stored['symbol'].tolist() if not stored.empty else []
+        for start in range(0, len(symbols), 50):
+            batch = self.store.read(self.dataset, filters={'symbol': symbols[start:start + 50]})
+            batch['symbol'] = batch['symbol'].astype(str)
+            batch = batch.sort_values(['symbol', 'time', 'id'], kind='stable', ignore_index=True)
+            total += len(batch)
+            if compact:
+                self.store.write(self.dataset, batch, partition_cols=['symbol'])
+        return total
+
+    def ticks(self, symbol):
+        """
+        Return a symbol's ticks of the session, stored and buffered.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            'time', 'price', 'volume', 'match_type' and 'id', sorted by time
+        """
+        stored = self.store.read(self.dataset, filters={'symbol': symbol}) if self.store.exists(self.dataset) \
+            else pd.DataFrame()
+        with self._locks[symbol]:
+            buffered = self.buffers[symbol].to_frame()
+        frames = [frame.drop(columns='symbol', errors='ignore') for frame in (stored, buffered) if not frame.empty]
+        if not frames:
+            return ticks_frame(TickBuffer().arrays())
+        frame = pd.concat(frames, ignore_index=True).sort_values(['time', 'id'], kind='stable', ignore_index=True)
+        frame['match_type'] = SIDE_NAMES[frame.pop('side').to_numpy()]
+        return frame[['time', 'price', 'volume', 'match_type', 'id']]
+
+    def run(self, until=None, interval=3.0, cycles=None, clock=None, sleep=time.sleep, verbose=True):
+        """
+        Poll every symbol each `interval` seconds until a time of day or a
+        number of cycles.
+
+        Parameters:
+        -----------
+        until : str, optional
+            Local time 'HH:MM' to stop at (default: None, run `cycles` times)
+        interval : float
+            Seconds between the starts of two cycles (default: 3.0)
+        cycles : int, optional
+            Number of cycles to run (default: None, until `until`)
+        clock : callable, optional
+            Function returning the current pandas.Timestamp (default: now)
+        sleep : callable
+            Function used to wait between cycles (default: time.sleep)
+
+        Returns:
+        --------
+        int
+            Number of cycles run
+        """
+        clock = clock or pd.Timestamp.now
+        stop = pd.Timestamp(f"{clock():%Y-%m-%d} {until}") if until else None
+        done = 0
+        while (cycles is None or done < cycles) and (stop is None or clock() < stop):
+            started = time.monotonic()
+            new = self.poll_all()
+            done += 1
+            if verbose:
+                print(f"Cycle {done}: {sum(new.values())} new ticks, {self.buffered_ticks} buffered")
+            sleep(max(0.0, interval - (time.monotonic() - started)))
+        return done
+
+    def failure_report(self):
+        """Symbols whose polls failed, as a DataFrame with FAILURE_COLUMNS."""
+        return pd.DataFrame(self.failures, columns=FAILURE_COLUMNS)
+
+    def stats(self):
+        """Return the ingestion counters, including the currently buffered ticks."""
+        with self._counters_lock:
+            counters = dict(self.counters)
+        counters['buffered_ticks'] = self.buffered_ticks
+        counters['failures'] = len(self.failures)
+        return counters
+
+
+class _LimitedQuote:
+    """Quote wrapper drawing one token per intraday request."""
+
+    def __init__(self, quote, limiter, ingestor):
+        self.quote = quote
+        self.limiter = limiter
+        self.ingestor = ingestor
+
+    def intraday(self, **kwargs):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        self.ingestor._count(requests=1)
+        return self.quote.intraday(**kwargs)
+
+
+class ReplaySource:
+    """
+    Local replay of a synthetic HOSE session, served through an
+    ``intraday(page_size, last_time)`` method like vnstock's Quote.
+
+    Each symbol's ticks are generated once, spread over the ATO, continuous
+    and ATC sessions; only ticks up to the replay clock (`now`) are served, so
+    advancing the clock releases new ticks. Like VCI, last_time is taken as
+    epoch seconds only.
+
+    Parameters:
+    -----------
+    symbols : list of str
+        Symbols to replay
+    session : str
+        Session date 'YYYY-MM-DD' (default: '2025-03-19')
+    mean_ticks : int
+        Average ticks per symbol over the session (default: 5,000)
+    latency : float
+        Seconds each request sleeps (default: 0.0)
+    seed : int
+        Seed of the synthetic ticks (default: 0)
+    ids : bool
+        Serve an id column; without it ticks are told apart by time, price,
+        volume and side only (default: True)
+    time_unit : str
+        Resolution of the tick times, 'ms' or 's'; whole seconds put several
+        ticks in the same second (default: 'ms')
+    """
+
+    SESSIONS = (('09:15', '11:30'), ('13:00', '14:30'))
+
+    def __init__(self, symbols, session='2025-03-19', mean_ticks=5_000, latency=0.0, seed=0, ids=True,
+                 time_unit='ms'):
+        self.session = session
+        self.latency = latency
+        self.ids = ids
+        unit = {'ms': 1_000_000, 's': 1_000_000_000}[time_unit]
+        self.now = pd.Timestamp(f'{session} 09:00')
+        self.requests = 0
+        self._ticks = {}
+        rng = np.random.default_rng(seed)
+        day = pd.Timestamp(session)
+        bounds = [(pd.Timestamp(f'{session} {a}'), pd.Timestamp(f'{session} {b}')) for a, b in self.SESSIONS]
+        lengths = np.array([(b - a).value for a, b in bounds], dtype=np.int64)
+        ato, atc = pd.Timestamp(f'{session} 09:15').value, pd.Timestamp(f'{session} 14:45').value
+        for symbol in symbols:
+            count = max(int(rng.exponential(mean_ticks)), 2)
+            # Continuous-session times, ms resolution, split by session length
+            offsets = np.sort(rng.integers(0, lengths.sum(), count - 2)) // unit * unit
+            starts = np.where(offsets < lengths[0], bounds[0][0].value, bounds[1][0].value - lengths[0])
+            times = np.concatenate([[ato - 1_000_000_000], starts + offsets, [atc]])
+            sides = np.concatenate([[3], rng.integers(1, 3, count - 2), [4]]).astype(np.int8)
+            price = np.round(rng.uniform(5, 100) * np.exp(np.cumsum(rng.normal(0, 0.0005, count))), 2)
+            self._ticks[symbol] = {
+                'time': times.astype(np.int64),
+                'price': price,
+                'volume': (rng.integers(1, 100, count) * 100).astype(np.int64),
+                'side': sides,
+                'id': np.arange(1, count + 1, dtype=np.int64) + (day.value // 86_400_000_000_000) * 10_000_000,
+            }
+
+    def advance(self, seconds):
+        self.now += pd.Timedelta(seconds=seconds)
+
+    def _frame(self, arrays):
+        frame = ticks_frame(arrays)
+        return frame if self.ids else frame.drop(columns='id')
+
+    def full_session(self, symbol):
+        """Every tick of a symbol as served by intraday at the end of the session."""
+        return self._frame(self._ticks[symbol])
+
+    def intraday(self, symbol, page_size=DEFAULT_PAGE_SIZE, last_time=None, **kwargs):
+        """The newest page_size ticks at or before last_time, in epoch seconds (default: now)."""
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        ticks = self._ticks[symbol]
+        upto = self.now.value
+        if last_time is not None:
+            if not isinstance(last_time, (int, np.integer)) or isinstance(last_time, bool):
+                raise TypeError(f"last_time must be epoch seconds, got {last_time!r}")
+            upto = min(upto, int(last_time) * 1_000_000_000 + UTC_OFFSET.value)
+        hi = ticks['time'].searchsorted(upto, side='right')
+        lo = max(0, hi - page_size)
+        return self._frame({column: values[lo:hi] for column, values in ticks.items()})
+
+    def quote(self, symbol, source=None):
+        """quote_factory for TickIngestor."""
+        replay = self
+
+        class Quote:
+            def intraday(self, page_size=DEFAULT_PAGE_SIZE, last_time=None, **kwargs):
+                return replay.intraday(symbol, page_size, last_time)
+
+        return Quote()
+
+
+def _rss_bytes():
+    """Resident memory of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _replay_session(ingestor, replay, interval_minutes, checkpoint=None):
+    """Poll every interval_minutes of replay time until 14:50, calling checkpoint each quarter."""
+    steps = int((pd.Timestamp(f'{replay.session} 14:50') - replay.now).total_seconds() // (interval_minutes * 60))
+    for step in range(steps + 1):
+        ingestor.poll_all()
+        replay.advance(interval_minutes * 60)
+        if checkpoint is not None and (step % max(1, steps // 4) == 0 or step == steps):
+            checkpoint()
+
+
+def benchmark(num_symbols=400, mean_ticks=5_000, interval_minutes=5, memory_limit=500_000,
+              root=os.path.join('.cache', 'ticks_bench')):
+    """
+    Replay a session for num_symbols symbols, polling every interval_minutes
+    of replay time, and check that the stored ticks match the replay. A
+    second, smaller replay without ids and with whole-second times checks
+    that distinct ticks in the same second are all kept.
+
+    Returns:
+    --------
+    dict
+        Ticks ingested, requests, seconds, ticks per second, peak buffered
+        ticks and the process memory after each quarter of the session
+    """
+    import shutil
+
+    shutil.rmtree(root, ignore_errors=True)
+    symbols = [f'S{i:03d}' for i in range(num_symbols)]
+    replay = ReplaySource(symbols, mean_ticks=mean_ticks)
+    ingestor = TickIngestor(symbols, store=DataStore(root), session=replay.session, memory_limit=memory_limit,
+                            quote_factory=replay.quote)
+
+    memory = []
+    t0 = time.perf_counter()
+    _replay_session(ingestor, replay, interval_minutes, lambda: memory.append(_rss_bytes()))
+    ingest_seconds = time.perf_counter() - t0
+    stored = ingestor.close_session()
+    seconds = time.perf_counter() - t0
+
+    expected = sum(len(replay._ticks[symbol]['time']) for symbol in symbols)
+    assert stored == expected, (stored, expected)
+    for symbol in symbols[:5]:
+        got = ingestor.ticks(symbol)
+        want = replay.full_session(symbol)
+        assert got['id'].tolist() == want['id'].tolist(), symbol
+        assert np.allclose(got['price'], want['price']), symbol
+
+    # No ids, about two ticks per second: nothing may be lost or repeated
+    dense = ReplaySource(symbols[:20], mean_ticks=30_000, ids=False, time_unit='s', seed=1)
+    no_ids = TickIngestor(symbols[:20], store=DataStore(os.path.join(root, 'no_ids')), session=dense.session,
+                          quote_factory=dense.quote)
+    _replay_session(no_ids, dense, interval_minutes)
+    no_ids.close_session()
+    order = ['time', 'price', 'volume', 'match_type']
+    for symbol in symbols[:20]:
+        got = no_ids.ticks(symbol)[order].sort_values(order, ignore_index=True)
+        want = dense.full_session(symbol)[order].sort_values(order, ignore_index=True)
+        assert len(got) == len(want), (symbol, len(got), len(want))
+        assert (got.to_numpy() == want.to_numpy()).all(), symbol
+
+    counters = ingestor.stats()
+    return {
+        'symbols': num_symbols,
+        'ticks': counters['ticks'],
+        'requests': counters['requests'],
+        'polls': counters['polls'],
+        'spills': counters['spills'],
+        'peak_buffered_ticks': counters['peak_buffered_ticks'],
+        'ingest_seconds': ingest_seconds,
+        'seconds': seconds,
+        'ticks_per_second': counters['ticks'] / ingest_seconds,
+        'memory': memory,
+        'no_id_ticks': no_ids.stats()['ticks'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream intraday ticks for many symbols into the data store.")
+    parser.add_argument('symbols', nargs='*', help="Symbols to ingest")
+    parser.add_argument('--until', default='14:50', help="Local time to stop polling (HH:MM)")
+    parser.add_argument('--interval', type=float, default=3.0, help="Seconds between polling cycles")
+    parser.add_argument('--rate', type=float, default=None, help="Calls per second to the source")
+    parser.add_argument('--memory-limit', type=int, default=DEFAULT_MEMORY_LIMIT,
+                        help="Buffered ticks before spilling to disk")
+    parser.add_argument('--benchmark', action='store_true', help="Replay a synthetic session instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark or not args.symbols:
+        result = benchmark()
+        print(f"Ingested {result['ticks']:,} ticks for {result['symbols']} symbols in "
+              f"{result['ingest_seconds']:.1f}s ({result['ticks_per_second']:,.0f} ticks/s, "
+              f"{result['requests']:,} requests, {result['spills']} spills)")
+        print(f"Peak buffered ticks: {result['peak_buffered_ticks']:,}")
+        print(f"Source without ids: all {result['no_id_ticks']:,} ticks kept")
+        if result['memory'][0] is not None:
+            print("Process memory through the session: "
+                  + ", ".join(f"{m / 2**20:.0f} MB" for m in result['memory']))
+        return result
+
+    ingestor = TickIngestor(args.symbols, rate_limit=args.rate, memory_limit=args.memory_limit)
+    ingestor.run(until=args.until, interval=args.interval)
+    stored = ingestor.close_session()
+    print(f"Stored {stored:,} ticks in {ingestor.store.root}/{ingestor.dataset}")
+    return ingestor
+
+
+if __name__ == "__main__":
+    main()
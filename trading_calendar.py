@@ -0,0 +1,241 @@
+"""
+Trading Calendar Module
+
+This module knows which days the Vietnamese stock market trades, so backfills
+can skip weekends and market holidays that always return empty frames, and so
+missing bars can be told apart from days without trading.
+
+The calendar combines two sources:
+- observed trading days taken from bars in the history cache; inside the ranges
+  the cache has fully covered, a day is a trading day only if some symbol has a bar
+- outside those ranges, weekdays minus a configurable holiday list
+
+(The module is not named calendar.py so it does not shadow the standard library.)
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Solar holidays observed every year (month-day): New Year, Reunification Day,
+# Labour Day and National Day
+FIXED_HOLIDAYS = ['01-01', '04-30', '05-01', '09-02']
+
+# Other HOSE/HNX closures: Lunar New Year, Hung Kings' Commemoration and days
+# off in lieu of holidays falling on a weekend
+HOLIDAYS = [
+    # 2020
+    '2020-01-23', '2020-01-24', '2020-01-27', '2020-01-28', '2020-01-29', '2020-04-02',
+    # 2021
+    '2021-02-10', '2021-02-11', '2021-02-12', '2021-02-15', '2021-02-16', '2021-04-21',
+    '2021-05-03', '2021-09-03',
+    # 2022
+    '2022-01-03', '2022-01-31', '2022-02-01', '2022-02-02', '2022-02-03', '2022-02-04',
+    '2022-04-11', '2022-05-02', '2022-05-03', '2022-09-01',
+    # 2023
+    '2023-01-02', '2023-01-20', '2023-01-23', '2023-01-24', '2023-01-25', '2023-01-26',
+    '2023-05-02', '2023-05-03', '2023-09-01', '2023-09-04',
+    # 2024
+    '2024-02-08', '2024-02-09', '2024-02-12', '2024-02-13', '2024-02-14', '2024-04-18',
+    '2024-04-29', '2024-09-03',
+    # 2025
+    '2025-01-27', '2025-01-28', '2025-01-29', '2025-01-30', '2025-01-31', '2025-04-07',
+    '2025-09-01',
+]
+
+
+def _day(value):
+    return np.datetime64(pd.Timestamp(value).normalize().date(), 'D')
+
+
+class TradingCalendar:
+    """
+    Set of trading days built from observed bars and a holiday list.
+
+    Parameters:
+    -----------
+    holidays : list of str, optional
+        Extra non-trading dates in 'YYYY-MM-DD' format (default: HOLIDAYS)
+    fixed_holidays : list of str, optional
+        Month-day strings closed every year (default: FIXED_HOLIDAYS)
+    """
+
+    def __init__(self, holidays=None, fixed_holidays=None):
+        self.holidays = np.array(sorted(HOLIDAYS if holidays is None else holidays), dtype='datetime64[D]')
+        self.fixed_holidays = set(FIXED_HOLIDAYS if fixed_holidays is None else fixed_holidays)
+        self._observed = np.array([], dtype='datetime64[D]')
+        # Sorted, non-overlapping inclusive day ranges where observations are complete
+        self._known = []
+
+    def add_observed(self, days, start, end):
+        """
+        Record the trading days seen in bars that fully cover [start, end].
+
+        Parameters:
+        -----------
+        days : iterable of dates
+            Days with at least one bar
+        start, end : str or date
+            Inclusive range the bars cover; days in it without a bar are treated
+            as non-trading days
+        """
+        days = pd.to_datetime(pd.Index(days)).normalize().values.astype('datetime64[D]')
+        self._observed = np.union1d(self._observed, days)
+        ranges = self._known + [(_day(start), _day(end))]
+        merged = []
+        for range_start, range_end in sorted(ranges):
+            if merged and range_start <= merged[-1][1] + np.timedelta64(1, 'D'):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+            else:
+                merged.append((range_start, range_end))
+        self._known = merged
+        return self
+
+    @classmethod
+    def from_history_cache(cls, history_cache, symbols=None, interval='1D', **kwargs):
+        """
+        Build a calendar from the daily bars stored in a HistoryCache.
+
+        Parameters:
+        -----------
+        history_cache : cache.HistoryCache
+            Cache to read; nothing is fetched
+        symbols : list of str, optional
+            Symbols to read (default: every cached symbol for the interval)
+        interval : str
+            Daily interval whose bars mark trading days (default: '1D')
+        **kwargs
+            Passed to TradingCalendar, e.g. holidays=[...]
+
+        Returns:
+        --------
+        TradingCalendar
+        """
+        calendar = cls(**kwargs)
+        if symbols is None:
+            symbols = history_cache.cached_symbols(interval)
+        for symbol in symbols:
+            data, ranges = history_cache.stored(symbol, interval)
+            if data.empty:
+                continue
+            times = data['time']
+            for range_start, range_end in ranges:
+                in_range = times[(times >= range_start) & (times < range_end + timedelta(days=1))]
+                if in_range.empty:
+                    continue
+                # Only the span between the first and last bar counts as observed,
+                # so days before a listing or after a delisting are not marked closed
+                calendar.add_observed(in_range, in_range.min(), in_range.max())
+        return calendar
+
+    def _rule_mask(self, days):
+        weekday = ((days.astype('datetime64[D]').astype(np.int64) - 4) % 7) < 5
+        month_day = pd.DatetimeIndex(days).strftime('%m-%d')
+        fixed = np.isin(month_day, list(self.fixed_holidays))
+        return weekday & ~fixed & ~np.isin(days, self.holidays)
+
+    def is_trading_day(self, day):
+        """Return True if the market trades on the given day."""
+        return bool(self._mask(np.array([_day(day)]))[0])
+
+    def _mask(self, days):
+        mask = self._rule_mask(days)
+        for range_start, range_end in self._known:
+            inside = (days >= range_start) & (days <= range_end)
+            mask[inside] = np.isin(days[inside], self._observed)
+        return mask
+
+    def trading_days(self, start, end):
+        """
+        List the trading days between start and end (inclusive).
+
+        Returns:
+        --------
+        pandas.DatetimeIndex
+        """
+        days = np.arange(_day(start), _day(end) + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        return pd.DatetimeIndex(days[self._mask(days)])
+
+    def roll_forward(self, dates, end=None):
+        """
+        Move each date to the first trading day on or after it.
+
+        Dates that would move past `end` are dropped and duplicates are removed,
+        so stepping 1 day through a range yields each trading day once.
+
+        Parameters:
+        -----------
+        dates : list of str
+            Dates in 'YYYY-MM-DD' format, sorted
+        end : str, optional
+            Last allowed date (default: no limit)
+
+        Returns:
+        --------
+        list of str
+            Trading days in 'YYYY-MM-DD' format
+        """
+        if not dates:
+            return []
+        last = _day(end) if end is not None else _day(dates[-1]) + np.timedelta64(31, 'D')
+        sessions = self.trading_days(dates[0], last).values.astype('datetime64[D]')
+        positions = np.searchsorted(sessions, np.array(dates, dtype='datetime64[D]'), side='left')
+        positions = np.unique(positions[positions < len(sessions)])
+        return [str(day) for day in sessions[positions]]
+
+    def trim_range(self, start, end):
+        """
+        Shrink [start, end] to its first and last trading day.
+
+        Returns:
+        --------
+        tuple or None
+            (first, last) pandas Timestamps, or None if the range has no trading day
+        """
+        days = self.trading_days(start, end)
+        if days.empty:
+            return None
+        return days[0], days[-1]
+
+    def missing_days(self, times, start, end):
+        """
+        Return the trading days between start and end without a bar.
+
+        Parameters:
+        -----------
+        times : iterable of dates
+            Times of the stored bars
+        start, end : str or date
+            Inclusive range to check
+
+        Returns:
+        --------
+        pandas.DatetimeIndex
+            True gaps: trading days that should have a bar but do not
+        """
+        expected = self.trading_days(start, end)
+        present = pd.to_datetime(pd.Index(times)).normalize()
+        return expected[~expected.isin(present)]
+
+
+def request_savings(start='2020-01-01', end='2024-12-31', calendar=None):
+    """
+    Compare the number of daily requests with and without the calendar.
+
+    Returns:
+    --------
+    dict
+        Calendar days, trading days and the fraction of requests saved
+    """
+    calendar = calendar or TradingCalendar()
+    all_days = (datetime.strptime(end, "%Y-%m-%d") - datetime.strptime(start, "%Y-%m-%d")).days + 1
+    trading = len(calendar.trading_days(start, end))
+    return {'calendar_days': all_days, 'trading_days': trading, 'saved': 1 - trading / all_days}
+
+
+if __name__ == "__main__":
+    result = request_savings()
+    print(f"Calendar days: {result['calendar_days']}")
+    print(f"Trading days: {result['trading_days']}")
+    print(f"Requests saved: {result['saved']:.1%}")
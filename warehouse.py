@@ -0,0 +1,655 @@
+"""
+Financial Statement Warehouse Module
+
+This module keeps the statements fetched by fs.py (BalanceSheet,
+IncomeStatement, CashFlow, Ratio) for many companies in one long table per
+statement with (symbol, period, item, value) rows, so they can be queried
+across companies ("ROE for all banks in 2023Q4") instead of one CSV per
+symbol.
+
+Wide vnstock frames are normalized on ingest: the symbol, year and quarter
+columns ('ticker'/'CP', 'yearReport'/'Năm', 'lengthReport'/'Kỳ') or a period
+index ('2023-Q4') become the period label ('2023' or '2023Q4'), every other
+numeric column becomes a line item. Each statement is stored as one
+dataset through storage.DataStore. When a statement is queried it is loaded once and sorted
+by item and by period, so a cross-section or pivot is a binary search and a
+slice rather than a scan.
+
+    from warehouse import StatementWarehouse
+
+    warehouse = StatementWarehouse()
+    warehouse.ingest('ACB', fs.fetch_statements('ACB', period='quarter'))
+    warehouse.cross_section('Ratio', 'ROE (%)', '2023Q4', symbols=banks)
+    warehouse.pivot('IncomeStatement', 'Doanh thu thuần')    # symbol x period
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import instrument
+from storage import DataStore
+
+DEFAULT_WAREHOUSE_DIR = os.path.join('data', 'warehouse')
+
+LONG_COLUMNS = ['symbol', 'period', 'item', 'value']
+
+# Identifier columns of vnstock statement frames (English and Vietnamese)
+SYMBOL_COLUMNS = ('ticker', 'CP', 'symbol')
+YEAR_COLUMNS = ('yearReport', 'Năm', 'year')
+QUARTER_COLUMNS = ('lengthReport', 'Kỳ', 'quarter')
+PERIOD_COLUMNS = ('period', 'Kỳ báo cáo')
+# Group of MultiIndex ratio columns that holds the identifiers
+META_GROUP = 'Meta'
+
+_PERIOD_PATTERN = re.compile(r'^(\d{4})\s*-?\s*Q?(\d)?$', re.IGNORECASE)
+
+
+def period_label(year, quarter=None):
+    """
+    Return the period label for a year and optional quarter.
+
+    Quarters outside 1-4 (VCI reports annual rows with lengthReport 5) give
+    the annual label.
+
+    Returns:
+    --------
+    str
+        'YYYY' or 'YYYYQn'
+    """
+    year = int(year)
+    if quarter is None or pd.isna(quarter) or int(quarter) not in (1, 2, 3, 4):
+        return str(year)
+    return f'{year}Q{int(quarter)}'
+
+
+def _normalize_period(value):
+    match = _PERIOD_PATTERN.match(str(value).strip())
+    if match is None:
+        return str(value)
+    return period_label(match.group(1), match.group(2))
+
+
+def _flatten_columns(df):
+    if not isinstance(df.columns, pd.MultiIndex):
+        return df
+    names = [column[-1] for column in df.columns]
+    duplicated = pd.Index(names).duplicated(keep=False)
+    flat = []
+    for column, name, duplicate in zip(df.columns, names, duplicated):
+        if duplicate and column[0] != META_GROUP:
+            name = ' / '.join(str(part) for part in column if str(part))
+        flat.append(name)
+    df = df.copy()
+    df.columns = flat
+    return df
+
+
+def _first_present(columns, candidates):
+    for candidate in candidates:
+        if candidate in columns:
+            return candidate
+    return None
+
+
+def _prepare(df, symbol):
+    """Flatten a wide statement frame and rename its identifier columns to
+    'symbol', 'year', 'quarter' and 'period'."""
+    df = _flatten_columns(df)
+    if df.index.name in PERIOD_COLUMNS or not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index().rename(columns={df.index.name or 'index': 'period'})
+    renames = {}
+    for candidates, name in ((SYMBOL_COLUMNS, 'symbol'), (YEAR_COLUMNS, 'year'),
+                             (QUARTER_COLUMNS, 'quarter'), (PERIOD_COLUMNS, 'period')):
+        column = _first_present(df.columns, candidates)
+        if column is not None:
+            renames[column] = name
+    df = df.rename(columns=renames)
+    if 'symbol' not in df.columns:
+        if symbol is None:
+            raise ValueError("symbol is required when the frame has no symbol column")
+        df.insert(0, 'symbol', symbol)
+    if 'year' not in df.columns and 'period' not in df.columns:
+        raise ValueError("Statement frame has no year or period column")
+    return df
+
+
+def normalize_statements(frames):
+    """
+    Turn wide vnstock statement frames of many symbols into long
+    (symbol, period, item, value) rows in one pass.
+
+    Parameters:
+    -----------
+    frames : dict
+        Symbol -> frame with one row per period and one column per line item,
+        as returned by stock.finance.balance_sheet() and friends. A symbol
+        column in the frame takes precedence over the key.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns LONG_COLUMNS; non-numeric and missing values are dropped
+    """
+    prepared = [_prepare(df, symbol) for symbol, df in frames.items() if df is not None and not df.empty]
+    if not prepared:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+    df = pd.concat(prepared, ignore_index=True) if len(prepared) > 1 else prepared[0]
+
+    # Frames from different sources may mix year/quarter and period columns
+    missing = [None] * len(df)
+    years = df['year'] if 'year' in df.columns else missing
+    quarters = df['quarter'] if 'quarter' in df.columns else missing
+    labels = df['period'] if 'period' in df.columns else missing
+    periods = [period_label(year, quarter) if year is not None and not pd.isna(year) else _normalize_period(label)
+               for year, quarter, label in zip(years, quarters, labels)]
+    symbols = df['symbol'].astype(str).to_numpy(dtype=object)
+
+    items = [column for column in df.columns if column not in ('symbol', 'year', 'quarter', 'period')]
+    block = df[items]
+    text = [column for column, dtype in block.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+    if text:
+        block = block.copy()
+        for column in text:
+            block[column] = pd.to_numeric(block[column], errors='coerce')
+    values = block.to_numpy(dtype=float)
+
+    long = pd.DataFrame({
+        'symbol': np.repeat(symbols, len(items)),
+        'period': np.repeat(np.asarray(periods, dtype=object), len(items)),
+        'item': np.tile(np.asarray([str(item) for item in items], dtype=object), len(df)),
+        'value': values.ravel(),
+    })
+    long = long[long['value'].notna()].reset_index(drop=True)
+    if len(set(zip(symbols, periods))) < len(df) or len(set(items)) < len(items):
+        # A period reported twice keeps its last row
+        long = long.drop_duplicates(['symbol', 'period', 'item'], keep='last').reset_index(drop=True)
+    return long
+
+
+def normalize_statement(df, symbol=None):
+    """
+    Turn one wide vnstock statement frame into long (symbol, period, item, value) rows.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        One row per period and one column per line item
+    symbol : str, optional
+        Symbol of the rows; required when the frame has no symbol column
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns LONG_COLUMNS
+    """
+    return normalize_statements({symbol: df})
+
+
+def _category_codes(column):
+    """Sorted category labels of a column and each row's code into them."""
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype(str).astype('category')
+    labels = column.cat.categories.astype(str)
+    order = np.argsort(np.asarray(labels, dtype=object))
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return pd.Index(labels[order]), rank[column.cat.codes.to_numpy()]
+
+
+def _isin_rows(long, rows, keys):
+    """Mask of the stored rows whose key columns match a row of `rows`."""
+    wanted = set(zip(*(rows[key].astype(str) for key in keys)))
+    # Combine the per-column category codes into one code per row, then only
+    # the distinct combinations are compared as strings
+    combined = np.zeros(len(long), dtype=np.int64)
+    categories = []
+    for key in keys:
+        column = long[key].cat
+        combined = combined * len(column.categories) + column.codes.to_numpy()
+        categories.append(column.categories.astype(str))
+    matches = []
+    for code in np.unique(combined):
+        labels = []
+        rest = int(code)
+        for names in reversed(categories):
+            rest, position = divmod(rest, len(names))
+            labels.append(names[position])
+        if tuple(reversed(labels)) in wanted:
+            matches.append(code)
+    return np.isin(combined, matches)
+
+
+class _StatementTable:
+    """
+    One statement held in memory as category codes, sorted by
+    (item, period, symbol) and by (period, item, symbol).
+    """
+
+    def __init__(self, long):
+        # Sorted labels, so period codes are chronological ('2023' < '2023Q1' < '2024')
+        self.symbols, symbol_codes = _category_codes(long['symbol'])
+        self.periods, period_codes = _category_codes(long['period'])
+        self.items, item_codes = _category_codes(long['item'])
+        self._symbol_lookup = {name: code for code, name in enumerate(self.symbols)}
+        self._period_lookup = {name: code for code, name in enumerate(self.periods)}
+        self._item_lookup = {name: code for code, name in enumerate(self.items)}
+        values = long['value'].to_numpy(dtype=float)
+
+        order = np.lexsort((symbol_codes, period_codes, item_codes))
+        self.by_item = {
+            'symbol': symbol_codes[order], 'period': period_codes[order],
+            'item': item_codes[order], 'value': values[order],
+        }
+        order = np.lexsort((symbol_codes, item_codes, period_codes))
+        self.by_period = {
+            'symbol': symbol_codes[order], 'period': period_codes[order],
+            'item': item_codes[order], 'value': values[order],
+        }
+
+    def __len__(self):
+        return len(self.by_item['value'])
+
+    @staticmethod
+    def _slice(keys, code, lo=0, hi=None):
+        hi = len(keys) if hi is None else hi
+        # Same dtype as the keys, or numpy converts the whole array
+        code = keys.dtype.type(code)
+        return (lo + np.searchsorted(keys[lo:hi], code, side='left'),
+                lo + np.searchsorted(keys[lo:hi], code, side='right'))
+
+    def cross_section(self, item, period):
+        table = self.by_item
+        if item not in self._item_lookup or period not in self._period_lookup:
+            return pd.Series(dtype=float, name=item)
+        lo, hi = self._slice(table['item'], self._item_lookup[item])
+        lo, hi = self._slice(table['period'], self._period_lookup[period], lo, hi)
+        return pd.Series(table['value'][lo:hi], index=pd.Index(self.symbols[table['symbol'][lo:hi]], name='symbol'),
+                         name=item)
+
+    def matrix(self, key, code, row_field, column_field, row_names, column_names):
+        table = self.by_item if key == 'item' else self.by_period
+        lo, hi = self._slice(table[key], code)
+        rows = table[row_field][lo:hi]
+        columns = table[column_field][lo:hi]
+        grid = np.full((len(row_names), len(column_names)), np.nan)
+        grid[rows, columns] = table['value'][lo:hi]
+        return grid
+
+
+class StatementWarehouse:
+    """
+    Long-format store of financial statements for many companies.
+
+    Each statement is one dataset with (symbol, period, item, value) rows.
+    Writes merge a batch of companies into the stored table at once, so bulk
+    loads should go through ingest_many() rather than one ingest() per symbol.
+
+    Parameters:
+    -----------
+    root : str
+        Directory of the warehouse, written through storage.DataStore
+        (default: DEFAULT_WAREHOUSE_DIR)
+    fmt : str
+        'feather' or 'parquet' (default: 'parquet')
+    """
+
+    def __init__(self, root=DEFAULT_WAREHOUSE_DIR, fmt='parquet'):
+        self.root = root
+        self.store = DataStore(root, fmt=fmt)
+        self._long = {}
+        self._tables = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _dataset(statement):
+        return f'statements/{statement}'
+
+    def statements(self):
+        """List the statements stored in the warehouse."""
+        base = os.path.join(self.root, 'statements')
+        if not os.path.isdir(base):
+            return []
+        return sorted(os.path.splitext(name)[0] for name in os.listdir(base))
+
+    def long(self, statement):
+        """
+        Return every stored row of a statement.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Columns LONG_COLUMNS, with symbol, period and item as categoricals
+        """
+        with self._lock:
+            long = self._long.get(statement)
+            if long is None:
+                long = self.store.read(self._dataset(statement))
+                if long.empty:
+                    long = pd.DataFrame({column: pd.Series(dtype='category') for column in LONG_COLUMNS[:3]})
+                    long['value'] = pd.Series(dtype=float)
+                self._long[statement] = long
+            return long
+
+    def stored(self, statement, symbol):
+        """
+        Return the stored rows of one symbol and statement.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Columns 'period', 'item', 'value' (empty if nothing is stored)
+        """
+        long = self.long(statement)
+        rows = long[long['symbol'] == symbol][['period', 'item', 'value']]
+        return rows.astype({'period': str, 'item': str}).reset_index(drop=True)
+
+    def write(self, statement, rows, replace_periods=True):
+        """
+        Merge long rows of any number of symbols into a statement.
+
+        Parameters:
+        -----------
+        statement : str
+            Statement name
+        rows : pandas.DataFrame
+            Columns LONG_COLUMNS
+        replace_periods : bool
+            Drop every stored row of the (symbol, period) pairs present in rows
+            first, so items removed in a restated period disappear; otherwise
+            only matching items are replaced (default: True)
+
+        Returns:
+        --------
+        int
+            Number of rows written
+        """
+        if rows.empty:
+            return 0
+        rows = rows[LONG_COLUMNS].drop_duplicates(['symbol', 'period', 'item'], keep='last')
+        with self._lock:
+            long = self.long(statement)
+            if not long.empty:
+                keys = ['symbol', 'period'] if replace_periods else ['symbol', 'period', 'item']
+                long = long[~_isin_rows(long, rows, keys)]
+                long = pd.DataFrame({
+                    column: union_categoricals([long[column].array, pd.Categorical(rows[column].astype(str))])
+                    for column in LONG_COLUMNS[:3]
+                } | {'value': np.concatenate([long['value'].to_numpy(), rows['value'].to_numpy(dtype=float)])})
+            else:
+                long = rows.astype({'symbol': 'category', 'period': 'category', 'item': 'category'})
+            long = long.sort_values(['symbol', 'period', 'item']).reset_index(drop=True)
+            self.store.write(self._dataset(statement), long)
+            self._long[statement] = long
+            self._tables.pop(statement, None)
+        return len(rows)
+
+    @instrument.timed()
+    def ingest_many(self, statements_by_symbol):
+        """
+        Add or update the statements of many companies in one write per statement.
+
+        Rows for periods that are already stored are replaced; other stored
+        periods are kept.
+
+        Parameters:
+        -----------
+        statements_by_symbol : dict
+            Symbol -> {statement name: wide frame}, e.g. fs.fetch_statements results
+
+        Returns:
+        --------
+        int
+            Number of long rows ingested
+        """
+        batches = {}
+        for symbol, statements in statements_by_symbol.items():
+            for statement, frame in statements.items():
+                batches.setdefault(statement, {})[symbol] = frame
+        return sum(self.write(statement, normalize_statements(frames)) for statement, frames in batches.items())
+
+    def ingest(self, symbol, statements):
+        """Add or update the statements of one company (see ingest_many)."""
+        return self.ingest_many({symbol: statements})
+
+    def _table(self, statement):
+        with self._lock:
+            table = self._tables.get(statement)
+            if table is None:
+                long = self.long(statement)
+                if long.empty:
+                    raise KeyError(f"No {statement} data in the warehouse")
+                table = _StatementTable(long)
+                self._tables[statement] = table
+            return table
+
+    def load(self, statements=None):
+        """Load and index statements ahead of queries (default: all stored)."""
+        for statement in statements or self.statements():
+            self._table(statement)
+
+    def items(self, statement):
+        """Line items of a statement."""
+        return list(self._table(statement).items)
+
+    def periods(self, statement):
+        """Periods of a statement, oldest first."""
+        return list(self._table(statement).periods)
+
+    def symbols(self, statement):
+        """Symbols with data for a statement."""
+        return list(self._table(statement).symbols)
+
+    def cross_section(self, statement, item, period, symbols=None):
+        """
+        One line item of one period for every company.
+
+        Parameters:
+        -----------
+        statement : str
+            Statement name, e.g. 'Ratio'
+        item : str
+            Line item, e.g. 'ROE (%)'
+        period : str
+            Period label, e.g. '2023Q4' or '2023'
+        symbols : list of str, optional
+            Companies to keep, e.g. all banks (default: all)
+
+        Returns:
+        --------
+        pandas.Series
+            Values indexed by symbol
+        """
+        result = self._table(statement).cross_section(item, _normalize_period(period))
+        if symbols is not None:
+            result = result[result.index.isin(symbols)]
+        return result
+
+    def pivot(self, statement, item, symbols=None, periods=None):
+        """
+        One line item as a symbol x period matrix.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            One row per symbol with data and one column per period
+        """
+        table = self._table(statement)
+        if item not in table._item_lookup:
+            raise KeyError(f"Unknown item: {item!r}")
+        grid = table.matrix('item', table._item_lookup[item], 'symbol', 'period', table.symbols, table.periods)
+        frame = pd.DataFrame(grid, index=pd.Index(table.symbols, name='symbol'),
+                             columns=pd.Index(table.periods, name='period'))
+        frame = frame[~np.isnan(grid).all(axis=1)]
+        if symbols is not None:
+            frame = frame[frame.index.isin(symbols)]
+        if periods is not None:
+            frame = frame[[_normalize_period(period) for period in periods]]
+        return frame
+
+    def panel(self, statement, period, items=None, symbols=None):
+        """
+        Every line item of one period as a symbol x item matrix.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            One row per symbol with data and one column per item
+        """
+        table = self._table(statement)
+        period = _normalize_period(period)
+        if period not in table._period_lookup:
+            raise KeyError(f"Unknown period: {period!r}")
+        grid = table.matrix('period', table._period_lookup[period], 'symbol', 'item', table.symbols, table.items)
+        frame = pd.DataFrame(grid, index=pd.Index(table.symbols, name='symbol'),
+                             columns=pd.Index(table.items, name='item'))
+        frame = frame[~np.isnan(grid).all(axis=1)]
+        if symbols is not None:
+            frame = frame[frame.index.isin(symbols)]
+        if items is not None:
+            frame = frame[list(items)]
+        return frame
+
+    def latest_periods(self, statement, kind=None):
+        """
+        Most recent stored period of every symbol's statement.
+
+        Parameters:
+        -----------
+        statement : str
+            Statement name
+        kind : str, optional
+            'quarter' or 'year' to only consider quarterly or annual periods
+            (default: both)
+
+        Returns:
+        --------
+        pandas.Series
+            Period label indexed by symbol
+        """
+        long = self.long(statement)
+        if long.empty:
+            return pd.Series(dtype=object)
+        pairs = long[['symbol', 'period']].drop_duplicates().astype(str)
+        if kind is not None:
+            quarterly = pairs['period'].str.contains('Q', regex=False)
+            pairs = pairs[quarterly if kind == 'quarter' else ~quarterly]
+        return pairs.groupby('symbol')['period'].max()
+
+
+def synthetic_statement(symbol, num_quarters=20, num_items=60, seed=0):
+    """
+    Quarterly statement frame shaped like VCI's English output, for benchmarks.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        'ticker', 'yearReport', 'lengthReport' and num_items item columns
+    """
+    rng = np.random.default_rng(seed + sum(ord(c) for c in symbol))
+    quarters = pd.period_range('2019Q1', periods=num_quarters, freq='Q')
+    frame = pd.DataFrame(rng.normal(100, 30, (num_quarters, num_items)),
+                         columns=[f'Item {i:03d}' for i in range(num_items)])
+    frame.insert(0, 'lengthReport', [q.quarter for q in quarters])
+    frame.insert(0, 'yearReport', [q.year for q in quarters])
+    frame.insert(0, 'ticker', symbol)
+    return frame
+
+
+def benchmark(num_symbols=1700, num_quarters=20, num_items=60, root=os.path.join('.cache', 'warehouse_bench'),
+              repeat=20):
+    """
+    Ingest synthetic quarterly statements for many companies and time
+    cross-sectional queries against a pandas scan of the long table.
+
+    Returns:
+    --------
+    dict
+        Seconds for ingest, load, the indexed and scanned cross-sections, and
+        a symbol x period pivot
+    """
+    import shutil
+
+    shutil.rmtree(root, ignore_errors=True)
+    warehouse = StatementWarehouse(root)
+    symbols = [f'S{i:04d}' for i in range(num_symbols)]
+
+    statements = {symbol: {'Ratio': synthetic_statement(symbol, num_quarters, num_items)} for symbol in symbols}
+    t0 = time.perf_counter()
+    warehouse.ingest_many(statements)
+    ingest = time.perf_counter() - t0
+
+    # A new process reads the stored table and builds the indexes once
+    warehouse = StatementWarehouse(root)
+    t0 = time.perf_counter()
+    warehouse.load(['Ratio'])
+    load = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        indexed = warehouse.cross_section('Ratio', 'Item 007', '2023Q4')
+    cross_section = (time.perf_counter() - t0) / repeat
+
+    long = warehouse.long('Ratio')
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        scanned = long[(long['item'] == 'Item 007') & (long['period'] == '2023Q4')]
+    scan = (time.perf_counter() - t0) / repeat
+    assert len(indexed) == len(scanned) == num_symbols
+
+    t0 = time.perf_counter()
+    pivot_frame = warehouse.pivot('Ratio', 'Item 007')
+    pivot = time.perf_counter() - t0
+    assert pivot_frame.shape == (num_symbols, num_quarters)
+
+    return {
+        'rows': len(long),
+        'ingest_seconds': ingest,
+        'load_seconds': load,
+        'cross_section_seconds': cross_section,
+        'scan_seconds': scan,
+        'pivot_seconds': pivot,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the financial statement warehouse.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    query = subparsers.add_parser('query', help="Cross-section of one item and period")
+    query.add_argument('statement', help="Statement, e.g. Ratio")
+    query.add_argument('item', help="Line item, e.g. 'ROE (%%)'")
+    query.add_argument('period', help="Period, e.g. 2023Q4 or 2023")
+    query.add_argument('--symbols', nargs='+', default=None, help="Companies to keep (default: all)")
+    pivot = subparsers.add_parser('pivot', help="Symbol x period matrix of one item")
+    pivot.add_argument('statement')
+    pivot.add_argument('item')
+    pivot.add_argument('--symbols', nargs='+', default=None)
+    subparsers.add_parser('benchmark', help="Time queries over 1,700 synthetic companies")
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        result = benchmark()
+        print(f"{result['rows']:,} rows ingested in {result['ingest_seconds']:.1f}s, "
+              f"loaded in {result['load_seconds']:.2f}s")
+        print(f"Indexed cross-section: {result['cross_section_seconds'] * 1000:.2f} ms")
+        print(f"Pandas scan: {result['scan_seconds'] * 1000:.2f} ms")
+        print(f"Symbol x period pivot: {result['pivot_seconds'] * 1000:.2f} ms")
+        return result
+
+    warehouse = StatementWarehouse()
+    if args.command == 'query':
+        result = warehouse.cross_section(args.statement, args.item, args.period, args.symbols)
+    else:
+        result = warehouse.pivot(args.statement, args.item, args.symbols)
+    print(result.to_string())
+    return result
+
+
+if __name__ == "__main__":
+    main()